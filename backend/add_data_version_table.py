@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移脚本 - 添加video_data_versions表
+"""
+
+from sqlalchemy import create_engine, inspect
+from models_simple import VideoDataVersion
+import os
+
+def add_data_version_table():
+    """创建视频数据版本表"""
+    db_path = "./video_analysis.db"
+    
+    if not os.path.exists(db_path):
+        print(f"数据库文件不存在: {db_path}")
+        return
+    
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        if inspect(engine).has_table(VideoDataVersion.__tablename__):
+            print("video_data_versions表已存在，无需添加")
+            return
+        
+        VideoDataVersion.__table__.create(bind=engine)
+        print("✓ 成功添加video_data_versions表")
+        print("  已有视频的版本号从0开始，首次修改帧、OCR结果或阶段配置时创建版本记录")
+    except Exception as e:
+        print(f"添加video_data_versions表失败: {str(e)}")
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    add_data_version_table()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移脚本 - 为videos表添加保留策略清理记录列（帧图片清理时间、归档时间）
+"""
+
+from sqlalchemy import create_engine, inspect, text
+import os
+
+RETENTION_COLUMNS = {
+    "frames_purged_at": "TIMESTAMP",
+    "archived_at": "TIMESTAMP"
+}
+
+def add_retention_columns():
+    """为videos表添加保留策略清理记录列"""
+    db_path = "./video_analysis.db"
+    
+    if not os.path.exists(db_path):
+        print(f"数据库文件不存在: {db_path}")
+        return
+    
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        columns = [column["name"] for column in inspect(engine).get_columns("videos")]
+        with engine.begin() as conn:
+            for name, column_type in RETENTION_COLUMNS.items():
+                if name in columns:
+                    print(f"{name}列已存在，无需添加")
+                    continue
+                conn.execute(text(f"ALTER TABLE videos ADD COLUMN {name} {column_type}"))
+                print(f"✓ 成功添加{name}列")
+    except Exception as e:
+        print(f"添加保留策略列失败: {str(e)}")
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    add_retention_columns()
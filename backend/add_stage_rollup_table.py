@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移脚本 - 添加stage_duration_rollups表
+"""
+
+from sqlalchemy import create_engine, inspect
+from models_simple import StageDurationRollup
+import os
+
+def add_stage_rollup_table():
+    """创建阶段耗时汇总表"""
+    db_path = "./video_analysis.db"
+    
+    if not os.path.exists(db_path):
+        print(f"数据库文件不存在: {db_path}")
+        return
+    
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        if inspect(engine).has_table(StageDurationRollup.__tablename__):
+            print("stage_duration_rollups表已存在，无需添加")
+            return
+        
+        StageDurationRollup.__table__.create(bind=engine)
+        print("✓ 成功添加stage_duration_rollups表")
+        print("  已有的阶段分析结果可调用 POST /projects/{project_id}/stage-rollups/rebuild 生成汇总")
+    except Exception as e:
+        print(f"添加stage_duration_rollups表失败: {str(e)}")
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    add_stage_rollup_table()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移脚本 - 添加存储用量表
+并遍历一次存储目录写入当前的用量（服务启动时也会与磁盘核对一次）
+"""
+
+from sqlalchemy import create_engine, inspect
+from models_simple import StorageUsage
+from storage_module import StorageAccountant
+from datetime import datetime
+import os
+
+def add_storage_usage_table():
+    """创建storage_usage表并回填当前用量"""
+    db_path = "./video_analysis.db"
+    
+    if not os.path.exists(db_path):
+        print(f"数据库文件不存在: {db_path}")
+        return
+    
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        if inspect(engine).has_table(StorageUsage.__tablename__):
+            print("storage_usage表已存在，无需添加")
+            return
+        StorageUsage.__table__.create(bind=engine)
+        print("✓ 成功添加storage_usage表")
+        
+        totals = StorageAccountant().scan()
+        now = datetime.utcnow()
+        with engine.begin() as conn:
+            if totals:
+                conn.execute(StorageUsage.__table__.insert(), [
+                    {"category": category, "video_id": video_id, "file_count": files, "total_bytes": size, "updated_at": now}
+                    for (category, video_id), (files, size) in totals.items()
+                ])
+        print(f"✓ 已统计{sum(files for files, _ in totals.values())}个文件的存储用量")
+    except Exception as e:
+        print(f"添加存储用量表失败: {str(e)}")
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    add_storage_usage_table()
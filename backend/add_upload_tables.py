@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移脚本 - 添加分块上传会话表和videos表的content_hash列
+并为已有视频计算文件的SHA-256，使新上传的相同视频可以与已有视频去重
+"""
+
+from sqlalchemy import create_engine, inspect, text
+from models_simple import VideoUpload
+from utils import calculate_file_hash
+import os
+
+def add_upload_tables():
+    """创建video_uploads表，添加content_hash列并回填已有视频的哈希"""
+    db_path = "./video_analysis.db"
+    
+    if not os.path.exists(db_path):
+        print(f"数据库文件不存在: {db_path}")
+        return
+    
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        inspector = inspect(engine)
+        if inspector.has_table(VideoUpload.__tablename__):
+            print("video_uploads表已存在，无需添加")
+        else:
+            VideoUpload.__table__.create(bind=engine)
+            print("✓ 成功添加video_uploads表")
+        
+        columns = [column["name"] for column in inspector.get_columns("videos")]
+        with engine.begin() as conn:
+            if "content_hash" in columns:
+                print("content_hash列已存在，无需添加")
+            else:
+                conn.execute(text("ALTER TABLE videos ADD COLUMN content_hash VARCHAR(64)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_video_content_hash ON videos (content_hash)"))
+                print("✓ 成功添加content_hash列")
+            
+            rows = conn.execute(text("SELECT id, file_path FROM videos WHERE content_hash IS NULL")).fetchall()
+            updated = 0
+            for video_id, file_path in rows:
+                if not os.path.exists(file_path):
+                    continue
+                content_hash = calculate_file_hash(file_path, "sha256")
+                conn.execute(text("UPDATE videos SET content_hash = :hash WHERE id = :id"), {"hash": content_hash, "id": video_id})
+                updated += 1
+            print(f"✓ 已计算{updated}个视频的文件哈希（{len(rows) - updated}个视频文件不存在，跳过）")
+    except Exception as e:
+        print(f"添加上传相关表失败: {str(e)}")
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    add_upload_tables()
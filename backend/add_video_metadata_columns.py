@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移脚本 - 为videos表添加视频元数据列（编码、总帧数、关键帧位置、探测时间）
+已有视频的元数据在下次分帧时于后台探测，也可以调用 POST /videos/{video_id}/metadata/probe 探测
+"""
+
+from sqlalchemy import create_engine, inspect, text
+import os
+
+METADATA_COLUMNS = {
+    "codec": "VARCHAR(20)",
+    "frame_count": "BIGINT",
+    "keyframes": "JSON",
+    "metadata_probed_at": "TIMESTAMP"
+}
+
+def add_video_metadata_columns():
+    """为videos表添加元数据列"""
+    db_path = "./video_analysis.db"
+    
+    if not os.path.exists(db_path):
+        print(f"数据库文件不存在: {db_path}")
+        return
+    
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        columns = [column["name"] for column in inspect(engine).get_columns("videos")]
+        with engine.begin() as conn:
+            for name, column_type in METADATA_COLUMNS.items():
+                if name in columns:
+                    print(f"{name}列已存在，无需添加")
+                    continue
+                conn.execute(text(f"ALTER TABLE videos ADD COLUMN {name} {column_type}"))
+                print(f"✓ 成功添加{name}列")
+    except Exception as e:
+        print(f"添加视频元数据列失败: {str(e)}")
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    add_video_metadata_columns()
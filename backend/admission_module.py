@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+准入控制模块
+按接口类别（视频分帧、OCR处理、分析计算）限制同时执行的重请求数：超出并发数的请求进入有界等待队列按顺序执行，
+队列已满时立即返回429，排队超时返回503，两者都带有Retry-After，避免重请求占满CPU导致轻量的读接口超时。
+
+计数保存在当前进程内存中，多worker部署时每个worker分别限制
+"""
+
+from fastapi import HTTPException
+from contextlib import asynccontextmanager
+from collections import deque
+from typing import Any, Dict, Optional
+from config import AdmissionConfig
+import asyncio
+import math
+import time
+
+
+# Retry-After的取值范围（秒）
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 300
+# 平均执行耗时的指数移动平均系数
+DURATION_SMOOTHING = 0.2
+
+
+class AdmissionLimiter:
+    """单个接口类别的并发限制（先进先出的有界等待队列）"""
+    
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float, retry_after: int,
+                 label: Optional[str] = None):
+        self.name = name
+        self.label = label or name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._average_duration: Optional[float] = None
+        self.stats = {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0, "max_queue_depth": 0}
+    
+    def estimate_retry_after(self) -> int:
+        """按平均执行耗时估算排在队尾的请求需要等待的秒数"""
+        if self._average_duration is None:
+            return self.retry_after
+        estimate = self._average_duration * (len(self._waiters) + 1) / self.max_concurrent
+        return max(MIN_RETRY_AFTER, min(MAX_RETRY_AFTER, math.ceil(estimate)))
+    
+    def _reject(self, status_code: int, reason: str, detail: str):
+        self.stats[reason] += 1
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(self.estimate_retry_after())}
+        )
+    
+    async def acquire(self) -> None:
+        """获取执行名额，需要排队时等待，队列已满或排队超时抛出HTTPException"""
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.stats["admitted"] += 1
+            return
+        
+        if len(self._waiters) >= self.max_queue:
+            self._reject(429, "rejected_queue_full", f"{self.label}请求过多，请稍后重试")
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["queued"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._waiters))
+        try:
+            # 名额由release()直接移交给队首的请求，active不变
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                self._reject(503, "rejected_timeout", f"{self.label}服务繁忙，排队超时，请稍后重试")
+        except asyncio.CancelledError:
+            # 客户端断开：已移交的名额需要释放，否则名额永久丢失
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.stats["admitted"] += 1
+    
+    def release(self, duration: Optional[float] = None) -> None:
+        """释放执行名额，有排队的请求时移交给队首"""
+        if duration is not None:
+            if self._average_duration is None:
+                self._average_duration = duration
+            else:
+                self._average_duration += DURATION_SMOOTHING * (duration - self._average_duration)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+    
+    @asynccontextmanager
+    async def slot(self):
+        """async with limiter.slot(): 在名额内执行请求"""
+        await self.acquire()
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start_time)
+    
+    def info(self) -> Dict[str, Any]:
+        """当前状态和计数"""
+        return {
+            "label": self.label,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "queue_depth": len(self._waiters),
+            "average_duration": round(self._average_duration, 3) if self._average_duration is not None else None,
+            "retry_after": self.estimate_retry_after(),
+            **self.stats
+        }
+
+
+class AdmissionController:
+    """各接口类别的并发限制"""
+    
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.limiters = {
+            name: AdmissionLimiter(name, **options)
+            for name, options in (limits if limits is not None else AdmissionConfig.LIMITS).items()
+        }
+    
+    def admit(self, endpoint_class: str):
+        """async with admission_controller.admit("ocr"): 在该类别的名额内执行"""
+        return self.limiters[endpoint_class].slot()
+    
+    def info(self) -> Dict[str, Any]:
+        return {name: limiter.info() for name, limiter in self.limiters.items()}
+
+
+# 创建全局实例
+admission_controller = AdmissionController()
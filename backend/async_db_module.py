@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+异步数据库模块
+为高频读接口提供异步会话（SQLAlchemy asyncio + aiosqlite / asyncpg），查询期间不阻塞事件循环，
+慢查询不会拖慢同一进程中的其他请求；写操作仍通过db_module中的同步会话和写线程队列完成
+"""
+
+from sqlalchemy import event
+from fastapi.concurrency import run_in_threadpool
+from typing import Callable, Any
+from config import DatabaseConfig
+from db_module import DATABASE_URL, SessionLocal, apply_sqlite_pragmas, get_pool_options
+import importlib.util
+
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+    _ASYNCIO_EXTENSION_AVAILABLE = True
+except ImportError:
+    _ASYNCIO_EXTENSION_AVAILABLE = False
+
+
+# 同步URL前缀 -> (异步驱动URL前缀, 驱动包名)
+_ASYNC_DRIVERS = {
+    "sqlite": ("sqlite+aiosqlite", "aiosqlite"),
+    "postgresql": ("postgresql+asyncpg", "asyncpg"),
+    "postgresql+psycopg2": ("postgresql+asyncpg", "asyncpg")
+}
+
+
+def _async_driver(database_url: str):
+    return _ASYNC_DRIVERS.get(database_url.split(":", 1)[0])
+
+
+def async_driver_available(database_url: str) -> bool:
+    """判断数据库URL对应的异步驱动是否已安装"""
+    driver = _async_driver(database_url)
+    return _ASYNCIO_EXTENSION_AVAILABLE and driver is not None and importlib.util.find_spec(driver[1]) is not None
+
+
+def to_async_url(database_url: str) -> str:
+    """将同步驱动的数据库URL转换为对应的异步驱动URL"""
+    driver = _async_driver(database_url)
+    if driver is None:
+        return database_url
+    return driver[0] + ":" + database_url.split(":", 1)[1]
+
+
+def create_async_db_engine(database_url: str = DATABASE_URL):
+    """创建异步引擎，SQLite连接与同步引擎使用相同的PRAGMA，服务端数据库使用相同的连接池配置"""
+    async_url = to_async_url(database_url)
+    if not async_url.startswith("sqlite"):
+        return create_async_engine(async_url, **get_pool_options(database_url))
+    
+    in_memory = ":memory:" in database_url or database_url == "sqlite://"
+    connect_args = {"timeout": DatabaseConfig.SQLITE_SETTINGS["timeout"]}
+    pool_args = {} if in_memory else {"poolclass": AsyncAdaptedQueuePool}
+    async_engine = create_async_engine(async_url, connect_args=connect_args, **pool_args)
+    
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        # 读接口只执行查询，使用自动提交模式，每条语句读取最新的WAL数据
+        dbapi_connection.isolation_level = None
+        apply_sqlite_pragmas(dbapi_connection, DatabaseConfig.SQLITE_PRAGMAS, in_memory)
+    
+    return async_engine
+
+
+class ThreadPoolSession:
+    """未安装异步驱动时的替代会话
+    
+    提供与AsyncSession相同的execute / run_sync / close接口，同步查询在线程池中执行，
+    同样不会阻塞事件循环
+    """
+    
+    def __init__(self, session_factory: Callable = SessionLocal):
+        self._session = session_factory()
+    
+    async def execute(self, statement, params=None):
+        frozen = await run_in_threadpool(lambda: self._session.execute(statement, params).freeze())
+        return frozen()
+    
+    async def run_sync(self, fn: Callable, *args, **kwargs) -> Any:
+        return await run_in_threadpool(fn, self._session, *args, **kwargs)
+    
+    async def close(self) -> None:
+        await run_in_threadpool(self._session.close)
+
+
+ASYNC_DRIVER_AVAILABLE = async_driver_available(DATABASE_URL)
+
+if ASYNC_DRIVER_AVAILABLE:
+    async_engine = create_async_db_engine(DATABASE_URL)
+    AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+else:
+    print("未安装当前数据库的异步驱动（aiosqlite / asyncpg），异步读接口将在线程池中执行同步查询")
+    async_engine = None
+    AsyncSessionLocal = ThreadPoolSession
+
+
+# 依赖注入：获取异步数据库会话（只用于读接口）
+async def get_async_db():
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
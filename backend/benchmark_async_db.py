@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步读接口延迟基准测试脚本
+在同一个事件循环中按固定速率发起请求（少量整段帧列表查询 + 大量单帧查询 + 20%不访问数据库的请求），
+对比同步会话（查询阻塞事件循环）、线程池会话与异步会话（aiosqlite）下的尾延迟
+
+用法: python benchmark_async_db.py [--rate 200] [--seconds 10] [--frames 2000] [--heavy-ratio 0.02]
+"""
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+from db_module import create_db_engine
+from async_db_module import create_async_db_engine, ThreadPoolSession, ASYNC_DRIVER_AVAILABLE
+from models_simple import Base, Project, Video, VideoFrame
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def create_database(frame_count: int) -> tuple:
+    """创建临时数据库，写入一个包含frame_count帧的视频"""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_async_"), "bench.db")
+    database_url = f"sqlite:///{db_path}"
+    engine = create_db_engine(database_url)
+    Base.metadata.create_all(engine)
+    
+    with engine.begin() as conn:
+        project_id = conn.execute(Project.__table__.insert(), {"name": "benchmark"}).inserted_primary_key[0]
+        video_id = conn.execute(Video.__table__.insert(), {
+            "project_id": project_id, "original_filename": "bench.mp4", "stored_filename": "bench.mp4",
+            "file_path": "bench.mp4", "file_size": 1
+        }).inserted_primary_key[0]
+        conn.execute(VideoFrame.__table__.insert(), [
+            {"video_id": video_id, "frame_number": i, "timestamp_ms": i * 33, "frame_path": f"frame_{i}.jpg"}
+            for i in range(frame_count)
+        ])
+    return database_url, engine, video_id
+
+
+def sync_handlers(SessionFactory):
+    """原实现：async接口中直接使用同步会话"""
+    async def list_frames(video_id):
+        db = SessionFactory()
+        try:
+            return db.query(VideoFrame).filter(VideoFrame.video_id == video_id).order_by(VideoFrame.frame_number).all()
+        finally:
+            db.close()
+    
+    async def get_frame(frame_id):
+        db = SessionFactory()
+        try:
+            return db.query(VideoFrame).filter(VideoFrame.id == frame_id).first()
+        finally:
+            db.close()
+    
+    return list_frames, get_frame
+
+
+def async_handlers(session_factory):
+    """新实现：异步会话（或线程池替代会话）"""
+    async def list_frames(video_id):
+        db = session_factory()
+        try:
+            result = await db.execute(
+                select(VideoFrame).where(VideoFrame.video_id == video_id).order_by(VideoFrame.frame_number)
+            )
+            return result.scalars().all()
+        finally:
+            await db.close()
+    
+    async def get_frame(frame_id):
+        db = session_factory()
+        try:
+            return (await db.execute(select(VideoFrame).where(VideoFrame.id == frame_id))).scalars().first()
+        finally:
+            await db.close()
+    
+    return list_frames, get_frame
+
+
+async def run_load(handlers, video_id: int, frame_count: int, rate: float, seconds: float, heavy_ratio: float) -> dict:
+    """按固定到达速率发起读请求（开环负载），延迟从计划到达时间开始计算，包含排队等待时间"""
+    list_frames, get_frame = handlers
+    latencies = {"list": [], "single": [], "ping": []}
+    rng = random.Random(0)
+    loop = asyncio.get_running_loop()
+    started_at = loop.time()
+    
+    async def request(kind, arrival):
+        if kind == "list":
+            await list_frames(video_id)
+        elif kind == "single":
+            await get_frame(rng.randint(1, frame_count))
+        else:
+            # 不访问数据库的请求，延迟只取决于事件循环是否被阻塞
+            await asyncio.sleep(0)
+        latencies[kind].append(loop.time() - arrival)
+    
+    tasks = []
+    for i in range(int(rate * seconds)):
+        arrival = started_at + i / rate
+        delay = arrival - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        roll = rng.random()
+        kind = "list" if roll < heavy_ratio else ("ping" if roll > 0.8 else "single")
+        tasks.append(asyncio.ensure_future(request(kind, arrival)))
+    await asyncio.gather(*tasks)
+    
+    elapsed = loop.time() - started_at
+    stats = {"requests_per_sec": len(tasks) / elapsed}
+    for kind, values in latencies.items():
+        stats[kind] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 0.5) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": max(values) * 1000 if values else 0.0
+        }
+    return stats
+
+
+def print_stats(name: str, stats: dict) -> None:
+    print(f"\n=== {name} ===")
+    print(f"  吞吐: {stats['requests_per_sec']:.0f} 次/秒")
+    for kind, label in (("ping", "非数据库请求"), ("single", "单帧查询"), ("list", "帧列表查询")):
+        item = stats[kind]
+        print(f"  {label}: {item['count']} 次 (p50 {item['p50_ms']:.2f}ms, p99 {item['p99_ms']:.2f}ms, max {item['max_ms']:.2f}ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="异步读接口延迟基准测试")
+    parser.add_argument("--rate", type=float, default=200, help="每秒发起的请求数")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--heavy-ratio", type=float, default=0.02, help="帧列表查询所占比例")
+    args = parser.parse_args()
+    
+    database_url, engine, video_id = create_database(args.frames)
+    SessionFactory = sessionmaker(bind=engine)
+    print(f"请求速率: {args.rate}/s, 时长: {args.seconds}s, 帧数: {args.frames}, 慢查询比例: {args.heavy_ratio}")
+    
+    profiles = [
+        ("同步会话", lambda: sync_handlers(SessionFactory), None),
+        ("线程池会话", lambda: async_handlers(lambda: ThreadPoolSession(SessionFactory)), None)
+    ]
+    if ASYNC_DRIVER_AVAILABLE:
+        from sqlalchemy.ext.asyncio import AsyncSession
+        async_engine = create_async_db_engine(database_url)
+        profiles.append((
+            "异步会话(aiosqlite)",
+            lambda: async_handlers(lambda: AsyncSession(async_engine, expire_on_commit=False)),
+            async_engine
+        ))
+    
+    for name, make_handlers, profile_engine in profiles:
+        stats = asyncio.run(run_load(make_handlers(), video_id, args.frames, args.rate, args.seconds, args.heavy_ratio))
+        print_stats(name, stats)
+        if profile_engine is not None:
+            # 异步引擎的连接绑定在事件循环上，每次asyncio.run之后释放
+            asyncio.run(profile_engine.dispose())
+    
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
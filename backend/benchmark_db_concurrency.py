@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite并发读写基准测试脚本
+对比默认SQLite配置（每个写线程各自提交）与生产配置（WAL + PRAGMA + 单写线程队列）
+在多个读线程和写线程同时运行时的吞吐量、写入延迟和锁错误数
+
+用法: python benchmark_db_concurrency.py [--readers 8] [--writers 8] [--seconds 10]
+"""
+
+from sqlalchemy import Column, Integer, String, Text, Index, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker, declarative_base
+from db_module import create_db_engine, DatabaseWriter
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+BenchBase = declarative_base()
+
+
+class BenchOCRRow(BenchBase):
+    """模拟ocr_results的写入负载"""
+    __tablename__ = "bench_ocr_rows"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    video_id = Column(Integer, nullable=False)
+    frame_id = Column(Integer, nullable=False)
+    text_content = Column(Text)
+    status = Column(String(20))
+    
+    __table_args__ = (
+        Index('idx_bench_video_frame', 'video_id', 'frame_id'),
+    )
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_profile(name: str, tuned: bool, readers: int, writers: int, seconds: float) -> dict:
+    """运行单个配置的基准测试"""
+    db_dir = tempfile.mkdtemp(prefix="bench_db_")
+    database_url = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    engine = create_db_engine(database_url, tuned=tuned)
+    BenchBase.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    writer = DatabaseWriter(SessionFactory) if tuned else None
+    
+    stop_at = time.monotonic() + seconds
+    lock = threading.Lock()
+    result = {"reads": 0, "writes": 0, "lock_errors": 0, "write_latencies": [], "read_latencies": []}
+    
+    def insert_row(session, video_id, frame_id):
+        session.add(BenchOCRRow(video_id=video_id, frame_id=frame_id, text_content='["加载中", "Loading"]', status="done"))
+    
+    def writer_loop(video_id):
+        frame_id = 0
+        while time.monotonic() < stop_at:
+            frame_id += 1
+            started = time.perf_counter()
+            try:
+                if writer is not None:
+                    writer.execute(lambda session: insert_row(session, video_id, frame_id))
+                else:
+                    session = SessionFactory()
+                    try:
+                        insert_row(session, video_id, frame_id)
+                        session.commit()
+                    finally:
+                        session.close()
+            except OperationalError:
+                with lock:
+                    result["lock_errors"] += 1
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                result["writes"] += 1
+                result["write_latencies"].append(elapsed)
+    
+    def reader_loop(video_id):
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            session = SessionFactory()
+            try:
+                session.execute(
+                    text("SELECT frame_id, text_content FROM bench_ocr_rows WHERE video_id = :video_id ORDER BY frame_id DESC LIMIT 50"),
+                    {"video_id": video_id}
+                ).fetchall()
+                session.execute(text("SELECT COUNT(*) FROM bench_ocr_rows")).scalar()
+            except OperationalError:
+                with lock:
+                    result["lock_errors"] += 1
+                continue
+            finally:
+                session.close()
+            elapsed = time.perf_counter() - started
+            with lock:
+                result["reads"] += 1
+                result["read_latencies"].append(elapsed)
+    
+    threads = [threading.Thread(target=writer_loop, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader_loop, args=(i % max(writers, 1),)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    if writer is not None:
+        writer.stop()
+    transactions = writer.stats["transactions"] if writer is not None else result["writes"]
+    engine.dispose()
+    
+    return {
+        "profile": name,
+        "reads_per_sec": result["reads"] / seconds,
+        "writes_per_sec": result["writes"] / seconds,
+        "transactions": transactions,
+        "lock_errors": result["lock_errors"],
+        "write_p50_ms": percentile(result["write_latencies"], 0.5) * 1000,
+        "write_p99_ms": percentile(result["write_latencies"], 0.99) * 1000,
+        "read_p50_ms": percentile(result["read_latencies"], 0.5) * 1000,
+        "read_p99_ms": percentile(result["read_latencies"], 0.99) * 1000,
+        "read_mean_ms": statistics.mean(result["read_latencies"]) * 1000 if result["read_latencies"] else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite并发读写基准测试")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    
+    print(f"读线程: {args.readers}, 写线程: {args.writers}, 时长: {args.seconds}s")
+    for name, tuned in (("默认配置", False), ("生产配置(WAL+写队列)", True)):
+        stats = run_profile(name, tuned, args.readers, args.writers, args.seconds)
+        print(f"\n=== {stats['profile']} ===")
+        print(f"  读: {stats['reads_per_sec']:.0f} 次/秒 (p50 {stats['read_p50_ms']:.2f}ms, p99 {stats['read_p99_ms']:.2f}ms)")
+        print(f"  写: {stats['writes_per_sec']:.0f} 次/秒 (p50 {stats['write_p50_ms']:.2f}ms, p99 {stats['write_p99_ms']:.2f}ms)")
+        print(f"  事务数: {stats['transactions']}, 锁错误: {stats['lock_errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧记录写入基准测试脚本
+对比原实现（分帧结束后逐帧构造VideoFrame对象、db.add后一次提交）与分批executemany写入（FrameRowWriter，
+经写线程每批提交）写入大量帧记录的总耗时、Python内存峰值和第一条帧记录可查询到的时间
+
+用法: python benchmark_frame_insert.py [--frames 20000] [--batch-size 500] [--repeat 3]
+"""
+
+from sqlalchemy.orm import sessionmaker
+from db_module import create_db_engine, DatabaseWriter
+from models_simple import Base, Project, Video, VideoFrame
+from frame_extraction_module import FrameRowWriter, FRAME_INSERT_BATCH_SIZE
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+
+def build_frames(frame_count: int):
+    """生成与分帧结果相同结构的帧信息（逐个产生，模拟边分帧边写入）"""
+    for frame_number in range(frame_count):
+        timestamp_ms = frame_number * 100
+        yield {
+            "frame_number": frame_number,
+            "timestamp_ms": timestamp_ms,
+            "frame_path": f"./data/frames/video_1/frame_{frame_number:06d}_{timestamp_ms}ms.jpg",
+            "file_size": 40000 + frame_number % 1000
+        }
+
+
+def create_env():
+    """创建临时数据库和一个视频记录"""
+    db_dir = tempfile.mkdtemp(prefix="bench_frames_")
+    engine = create_db_engine(f"sqlite:///{os.path.join(db_dir, 'bench.db')}")
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    db = SessionFactory()
+    try:
+        project = Project(name="基准测试项目")
+        db.add(project)
+        db.commit()
+        video = Video(project_id=project.id, original_filename="bench.mp4", stored_filename="bench.mp4",
+                      file_path="./bench.mp4", file_size=0)
+        db.add(video)
+        db.commit()
+        return SessionFactory, video.id
+    finally:
+        db.close()
+
+
+def run_orm(frame_count: int, batch_size: int) -> dict:
+    """原实现：帧信息先全部保留在内存，再逐帧构造ORM对象一次提交"""
+    SessionFactory, video_id = create_env()
+    tracemalloc.start()
+    started = time.perf_counter()
+    extracted_frames = list(build_frames(frame_count))
+    db = SessionFactory()
+    try:
+        for frame_info in extracted_frames:
+            db.add(VideoFrame(video_id=video_id, **frame_info))
+        db.commit()
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": elapsed, "first_visible": elapsed, "peak_mb": peak / 1024 / 1024}
+
+
+def run_bulk(frame_count: int, batch_size: int) -> dict:
+    """分批写入：帧信息交给FrameRowWriter，每满一批executemany并提交"""
+    SessionFactory, video_id = create_env()
+    writer = DatabaseWriter(SessionFactory)
+    row_writer = FrameRowWriter(video_id, writer, batch_size=batch_size)
+    first_visible = None
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        for frame_info in build_frames(frame_count):
+            row_writer.add([frame_info])
+            if first_visible is None and row_writer.inserted:
+                first_visible = time.perf_counter() - started
+        row_writer.flush()
+        elapsed = time.perf_counter() - started
+    finally:
+        writer.stop()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": elapsed, "first_visible": first_visible or elapsed, "peak_mb": peak / 1024 / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="帧记录写入基准测试")
+    parser.add_argument("--frames", type=int, default=20000, help="帧数")
+    parser.add_argument("--batch-size", type=int, default=FRAME_INSERT_BATCH_SIZE, help="分批写入的每批帧数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数（取中位数）")
+    args = parser.parse_args()
+    
+    print(f"帧数: {args.frames}，每批: {args.batch_size}，重复: {args.repeat}次\n")
+    print(f"{'方式':<16}{'总耗时(s)':>12}{'帧/秒':>12}{'首批可见(s)':>14}{'内存峰值(MB)':>16}")
+    baseline = None
+    for name, run in (("ORM逐帧add", run_orm), ("分批executemany", run_bulk)):
+        results = [run(args.frames, args.batch_size) for _ in range(args.repeat)]
+        seconds = statistics.median(result["seconds"] for result in results)
+        first_visible = statistics.median(result["first_visible"] for result in results)
+        peak_mb = statistics.median(result["peak_mb"] for result in results)
+        baseline = baseline or seconds
+        print(f"{name:<16}{seconds:>12.3f}{args.frames / seconds:>12.0f}{first_visible:>14.3f}{peak_mb:>16.1f}"
+              f"  ({baseline / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
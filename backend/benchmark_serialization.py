@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应序列化与压缩基准测试脚本
+按10k帧视频构造OCR结果查看、增强OCR结果和阶段模式分析三类响应，
+对比原实现（逐条构造Pydantic模型 + jsonable_encoder + 标准库json）与直接序列化字典（orjson）的耗时，
+并比较GZip/Brotli在不同压缩级别下的压缩后大小和耗时
+
+用法: python benchmark_serialization.py [--frames 10000] [--repeat 3]
+"""
+
+from fastapi.encoders import jsonable_encoder
+from datetime import datetime, timedelta
+from serialization_module import dumps, ORJSON_AVAILABLE, BROTLI_AVAILABLE
+import argparse
+import gzip
+import json
+import random
+import time
+
+try:
+    from ocr_module import EnhancedOCRResultResponse
+except ImportError as e:
+    print(f"无法导入OCR模块，增强OCR结果的模型构造部分跳过: {e}")
+    EnhancedOCRResultResponse = None
+
+if BROTLI_AVAILABLE:
+    import brotli
+
+
+WORDS = ["加载中", "请稍候", "首页", "推荐", "Loading", "视频", "直播", "消息", "我的", "搜索", "关注", "刷新"]
+
+
+def build_payloads(frame_count: int) -> dict:
+    """构造与接口返回结构相同的测试数据"""
+    rng = random.Random(42)
+    base_time = datetime(2024, 1, 1)
+    database_results, enhanced_rows, occurrences = [], [], []
+    
+    for frame_id in range(1, frame_count + 1):
+        texts = rng.sample(WORDS, 5)
+        boxes = [[rng.randint(0, 1080), rng.randint(0, 1920), rng.randint(0, 1080), rng.randint(0, 1920)] for _ in texts]
+        scores = [round(rng.uniform(0.6, 1.0), 6) for _ in texts]
+        database_results.append({
+            "id": frame_id,
+            "frame_id": frame_id,
+            "text_content": texts,
+            "confidence": round(sum(scores) / len(scores), 4),
+            "bbox": json.dumps([{"text": t, "bbox": b, "confidence": s} for t, b, s in zip(texts, boxes, scores)], ensure_ascii=False),
+            "processed_at": (base_time + timedelta(seconds=frame_id)).isoformat()
+        })
+        enhanced_rows.append({
+            "frame_id": frame_id,
+            "frame_path": f"./data/frames/video_1/frame_{frame_id:06d}.jpg",
+            "ocr_version": "PP-OCRv5",
+            "processing_time": round(rng.uniform(0.05, 0.3), 4),
+            "text_blocks": [],
+            "full_text": " ".join(texts),
+            "total_confidence": 0.0,
+            "text_count": len(texts),
+            "language": "zh",
+            "image_info": {},
+            "detection_results": [],
+            "recognition_results": [],
+            "raw_result": [{"json": {"res": {"rec_texts": texts, "rec_scores": scores, "rec_boxes": boxes}}}]
+        })
+        occurrences.append({
+            "frame_id": frame_id,
+            "frame_number": frame_id - 1,
+            "timestamp_ms": (frame_id - 1) * 33,
+            "matched_texts": texts[:2],
+            "confidence": scores[0]
+        })
+    
+    stage_result = {
+        "video_id": 1,
+        "total_stages": 3,
+        "analysis_timestamp": base_time.isoformat(),
+        "stage_results": [{
+            "stage_id": stage_id,
+            "stage_name": f"阶段{stage_id}",
+            "keywords": WORDS[:3],
+            "stage_start_timestamp_ms": 0,
+            "stage_end_timestamp_ms": frame_count * 33,
+            "stage_duration_ms": frame_count * 33,
+            "keyword_results": [{
+                "keyword": keyword,
+                "first_appearance_timestamp": 0,
+                "frame_occurrences": occurrences
+            } for keyword in WORDS[:3]]
+        } for stage_id in range(1, 4)]
+    }
+    
+    return {
+        "ocr_view": {
+            "stats": {"video_id": 1, "database_records_count": frame_count, "json_files_count": frame_count},
+            "database_results": database_results,
+            "json_results": [{
+                "frame_id": row["frame_id"],
+                "frame_path": row["frame_path"],
+                "ocr_version": row["ocr_version"],
+                "processing_time": row["processing_time"],
+                "text_blocks_count": 0,
+                "has_raw_result": True
+            } for row in enhanced_rows]
+        },
+        "enhanced_ocr": enhanced_rows,
+        "stage_pattern": stage_result
+    }
+
+
+def legacy_serialize(name: str, payload) -> bytes:
+    """原实现：增强OCR结果逐条构造模型，再经jsonable_encoder和标准库json序列化"""
+    if name == "enhanced_ocr" and EnhancedOCRResultResponse is not None:
+        payload = [EnhancedOCRResultResponse(**row) for row in payload]
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def timed(fn, repeat: int):
+    """返回(最短耗时毫秒, 结果)"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应序列化与压缩基准测试")
+    parser.add_argument("--frames", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    payloads = build_payloads(args.frames)
+    print(f"帧数: {args.frames}，orjson: {'已安装' if ORJSON_AVAILABLE else '未安装'}，brotli: {'已安装' if BROTLI_AVAILABLE else '未安装'}")
+    
+    for name, payload in payloads.items():
+        legacy_ms, legacy_body = timed(lambda: legacy_serialize(name, payload), args.repeat)
+        fast_ms, body = timed(lambda: dumps(payload), args.repeat)
+        assert json.loads(body) == json.loads(legacy_body)
+        
+        print(f"\n=== {name} ===")
+        print(f"序列化  原实现: {legacy_ms:8.1f}ms  直接序列化: {fast_ms:8.1f}ms  加速: {legacy_ms / fast_ms:5.1f}x  大小: {len(body) / 1024:8.1f}KB")
+        
+        codecs = [(f"gzip-{level}", lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0)) for level in (1, 6, 9)]
+        if BROTLI_AVAILABLE:
+            codecs += [(f"br-{quality}", lambda data, quality=quality: brotli.compress(data, quality=quality)) for quality in (4, 11)]
+        for codec, compress in codecs:
+            compress_ms, compressed = timed(lambda: compress(body), args.repeat)
+            print(f"  {codec:8s} 压缩后: {len(compressed) / 1024:8.1f}KB ({len(compressed) / len(body):6.1%})  耗时: {compress_ms:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
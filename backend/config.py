@@ -7,7 +7,11 @@
 import os
 from pathlib import Path
 from typing import Optional
-from pydantic_settings import BaseSettings
+try:
+    from pydantic_settings import BaseSettings
+except ImportError:
+    # pydantic 1.x 中BaseSettings位于pydantic包内
+    from pydantic import BaseSettings
 
 
 class Settings(BaseSettings):
@@ -26,10 +30,14 @@ class Settings(BaseSettings):
     storage_base_path: str = "./data"
     max_video_size: int = 500 * 1024 * 1024  # 500MB
     max_frame_size: int = 5 * 1024 * 1024    # 5MB
+    # 帧图片存储方式：files每帧一个文件，archive每个视频一个归档文件（见frame_store_module）
+    frame_storage_backend: str = "files"
     
     # 视频处理设置
     frame_extract_fps: float = 1.0  # 每秒提取帧数
     frame_quality: int = 85         # JPEG质量
+    frame_image_format: str = "jpg"  # 帧图片格式：jpg、webp或png
+    frame_encode_workers: int = 2    # 分帧时并行编码写入帧图片的线程数
     supported_video_formats: list = [".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv", ".webm"]
     
     # OCR设置
@@ -39,6 +47,8 @@ class Settings(BaseSettings):
     ocr_use_doc_orientation_classify: bool = False
     ocr_use_doc_unwarping: bool = False
     ocr_use_textline_orientation: bool = False
+    # OCR推理服务的Unix socket路径（环境变量OCR_INFERENCE_SOCKET），设置后本进程不加载OCR模型
+    ocr_inference_socket: Optional[str] = None
     
     # 分析设置
     default_keywords: list = ["加载中", "Loading", "请稍候", "Please wait"]
@@ -55,6 +65,10 @@ class Settings(BaseSettings):
     temp_file_retention_hours: int = 24
     frame_retention_days: int = 30
     video_archive_days: int = 90
+    # 是否在后台定期执行保留策略清理（环境变量RETENTION_AUTO_RUN），默认关闭，只能通过接口手动执行
+    retention_auto_run: bool = False
+    # 归档时是否删除视频文件（环境变量VIDEO_ARCHIVE_DELETE_SOURCE），删除后无法重新分帧
+    video_archive_delete_source: bool = False
     
     # API设置
     api_host: str = "0.0.0.0"
@@ -119,6 +133,15 @@ class OCRConfig:
         "cls_model_name": "PP-LCNet_x1_0_doc_ori"
     }
     
+    # OCR推理服务设置（见ocr_inference_module）
+    INFERENCE_SERVER = {
+        "socket_path": "/tmp/byte_test_ocr.sock",
+        "max_batch_size": 8,          # 单次predict最多合并的帧数
+        "max_batch_delay_ms": 10,     # 凑批时最多等待的时间
+        "max_inflight_frames": 8,     # 每个OCR任务同时提交给推理服务的帧数
+        "request_timeout": 120        # 单帧识别超时（秒）
+    }
+    
     # 文本处理设置
     TEXT_PROCESSING = {
         "min_confidence": 0.7,
@@ -193,6 +216,23 @@ class DatabaseConfig:
         "isolation_level": None
     }
     
+    # SQLite生产模式PRAGMA（每个新连接执行）
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",        # 读写并发：读不阻塞写，写不阻塞读
+        "synchronous": "NORMAL",      # WAL模式下安全且比FULL少一次fsync
+        "busy_timeout": 30000,        # 锁等待时间(毫秒)
+        "mmap_size": 268435456,       # 256MB内存映射读取
+        "cache_size": -65536,         # 64MB页缓存（负数单位为KB）
+        "temp_store": "MEMORY"
+    }
+    
+    # SQLite单写线程队列设置
+    SQLITE_WRITE_QUEUE = {
+        "enabled": True,
+        "max_batch_size": 200,        # 单个事务最多合并的写任务数
+        "max_batch_delay_ms": 0       # 取完积压任务后再等待后续任务合并的时间（0表示不等待）
+    }
+    
     # MySQL设置（如果使用MySQL）
     MYSQL_SETTINGS = {
         "charset": "utf8mb4",
@@ -211,6 +251,54 @@ class DatabaseConfig:
     }
 
 
+class AdmissionConfig:
+    """准入控制配置（见admission_module）"""
+    
+    # 每个接口类别：名称、最大并发数、等待队列长度、排队超时（秒）、尚无耗时统计时的Retry-After（秒）
+    LIMITS = {
+        "frame_extraction": {"label": "视频分帧", "max_concurrent": 1, "max_queue": 2, "queue_timeout": 30, "retry_after": 30},
+        "ocr": {"label": "OCR处理", "max_concurrent": 2, "max_queue": 4, "queue_timeout": 30, "retry_after": 60},
+        "analysis": {"label": "分析", "max_concurrent": 4, "max_queue": 16, "queue_timeout": 10, "retry_after": 5}
+    }
+
+
+class StorageConfig:
+    """存储用量统计配置（见storage_module）"""
+    
+    # 各存储类别的目录
+    CATEGORIES = {
+        "videos": "./data/videos",
+        "uploads": "./data/uploads",
+        "frames": "./data/frames",
+        "ocr_results": "./data/ocr_results",
+        "ocr_images": "./data/ocr_images",
+        "thumbnails": "./data/thumbnails",
+        "charts": "./data/charts",
+        "temp": "./data/temp",
+        "backups": "./data/backups"
+    }
+    # 按视频划分子目录（video_{id}）的类别
+    PER_VIDEO_CATEGORIES = ["frames", "ocr_results", "ocr_images", "thumbnails"]
+    
+    # 增量计数写入数据库的间隔（秒）
+    FLUSH_INTERVAL = 2
+    # 与磁盘核对计数的间隔（秒），启动时先核对一次
+    RECONCILE_INTERVAL = 6 * 3600
+
+
+class RetentionConfig:
+    """保留策略清理配置（见retention_module，保留期限和是否自动清理使用Settings的文件清理设置，设为0表示不清理）"""
+    
+    # 后台清理的间隔（秒）
+    GC_INTERVAL = 3600
+    # 每批删除的文件数，批之间按速率限制等待
+    BATCH_SIZE = 200
+    # 每秒最多删除的文件数，避免清理占满磁盘IO
+    MAX_DELETES_PER_SECOND = 500
+    # 每次清理最多处理的视频数（其余的在下一次清理时处理）
+    MAX_VIDEOS_PER_RUN = 50
+
+
 # 创建全局设置实例
 settings = Settings()
 
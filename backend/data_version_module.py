@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+视频数据版本模块
+为每个视频维护单调递增的数据版本号：修改帧、OCR结果或阶段配置的写操作在同一事务中将版本号加一，
+读接口据此生成ETag并作为响应缓存的键，版本号不变时无需重新查询和计算
+"""
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models_simple import VideoDataVersion
+from datetime import datetime
+
+
+class VideoDataVersionManager:
+    """视频数据版本管理类"""
+    
+    def bump(self, video_id: int, db: Session) -> None:
+        """将视频的数据版本号加一（不提交，随调用方的事务一起生效）"""
+        if self._increment(video_id, db) == 0:
+            self._ensure_version_row(video_id, db)
+            self._increment(video_id, db)
+    
+    async def get_version(self, video_id: int, db) -> int:
+        """获取视频当前的数据版本号，没有记录时为0（db为async_db_module提供的异步会话）"""
+        version = (await db.execute(
+            select(VideoDataVersion.version).where(VideoDataVersion.video_id == video_id)
+        )).scalar()
+        return version or 0
+    
+    def _increment(self, video_id: int, db: Session) -> int:
+        result = db.execute(
+            VideoDataVersion.__table__.update().where(
+                VideoDataVersion.video_id == video_id
+            ).values(version=VideoDataVersion.version + 1, updated_at=datetime.utcnow())
+        )
+        return result.rowcount
+    
+    def _ensure_version_row(self, video_id: int, db: Session) -> None:
+        """版本行不存在时插入（已存在则忽略），并发写入同一视频时不会违反主键约束"""
+        values = {"video_id": video_id, "version": 0}
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            statement = postgresql.insert(VideoDataVersion.__table__).values(**values).on_conflict_do_nothing(
+                index_elements=["video_id"]
+            )
+        elif dialect == "sqlite":
+            statement = sqlite.insert(VideoDataVersion.__table__).values(**values).on_conflict_do_nothing(
+                index_elements=["video_id"]
+            )
+        elif dialect == "mysql":
+            statement = VideoDataVersion.__table__.insert().values(**values).prefix_with("IGNORE")
+        else:
+            if db.query(VideoDataVersion.video_id).filter(VideoDataVersion.video_id == video_id).first() is not None:
+                return
+            statement = VideoDataVersion.__table__.insert().values(**values)
+        db.execute(statement)
+
+
+# 创建全局实例
+video_data_version_manager = VideoDataVersionManager()
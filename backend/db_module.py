@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+数据库模块
+按配置的数据库URL（settings.database_url，可通过环境变量DATABASE_URL覆盖）创建数据库引擎和会话。
+SQLite使用生产模式配置（WAL、PRAGMA调优），并提供单写线程队列：写任务在专用线程中串行执行，
+积压的任务合并为一个事务提交；PostgreSQL / MySQL使用连接池配置和pre-ping，可供多个worker进程共享
+"""
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool
+from concurrent.futures import Future
+from typing import Callable, Any, Optional, Dict
+from config import DatabaseConfig, get_database_url
+import asyncio
+import queue
+import threading
+import time
+
+
+# 数据库配置
+DATABASE_URL = get_database_url()
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_mysql(url: str) -> bool:
+    return url.startswith("mysql")
+
+
+def get_pool_options(database_url: str) -> Dict[str, Any]:
+    """服务端数据库的连接池参数：池大小、溢出连接数、超时和回收时间，并在取出连接时pre-ping"""
+    settings = DatabaseConfig.MYSQL_SETTINGS if _is_mysql(database_url) else DatabaseConfig.CONNECTION_POOL
+    options = {key: settings[key] for key in ("pool_size", "max_overflow", "pool_timeout", "pool_recycle") if key in settings}
+    options["pool_pre_ping"] = True
+    return options
+
+
+# 不需要写锁的语句前缀
+_READ_STATEMENT_PREFIXES = ("SELECT", "PRAGMA", "EXPLAIN", "SAVEPOINT", "RELEASE", "ROLLBACK", "COMMIT", "BEGIN")
+
+
+def _is_write_statement(statement: str) -> bool:
+    return not statement.lstrip()[:9].upper().startswith(_READ_STATEMENT_PREFIXES)
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: Dict[str, Any], in_memory: bool = False) -> None:
+    """在新连接上执行PRAGMA（内存数据库不支持WAL，跳过journal_mode）"""
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        if in_memory and name == "journal_mode":
+            continue
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _configure_sqlite(engine: Engine, pragmas: Dict[str, Any]) -> None:
+    """为SQLite引擎注册连接事件：执行PRAGMA，并由SQLAlchemy显式控制事务
+    
+    关闭pysqlite自身的事务管理（isolation_level=None）。普通会话的读语句以自动提交方式执行，
+    每条语句读取最新数据，不会持有旧的WAL快照；第一条写语句之前才发出BEGIN IMMEDIATE获取写锁，
+    避免"读事务升级为写事务"时直接返回database is locked（这种情况busy_timeout无法等待）。
+    写线程的事务在开始时即发出BEGIN IMMEDIATE。
+    """
+    in_memory = engine.url.database in (None, "", ":memory:")
+    
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        apply_sqlite_pragmas(dbapi_connection, pragmas, in_memory)
+    
+    @event.listens_for(engine, "begin")
+    def do_begin(conn):
+        if conn.get_execution_options().get("sqlite_begin_immediate"):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def begin_before_write(conn, cursor, statement, parameters, context, executemany):
+        if conn.in_transaction() and not conn.connection.dbapi_connection.in_transaction and _is_write_statement(statement):
+            cursor.execute("BEGIN IMMEDIATE")
+
+
+def create_db_engine(database_url: str = DATABASE_URL, tuned: bool = True, echo: bool = False) -> Engine:
+    """创建数据库引擎，SQLite在tuned模式下启用生产配置，其他数据库使用连接池配置"""
+    if not _is_sqlite(database_url):
+        connect_args = {"charset": DatabaseConfig.MYSQL_SETTINGS["charset"]} if _is_mysql(database_url) else {}
+        return create_engine(database_url, connect_args=connect_args, echo=echo, **get_pool_options(database_url))
+    
+    if not tuned:
+        return create_engine(database_url, connect_args={"check_same_thread": False}, echo=echo)
+    
+    # 文件数据库使用连接池复用连接（SQLAlchemy 1.4默认的NullPool每次都会重新连接并执行PRAGMA）
+    connect_args = {key: value for key, value in DatabaseConfig.SQLITE_SETTINGS.items() if key != "isolation_level"}
+    if ":memory:" in database_url or database_url == "sqlite://":
+        pool_args = {}
+    else:
+        pool = DatabaseConfig.CONNECTION_POOL
+        pool_args = {"poolclass": QueuePool, "pool_size": pool["pool_size"], "max_overflow": pool["max_overflow"],
+                     "pool_timeout": pool["pool_timeout"]}
+    engine = create_engine(database_url, connect_args=connect_args, echo=echo, **pool_args)
+    _configure_sqlite(engine, DatabaseConfig.SQLITE_PRAGMAS)
+    return engine
+
+
+class _WriteJob:
+    __slots__ = ("fn", "future")
+    
+    def __init__(self, fn: Callable[[Session], Any], future: Future):
+        self.fn = fn
+        self.future = future
+
+
+class DatabaseWriter:
+    """单写线程队列
+    
+    submit(fn)提交的写任务fn(session)在专用线程中执行；线程每次取出上一个事务执行期间积压的任务
+    （最多max_batch_size个，可选再等待max_batch_delay_ms），整批在一个事务中执行并只提交一次。
+    批内有任务失败时回滚整批，再逐个任务单独执行，使失败只影响该任务本身。
+    任务的Future在事务提交后才完成，因此调用方等待结果即可确认数据已落库。
+    """
+    
+    def __init__(self, session_factory: sessionmaker, max_batch_size: int = 200, max_batch_delay_ms: int = 0,
+                 begin_immediate: bool = True):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay_ms / 1000
+        self.begin_immediate = begin_immediate
+        self._queue: "queue.Queue[Optional[_WriteJob]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {"jobs": 0, "failed_jobs": 0, "transactions": 0}
+    
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+    
+    def submit(self, fn: Callable[[Session], Any]) -> Future:
+        """提交写任务，返回在事务提交后完成的Future"""
+        future = Future()
+        self._ensure_started()
+        self._queue.put(_WriteJob(fn, future))
+        return future
+    
+    def execute(self, fn: Callable[[Session], Any], timeout: Optional[float] = None) -> Any:
+        """提交写任务并阻塞等待结果"""
+        return self.submit(fn).result(timeout)
+    
+    async def execute_async(self, fn: Callable[[Session], Any]) -> Any:
+        """提交写任务并在事件循环中等待结果（不阻塞事件循环）"""
+        return await asyncio.wrap_future(self.submit(fn))
+    
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """等待此前提交的写任务全部完成"""
+        self.execute(lambda session: None, timeout)
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """处理完队列中的任务后停止写线程"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+    
+    def _collect_batch(self, first: _WriteJob) -> tuple:
+        """收集一批任务，返回(任务列表, 是否收到停止信号)"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_batch_delay
+        while len(batch) < self.max_batch_size:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+    
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stopping = self._collect_batch(first)
+            self._execute_batch(batch)
+            if stopping:
+                return
+    
+    def _run_in_transaction(self, jobs: list) -> list:
+        """在一个事务中依次执行任务并提交，任一任务失败时回滚并抛出异常"""
+        session = self.session_factory()
+        try:
+            if self.begin_immediate:
+                session.connection(execution_options={"sqlite_begin_immediate": True})
+            results = [job.fn(session) for job in jobs]
+            session.commit()
+            self.stats["transactions"] += 1
+            return results
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    def _execute_batch(self, batch: list) -> None:
+        try:
+            outcomes = [(job, result, None) for job, result in zip(batch, self._run_in_transaction(batch))]
+        except Exception:
+            # 回滚整批后逐个重新执行，隔离失败的任务
+            outcomes = []
+            for job in batch:
+                try:
+                    outcomes.append((job, self._run_in_transaction([job])[0], None))
+                except Exception as e:
+                    outcomes.append((job, None, e))
+        
+        for job, result, error in outcomes:
+            self.stats["jobs"] += 1
+            if error is not None:
+                self.stats["failed_jobs"] += 1
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+
+class _DirectWriter(DatabaseWriter):
+    """不使用队列的写入器：在调用线程中用独立会话执行并立即提交
+    
+    非SQLite数据库（自身支持并发写事务，且多个worker进程之间无法共享队列）或关闭写队列时使用
+    """
+    
+    def submit(self, fn: Callable[[Session], Any]) -> Future:
+        future = Future()
+        session = self.session_factory()
+        try:
+            result = fn(session)
+            session.commit()
+            future.set_result(result)
+        except Exception as e:
+            session.rollback()
+            future.set_exception(e)
+        finally:
+            session.close()
+        return future
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        pass
+
+
+def create_db_writer(session_factory: sessionmaker, database_url: str = DATABASE_URL) -> DatabaseWriter:
+    """按数据库类型和配置创建写入器"""
+    queue_settings = DatabaseConfig.SQLITE_WRITE_QUEUE
+    if _is_sqlite(database_url) and queue_settings["enabled"]:
+        return DatabaseWriter(
+            session_factory,
+            max_batch_size=queue_settings["max_batch_size"],
+            max_batch_delay_ms=queue_settings["max_batch_delay_ms"]
+        )
+    return _DirectWriter(session_factory)
+
+
+engine = create_db_engine(DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+db_writer = create_db_writer(SessionLocal, DATABASE_URL)
+
+
+# 依赖注入：获取数据库会话
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+视频数据删除模块
+按范围删除视频的派生数据：数据库记录以集合方式（按视频ID的批量DELETE）在一个事务中删除，
+帧图片、OCR结果文件等产物由线程池并行删除；接口可创建后台删除任务并立即返回任务ID
+
+删除范围：
+    ocr     OCR结果、OCR文本行、阶段分析结果，以及OCR结果JSON目录
+    frames  在ocr的基础上再删除视频帧、帧图片目录和OCR图片目录
+    video   在frames的基础上再删除阶段配置、可视化报告、视频记录和视频文件
+"""
+
+from fastapi import HTTPException, BackgroundTasks
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+from models_simple import Video, VideoFrame, OCRResult, OCRTextLine, StageConfig, VisualizationReport
+from stage_rollup_module import stage_rollup_manager
+from stage_stream_module import stage_stream_manager
+from job_module import job_registry
+from data_version_module import video_data_version_manager
+from db_module import db_writer, DatabaseWriter
+from storage_module import storage_accountant
+from frame_store_module import frame_store, frame_file_path
+import os
+
+
+DELETION_SCOPES = ("ocr", "frames", "video")
+# 并行删除文件的线程数
+FILE_UNLINK_WORKERS = 8
+
+
+class VideoDataDeleter:
+    """视频数据删除管理类"""
+    
+    def __init__(self, writer: Optional[DatabaseWriter] = None):
+        self.writer = writer
+        self.frames_storage_path = "./data/frames"
+        self.ocr_results_path = "./data/ocr_results"
+        self.ocr_images_path = "./data/ocr_images"
+        self.thumbnails_path = "./data/thumbnails"
+    
+    def _artifact_dirs(self, video_id: int, scope: str) -> List[Path]:
+        """该范围内需要删除的产物目录"""
+        dirs = [Path(f"{self.ocr_results_path}/video_{video_id}")]
+        if scope in ("frames", "video"):
+            dirs.append(Path(f"{self.frames_storage_path}/video_{video_id}"))
+            dirs.append(Path(f"{self.ocr_images_path}/video_{video_id}"))
+            dirs.append(Path(f"{self.thumbnails_path}/video_{video_id}"))
+        return dirs
+    
+    def _collect_files(self, video_id: int, scope: str, db: Session) -> List[str]:
+        """收集数据库中记录的、该范围内需要删除的文件路径"""
+        files = []
+        if scope in ("frames", "video"):
+            # 归档中的帧对应同一个归档文件，由delete_files去重
+            files.extend(
+                frame_file_path(path) for (path,) in db.query(VideoFrame.frame_path).filter(VideoFrame.video_id == video_id)
+            )
+        if scope == "video":
+            # 内容相同的视频共用同一个文件，仍被其他视频引用的文件保留
+            for (path,) in db.query(Video.file_path).filter(Video.id == video_id):
+                if db.query(Video.id).filter(Video.file_path == path, Video.id != video_id).first() is None:
+                    files.append(path)
+            files.extend(
+                path for (path,) in db.query(VisualizationReport.chart_path).filter(VisualizationReport.video_id == video_id)
+                if path
+            )
+        return files
+    
+    def delete_rows(self, video_id: int, scope: str, db: Session) -> Tuple[Dict[str, int], List[str]]:
+        """以集合方式删除该范围内的数据库记录（不提交），返回(各表删除行数, 需要删除的文件路径)"""
+        if scope not in DELETION_SCOPES:
+            raise HTTPException(status_code=400, detail=f"不支持的删除范围: {scope}")
+        if db.query(Video.id).filter(Video.id == video_id).first() is None:
+            raise HTTPException(status_code=404, detail="视频不存在")
+        
+        files = self._collect_files(video_id, scope, db)
+        frame_ids = select(VideoFrame.id).where(VideoFrame.video_id == video_id)
+        
+        # 阶段结果引用了帧，先从项目耗时汇总中移除
+        counts = {"stage_analysis_results": stage_rollup_manager.remove_video_results(video_id, db, commit=False)}
+        counts["ocr_text_lines"] = db.query(OCRTextLine).filter(
+            OCRTextLine.video_id == video_id
+        ).delete(synchronize_session=False)
+        counts["ocr_results"] = db.query(OCRResult).filter(
+            OCRResult.frame_id.in_(frame_ids)
+        ).delete(synchronize_session=False)
+        
+        if scope in ("frames", "video"):
+            counts["video_frames"] = db.query(VideoFrame).filter(
+                VideoFrame.video_id == video_id
+            ).delete(synchronize_session=False)
+        
+        if scope == "video":
+            counts["visualization_reports"] = db.query(VisualizationReport).filter(
+                VisualizationReport.video_id == video_id
+            ).delete(synchronize_session=False)
+            counts["stage_configs"] = db.query(StageConfig).filter(
+                StageConfig.video_id == video_id
+            ).delete(synchronize_session=False)
+            counts["videos"] = db.query(Video).filter(Video.id == video_id).delete(synchronize_session=False)
+        
+        video_data_version_manager.bump(video_id, db)
+        return counts, files
+    
+    def delete_files(self, files: List[str], dirs: List[Path]) -> Dict[str, int]:
+        """并行删除文件及目录中的剩余文件，最后删除空目录"""
+        paths = set(files)
+        for directory in dirs:
+            if directory.is_dir():
+                for root, _, filenames in os.walk(directory):
+                    paths.update(os.path.join(root, filename) for filename in filenames)
+        
+        def unlink(path: str) -> Optional[bool]:
+            try:
+                storage_accountant.remove_file(path)
+                frame_store.release(path)
+                return True
+            except FileNotFoundError:
+                return None
+            except Exception as e:
+                print(f"删除文件失败: {path}, 错误: {e}")
+                return False
+        
+        with ThreadPoolExecutor(max_workers=FILE_UNLINK_WORKERS) as executor:
+            outcomes = list(executor.map(unlink, paths))
+        
+        removed_dirs = 0
+        for directory in dirs:
+            if not directory.is_dir():
+                continue
+            # 自底向上删除空目录，目录中仍有未能删除的文件时保留
+            for root, _, _ in sorted(os.walk(directory), key=lambda item: len(item[0]), reverse=True):
+                try:
+                    os.rmdir(root)
+                    removed_dirs += 1
+                except OSError as e:
+                    print(f"删除目录失败: {root}, 错误: {e}")
+        
+        return {
+            "deleted_files": outcomes.count(True),
+            "failed_files": outcomes.count(False),
+            "deleted_dirs": removed_dirs
+        }
+    
+    def delete_video_data(self, video_id: int, scope: str, db: Session) -> Dict[str, Any]:
+        """在当前会话中删除视频数据并提交，然后删除文件"""
+        counts, files = self.delete_rows(video_id, scope, db)
+        db.commit()
+        stage_stream_manager.discard(video_id)
+        file_stats = self.delete_files(files, self._artifact_dirs(video_id, scope))
+        return {"video_id": video_id, "scope": scope, "deleted_rows": counts, **file_stats}
+    
+    def _run_deletion(self, video_id: int, scope: str) -> Dict[str, Any]:
+        """后台任务：通过写队列在一个事务中删除数据库记录，提交后删除文件"""
+        writer = self.writer or db_writer
+        counts, files = writer.execute(lambda session: self.delete_rows(video_id, scope, session))
+        stage_stream_manager.discard(video_id)
+        file_stats = self.delete_files(files, self._artifact_dirs(video_id, scope))
+        return {"video_id": video_id, "scope": scope, "deleted_rows": counts, **file_stats}
+    
+    def start_deletion_job(self, video_id: int, scope: str, background_tasks: BackgroundTasks, db: Session) -> Dict[str, Any]:
+        """创建后台删除任务并立即返回任务信息；同一视频相同范围的删除正在进行时返回已有任务"""
+        if scope not in DELETION_SCOPES:
+            raise HTTPException(status_code=400, detail=f"不支持的删除范围: {scope}")
+        if db.query(Video.id).filter(Video.id == video_id).first() is None:
+            raise HTTPException(status_code=404, detail="视频不存在")
+        
+        params = {"video_id": video_id, "scope": scope}
+        job = job_registry.find_active("delete_video_data", params)
+        if job is None:
+            job = job_registry.create("delete_video_data", params)
+            background_tasks.add_task(job_registry.run, job["job_id"], lambda: self._run_deletion(video_id, scope))
+        return job
+
+
+# 创建全局实例
+video_data_deleter = VideoDataDeleter()
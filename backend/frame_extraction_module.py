@@ -5,20 +5,34 @@ OpenCV视频分帧模块
 """
 
 from fastapi import HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
 from models_simple import Video, VideoFrame, ProcessStatus
+from deletion_module import video_data_deleter
+from data_version_module import video_data_version_manager
+from pagination_module import fetch_timeline_page, parse_fields, DEFAULT_PAGE_LIMIT
+from progress_module import progress_manager, PhaseProgress
+from storage_module import storage_accountant
+from db_module import db_writer, DatabaseWriter
+from frame_store_module import frame_store, FrameArchiveWriter, FRAME_STORAGE_BACKENDS, FRAME_IMAGE_FORMATS, parse_frame_ref
+from config import settings
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional, Dict, Any
 from pydantic import BaseModel
 from datetime import datetime
 import cv2
+import math
 import os
+import queue
+import threading
 
 
 class FrameExtractionRequest(BaseModel):
     fps: Optional[float] = 3.0  # 每秒提取帧数
-    quality: Optional[int] = 85  # JPEG质量
+    quality: Optional[int] = 85  # JPEG/WebP质量
     max_frames: Optional[int] = None  # 最大帧数限制
+    image_format: Optional[str] = None  # 帧图片格式jpg、webp或png（默认使用配置）
 
 
 class VideoFrameResponse(BaseModel):
@@ -34,11 +48,224 @@ class VideoFrameResponse(BaseModel):
         from_attributes = True
 
 
+# 分页接口可选的字段
+FRAME_PAGE_FIELDS = {
+    "id": VideoFrame.id,
+    "frame_number": VideoFrame.frame_number,
+    "timestamp_ms": VideoFrame.timestamp_ms,
+    "frame_path": VideoFrame.frame_path,
+    "file_size": VideoFrame.file_size,
+    "extracted_at": VideoFrame.extracted_at
+}
+DEFAULT_FRAME_PAGE_FIELDS = ["id", "frame_number", "timestamp_ms", "file_size"]
+
+# 每解码多少帧更新一次进度
+PROGRESS_UPDATE_FRAMES = 30
+# 每个编码线程在队列中最多排队的帧数（限制已解码未编码的帧占用的内存）
+ENCODE_QUEUE_FRAMES_PER_WORKER = 4
+# PNG为无损格式，quality不适用，使用固定的压缩级别
+PNG_COMPRESSION = 3
+# 分帧过程中每批写入数据库的帧记录数
+FRAME_INSERT_BATCH_SIZE = 500
+
+
+def frame_encode_params(image_format: str, quality: int) -> List[int]:
+    """帧图片格式对应的OpenCV编码参数"""
+    if image_format == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    if image_format == "png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION]
+    return [cv2.IMWRITE_JPEG_QUALITY, quality]
+
+
+class FrameWritePipeline:
+    """分帧的编码写入流水线
+    
+    解码线程把选中的帧放入有界队列，编码线程池并行编码（OpenCV编码时释放GIL）并写入单独的图片文件或帧归档，
+    解码不再等待编码和磁盘。文件大小取自编码后的数据，不再逐帧stat。
+    """
+    
+    def __init__(self, frames_dir: Path, image_format: str, quality: int, workers: int,
+                 archive: Optional[FrameArchiveWriter] = None):
+        self.frames_dir = frames_dir
+        self.extension = f".{image_format}"
+        self.encode_params = frame_encode_params(image_format, quality)
+        self.archive = archive
+        # 重新分帧时覆盖同名文件，覆盖前的大小用于存储用量统计（一次列出目录，不逐帧stat）
+        self._existing_sizes = {} if archive is not None else {
+            entry.name: entry.stat().st_size for entry in os.scandir(frames_dir) if entry.is_file()
+        }
+        workers = max(1, workers)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=workers * ENCODE_QUEUE_FRAMES_PER_WORKER)
+        self._frames: List[dict] = []
+        self._taken = 0
+        self._lock = threading.Lock()
+        self._error: Optional[Exception] = None
+        self._threads = [
+            threading.Thread(target=self._run, name=f"frame-encoder-{index}", daemon=True) for index in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    @property
+    def saved(self) -> int:
+        """已写入的帧数"""
+        return len(self._frames)
+    
+    def submit(self, frame_number: int, timestamp_ms: int, frame) -> None:
+        """放入编码队列，队列已满时阻塞解码；编码线程出错时抛出"""
+        if self._error is not None:
+            raise self._error
+        self._queue.put((frame_number, timestamp_ms, frame))
+    
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                # 已出错时只清空队列，让解码线程不再阻塞
+                continue
+            try:
+                frame_info = self._write(*item)
+            except Exception as e:
+                self._error = self._error or e
+                continue
+            if frame_info is not None:
+                with self._lock:
+                    self._frames.append(frame_info)
+    
+    def _write(self, frame_number: int, timestamp_ms: int, frame) -> Optional[dict]:
+        success, encoded = cv2.imencode(self.extension, frame, self.encode_params)
+        if not success:
+            print(f"⚠ 帧编码失败: 第{frame_number}帧（{timestamp_ms}ms）")
+            return None
+        
+        data = encoded.tobytes()
+        if self.archive is not None:
+            frame_path = self.archive.append(data)
+        else:
+            frame_filename = f"frame_{frame_number:06d}_{timestamp_ms}ms{self.extension}"
+            path = self.frames_dir / frame_filename
+            with open(path, "wb") as f:
+                f.write(data)
+            storage_accountant.file_written(path, len(data), self._existing_sizes.get(frame_filename))
+            frame_path = str(path)
+        
+        return {
+            "frame_number": frame_number,
+            "timestamp_ms": timestamp_ms,
+            "frame_path": frame_path,
+            "file_size": len(data)
+        }
+    
+    def take_completed(self) -> List[dict]:
+        """取出上次调用以来写完的帧（顺序不定），归档中的帧先写入操作系统，保证取出的帧可被读取"""
+        with self._lock:
+            frames = self._frames[self._taken:]
+            self._taken = len(self._frames)
+        if frames and self.archive is not None:
+            self.archive.flush()
+        return frames
+    
+    def close(self) -> None:
+        """等待队列中的帧全部写完并结束编码线程（可重复调用）"""
+        for thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+    
+    def results(self) -> List[dict]:
+        """按帧号排列的帧信息（在close之后调用）；编码线程出错时抛出"""
+        if self._error is not None:
+            raise self._error
+        return sorted(self._frames, key=lambda frame_info: frame_info["frame_number"])
+
+
+def bulk_insert_frames(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """批量写入帧记录（executemany），不提交事务"""
+    for start in range(0, len(rows), FRAME_INSERT_BATCH_SIZE):
+        db.execute(VideoFrame.__table__.insert(), rows[start:start + FRAME_INSERT_BATCH_SIZE])
+    return len(rows)
+
+
+class FrameRowWriter:
+    """分帧过程中分批写入帧记录：不再逐帧构造ORM对象，每批通过写线程提交后即可查询到
+    
+    existing_ids（时间戳 → 帧ID）中的帧为重新生成图片的已有帧，更新原记录而不是新增
+    """
+    
+    def __init__(self, video_id: int, writer: DatabaseWriter, existing_ids: Optional[Dict[int, int]] = None,
+                 batch_size: int = FRAME_INSERT_BATCH_SIZE):
+        self.video_id = video_id
+        self.writer = writer
+        self.existing_ids = existing_ids or {}
+        self.batch_size = batch_size
+        self.inserted = 0
+        self.updated = 0
+        self._pending: List[dict] = []
+    
+    def add(self, frames: List[dict]) -> None:
+        """加入已保存的帧，累计满一批时写入"""
+        self._pending.extend(frames)
+        while len(self._pending) >= self.batch_size:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            self._insert(batch)
+    
+    def flush(self) -> None:
+        """写入剩余的帧记录"""
+        if self._pending:
+            batch, self._pending = self._pending, []
+            self._insert(batch)
+    
+    def _insert(self, frames: List[dict]) -> None:
+        rows, updates = [], []
+        for frame_info in frames:
+            frame_id = self.existing_ids.get(frame_info["timestamp_ms"])
+            if frame_id is not None:
+                updates.append({
+                    "frame_id": frame_id,
+                    "new_path": frame_info["frame_path"],
+                    "new_size": frame_info["file_size"],
+                    "new_extracted_at": datetime.utcnow()
+                })
+                continue
+            rows.append({
+                "video_id": self.video_id,
+                "frame_number": frame_info["frame_number"],
+                "timestamp_ms": frame_info["timestamp_ms"],
+                "frame_path": frame_info["frame_path"],
+                "file_size": frame_info["file_size"]
+            })
+        
+        def insert(session: Session) -> None:
+            bulk_insert_frames(session, rows)
+            if updates:
+                session.execute(
+                    VideoFrame.__table__.update().where(VideoFrame.id == bindparam("frame_id")).values(
+                        frame_path=bindparam("new_path"),
+                        file_size=bindparam("new_size"),
+                        extracted_at=bindparam("new_extracted_at")
+                    ),
+                    updates
+                )
+            video_data_version_manager.bump(self.video_id, session)
+        
+        self.writer.execute(insert)
+        self.inserted += len(rows)
+        self.updated += len(updates)
+
+
 class FrameExtractor:
     """视频帧提取器"""
     
     def __init__(self):
         self.frames_storage_path = "./data/frames"
+        self.storage_backend = settings.frame_storage_backend
+        self.image_format = settings.frame_image_format
+        self.encode_workers = settings.frame_encode_workers
+        self.writer = db_writer
         
         # 确保帧存储目录存在
         Path(self.frames_storage_path).mkdir(parents=True, exist_ok=True)
@@ -49,10 +276,28 @@ class FrameExtractor:
         frame_dir.mkdir(parents=True, exist_ok=True)
         return frame_dir
     
-    def extract_video_frames(self, video_path: str, video_id: int, fps: float = 1.0, quality: int = 85, max_frames: int = None) -> List[dict]:
-        """提取视频帧"""
+    def extract_video_frames(self, video_path: str, video_id: int, fps: float = 1.0, quality: int = 85, max_frames: int = None,
+                             video_fps: Optional[float] = None, progress: Optional[PhaseProgress] = None,
+                             image_format: Optional[str] = None,
+                             on_frames: Optional[Callable[[List[dict]], None]] = None,
+                             existing_frames: Optional[Dict[int, int]] = None, rewrite_existing: bool = False) -> List[dict]:
+        """提取视频帧，video_fps为已探测的视频帧率（未提供时从视频文件读取），progress记录已解码和已保存的帧数
+        
+        提供on_frames时，分帧过程中定期以已保存的帧调用（用于分批写入帧记录）。
+        existing_frames（时间戳 → 帧号）为已提取过的帧：只解码不保存，新帧从已有的最大帧号之后编号；
+        rewrite_existing为True时（帧图片已被清理）重新保存这些帧并沿用原帧号和原时间戳。返回本次保存的帧
+        
+        已有帧按时间戳换算的源视频帧序号（四舍五入）匹配，而不是按毫秒时间戳精确匹配：前后两次分帧的帧率来源可能不同
+        （如文件中读取的29.97002997与旧版本探测保存的两位小数29.97），同一帧算出的时间戳会相差1ms
+        """
+        existing_frames = existing_frames or {}
+        image_format = image_format or self.image_format
         if not os.path.exists(video_path):
             raise ValueError(f"视频文件不存在: {video_path}")
+        if self.storage_backend not in FRAME_STORAGE_BACKENDS:
+            raise ValueError(f"不支持的帧存储方式: {self.storage_backend}")
+        if image_format not in FRAME_IMAGE_FORMATS:
+            raise ValueError(f"不支持的帧图片格式: {image_format}")
         
         # 创建帧存储目录
         frames_dir = self.create_frame_directory(video_id)
@@ -62,59 +307,108 @@ class FrameExtractor:
         if not cap.isOpened():
             raise ValueError(f"无法打开视频文件: {video_path}")
         
+        # 归档存储时所有帧追加到同一个文件
+        archive = FrameArchiveWriter(frames_dir) if self.storage_backend == "archive" else None
+        pipeline = FrameWritePipeline(frames_dir, image_format, quality, self.encode_workers, archive)
         try:
             # 获取视频信息
-            video_fps = cap.get(cv2.CAP_PROP_FPS)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            duration_ms = int((total_frames / video_fps) * 1000) if video_fps > 0 else 0
+            if not video_fps:
+                video_fps = cap.get(cv2.CAP_PROP_FPS)
             
             # 计算帧间隔
             frame_interval = int(video_fps / fps) if fps > 0 else 1
             
-            extracted_frames = []
+            def source_index(timestamp_ms: int) -> int:
+                """时间戳对应的源视频帧序号"""
+                return round(timestamp_ms * video_fps / 1000) if video_fps > 0 else timestamp_ms // 1000
+            
+            # 源视频帧序号 → (已有帧的时间戳, 帧号)
+            existing_by_index = {
+                source_index(timestamp_ms): (timestamp_ms, frame_number)
+                for timestamp_ms, frame_number in existing_frames.items()
+            }
+            
             frame_count = 0
-            saved_frame_number = 0
+            sampled_frames = 0  # 按间隔选中的帧数（包括已提取过的帧）
+            skipped_frames = 0
+            next_frame_number = max(existing_frames.values()) + 1 if existing_frames else 0
+            
+            def saved_counters(saved: int) -> Dict[str, int]:
+                """进度中的帧数计数，增量分帧时另外记录跳过的已提取帧数"""
+                if not existing_frames or rewrite_existing:
+                    return {"frames_saved": saved}
+                return {"frames_saved": saved, "frames_skipped": skipped_frames}
+            
+            if progress is not None:
+                # 已探测的视频使用准确的总帧数，否则使用容器中的估计值
+                total_frames = progress.total or int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+                expected_frames = math.ceil(total_frames / max(frame_interval, 1)) if total_frames else None
+                if max_frames and expected_frames:
+                    expected_frames = min(expected_frames, max_frames)
+                progress.update(total=total_frames, frames_expected=expected_frames, **saved_counters(0))
+            
+            # 继续分帧时直接定位到第一个尚未提取的采样帧，不再从头解码（之前的采样帧都已提取）；
+            # 定位失败时仍从头解码
+            resume_samples = 0
+            if existing_by_index and not rewrite_existing:
+                while resume_samples * frame_interval in existing_by_index and not (max_frames and resume_samples >= max_frames):
+                    resume_samples += 1
+            if resume_samples and cap.set(cv2.CAP_PROP_POS_FRAMES, resume_samples * frame_interval):
+                frame_count = resume_samples * frame_interval
+                sampled_frames = skipped_frames = resume_samples
             
-            while True:
-                ret, frame = cap.read()
-                if not ret:
+            while not (max_frames and sampled_frames >= max_frames):
+                # 先只解码，选中且需要保存的帧才取出图像
+                if not cap.grab():
                     break
                 
                 # 按间隔提取帧
                 if frame_count % frame_interval == 0:
                     # 计算时间戳
                     timestamp_ms = int((frame_count / video_fps) * 1000) if video_fps > 0 else frame_count * 1000
+                    sampled_frames += 1
                     
-                    # 生成帧文件名
-                    frame_filename = f"frame_{saved_frame_number:06d}_{timestamp_ms}ms.jpg"
-                    frame_path = frames_dir / frame_filename
+                    existing = existing_by_index.get(frame_count)
                     
-                    # 保存帧图片
-                    encode_params = [cv2.IMWRITE_JPEG_QUALITY, quality]
-                    success = cv2.imwrite(str(frame_path), frame, encode_params)
-                    
-                    if success:
-                        file_size = os.path.getsize(frame_path)
-                        
-                        frame_info = {
-                            "frame_number": saved_frame_number,
-                            "timestamp_ms": timestamp_ms,
-                            "frame_path": str(frame_path),
-                            "file_size": file_size
-                        }
-                        extracted_frames.append(frame_info)
-                        saved_frame_number += 1
-                        
-                        # 检查最大帧数限制
-                        if max_frames and saved_frame_number >= max_frames:
+                    if existing is not None and not rewrite_existing:
+                        skipped_frames += 1
+                    else:
+                        ret, frame = cap.retrieve()
+                        if not ret:
                             break
+                        if existing is not None:
+                            # 沿用已有帧的时间戳和帧号，更新原帧记录
+                            timestamp_ms, frame_number = existing
+                        else:
+                            frame_number = next_frame_number
+                            next_frame_number += 1
+                        # 交给编码线程编码并保存（编码失败的帧跳过，其帧号空缺）
+                        pipeline.submit(frame_number, timestamp_ms, frame)
+                    
+                    # 检查最大帧数限制
+                    if max_frames and sampled_frames >= max_frames:
+                        break
                 
                 frame_count += 1
+                if frame_count % PROGRESS_UPDATE_FRAMES == 0:
+                    if progress is not None:
+                        progress.update(completed=frame_count, **saved_counters(pipeline.saved))
+                    if on_frames is not None:
+                        on_frames(pipeline.take_completed())
             
+            pipeline.close()
+            extracted_frames = pipeline.results()
+            if on_frames is not None:
+                on_frames(pipeline.take_completed())
+            if progress is not None:
+                progress.update(completed=frame_count, **saved_counters(len(extracted_frames)))
             return extracted_frames
-            
+        
         finally:
+            pipeline.close()
             cap.release()
+            if archive is not None:
+                archive.close()
     
     async def extract_frames_from_video(self, video_id: int, request: FrameExtractionRequest, db: Session) -> dict:
         """从视频提取帧并保存到数据库"""
@@ -127,64 +421,154 @@ class FrameExtractor:
         if not os.path.exists(video.file_path):
             raise HTTPException(status_code=404, detail="视频文件不存在")
         
+        if request.image_format is not None and request.image_format not in FRAME_IMAGE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"不支持的帧图片格式: {request.image_format}")
+        
+        # 已探测的元数据显示视频没有帧时不再打开文件
+        if video.metadata_probed_at is not None and video.frame_count == 0:
+            raise HTTPException(status_code=400, detail="视频没有可提取的帧")
+        
+        progress = progress_manager.start(
+            video_id, "extraction", total=video.frame_count if video.metadata_probed_at is not None else None
+        )
         try:
             # 更新视频状态为处理中
             video.process_status = ProcessStatus.processing
             db.commit()
             
-            # 提取视频帧
-            extracted_frames = self.extract_video_frames(
+            # 已提取过的帧（时间戳 → 帧号）不再重复保存：中断后重新分帧时从已写入的帧之后继续，
+            # 提高采样率时只补充缺少的时间戳
+            existing_frames = dict(
+                db.query(VideoFrame.timestamp_ms, VideoFrame.frame_number).filter(VideoFrame.video_id == video_id)
+            )
+            # 帧图片已按保留策略清理时重新生成已有帧的图片，更新原记录（帧ID不变，OCR结果仍然关联）
+            rewrite_existing = video.frames_purged_at is not None
+            existing_ids = dict(
+                db.query(VideoFrame.timestamp_ms, VideoFrame.id).filter(VideoFrame.video_id == video_id)
+            ) if rewrite_existing else None
+            
+            # 提取视频帧（在线程池中解码，避免阻塞事件循环），帧记录在分帧过程中分批写入数据库
+            row_writer = FrameRowWriter(video_id, self.writer, existing_ids)
+            extracted_frames = await run_in_threadpool(
+                self.extract_video_frames,
                 video.file_path,
                 video_id,
                 request.fps,
                 request.quality,
-                request.max_frames
+                request.max_frames,
+                float(video.fps) if video.fps else None,
+                progress,
+                request.image_format,
+                row_writer.add,
+                existing_frames,
+                rewrite_existing
             )
+            await run_in_threadpool(row_writer.flush)
+            if existing_frames and row_writer.inserted:
+                # 补充的帧可能位于已有帧之间
+                await run_in_threadpool(self.renumber_frames, video_id)
+            video_data_version_manager.bump(video_id, db)
             
-            # 保存帧信息到数据库
-            db_frames = []
-            for frame_info in extracted_frames:
-                db_frame = VideoFrame(
-                    video_id=video_id,
-                    frame_number=frame_info["frame_number"],
-                    timestamp_ms=frame_info["timestamp_ms"],
-                    frame_path=frame_info["frame_path"],
-                    file_size=frame_info["file_size"]
-                )
-                db.add(db_frame)
-                db_frames.append(db_frame)
-            
-            # 更新视频状态为完成
+            # 更新视频状态为完成（重新分帧后帧图片不再是已清理状态）
             video.process_status = ProcessStatus.completed
+            video.frames_purged_at = None
             db.commit()
+            progress.finish()
             
             return {
                 "message": "视频分帧完成",
                 "video_id": video_id,
-                "total_frames": len(extracted_frames),
+                "total_frames": len(existing_frames) + row_writer.inserted,
+                "new_frames": row_writer.inserted,
+                "existing_frames": len(existing_frames),
                 "frames": [{
                     "frame_number": frame["frame_number"],
                     "timestamp_ms": frame["timestamp_ms"],
                     "file_size": frame["file_size"]
                 } for frame in extracted_frames]
             }
-            
+        
         except Exception as e:
             # 更新视频状态为失败
+            progress.finish(error=str(e))
             video.process_status = ProcessStatus.failed
             db.commit()
             raise HTTPException(status_code=500, detail=f"视频分帧失败: {str(e)}")
     
-    async def get_video_frames(self, video_id: int, db: Session) -> List[VideoFrame]:
-        """获取视频的所有帧"""
+    def renumber_frames(self, video_id: int) -> int:
+        """按时间戳重新为视频的帧编号，返回帧号变化的帧数
+        
+        单独保存的帧图片文件名中带有帧号，一并重命名；归档帧的引用只有偏移和长度，无需修改
+        """
+        def renumber(session: Session) -> int:
+            rows = session.query(VideoFrame.id, VideoFrame.frame_number, VideoFrame.frame_path).filter(
+                VideoFrame.video_id == video_id
+            ).order_by(VideoFrame.timestamp_ms, VideoFrame.id).all()
+            updates = []
+            for index, (frame_id, frame_number, frame_path) in enumerate(rows):
+                if frame_number == index:
+                    continue
+                updates.append({"frame_id": frame_id, "new_number": index, "new_path": self._renumbered_path(frame_path, frame_number, index)})
+            if updates:
+                session.execute(
+                    VideoFrame.__table__.update().where(VideoFrame.id == bindparam("frame_id")).values(
+                        frame_number=bindparam("new_number"),
+                        frame_path=bindparam("new_path")
+                    ),
+                    updates
+                )
+                video_data_version_manager.bump(video_id, session)
+            return len(updates)
+        
+        return self.writer.execute(renumber)
+    
+    @staticmethod
+    def _renumbered_path(frame_path: str, frame_number: int, new_number: int) -> str:
+        """帧号变化后的帧图片路径：重命名磁盘上的图片文件（文件名中的帧号），归档帧原样返回"""
+        prefix = f"frame_{frame_number:06d}_"
+        path = Path(frame_path)
+        if parse_frame_ref(frame_path) is not None or not path.name.startswith(prefix):
+            return frame_path
+        new_path = path.with_name(f"frame_{new_number:06d}_{path.name[len(prefix):]}")
+        if path.exists():
+            # 文件名中还带有时间戳，新文件名不会与其他帧的文件重名
+            os.replace(path, new_path)
+        return str(new_path)
+    
+    async def get_video_frames(self, video_id: int, db) -> List[VideoFrame]:
+        """获取视频的所有帧（db为async_db_module提供的异步会话）"""
         # 检查视频是否存在
-        video = db.query(Video).filter(Video.id == video_id).first()
+        video = (await db.execute(select(Video.id).where(Video.id == video_id))).first()
         if not video:
             raise HTTPException(status_code=404, detail="视频不存在")
         
         # 获取视频帧
-        frames = db.query(VideoFrame).filter(VideoFrame.video_id == video_id).order_by(VideoFrame.frame_number).all()
-        return frames
+        result = await db.execute(
+            select(VideoFrame).where(VideoFrame.video_id == video_id).order_by(VideoFrame.frame_number)
+        )
+        return result.scalars().all()
+    
+    async def get_video_frames_page(self, video_id: int, db, from_ms: Optional[int] = None, to_ms: Optional[int] = None,
+                                    cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_LIMIT,
+                                    fields: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+        """按时间顺序分页获取视频帧，可限定时间窗口[from_ms, to_ms)并只返回指定字段"""
+        video = (await db.execute(select(Video.id).where(Video.id == video_id))).first()
+        if not video:
+            raise HTTPException(status_code=404, detail="视频不存在")
+        
+        page = await fetch_timeline_page(
+            db,
+            FRAME_PAGE_FIELDS,
+            parse_fields(fields, FRAME_PAGE_FIELDS, DEFAULT_FRAME_PAGE_FIELDS),
+            filters=[VideoFrame.video_id == video_id],
+            order_columns=[VideoFrame.timestamp_ms, VideoFrame.id],
+            from_ms=from_ms,
+            to_ms=to_ms,
+            cursor=cursor,
+            limit=limit,
+            include_total=include_total
+        )
+        return {"video_id": video_id, **page}
     
     def get_frame(self, frame_id: int, db: Session) -> VideoFrame:
         """获取指定帧信息"""
@@ -198,45 +582,20 @@ class FrameExtractor:
         frame = self.get_frame(frame_id, db)
         
         # 检查图片文件是否存在
-        if not os.path.exists(frame.frame_path):
+        if not frame_store.exists(frame.frame_path):
             raise HTTPException(status_code=404, detail="帧图片文件不存在")
         
         return frame.frame_path
     
     def delete_video_frames(self, video_id: int, db: Session) -> dict:
-        """删除视频的所有帧"""
-        # 检查视频是否存在
-        video = db.query(Video).filter(Video.id == video_id).first()
-        if not video:
-            raise HTTPException(status_code=404, detail="视频不存在")
-        
-        # 获取所有帧
-        frames = db.query(VideoFrame).filter(VideoFrame.video_id == video_id).all()
-        
-        # 删除帧文件
-        deleted_files = 0
-        for frame in frames:
-            if os.path.exists(frame.frame_path):
-                try:
-                    os.remove(frame.frame_path)
-                    deleted_files += 1
-                except Exception as e:
-                    print(f"删除帧文件失败: {frame.frame_path}, 错误: {e}")
-        
-        # 删除数据库记录
-        db.query(VideoFrame).filter(VideoFrame.video_id == video_id).delete()
-        db.commit()
-        
-        # 删除帧目录（如果为空）
-        frames_dir = Path(f"{self.frames_storage_path}/video_{video_id}")
-        if frames_dir.exists() and not any(frames_dir.iterdir()):
-            frames_dir.rmdir()
+        """删除视频的所有帧（同时删除依赖帧的OCR结果和阶段分析结果）"""
+        result = video_data_deleter.delete_video_data(video_id, "frames", db)
         
         return {
             "message": "视频帧删除完成",
             "video_id": video_id,
-            "deleted_frames": len(frames),
-            "deleted_files": deleted_files
+            "deleted_frames": result["deleted_rows"]["video_frames"],
+            "deleted_files": result["deleted_files"]
         }
     
     def get_frame_statistics(self, video_id: int, db: Session) -> dict:
@@ -268,15 +627,16 @@ class FrameExtractor:
         if not frame:
             raise HTTPException(status_code=404, detail="帧不存在")
         
-        # 删除文件
-        if os.path.exists(frame.frame_path):
+        # 删除文件（归档中的帧不能单独删除，删除视频的所有帧时随归档文件一起删除）
+        if parse_frame_ref(frame.frame_path) is None and os.path.exists(frame.frame_path):
             try:
-                os.remove(frame.frame_path)
+                storage_accountant.remove_file(frame.frame_path)
             except Exception as e:
                 print(f"删除帧文件失败: {frame.frame_path}, 错误: {e}")
         
         # 删除数据库记录
         db.delete(frame)
+        video_data_version_manager.bump(frame.video_id, db)
         db.commit()
         
         return {
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+帧存储模块
+帧图片有两种存储方式（Settings.frame_storage_backend，环境变量FRAME_STORAGE_BACKEND）：
+    
+    files    每帧一个图片文件：data/frames/video_{id}/frame_000001_1000ms.jpg
+    archive  每个视频一个归档文件：编码后的帧依次追加到data/frames/video_{id}/frames.pack，
+             帧的frame_path记录为"归档文件路径#偏移:长度"（即偏移索引）
+
+归档文件只追加、不修改，已写入的帧的偏移始终有效；读取时以只读方式内存映射归档文件，
+按偏移切片得到帧的编码数据，不需要每帧打开一次文件，也不会产生大量小文件。
+读取帧图片的代码统一通过frame_store，不需要区分两种存储方式
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+from storage_module import storage_accountant
+import cv2
+import mmap
+import numpy as np
+import os
+import threading
+
+
+FRAME_STORAGE_BACKENDS = ("files", "archive")
+FRAME_ARCHIVE_NAME = "frames.pack"
+# 帧图片格式（即文件扩展名）及对应的媒体类型
+FRAME_IMAGE_FORMATS = {"jpg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+# 同时保持映射的归档文件数（超过时关闭最久未使用的）
+MAX_MAPPED_ARCHIVES = 64
+
+
+def archive_frame_ref(archive_path: str, offset: int, length: int) -> str:
+    """归档中一帧的frame_path"""
+    return f"{archive_path}#{offset}:{length}"
+
+
+def parse_frame_ref(frame_path: str) -> Optional[Tuple[str, int, int]]:
+    """解析归档帧的frame_path，返回(归档文件路径, 偏移, 长度)；单独的图片文件返回None"""
+    archive_path, separator, position = frame_path.rpartition("#")
+    if not separator:
+        return None
+    offset, _, length = position.partition(":")
+    if not (offset.isdigit() and length.isdigit()):
+        return None
+    return archive_path, int(offset), int(length)
+
+
+def frame_file_path(frame_path: str) -> str:
+    """帧数据所在的磁盘文件（归档帧为归档文件）"""
+    ref = parse_frame_ref(frame_path)
+    return ref[0] if ref is not None else frame_path
+
+
+def frame_image_format(frame_path: str, data: Optional[bytes] = None) -> str:
+    """帧图片的格式：提供了编码数据时按文件头判断（归档帧没有扩展名），否则按扩展名"""
+    if data is not None:
+        if data[:8] == b"\x89PNG\r\n\x1a\n":
+            return "png"
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return "webp"
+        return "jpg"
+    image_format = Path(frame_path).suffix.lstrip(".").lower()
+    return image_format if image_format in FRAME_IMAGE_FORMATS else "jpg"
+
+
+class FrameArchiveWriter:
+    """向视频的帧归档文件追加帧（同一视频同时只应有一个写入者，写入者可被多个编码线程共用）"""
+    
+    def __init__(self, frames_dir: Path):
+        self.path = Path(frames_dir) / FRAME_ARCHIVE_NAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.path.exists()
+        self._file = open(self.path, "ab")
+        self._lock = threading.Lock()
+        self.offset = self._file.tell()
+        if is_new:
+            storage_accountant.file_written(self.path, 0)
+    
+    def append(self, data: bytes) -> str:
+        """追加一帧的编码数据，返回该帧的frame_path"""
+        with self._lock:
+            offset = self.offset
+            self._file.write(data)
+            self.offset += len(data)
+        storage_accountant.file_written(self.path, offset + len(data), previous_size=offset)
+        return archive_frame_ref(str(self.path), offset, len(data))
+    
+    def flush(self) -> None:
+        """写入操作系统，之后其他线程和进程即可读取已追加的帧"""
+        with self._lock:
+            self._file.flush()
+    
+    def close(self) -> None:
+        self._file.close()
+    
+    def __enter__(self) -> "FrameArchiveWriter":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _MappedArchive:
+    __slots__ = ("mapping", "device", "inode", "size")
+    
+    def __init__(self, mapping: mmap.mmap, stat: os.stat_result):
+        self.mapping = mapping
+        self.device = stat.st_dev
+        self.inode = stat.st_ino
+        self.size = len(mapping)
+
+
+class FrameStore:
+    """读取帧图片：单独的图片文件直接读取，归档帧从内存映射的归档文件中切片"""
+    
+    def __init__(self, max_mapped_archives: int = MAX_MAPPED_ARCHIVES):
+        self.max_mapped_archives = max_mapped_archives
+        self._archives: "OrderedDict[str, _MappedArchive]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _close(self, path: str) -> None:
+        archive = self._archives.pop(path, None)
+        if archive is not None:
+            archive.mapping.close()
+    
+    def _read_archive(self, archive_path: str, offset: int, length: int) -> bytes:
+        """从归档中读取一段数据；归档在映射后追加了数据或被删除重建时重新映射"""
+        stat = os.stat(archive_path)
+        end = offset + length
+        key = os.path.abspath(archive_path)
+        with self._lock:
+            archive = self._archives.get(key)
+            if archive is not None and (archive.device, archive.inode) == (stat.st_dev, stat.st_ino) and archive.size >= end:
+                self._archives.move_to_end(key)
+            else:
+                self._close(key)
+                if stat.st_size < end:
+                    raise FileNotFoundError(f"归档中的帧数据不完整: {archive_path}#{offset}:{length}")
+                with open(archive_path, "rb") as f:
+                    archive = _MappedArchive(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), os.fstat(f.fileno()))
+                self._archives[key] = archive
+                while len(self._archives) > self.max_mapped_archives:
+                    self._close(next(iter(self._archives)))
+            # 在锁内切片，避免映射被其他线程关闭
+            return archive.mapping[offset:end]
+    
+    def read_bytes(self, frame_path: str) -> bytes:
+        """读取帧的编码数据，不存在时抛出FileNotFoundError"""
+        ref = parse_frame_ref(frame_path)
+        if ref is None:
+            with open(frame_path, "rb") as f:
+                return f.read()
+        return self._read_archive(*ref)
+    
+    def read_image(self, frame_path: str):
+        """读取并解码帧图片，不存在或无法解码时返回None（与cv2.imread一致）"""
+        if parse_frame_ref(frame_path) is None:
+            return cv2.imread(frame_path)
+        try:
+            data = self.read_bytes(frame_path)
+        except FileNotFoundError:
+            return None
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    
+    def exists(self, frame_path: str) -> bool:
+        ref = parse_frame_ref(frame_path)
+        if ref is None:
+            return os.path.exists(frame_path)
+        archive_path, offset, length = ref
+        try:
+            return os.path.getsize(archive_path) >= offset + length
+        except OSError:
+            return False
+    
+    def release(self, file_path: str) -> None:
+        """归档文件被删除后关闭其映射，释放磁盘空间"""
+        with self._lock:
+            self._close(os.path.abspath(file_path))
+
+
+# 创建全局实例
+frame_store = FrameStore()
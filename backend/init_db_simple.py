@@ -7,9 +7,10 @@
 import os
 import sys
 from pathlib import Path
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from models_simple import Base, Project, Video, StageConfig, ProcessStatus
+from config import get_database_url
+from db_module import create_db_engine
 import json
 from datetime import datetime
 
@@ -33,9 +34,9 @@ def create_directories():
 
 def init_database():
     """初始化数据库"""
-    # 创建数据库引擎
-    database_url = "sqlite:///./video_analysis.db"
-    engine = create_engine(database_url, echo=True)
+    # 创建数据库引擎（使用配置的数据库URL，可通过环境变量DATABASE_URL指定PostgreSQL等数据库）
+    database_url = get_database_url()
+    engine = create_db_engine(database_url, echo=True)
     
     # 创建所有表
     print("正在创建数据库表...")
@@ -122,8 +123,8 @@ def init_database():
 
 def print_database_info():
     """打印数据库信息"""
-    database_url = "sqlite:///./video_analysis.db"
-    engine = create_engine(database_url)
+    database_url = get_database_url()
+    engine = create_db_engine(database_url)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     session = SessionLocal()
     
@@ -132,7 +133,7 @@ def print_database_info():
         video_count = session.query(Video).count()
         
         print("\n=== 数据库信息 ===")
-        print(f"数据库文件: video_analysis.db")
+        print(f"数据库: {engine.url.render_as_string(hide_password=True)}")
         print(f"项目数量: {project_count}")
         print(f"视频数量: {video_count}")
         
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+后台任务登记模块
+记录在后台执行的任务（如删除视频数据）的状态，接口创建任务后立即返回任务ID，
+客户端通过任务ID查询进度和结果；只保存在当前进程内存中，已结束的任务只保留最近的若干个
+"""
+
+from fastapi import HTTPException
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable
+import threading
+import uuid
+
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+# 最多保留的已结束任务数
+MAX_FINISHED_JOBS = 500
+
+
+class JobRegistry:
+    """后台任务登记表（线程安全）"""
+    
+    def __init__(self, max_finished_jobs: int = MAX_FINISHED_JOBS):
+        self.max_finished_jobs = max_finished_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def create(self, kind: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """登记新任务，返回任务信息"""
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "params": params or {},
+            "status": JOB_PENDING,
+            "result": None,
+            "error": None,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None
+        }
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            self._evict_finished()
+            return dict(job)
+    
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """查询任务，不存在时抛出404"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail="任务不存在")
+            return dict(job)
+    
+    def find_active(self, kind: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """查找相同类型和参数、尚未结束的任务"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job["kind"] == kind and job["params"] == params and job["status"] in (JOB_PENDING, JOB_RUNNING):
+                    return dict(job)
+        return None
+    
+    def run(self, job_id: str, fn: Callable[[], Any]) -> None:
+        """执行任务函数并记录状态和结果（供BackgroundTasks调用）"""
+        self._update(job_id, status=JOB_RUNNING, started_at=datetime.now().isoformat())
+        try:
+            result = fn()
+        except Exception as e:
+            print(f"后台任务失败: {job_id}, 错误: {e}")
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            self._update(job_id, status=JOB_FAILED, error=error, finished_at=datetime.now().isoformat())
+            return
+        self._update(job_id, status=JOB_COMPLETED, result=result, finished_at=datetime.now().isoformat())
+    
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+            self._evict_finished()
+    
+    def _evict_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in (JOB_COMPLETED, JOB_FAILED)]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+
+# 创建全局实例
+job_registry = JobRegistry()
@@ -5,20 +5,41 @@
 """
 
 from fastapi import HTTPException
+from sqlalchemy import literal, or_
 from sqlalchemy.orm import Session
-from models_simple import Video, VideoFrame, OCRResult, StageConfig
-from typing import List, Dict, Optional, Any
+from models_simple import Project, Video, VideoFrame, OCRResult, StageConfig
+from typing import List, Dict, Optional, Any, NamedTuple
 from pydantic import BaseModel
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import groupby
+from stage_rule_module import compile_rule, validate_rule, FrameView, StageRuleError
+from ocr_text_line_module import has_text_lines, videos_with_text_lines, query_keyword_line_matches
+import base64
 import json
+import multiprocessing
+import os
+import threading
 from datetime import datetime
 
 
+# 关键词模式结果的响应投影
+RESPONSE_MODES = ["full", "summary", "periods", "occurrences"]
+OCCURRENCE_ENCODINGS = ["rows", "columnar"]
+
+
 class KeywordPatternRequest(BaseModel):
     """关键词模式分析请求模型"""
     keywords: List[str]
     case_sensitive: bool = False
     exact_match: bool = False
-    confidence_threshold: float = 0.0
+    confidence_threshold: float = 0.0  # 有文本行记录时按单行置信度过滤，否则按整帧平均置信度
+    response_mode: str = "full"  # full, summary, periods, occurrences
+    occurrence_encoding: str = "rows"  # rows, columnar
+    include_text_content: bool = True  # 出现记录中是否包含完整的text_content
+    cursor: Optional[str] = None  # occurrences模式下的分页游标
+    limit: int = 500  # occurrences模式下每个关键词每页的出现记录数
 
 
 class KeywordOccurrence(BaseModel):
@@ -60,10 +81,324 @@ class StagePatternResult(BaseModel):
     stage_start_timestamp_ms: Optional[int] = None
     stage_end_timestamp_ms: Optional[int] = None
     stage_duration_ms: Optional[int] = None
+    start_source: str = "keywords"  # keywords: 关键词默认规则, rule: start_rule
+    end_source: str = "keywords"  # keywords: 关键词默认规则, rule: end_rule
     keyword_results: List[KeywordPatternResult] = []
     pattern_summary: Dict[str, Any] = {}
 
 
+class ProjectStagePatternRequest(BaseModel):
+    """项目级批量阶段模式分析请求模型"""
+    video_ids: Optional[List[int]] = None  # 为空时分析项目下所有视频
+    confidence_threshold: float = 0.0
+    include_pattern_details: bool = False
+    max_workers: Optional[int] = None  # 并行进程数，默认且最多为CPU核数
+
+
+class _FrameRow(NamedTuple):
+    """批量分析时使用的轻量帧记录（可跨进程传递）"""
+    id: int
+    frame_number: int
+    timestamp_ms: int
+
+
+class _OCRRow(NamedTuple):
+    """批量分析时使用的轻量OCR记录（可跨进程传递）"""
+    text_content: Optional[str]
+    confidence: Optional[float]
+
+
+class _StageSpec(NamedTuple):
+    """阶段配置快照"""
+    id: int
+    stage_name: str
+    stage_order: int
+    keywords: List[str]
+    start_rule: Optional[Dict[str, Any]] = None
+    end_rule: Optional[Dict[str, Any]] = None
+
+
+class KeywordPatternTracker:
+    """单个关键词的增量状态机
+    
+    按时间顺序逐帧输入OCR结果，随时可以通过snapshot()得到截至当前帧的分析结果。
+    """
+    
+    def __init__(self, keyword: str, case_sensitive: bool = False, exact_match: bool = False,
+                 collect_occurrences: bool = True, occurrence_after: Optional[tuple] = None,
+                 occurrence_limit: Optional[int] = None):
+        self.keyword = keyword
+        self.case_sensitive = case_sensitive
+        self.exact_match = exact_match
+        
+        # 出现记录收集范围：只收集(timestamp_ms, frame_id)在occurrence_after之后的记录，
+        # 最多收集occurrence_limit + 1条（多出的一条用于判断是否还有下一页）
+        self.collect_occurrences = collect_occurrences
+        self.occurrence_after = occurrence_after
+        self.occurrence_limit = occurrence_limit
+        
+        self.first_appearance_timestamp_ms = None
+        self.first_disappearance_timestamp_ms = None
+        self.last_appearance_timestamp_ms = None
+        self.occurrences = []
+        self.occurrence_count = 0
+        self.confidence_sum = 0.0
+        
+        self.previous_found = False
+        self.continuous_start = None
+        self.continuous_periods = []
+        self.gap_periods = []
+        self.last_found_timestamp = None
+        self.last_frame_timestamp = None
+    
+    def matches(self, text_content: str) -> bool:
+        """关键词匹配逻辑"""
+        if self.exact_match:
+            # 精确匹配
+            if self.case_sensitive:
+                return self.keyword == text_content.strip()
+            return self.keyword.lower() == text_content.strip().lower()
+        
+        # 包含匹配
+        if self.case_sensitive:
+            return self.keyword in text_content
+        return self.keyword.lower() in text_content.lower()
+    
+    def feed(self, frame, ocr_result) -> bool:
+        """输入一帧OCR结果，返回该帧是否匹配"""
+        text_content = ocr_result.text_content or ""
+        found_in_frame = self.matches(text_content)
+        self.observe(frame, found_in_frame, ocr_result.confidence, text_content)
+        return found_in_frame
+    
+    def observe(self, frame, found_in_frame: bool, confidence: Optional[float], text_content: str = "") -> None:
+        """输入一帧已判定的匹配结果（匹配已在其他地方完成时使用，如文本行查询）"""
+        if found_in_frame:
+            # 记录出现
+            confidence = float(confidence) if confidence else 0.0
+            self.occurrence_count += 1
+            self.confidence_sum += confidence
+            if self._should_collect(frame):
+                self.occurrences.append(KeywordOccurrence(
+                    frame_id=frame.id,
+                    frame_number=frame.frame_number,
+                    timestamp_ms=frame.timestamp_ms,
+                    confidence=confidence,
+                    text_content=text_content,
+                    matched_text=self.keyword
+                ))
+            
+            # 记录第一次出现
+            if self.first_appearance_timestamp_ms is None:
+                self.first_appearance_timestamp_ms = frame.timestamp_ms
+            
+            # 更新最后出现时间
+            self.last_appearance_timestamp_ms = frame.timestamp_ms
+            
+            # 开始连续期间
+            if not self.previous_found:
+                self.continuous_start = frame.timestamp_ms
+            
+            self.last_found_timestamp = frame.timestamp_ms
+        
+        elif self.previous_found:
+            # 关键词消失，记录第一次消失
+            if self.first_disappearance_timestamp_ms is None:
+                self.first_disappearance_timestamp_ms = frame.timestamp_ms
+            
+            # 结束连续期间
+            if self.continuous_start is not None:
+                self.continuous_periods.append({
+                    "start_timestamp_ms": self.continuous_start,
+                    "end_timestamp_ms": frame.timestamp_ms,
+                    "duration_ms": frame.timestamp_ms - self.continuous_start
+                })
+                self.continuous_start = None
+            
+            # 记录间隔期间
+            if self.last_found_timestamp is not None:
+                self.gap_periods.append({
+                    "start_timestamp_ms": self.last_found_timestamp,
+                    "end_timestamp_ms": frame.timestamp_ms,
+                    "duration_ms": frame.timestamp_ms - self.last_found_timestamp
+                })
+        
+        self.previous_found = found_in_frame
+        self.last_frame_timestamp = frame.timestamp_ms
+    
+    def _should_collect(self, frame) -> bool:
+        """判断该帧的出现记录是否在收集范围内"""
+        if not self.collect_occurrences:
+            return False
+        if self.occurrence_after is not None and (frame.timestamp_ms, frame.id) <= tuple(self.occurrence_after):
+            return False
+        if self.occurrence_limit is not None and len(self.occurrences) > self.occurrence_limit:
+            return False
+        return True
+    
+    def snapshot(self) -> KeywordPatternResult:
+        """生成截至当前帧的分析结果（不改变状态机状态）"""
+        continuous_periods = list(self.continuous_periods)
+        
+        # 处理尚未结束的连续期间
+        if self.continuous_start is not None and self.last_frame_timestamp is not None:
+            continuous_periods.append({
+                "start_timestamp_ms": self.continuous_start,
+                "end_timestamp_ms": self.last_frame_timestamp,
+                "duration_ms": self.last_frame_timestamp - self.continuous_start
+            })
+        
+        occurrences = list(self.occurrences)
+        first_appearance = self.first_appearance_timestamp_ms
+        last_appearance = self.last_appearance_timestamp_ms
+        
+        return KeywordPatternResult(
+            keyword=self.keyword,
+            first_appearance_timestamp_ms=first_appearance,
+            first_disappearance_timestamp_ms=self.first_disappearance_timestamp_ms,
+            last_appearance_timestamp_ms=last_appearance,
+            total_occurrences=self.occurrence_count,
+            continuous_duration_ms=sum(period["duration_ms"] for period in continuous_periods) if continuous_periods else None,
+            gap_duration_ms=sum(period["duration_ms"] for period in self.gap_periods) if self.gap_periods else None,
+            occurrences=occurrences,
+            pattern_analysis={
+                "continuous_periods": continuous_periods,
+                "gap_periods": list(self.gap_periods),
+                "average_confidence": self.confidence_sum / self.occurrence_count if self.occurrence_count else 0.0,
+                "occurrence_frequency": self.occurrence_count,
+                "time_span_ms": (last_appearance - first_appearance) if first_appearance and last_appearance else 0
+            }
+        )
+
+
+class StagePatternTracker:
+    """单个阶段的增量状态机
+    
+    由该阶段每个关键词的状态机和编译后的起止规则状态机组成。
+    未配置start_rule时以最早的关键词出现作为阶段开始，未配置end_rule时以最晚的关键词首次消失作为阶段结束；
+    end_rule从阶段开始的帧起求值。关键词可以按文本行的匹配结果输入，起止规则始终在整帧文本上求值。
+    """
+    
+    def __init__(self, spec: _StageSpec, collect_occurrences: bool = True):
+        self.spec = spec
+        self.keyword_trackers = [
+            KeywordPatternTracker(keyword, collect_occurrences=collect_occurrences) for keyword in spec.keywords
+        ]
+        self.start_rule = compile_rule(spec.start_rule, spec.keywords) if spec.start_rule else None
+        self.end_rule = compile_rule(spec.end_rule, spec.keywords) if spec.end_rule else None
+    
+    def feed(self, frame, ocr_result, keyword_matches: Optional[Dict[str, Optional[float]]] = None) -> None:
+        """输入一帧OCR结果
+        
+        提供keyword_matches（关键词 → 该帧匹配文本行的最高置信度，未匹配为None）时按文本行的匹配结果更新关键词状态机，
+        否则在整帧的text_content中匹配
+        """
+        for tracker in self.keyword_trackers:
+            if keyword_matches is None:
+                tracker.feed(frame, ocr_result)
+            else:
+                score = keyword_matches.get(tracker.keyword)
+                tracker.observe(frame, score is not None, score, ocr_result.text_content or "")
+        
+        if self.start_rule is None and self.end_rule is None:
+            return
+        
+        view = FrameView(frame.timestamp_ms, frame.id, ocr_result.text_content or "")
+        if self.start_rule is not None:
+            self.start_rule.feed(view)
+        if self.end_rule is not None and self._stage_started():
+            self.end_rule.feed(view)
+    
+    def _stage_started(self) -> bool:
+        if self.start_rule is not None:
+            return self.start_rule.fired
+        return any(tracker.first_appearance_timestamp_ms is not None for tracker in self.keyword_trackers)
+    
+    def snapshot(self) -> StagePatternResult:
+        """生成截至当前帧的阶段分析结果"""
+        keyword_results = [tracker.snapshot() for tracker in self.keyword_trackers]
+        result = keyword_pattern_analyzer._build_stage_result(self.spec, keyword_results)
+        
+        if self.start_rule is None and self.end_rule is None:
+            return result
+        
+        stage_start = result.stage_start_timestamp_ms
+        stage_end = result.stage_end_timestamp_ms
+        updates = {}
+        if self.start_rule is not None:
+            stage_start = self.start_rule.fired_at
+            updates["start_source"] = "rule"
+        if self.end_rule is not None:
+            stage_end = self.end_rule.fired_at
+            updates["end_source"] = "rule"
+        
+        updates.update({
+            "stage_start_timestamp_ms": stage_start,
+            "stage_end_timestamp_ms": stage_end,
+            "stage_duration_ms": stage_end - stage_start if stage_start is not None and stage_end is not None else None
+        })
+        return result.copy(update=updates)
+
+
+_analysis_pool: Optional[ProcessPoolExecutor] = None
+_analysis_pool_lock = threading.Lock()
+
+
+def _get_analysis_pool() -> ProcessPoolExecutor:
+    """项目批量分析共用的进程池（首次使用时创建，进程数为CPU核数）
+    
+    使用spawn方式启动工作进程，不从已运行写线程、存储统计线程等后台线程的服务进程fork
+    """
+    global _analysis_pool
+    with _analysis_pool_lock:
+        if _analysis_pool is None:
+            _analysis_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _analysis_pool
+
+
+def _discard_analysis_pool(pool: ProcessPoolExecutor) -> None:
+    """工作进程异常退出后进程池不可再用，丢弃后下次使用时重新创建"""
+    global _analysis_pool
+    with _analysis_pool_lock:
+        if _analysis_pool is pool:
+            _analysis_pool = None
+
+
+def shutdown_analysis_pool() -> None:
+    """关闭批量分析进程池（应用关闭时调用）"""
+    global _analysis_pool
+    with _analysis_pool_lock:
+        pool, _analysis_pool = _analysis_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _analyze_video_stages_worker(video_id: int, stage_specs: List[_StageSpec], frames_with_ocr: List, include_pattern_details: bool,
+                                 keyword_matches: Optional[Dict[str, Dict[int, float]]] = None) -> Dict[str, Any]:
+    """在工作进程中分析单个视频的所有阶段，keyword_matches为文本行查询的关键词匹配结果（视频没有文本行记录时为None）"""
+    analyzer = KeywordPatternAnalyzer()
+    stage_results = analyzer._analyze_stages(
+        stage_specs, frames_with_ocr, collect_occurrences=include_pattern_details, keyword_matches=keyword_matches
+    )
+    
+    stage_dicts = []
+    for result in stage_results:
+        stage_dict = result.dict()
+        if not include_pattern_details:
+            stage_dict.pop("keyword_results", None)
+        stage_dicts.append(stage_dict)
+    
+    return {
+        "video_id": video_id,
+        "total_frames": len(frames_with_ocr),
+        "match_source": "text_lines" if keyword_matches is not None else "ocr_results",
+        "stage_results": stage_dicts,
+        "overall_summary": analyzer._generate_overall_summary(stage_results)
+    }
+
+
 class KeywordPatternAnalyzer:
     """关键词模式分析器"""
     
@@ -72,39 +407,91 @@ class KeywordPatternAnalyzer:
     
     def analyze_keyword_pattern(self, video_id: int, request: KeywordPatternRequest, db: Session) -> Dict[str, Any]:
         """分析视频中关键词的模式"""
+        # 校验响应投影参数
+        if request.response_mode not in RESPONSE_MODES:
+            raise HTTPException(status_code=400, detail=f"不支持的response_mode: {request.response_mode}")
+        if request.occurrence_encoding not in OCCURRENCE_ENCODINGS:
+            raise HTTPException(status_code=400, detail=f"不支持的occurrence_encoding: {request.occurrence_encoding}")
+        if request.limit <= 0:
+            raise HTTPException(status_code=400, detail="limit必须大于0")
+        cursor_positions = self._decode_cursor(request.cursor) if request.cursor else {}
+        
         # 验证视频存在
         video = db.query(Video).filter(Video.id == video_id).first()
         if not video:
             raise HTTPException(status_code=404, detail="视频不存在")
         
-        # 获取视频的所有帧和OCR结果
-        frames_with_ocr = db.query(VideoFrame, OCRResult).join(
-            OCRResult, VideoFrame.id == OCRResult.frame_id
-        ).filter(
-            VideoFrame.video_id == video_id,
-            OCRResult.confidence >= request.confidence_threshold
-        ).order_by(VideoFrame.timestamp_ms).all()
+        # 有文本行记录时在文本行上匹配（置信度阈值作用于单行），否则使用整帧OCR结果
+        collect_occurrences = request.response_mode in ("full", "occurrences")
+        use_text_lines = has_text_lines(db, video_id)
+        if use_text_lines:
+            frames_with_ocr = self._query_ocr_frames(video_id, db, with_text=collect_occurrences and request.include_text_content)
+        else:
+            frames_with_ocr = db.query(VideoFrame, OCRResult).join(
+                OCRResult, VideoFrame.id == OCRResult.frame_id
+            ).filter(
+                VideoFrame.video_id == video_id,
+                OCRResult.confidence >= request.confidence_threshold
+            ).order_by(VideoFrame.timestamp_ms, VideoFrame.id).all()
         
         if not frames_with_ocr:
             raise HTTPException(status_code=404, detail="视频OCR结果不存在或不满足置信度要求")
         
-        # 分析每个关键词
+        # 分析每个关键词（summary/periods模式不构建出现记录）
+        paginate = request.response_mode == "occurrences"
         keyword_results = []
         for keyword in request.keywords:
-            result = self._analyze_single_keyword(
-                keyword, frames_with_ocr, request.case_sensitive, request.exact_match
+            # 游标中位置为None的关键词已取完所有出现记录，后续页返回空列表
+            exhausted = paginate and keyword in cursor_positions and cursor_positions[keyword] is None
+            tracker = KeywordPatternTracker(
+                keyword, request.case_sensitive, request.exact_match,
+                collect_occurrences=collect_occurrences and not exhausted,
+                occurrence_after=cursor_positions.get(keyword) if paginate else None,
+                occurrence_limit=request.limit if paginate else None
             )
-            keyword_results.append(result)
+            if use_text_lines:
+                # 匹配由SQL完成，这里只按时间顺序计算出现/消失区间
+                matches = query_keyword_line_matches(
+                    db, video_id, keyword, request.case_sensitive, request.exact_match, request.confidence_threshold
+                )
+                for frame, ocr_result in frames_with_ocr:
+                    tracker.observe(frame, frame.id in matches, matches.get(frame.id), ocr_result.text_content or "")
+            else:
+                for frame, ocr_result in frames_with_ocr:
+                    tracker.feed(frame, ocr_result)
+            keyword_results.append(tracker.snapshot())
         
-        return {
+        response = {
             "message": "关键词模式分析完成",
             "video_id": video_id,
             "analyzed_keywords": len(request.keywords),
             "total_frames": len(frames_with_ocr),
+            "match_source": "text_lines" if use_text_lines else "ocr_results",
             "analysis_timestamp": datetime.now().isoformat(),
-            "keyword_results": [result.dict() for result in keyword_results],
+            "response_mode": request.response_mode,
+            "keyword_results": [self._project_keyword_result(result, request) for result in keyword_results],
             "summary": self._generate_analysis_summary(keyword_results)
         }
+        
+        if paginate:
+            # 已取完的关键词在游标中记为None，所有关键词都取完时不再返回游标
+            next_positions = {item["keyword"]: item.pop("next_position") for item in response["keyword_results"]}
+            has_more = any(position is not None for position in next_positions.values())
+            response["next_cursor"] = self._encode_cursor(next_positions) if has_more else None
+        
+        return response
+    
+    def _query_ocr_frames(self, video_id: int, db: Session, with_text: bool) -> List[tuple]:
+        """查询已完成OCR的帧（按时间顺序），不需要出现记录的原文时不读取text_content"""
+        text_column = OCRResult.text_content if with_text else literal(None)
+        rows = db.query(
+            VideoFrame.id, VideoFrame.frame_number, VideoFrame.timestamp_ms, text_column
+        ).join(
+            OCRResult, VideoFrame.id == OCRResult.frame_id
+        ).filter(
+            VideoFrame.video_id == video_id
+        ).order_by(VideoFrame.timestamp_ms, VideoFrame.id).all()
+        return [(_FrameRow(row[0], row[1], row[2]), _OCRRow(row[3], None)) for row in rows]
     
     def analyze_stage_pattern(self, video_id: int, request: StagePatternRequest, db: Session) -> Dict[str, Any]:
         """基于阶段配置分析关键词模式"""
@@ -127,177 +514,303 @@ class KeywordPatternAnalyzer:
         if not stage_configs:
             raise HTTPException(status_code=404, detail="阶段配置不存在")
         
-        # 获取视频的所有帧和OCR结果
-        frames_with_ocr = db.query(VideoFrame, OCRResult).join(
-            OCRResult, VideoFrame.id == OCRResult.frame_id
-        ).filter(
-            VideoFrame.video_id == video_id,
-            OCRResult.confidence >= request.confidence_threshold
-        ).order_by(VideoFrame.timestamp_ms).all()
+        stage_specs = self._build_stage_specs(stage_configs)
+        self._validate_stage_specs(stage_specs)
+        
+        # 与关键词模式分析相同：有文本行记录时关键词在文本行上匹配（置信度阈值作用于单行），否则使用整帧OCR结果
+        use_text_lines = has_text_lines(db, video_id)
+        if use_text_lines:
+            # 起止规则在整帧文本上求值，出现记录包含原文，两者都不需要时不读取text_content
+            with_text = request.include_pattern_details or any(spec.start_rule or spec.end_rule for spec in stage_specs)
+            frames_with_ocr = self._query_ocr_frames(video_id, db, with_text=with_text)
+        else:
+            frames_with_ocr = db.query(VideoFrame, OCRResult).join(
+                OCRResult, VideoFrame.id == OCRResult.frame_id
+            ).filter(
+                VideoFrame.video_id == video_id,
+                OCRResult.confidence >= request.confidence_threshold
+            ).order_by(VideoFrame.timestamp_ms).all()
         
         if not frames_with_ocr:
             raise HTTPException(status_code=404, detail="视频OCR结果不存在或不满足置信度要求")
         
         # 分析每个阶段
-        stage_results = []
-        for config in stage_configs:
-            # 解析关键词
-            keywords = json.loads(config.keywords) if isinstance(config.keywords, str) else config.keywords
-            
-            # 分析阶段关键词
-            keyword_results = []
-            for keyword in keywords:
-                result = self._analyze_single_keyword(keyword, frames_with_ocr, False, False)
-                keyword_results.append(result)
-            
-            # 计算阶段时间范围
-            stage_start = None
-            stage_end = None
-            
-            if keyword_results:
-                # 找到最早的关键词出现时间作为阶段开始
-                first_appearances = [r.first_appearance_timestamp_ms for r in keyword_results if r.first_appearance_timestamp_ms is not None]
-                if first_appearances:
-                    stage_start = min(first_appearances)
-                
-                # 找到最晚的关键词消失时间作为阶段结束
-                last_disappearances = [r.first_disappearance_timestamp_ms for r in keyword_results if r.first_disappearance_timestamp_ms is not None]
-                if last_disappearances:
-                    stage_end = max(last_disappearances)
-            
-            stage_duration = None
-            if stage_start is not None and stage_end is not None:
-                stage_duration = stage_end - stage_start
-            
-            stage_result = StagePatternResult(
-                stage_id=config.id,
-                stage_name=config.stage_name,
-                stage_order=config.stage_order,
-                keywords=keywords,
-                stage_start_timestamp_ms=stage_start,
-                stage_end_timestamp_ms=stage_end,
-                stage_duration_ms=stage_duration,
-                keyword_results=keyword_results,
-                pattern_summary=self._generate_stage_summary(keyword_results)
-            )
-            
-            stage_results.append(stage_result)
+        keyword_matches = self._query_stage_keyword_matches(
+            db, video_id, stage_specs, request.confidence_threshold
+        ) if use_text_lines else None
+        stage_results = self._analyze_stages(
+            stage_specs, frames_with_ocr, collect_occurrences=request.include_pattern_details, keyword_matches=keyword_matches
+        )
         
         return {
             "message": "阶段模式分析完成",
             "video_id": video_id,
             "total_stages": len(stage_configs),
+            "match_source": "text_lines" if use_text_lines else "ocr_results",
             "analysis_timestamp": datetime.now().isoformat(),
             "stage_results": [result.dict() for result in stage_results],
             "overall_summary": self._generate_overall_summary(stage_results)
         }
     
-    def _analyze_single_keyword(self, keyword: str, frames_with_ocr: List, case_sensitive: bool = False, exact_match: bool = False) -> KeywordPatternResult:
-        """分析单个关键词的模式"""
-        result = KeywordPatternResult(keyword=keyword)
+    def _project_keyword_result(self, result: KeywordPatternResult, request: KeywordPatternRequest) -> Dict[str, Any]:
+        """按response_mode裁剪单个关键词的分析结果"""
+        if request.response_mode == "full":
+            if request.occurrence_encoding == "rows" and request.include_text_content:
+                return result.dict()
+            projected = result.dict(exclude={"occurrences"})
+            projected["occurrences"] = self._encode_occurrences(result.occurrences, request)
+            return projected
         
-        previous_found = False
-        continuous_start = None
-        continuous_periods = []
-        gap_periods = []
-        last_found_timestamp = None
+        projected = {
+            "keyword": result.keyword,
+            "first_appearance_timestamp_ms": result.first_appearance_timestamp_ms,
+            "first_disappearance_timestamp_ms": result.first_disappearance_timestamp_ms,
+            "last_appearance_timestamp_ms": result.last_appearance_timestamp_ms,
+            "total_occurrences": result.total_occurrences,
+            "continuous_duration_ms": result.continuous_duration_ms,
+            "gap_duration_ms": result.gap_duration_ms,
+            "average_confidence": result.pattern_analysis.get("average_confidence", 0.0),
+            "time_span_ms": result.pattern_analysis.get("time_span_ms", 0)
+        }
         
-        for frame, ocr_result in frames_with_ocr:
-            text_content = ocr_result.text_content or ""
+        if request.response_mode == "periods":
+            projected["continuous_periods"] = result.pattern_analysis.get("continuous_periods", [])
+            projected["gap_periods"] = result.pattern_analysis.get("gap_periods", [])
+        
+        if request.response_mode == "occurrences":
+            # 追踪器多收集了一条记录，用于判断是否还有下一页
+            occurrences = result.occurrences[:request.limit]
+            has_more = len(result.occurrences) > request.limit
+            last = occurrences[-1] if occurrences else None
+            projected["next_position"] = [last.timestamp_ms, last.frame_id] if has_more and last else None
+            projected["occurrences"] = self._encode_occurrences(occurrences, request)
+        
+        return projected
+    
+    def _encode_occurrences(self, occurrences: List[KeywordOccurrence], request: KeywordPatternRequest):
+        """按occurrence_encoding编码出现记录"""
+        fields = ["frame_id", "frame_number", "timestamp_ms", "confidence"]
+        if request.include_text_content:
+            fields.append("text_content")
+        
+        if request.occurrence_encoding == "columnar":
+            # 列式编码：每个字段一个数组，避免为每条记录重复字段名
+            return {field: [getattr(occ, field) for occ in occurrences] for field in fields}
+        
+        return [{field: getattr(occ, field) for field in fields} for occ in occurrences]
+    
+    def _encode_cursor(self, positions: Dict[str, Optional[List[int]]]) -> str:
+        """将各关键词的分页位置编码为游标（已取完的关键词位置为None）"""
+        raw = json.dumps(positions, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+    
+    def _decode_cursor(self, cursor: str) -> Dict[str, Optional[tuple]]:
+        """解码分页游标"""
+        try:
+            positions = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+            return {
+                keyword: None if position is None else (int(position[0]), int(position[1]))
+                for keyword, position in positions.items()
+            }
+        except (ValueError, TypeError, KeyError, IndexError, AttributeError):
+            raise HTTPException(status_code=400, detail="无效的分页游标")
+    
+    def analyze_project_stage_pattern(self, project_id: int, request: ProjectStagePatternRequest, db: Session) -> Dict[str, Any]:
+        """批量分析项目下所有视频的阶段模式
+        
+        所有视频的帧和OCR结果通过一次按(video_id, timestamp_ms)排序的流式查询读取，
+        每读完一个视频即提交到共用的进程池并行分析，同时分析的视频数不超过max_workers。
+        有文本行记录的视频在读取帧之前查询好关键词的文本行匹配结果，随帧一起提交。
+        """
+        # 验证项目存在
+        project = db.query(Project).filter(Project.id == project_id).first()
+        if not project:
+            raise HTTPException(status_code=404, detail="项目不存在")
+        
+        video_query = db.query(Video.id).filter(Video.project_id == project_id)
+        if request.video_ids:
+            video_query = video_query.filter(Video.id.in_(request.video_ids))
+        video_ids = [row.id for row in video_query.order_by(Video.id).all()]
+        
+        if not video_ids:
+            raise HTTPException(status_code=404, detail="项目中没有视频")
+        
+        # 一次性读取所有视频的阶段配置
+        stage_configs = db.query(StageConfig).filter(
+            StageConfig.video_id.in_(video_ids)
+        ).order_by(StageConfig.video_id, StageConfig.stage_order).all()
+        
+        stage_specs_by_video = {}
+        for config in stage_configs:
+            stage_specs_by_video.setdefault(config.video_id, []).extend(self._build_stage_specs([config]))
+        # 规则在提交到工作进程前校验，工作进程只分析有效的规则
+        for stage_specs in stage_specs_by_video.values():
+            self._validate_stage_specs(stage_specs)
+        
+        skipped_videos = [
+            {"video_id": video_id, "reason": "阶段配置不存在"}
+            for video_id in video_ids if video_id not in stage_specs_by_video
+        ]
+        target_video_ids = [video_id for video_id in video_ids if video_id in stage_specs_by_video]
+        
+        video_results = []
+        if target_video_ids:
+            # 有文本行记录的视频按单行置信度匹配关键词，帧不再按整帧置信度过滤
+            text_line_video_ids = videos_with_text_lines(db, target_video_ids)
+            keyword_matches_by_video = {
+                video_id: self._query_stage_keyword_matches(
+                    db, video_id, stage_specs_by_video[video_id], request.confidence_threshold
+                )
+                for video_id in text_line_video_ids
+            }
             
-            # 关键词匹配逻辑
-            if exact_match:
-                # 精确匹配
-                if case_sensitive:
-                    found_in_frame = keyword == text_content.strip()
-                else:
-                    found_in_frame = keyword.lower() == text_content.strip().lower()
-            else:
-                # 包含匹配
-                if case_sensitive:
-                    found_in_frame = keyword in text_content
-                else:
-                    found_in_frame = keyword.lower() in text_content.lower()
+            # 单次流式查询所有视频的帧和OCR结果
+            rows = db.query(
+                VideoFrame.video_id,
+                VideoFrame.id,
+                VideoFrame.frame_number,
+                VideoFrame.timestamp_ms,
+                OCRResult.text_content,
+                OCRResult.confidence
+            ).join(
+                OCRResult, VideoFrame.id == OCRResult.frame_id
+            ).filter(
+                VideoFrame.video_id.in_(target_video_ids),
+                or_(VideoFrame.video_id.in_(text_line_video_ids), OCRResult.confidence >= request.confidence_threshold)
+            ).order_by(
+                VideoFrame.video_id, VideoFrame.timestamp_ms
+            ).yield_per(1000)
             
-            if found_in_frame:
-                # 记录出现
-                occurrence = KeywordOccurrence(
-                    frame_id=frame.id,
-                    frame_number=frame.frame_number,
-                    timestamp_ms=frame.timestamp_ms,
-                    confidence=float(ocr_result.confidence) if ocr_result.confidence else 0.0,
-                    text_content=text_content,
-                    matched_text=keyword
-                )
-                result.occurrences.append(occurrence)
-                result.total_occurrences += 1
-                
-                # 记录第一次出现
-                if result.first_appearance_timestamp_ms is None:
-                    result.first_appearance_timestamp_ms = frame.timestamp_ms
-                
-                # 更新最后出现时间
-                result.last_appearance_timestamp_ms = frame.timestamp_ms
-                
-                # 开始连续期间
-                if not previous_found:
-                    continuous_start = frame.timestamp_ms
-                
-                last_found_timestamp = frame.timestamp_ms
+            cpu_count = os.cpu_count() or 1
+            max_workers = max(1, min(request.max_workers or cpu_count, cpu_count, len(target_video_ids)))
             
-            else:
-                # 关键词消失
-                if previous_found:
-                    # 记录第一次消失
-                    if result.first_disappearance_timestamp_ms is None:
-                        result.first_disappearance_timestamp_ms = frame.timestamp_ms
-                    
-                    # 结束连续期间
-                    if continuous_start is not None:
-                        continuous_periods.append({
-                            "start_timestamp_ms": continuous_start,
-                            "end_timestamp_ms": frame.timestamp_ms,
-                            "duration_ms": frame.timestamp_ms - continuous_start
-                        })
-                        continuous_start = None
-                    
-                    # 记录间隔期间
-                    if last_found_timestamp is not None:
-                        gap_periods.append({
-                            "start_timestamp_ms": last_found_timestamp,
-                            "end_timestamp_ms": frame.timestamp_ms,
-                            "duration_ms": frame.timestamp_ms - last_found_timestamp
-                        })
+            video_groups = (
+                (video_id, [
+                    (_FrameRow(row.id, row.frame_number, row.timestamp_ms),
+                     _OCRRow(row.text_content, float(row.confidence) if row.confidence is not None else None))
+                    for row in group
+                ])
+                for video_id, group in groupby(rows, key=lambda row: row.video_id)
+            )
             
-            previous_found = found_in_frame
+            if max_workers == 1:
+                for video_id, frames_with_ocr in video_groups:
+                    video_results.append(_analyze_video_stages_worker(
+                        video_id, stage_specs_by_video[video_id], frames_with_ocr, request.include_pattern_details,
+                        keyword_matches_by_video.get(video_id)
+                    ))
+            else:
+                pool = _get_analysis_pool()
+                pending = deque()
+                try:
+                    for video_id, frames_with_ocr in video_groups:
+                        if len(pending) >= max_workers:
+                            video_results.append(pending.popleft().result())
+                        pending.append(pool.submit(
+                            _analyze_video_stages_worker,
+                            video_id, stage_specs_by_video[video_id], frames_with_ocr, request.include_pattern_details,
+                            keyword_matches_by_video.get(video_id)
+                        ))
+                    video_results.extend(future.result() for future in pending)
+                except BrokenProcessPool:
+                    _discard_analysis_pool(pool)
+                    raise
         
-        # 处理最后一个连续期间
-        if continuous_start is not None and frames_with_ocr:
-            last_frame = frames_with_ocr[-1][0]
-            continuous_periods.append({
-                "start_timestamp_ms": continuous_start,
-                "end_timestamp_ms": last_frame.timestamp_ms,
-                "duration_ms": last_frame.timestamp_ms - continuous_start
-            })
+        analyzed_ids = {result["video_id"] for result in video_results}
+        skipped_videos.extend(
+            {"video_id": video_id, "reason": "视频OCR结果不存在或不满足置信度要求"}
+            for video_id in target_video_ids if video_id not in analyzed_ids
+        )
         
-        # 计算连续持续时间
-        if continuous_periods:
-            result.continuous_duration_ms = sum(period["duration_ms"] for period in continuous_periods)
-        
-        # 计算间隔持续时间
-        if gap_periods:
-            result.gap_duration_ms = sum(period["duration_ms"] for period in gap_periods)
-        
-        # 生成模式分析
-        result.pattern_analysis = {
-            "continuous_periods": continuous_periods,
-            "gap_periods": gap_periods,
-            "average_confidence": sum(occ.confidence for occ in result.occurrences) / len(result.occurrences) if result.occurrences else 0.0,
-            "occurrence_frequency": len(result.occurrences),
-            "time_span_ms": (result.last_appearance_timestamp_ms - result.first_appearance_timestamp_ms) if result.first_appearance_timestamp_ms and result.last_appearance_timestamp_ms else 0
+        return {
+            "message": "项目阶段模式批量分析完成",
+            "project_id": project_id,
+            "total_videos": len(video_ids),
+            "analyzed_videos": len(video_results),
+            "analysis_timestamp": datetime.now().isoformat(),
+            "video_results": video_results,
+            "skipped_videos": sorted(skipped_videos, key=lambda item: item["video_id"])
         }
+    
+    def _build_stage_specs(self, stage_configs: List[StageConfig]) -> List[_StageSpec]:
+        """将阶段配置转换为与数据库会话无关的快照"""
+        specs = []
+        for config in stage_configs:
+            # 解析关键词
+            keywords = json.loads(config.keywords) if isinstance(config.keywords, str) else config.keywords
+            start_rule = json.loads(config.start_rule) if isinstance(config.start_rule, str) else config.start_rule
+            end_rule = json.loads(config.end_rule) if isinstance(config.end_rule, str) else config.end_rule
+            specs.append(_StageSpec(config.id, config.stage_name, config.stage_order, keywords, start_rule, end_rule))
+        return specs
+    
+    def _validate_stage_specs(self, stage_specs: List[_StageSpec]) -> None:
+        """校验各阶段的起止规则，无效时返回400"""
+        for spec in stage_specs:
+            try:
+                validate_rule(spec.start_rule, spec.keywords)
+                validate_rule(spec.end_rule, spec.keywords)
+            except StageRuleError as e:
+                raise HTTPException(status_code=400, detail=f"阶段规则无效（{spec.stage_name}）: {str(e)}")
+    
+    def _analyze_stages(self, stage_specs: List[_StageSpec], frames_with_ocr: List, collect_occurrences: bool = True,
+                        keyword_matches: Optional[Dict[str, Dict[int, float]]] = None) -> List[StagePatternResult]:
+        """分析一组阶段在给定帧序列上的关键词模式，所有阶段的状态机在一次遍历中同时求值（规则须已校验）
         
-        return result
+        提供keyword_matches（关键词 → {帧ID: 匹配文本行的最高置信度}）时关键词按文本行的匹配结果计算
+        """
+        trackers = [StagePatternTracker(spec, collect_occurrences) for spec in stage_specs]
+        for frame, ocr_result in frames_with_ocr:
+            frame_matches = None if keyword_matches is None else {
+                keyword: matches.get(frame.id) for keyword, matches in keyword_matches.items()
+            }
+            for tracker in trackers:
+                tracker.feed(frame, ocr_result, frame_matches)
+        return [tracker.snapshot() for tracker in trackers]
+    
+    def _query_stage_keyword_matches(self, db: Session, video_id: int, stage_specs: List[_StageSpec],
+                                     min_score: float = 0.0) -> Dict[str, Dict[int, float]]:
+        """在文本行上查询各阶段关键词的匹配帧，返回 {关键词: {帧ID: 匹配行的最高置信度}}"""
+        keywords = {keyword for spec in stage_specs for keyword in spec.keywords}
+        return {keyword: query_keyword_line_matches(db, video_id, keyword, min_score=min_score) for keyword in keywords}
+    
+    def _build_stage_result(self, spec: _StageSpec, keyword_results: List[KeywordPatternResult]) -> StagePatternResult:
+        """根据关键词结果计算阶段时间范围"""
+        stage_start = None
+        stage_end = None
+        
+        if keyword_results:
+            # 找到最早的关键词出现时间作为阶段开始
+            first_appearances = [r.first_appearance_timestamp_ms for r in keyword_results if r.first_appearance_timestamp_ms is not None]
+            if first_appearances:
+                stage_start = min(first_appearances)
+            
+            # 找到最晚的关键词消失时间作为阶段结束
+            last_disappearances = [r.first_disappearance_timestamp_ms for r in keyword_results if r.first_disappearance_timestamp_ms is not None]
+            if last_disappearances:
+                stage_end = max(last_disappearances)
+        
+        stage_duration = None
+        if stage_start is not None and stage_end is not None:
+            stage_duration = stage_end - stage_start
+        
+        return StagePatternResult(
+            stage_id=spec.id,
+            stage_name=spec.stage_name,
+            stage_order=spec.stage_order,
+            keywords=spec.keywords,
+            stage_start_timestamp_ms=stage_start,
+            stage_end_timestamp_ms=stage_end,
+            stage_duration_ms=stage_duration,
+            keyword_results=keyword_results,
+            pattern_summary=self._generate_stage_summary(keyword_results)
+        )
+    
+    def _analyze_single_keyword(self, keyword: str, frames_with_ocr: List, case_sensitive: bool = False, exact_match: bool = False) -> KeywordPatternResult:
+        """分析单个关键词的模式"""
+        tracker = KeywordPatternTracker(keyword, case_sensitive, exact_match)
+        for frame, ocr_result in frames_with_ocr:
+            tracker.feed(frame, ocr_result)
+        return tracker.snapshot()
     
     def _generate_analysis_summary(self, keyword_results: List[KeywordPatternResult]) -> Dict[str, Any]:
         """生成分析摘要"""
@@ -4,12 +4,13 @@
 重构后的FastAPI应用 - 使用模块化架构
 """
 
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 from models_simple import Base, Project, Video, StageConfig, VideoFrame, ProcessStatus, OCRResult
 from pathlib import Path
 import json
@@ -20,20 +21,35 @@ from datetime import datetime
 
 # 导入模块化组件
 from video_module import video_manager, VideoResponse
+from upload_module import video_upload_manager, UploadCreateRequest
+from metadata_module import video_metadata_prober
 from frame_extraction_module import frame_extractor, FrameExtractionRequest, VideoFrameResponse
-from ocr_module import ocr_processor, OCRProcessRequest, OCRResultResponse, EnhancedOCRResultResponse, KeywordAnalysisRequest
-from keyword_pattern_module import keyword_pattern_analyzer, KeywordPatternRequest, StagePatternRequest
-
-# 数据库配置
-DATABASE_URL = "sqlite:///./video_analysis.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from ocr_module import ocr_processor, OCRProcessRequest, OCRResultResponse, KeywordAnalysisRequest
+from keyword_pattern_module import keyword_pattern_analyzer, KeywordPatternRequest, StagePatternRequest, ProjectStagePatternRequest, shutdown_analysis_pool
+from stage_stream_module import stage_stream_manager
+from stage_rule_module import validate_rule, StageRuleError
+from stage_rollup_module import stage_rollup_manager
+from db_module import engine, SessionLocal, db_writer, get_db
+from async_db_module import get_async_db
+from deletion_module import video_data_deleter
+from job_module import job_registry
+from data_version_module import video_data_version_manager
+from response_cache_module import cached_video_response, serialize_models
+from serialization_module import FastJSONResponse, CompressionMiddleware
+from thumbnail_module import thumbnail_manager, cached_file_response, cached_bytes_response
+from frame_store_module import frame_store, parse_frame_ref, frame_image_format, FRAME_IMAGE_FORMATS
+from admission_module import admission_controller
+from progress_module import progress_manager
+from storage_module import storage_accountant
+from retention_module import retention_collector
+from config import settings
 
 # 创建FastAPI应用
 app = FastAPI(
     title="视频耗时分析系统",
     description="用于分析视频加载各阶段耗时的系统",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # 添加CORS中间件
@@ -43,18 +59,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 前端需要读取429/503响应的Retry-After和分块上传的Upload-Offset
+    expose_headers=["Retry-After", "Upload-Offset"],
 )
 
+# 超过大小阈值的JSON响应按Accept-Encoding压缩（Brotli/GZip）
+app.add_middleware(CompressionMiddleware)
+
 # 挂载静态文件服务
 app.mount("/static", StaticFiles(directory="data"), name="static")
 
-# 依赖注入：获取数据库会话
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@app.on_event("shutdown")
+def stop_db_writer():
+    """关闭前停止保留策略清理和批量分析进程池、写入剩余的存储用量增量，并处理完写队列中的任务"""
+    retention_collector.stop(timeout=30)
+    shutdown_analysis_pool()
+    storage_accountant.stop(timeout=30)
+    db_writer.stop(timeout=30)
 
 # Pydantic模型
 class ProjectCreate(BaseModel):
@@ -99,7 +120,7 @@ class StageConfigResponse(BaseModel):
 # - OCRResultResponse 在 ocr_module 中
 # - OCRProcessRequest 在 ocr_module 中
 # - KeywordAnalysisRequest 在 ocr_module 中
-    
+
 # KeywordAnalysisResponse 也在 ocr_module 中定义
 
 class FrameInfo(BaseModel):
@@ -114,6 +135,7 @@ class FrameExtractionResponse(BaseModel):
     video_id: int
     total_frames: int
     frames: List[FrameInfo]
+    thumbnail_job_id: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -126,6 +148,7 @@ async def startup_event():
     directories = [
         "./data",
         "./data/videos",
+        "./data/uploads",
         "./data/frames",
         "./data/charts",
         "./data/temp",
@@ -136,6 +159,12 @@ async def startup_event():
     for directory in directories:
         Path(directory).mkdir(parents=True, exist_ok=True)
     
+    # 后台写入存储用量增量，并与磁盘核对一次
+    storage_accountant.start()
+    # 后台按保留策略定期清理帧图片、归档视频和临时文件（需开启retention_auto_run）
+    if settings.retention_auto_run:
+        retention_collector.start()
+    
     print("✓ 视频耗时分析系统启动完成")
     print("✓ 模块化架构已加载：视频模块、帧提取模块、OCR模块")
 
@@ -178,20 +207,75 @@ async def get_project(project_id: int, db: Session = Depends(get_db)):
     return project
 
 # 视频管理
+def with_metadata_job(result: dict, background_tasks: BackgroundTasks, db: Session) -> dict:
+    """为新上传的视频创建元数据探测任务（复用已有文件且元数据已探测时不需要）"""
+    job = video_metadata_prober.start_probe_job(result["video_id"], background_tasks, db)
+    result["metadata_job_id"] = job["job_id"] if job else None
+    return result
+
 @app.post("/videos/upload/{project_id}", response_model=VideoResponse)
 async def upload_video(
     project_id: int,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
-    """上传视频"""
-    return await video_manager.upload_video(project_id, file, db)
+    """上传视频，上传完成后在后台探测视频元数据"""
+    result = await video_manager.upload_video(project_id, file, db)
+    return with_metadata_job(result, background_tasks, db)
+
+# 分块上传（支持断点续传）
+@app.post("/projects/{project_id}/uploads")
+async def create_upload(project_id: int, request: UploadCreateRequest, db: Session = Depends(get_db)):
+    """创建分块上传会话，返回上传ID和建议的分块大小"""
+    return video_upload_manager.create_upload(project_id, request, db)
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str, db: Session = Depends(get_db)):
+    """查询上传会话，offset为服务端已接收的字节数"""
+    return video_upload_manager.get_upload(upload_id, db)
+
+@app.put("/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request, db: Session = Depends(get_db)):
+    """以请求体发送从offset开始的一块数据，offset必须等于服务端已接收的字节数"""
+    return await video_upload_manager.append_chunk(upload_id, offset, request, db)
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """完成上传并创建视频记录（内容与已有视频相同时复用已有文件），然后在后台探测视频元数据"""
+    result = await video_upload_manager.complete_upload(upload_id, db)
+    return with_metadata_job(result, background_tasks, db)
+
+@app.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str, db: Session = Depends(get_db)):
+    """取消上传并删除已上传的数据"""
+    return await video_upload_manager.abort_upload(upload_id, db)
 
 @app.get("/videos/{video_id}", response_model=VideoResponse)
 async def get_video(video_id: int, db: Session = Depends(get_db)):
     """获取指定视频"""
     return await video_manager.get_video(video_id, db)
 
+@app.get("/videos/{video_id}/metadata")
+async def get_video_metadata(video_id: int, db: Session = Depends(get_db)):
+    """获取视频元数据（时长、帧率、分辨率、编码、总帧数和关键帧位置），probed为false表示尚未探测"""
+    return video_metadata_prober.get_metadata(video_id, db)
+
+@app.post("/videos/{video_id}/metadata/probe", status_code=202)
+async def probe_video_metadata(video_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """在后台重新探测视频元数据，返回任务信息"""
+    return video_metadata_prober.start_probe_job(video_id, background_tasks, db, force=True)
+
+@app.get("/videos/{video_id}/storage")
+async def get_video_storage(video_id: int, db: Session = Depends(get_db)):
+    """获取视频各类产物（帧图片、OCR结果、OCR图片、缩略图）占用的文件数和字节数"""
+    return storage_accountant.get_video_usage(video_id, db)
+
+@app.delete("/videos/{video_id}", status_code=202)
+async def delete_video(video_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """删除视频及其所有派生数据（后台执行，立即返回任务信息）"""
+    return video_data_deleter.start_deletion_job(video_id, "video", background_tasks, db)
+
 @app.get("/projects/{project_id}/videos/", response_model=List[VideoResponse])
 async def get_project_videos(project_id: int, db: Session = Depends(get_db)):
     """获取项目的所有视频"""
@@ -206,6 +290,13 @@ async def create_stage_config(config: StageConfigCreate, db: Session = Depends(g
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
     
+    # 校验起止规则
+    try:
+        validate_rule(config.start_rule, config.keywords)
+        validate_rule(config.end_rule, config.keywords)
+    except StageRuleError as e:
+        raise HTTPException(status_code=400, detail=f"阶段规则无效: {str(e)}")
+    
     db_config = StageConfig(
         video_id=config.video_id,
         stage_name=config.stage_name,
@@ -216,8 +307,10 @@ async def create_stage_config(config: StageConfigCreate, db: Session = Depends(g
     )
     
     db.add(db_config)
+    video_data_version_manager.bump(config.video_id, db)
     db.commit()
     db.refresh(db_config)
+    stage_stream_manager.discard(config.video_id)
     
     # 转换JSON字段为Python对象
     response_config = StageConfigResponse(
@@ -234,25 +327,31 @@ async def create_stage_config(config: StageConfigCreate, db: Session = Depends(g
     return response_config
 
 @app.get("/videos/{video_id}/stage-configs/", response_model=List[StageConfigResponse])
-async def get_video_stage_configs(video_id: int, db: Session = Depends(get_db)):
-    """获取视频的所有阶段配置"""
-    configs = db.query(StageConfig).filter(StageConfig.video_id == video_id).order_by(StageConfig.stage_order).all()
-    
-    response_configs = []
-    for config in configs:
-        response_config = StageConfigResponse(
-            id=config.id,
-            video_id=config.video_id,
-            stage_name=config.stage_name,
-            stage_order=config.stage_order,
-            keywords=json.loads(config.keywords),
-            start_rule=json.loads(config.start_rule) if config.start_rule else None,
-            end_rule=json.loads(config.end_rule) if config.end_rule else None,
-            created_at=config.created_at
+async def get_video_stage_configs(video_id: int, request: Request, db=Depends(get_async_db)):
+    """获取视频的所有阶段配置（支持ETag条件请求）"""
+    async def load_configs():
+        result = await db.execute(
+            select(StageConfig).where(StageConfig.video_id == video_id).order_by(StageConfig.stage_order)
         )
-        response_configs.append(response_config)
+        configs = result.scalars().all()
+        
+        response_configs = []
+        for config in configs:
+            response_config = StageConfigResponse(
+                id=config.id,
+                video_id=config.video_id,
+                stage_name=config.stage_name,
+                stage_order=config.stage_order,
+                keywords=json.loads(config.keywords),
+                start_rule=json.loads(config.start_rule) if config.start_rule else None,
+                end_rule=json.loads(config.end_rule) if config.end_rule else None,
+                created_at=config.created_at
+            )
+            response_configs.append(response_config)
+        
+        return response_configs
     
-    return response_configs
+    return await cached_video_response(request, db, video_id, load_configs)
 
 @app.delete("/stage-configs/{config_id}")
 async def delete_stage_config(config_id: int, db: Session = Depends(get_db)):
@@ -262,9 +361,13 @@ async def delete_stage_config(config_id: int, db: Session = Depends(get_db)):
     if not config:
         raise HTTPException(status_code=404, detail="阶段配置不存在")
     
-    # 删除相关的分析结果（由于设置了CASCADE，会自动删除）
+    # 删除相关的分析结果，并从项目耗时汇总中移除
+    video_id = config.video_id
+    stage_rollup_manager.remove_video_results(video_id, db, stage_config_ids=[config_id], commit=False)
     db.delete(config)
+    video_data_version_manager.bump(video_id, db)
     db.commit()
+    stage_stream_manager.discard(video_id)
     
     return {"message": "阶段配置删除成功", "config_id": config_id}
 
@@ -276,9 +379,12 @@ async def delete_all_video_stage_configs(video_id: int, db: Session = Depends(ge
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
     
-    # 删除该视频的所有阶段配置
+    # 删除该视频的所有阶段配置及分析结果
+    stage_rollup_manager.remove_video_results(video_id, db, commit=False)
     deleted_count = db.query(StageConfig).filter(StageConfig.video_id == video_id).delete()
+    video_data_version_manager.bump(video_id, db)
     db.commit()
+    stage_stream_manager.discard(video_id)
     
     return {
         "message": f"成功删除视频 {video_id} 的所有阶段配置",
@@ -294,23 +400,12 @@ async def get_system_info(db: Session = Depends(get_db)):
     video_count = db.query(Video).count()
     config_count = db.query(StageConfig).count()
     
-    # 存储信息
-    storage_info = {}
-    storage_dirs = [
-        "./data/videos",
-        "./data/frames",
-        "./data/charts",
-        "./data/temp",
-        "./data/backups"
-    ]
-    
-    for dir_path in storage_dirs:
-        path = Path(dir_path)
-        if path.exists() and path.is_dir():
-            file_count = len(list(path.glob("*")))
-            storage_info[dir_path] = file_count
-        else:
-            storage_info[dir_path] = 0
+    # 存储信息（读取增量维护的计数，不遍历目录）
+    storage_usage = storage_accountant.get_usage(db)
+    storage_info = {
+        storage_accountant.categories[category]: usage["file_count"]
+        for category, usage in storage_usage.items()
+    }
     
     return {
         "database": {
@@ -319,134 +414,243 @@ async def get_system_info(db: Session = Depends(get_db)):
             "stage_configs": config_count
         },
         "storage": storage_info,
+        "storage_usage": storage_usage,
+        "storage_reconciled_at": storage_accountant.last_reconciled_at,
         "system": {
             "status": "running",
             "version": "1.0.0"
         }
     }
 
+# 立即与磁盘核对存储用量
+@app.post("/system/storage/reconcile", status_code=202)
+async def reconcile_storage(background_tasks: BackgroundTasks):
+    """创建后台任务遍历存储目录，用实际用量修正计数"""
+    return storage_accountant.start_reconcile_job(background_tasks)
+
+# 保留策略清理
+@app.get("/system/retention")
+async def get_retention_report():
+    """预览按当前保留策略将要清理的视频、文件数和字节数（不删除文件），以及上一次清理的结果"""
+    report = await run_in_threadpool(retention_collector.run, True)
+    return {"preview": report, "last_run": retention_collector.last_report}
+
+@app.post("/system/retention/gc", status_code=202)
+async def run_retention_gc(background_tasks: BackgroundTasks, dry_run: bool = False):
+    """创建后台任务立即按保留策略清理，dry_run为true时只统计不删除"""
+    return retention_collector.start_gc_job(background_tasks, dry_run)
+
+# 重请求的准入控制状态
+@app.get("/system/admission")
+async def get_admission_info():
+    """获取各接口类别的并发数、排队数和拒绝次数"""
+    return admission_controller.info()
+
 # 视频分帧处理函数已移至 frame_extraction_module
 
 # OCR处理函数和关键词分析函数已移至 ocr_module
 
 # 视频分帧API
 @app.post("/videos/{video_id}/extract-frames", response_model=FrameExtractionResponse)
-async def extract_frames(video_id: int, request: FrameExtractionRequest, db: Session = Depends(get_db)):
-    """提取视频帧"""
-    return await frame_extractor.extract_frames_from_video(video_id, request, db)
+async def extract_frames(video_id: int, request: FrameExtractionRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """提取视频帧，完成后在后台预生成常用尺寸的缩略图"""
+    async with admission_controller.admit("frame_extraction"):
+        result = await frame_extractor.extract_frames_from_video(video_id, request, db)
+    if result["total_frames"] > 0:
+        result["thumbnail_job_id"] = thumbnail_manager.start_pregenerate_job(video_id, background_tasks, db)["job_id"]
+    # 迁移前上传的视频没有元数据，分帧后在后台补充探测
+    video_metadata_prober.start_probe_job(video_id, background_tasks, db)
+    return result
 
 # 获取视频帧列表
 @app.get("/videos/{video_id}/frames", response_model=List[VideoFrameResponse])
-async def get_video_frames(video_id: int, db: Session = Depends(get_db)):
-    """获取视频的所有帧"""
-    return await frame_extractor.get_video_frames(video_id, db)
+async def get_video_frames(video_id: int, request: Request, db=Depends(get_async_db)):
+    """获取视频的所有帧（支持ETag条件请求）"""
+    async def load_frames():
+        return serialize_models(VideoFrameResponse, await frame_extractor.get_video_frames(video_id, db))
+    
+    return await cached_video_response(request, db, video_id, load_frames)
+
+# 分页获取视频帧（按时间键集分页，支持时间窗口和字段选择）
+@app.get("/videos/{video_id}/frames/page")
+async def get_video_frames_page(
+    video_id: int,
+    request: Request,
+    from_ms: Optional[int] = None,
+    to_ms: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 200,
+    fields: Optional[str] = None,
+    include_total: bool = False,
+    db=Depends(get_async_db)
+):
+    """按时间顺序分页获取视频帧，fields为逗号分隔的字段列表（支持ETag条件请求）"""
+    return await cached_video_response(request, db, video_id, lambda: frame_extractor.get_video_frames_page(
+        video_id, db, from_ms, to_ms, cursor, limit, fields, include_total
+    ))
 
 # 获取单个视频帧信息
 @app.get("/frames/{frame_id}", response_model=VideoFrameResponse)
-async def get_frame(frame_id: int, db: Session = Depends(get_db)):
+async def get_frame(frame_id: int, db=Depends(get_async_db)):
     """获取指定帧信息"""
-    frame = db.query(VideoFrame).filter(VideoFrame.id == frame_id).first()
+    frame = (await db.execute(select(VideoFrame).where(VideoFrame.id == frame_id))).scalars().first()
     if not frame:
         raise HTTPException(status_code=404, detail="帧不存在")
     return frame
 
 # 查看帧图片
 @app.get("/frames/{frame_id}/image")
-async def get_frame_image(frame_id: int, db: Session = Depends(get_db)):
-    """获取帧图片文件"""
+async def get_frame_image(frame_id: int, request: Request, db: Session = Depends(get_db)):
+    """获取帧图片文件（帧可能被重新提取，URL不变，因此按ETag重新验证）"""
     frame = db.query(VideoFrame).filter(VideoFrame.id == frame_id).first()
     if not frame:
         raise HTTPException(status_code=404, detail="帧不存在")
     
     # 检查图片文件是否存在
-    if not os.path.exists(frame.frame_path):
+    if not frame_store.exists(frame.frame_path):
+        if frame.video.frames_purged_at is not None:
+            if not os.path.exists(frame.video.file_path):
+                raise HTTPException(status_code=404, detail="帧图片已按保留策略清理，视频文件已归档删除，无法重新分帧")
+            raise HTTPException(status_code=404, detail="帧图片已按保留策略清理，可重新分帧")
         raise HTTPException(status_code=404, detail="帧图片文件不存在")
     
-    return FileResponse(
-        path=frame.frame_path,
-        media_type="image/jpeg",
-        filename=f"frame_{frame.frame_number}_{frame.timestamp_ms}ms.jpg"
-    )
+    if parse_frame_ref(frame.frame_path) is not None:
+        # 归档中的帧从内存映射切片返回
+        data = await run_in_threadpool(frame_store.read_bytes, frame.frame_path)
+        image_format = frame_image_format(frame.frame_path, data)
+        filename = f"frame_{frame.frame_number}_{frame.timestamp_ms}ms.{image_format}"
+        return cached_bytes_response(data, request, FRAME_IMAGE_FORMATS[image_format], "no-cache", filename=filename)
+    image_format = frame_image_format(frame.frame_path)
+    filename = f"frame_{frame.frame_number}_{frame.timestamp_ms}ms.{image_format}"
+    return cached_file_response(frame.frame_path, request, FRAME_IMAGE_FORMATS[image_format], "no-cache", filename=filename)
+
+# 帧缩略图（重定向到带内容哈希的URL）
+@app.get("/frames/{frame_id}/thumbnail")
+async def get_frame_thumbnail(frame_id: int, size: str = "sm", db: Session = Depends(get_db)):
+    """获取帧缩略图，size可选xs(96px)、sm(240px)、md(480px)"""
+    return thumbnail_manager.get_thumbnail_redirect(frame_id, size, db)
+
+@app.get("/thumbnails/frames/{frame_id}/{size}/{key}.jpg")
+async def serve_frame_thumbnail(frame_id: int, size: str, key: str, request: Request, db: Session = Depends(get_db)):
+    """返回带内容哈希的缩略图，首次请求时生成（可长期缓存）"""
+    return await thumbnail_manager.serve_thumbnail(frame_id, size, key, request, db)
+
+# 缩略图雪碧图
+@app.get("/videos/{video_id}/thumbnail-sprite")
+async def get_thumbnail_sprite(
+    video_id: int,
+    request: Request,
+    size: str = "xs",
+    count: int = 100,
+    columns: int = 10,
+    from_ms: Optional[int] = None,
+    to_ms: Optional[int] = None,
+    db=Depends(get_async_db)
+):
+    """在时间窗口内均匀选取count帧拼成一张雪碧图，返回雪碧图URL和每帧在图中的位置（支持ETag条件请求）"""
+    return await cached_video_response(request, db, video_id, lambda: thumbnail_manager.get_sprite(
+        video_id, db, size, count, columns, from_ms, to_ms
+    ))
+
+@app.get("/thumbnails/sprites/{video_id}/{size}/{key}.jpg")
+async def serve_thumbnail_sprite(video_id: int, size: str, key: str, request: Request):
+    """返回雪碧图（可长期缓存）"""
+    return thumbnail_manager.serve_sprite(video_id, size, key, request)
 
 # 删除视频帧
-@app.delete("/videos/{video_id}/frames")
-async def delete_video_frames(video_id: int, db: Session = Depends(get_db)):
-    """删除视频的所有帧"""
-    # 检查视频是否存在
-    video = db.query(Video).filter(Video.id == video_id).first()
-    if not video:
-        raise HTTPException(status_code=404, detail="视频不存在")
-    
-    # 获取所有帧
-    frames = db.query(VideoFrame).filter(VideoFrame.video_id == video_id).all()
-    
-    # 删除帧文件
-    deleted_files = 0
-    for frame in frames:
-        if os.path.exists(frame.frame_path):
-            try:
-                os.remove(frame.frame_path)
-                deleted_files += 1
-            except Exception as e:
-                print(f"删除帧文件失败: {frame.frame_path}, 错误: {e}")
-    
-    # 删除数据库记录
-    db.query(VideoFrame).filter(VideoFrame.video_id == video_id).delete()
-    db.commit()
-    
-    # 删除帧目录（如果为空）
-    frames_dir = Path(f"./data/frames/video_{video_id}")
-    if frames_dir.exists() and not any(frames_dir.iterdir()):
-        frames_dir.rmdir()
-    
-    return {
-        "message": "视频帧删除完成",
-        "video_id": video_id,
-        "deleted_frames": len(frames),
-        "deleted_files": deleted_files
-    }
+@app.delete("/videos/{video_id}/frames", status_code=202)
+async def delete_video_frames(video_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """删除视频的所有帧及依赖帧的OCR结果、阶段分析结果（后台执行，立即返回任务信息）"""
+    return video_data_deleter.start_deletion_job(video_id, "frames", background_tasks, db)
+
+# 查询后台任务状态
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """获取后台任务（如删除任务）的状态和结果"""
+    return job_registry.get(job_id)
+
+# 处理进度
+@app.get("/videos/{video_id}/progress")
+async def get_video_progress(video_id: int):
+    """获取视频分帧、OCR的当前进度（已处理帧数、吞吐量、预计剩余时间）"""
+    return progress_manager.get_progress(video_id)
+
+@app.get("/videos/{video_id}/progress/stream")
+async def stream_video_progress(video_id: int):
+    """以SSE推送视频分帧、OCR的进度，OCR进行中附带阶段分析的中间结果"""
+    return StreamingResponse(
+        progress_manager.event_stream(video_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # OCR处理API
 @app.post("/videos/{video_id}/process-ocr")
 async def process_video_ocr(video_id: int, request: OCRProcessRequest, db: Session = Depends(get_db)):
     """对视频的所有帧进行OCR处理"""
-    return await ocr_processor.process_video_ocr(video_id, request, db)
+    async with admission_controller.admit("ocr"):
+        return await ocr_processor.process_video_ocr(video_id, request, db)
 
 # 获取OCR结果API
 @app.get("/videos/{video_id}/ocr-results", response_model=List[OCRResultResponse])
-async def get_video_ocr_results(video_id: int, db: Session = Depends(get_db)):
-    """获取视频的所有OCR结果"""
-    return ocr_processor.get_video_ocr_results(video_id, db)
+async def get_video_ocr_results(video_id: int, request: Request, db=Depends(get_async_db)):
+    """获取视频的所有OCR结果（支持ETag条件请求）"""
+    async def load_results():
+        return await db.run_sync(
+            lambda session: serialize_models(OCRResultResponse, ocr_processor.get_video_ocr_results(video_id, session))
+        )
+    
+    return await cached_video_response(request, db, video_id, load_results)
+
+# 分页获取OCR结果API（按帧时间键集分页，支持时间窗口和字段选择）
+@app.get("/videos/{video_id}/ocr-results/page")
+async def get_video_ocr_results_page(
+    video_id: int,
+    request: Request,
+    from_ms: Optional[int] = None,
+    to_ms: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 200,
+    fields: Optional[str] = None,
+    include_total: bool = False,
+    db=Depends(get_async_db)
+):
+    """按帧时间顺序分页获取OCR结果，fields为逗号分隔的字段列表（支持ETag条件请求）"""
+    return await cached_video_response(request, db, video_id, lambda: ocr_processor.get_video_ocr_results_page(
+        video_id, db, from_ms, to_ms, cursor, limit, fields, include_total
+    ))
 
 # 获取增强的OCR结果API (PP-OCRv5)
-@app.get("/videos/{video_id}/enhanced-ocr-results", response_model=List[EnhancedOCRResultResponse])
-async def get_enhanced_ocr_results(video_id: int, db: Session = Depends(get_db)):
-    """获取视频的增强OCR结果（PP-OCRv5格式）"""
-    return ocr_processor.get_enhanced_ocr_results(video_id)
+@app.get("/videos/{video_id}/enhanced-ocr-results")
+async def get_enhanced_ocr_results(video_id: int):
+    """获取视频的增强OCR结果（PP-OCRv5格式，结构见EnhancedOCRResultResponse，从结果文件读取后直接序列化）"""
+    return FastJSONResponse(ocr_processor.get_enhanced_ocr_result_rows(video_id))
 
 # 关键词分析API
 @app.post("/videos/{video_id}/analyze-keywords")
 async def analyze_video_keywords(video_id: int, request: KeywordAnalysisRequest, db: Session = Depends(get_db)):
     """分析视频中关键词的出现和消失模式"""
-    return await ocr_processor.analyze_video_keywords(video_id, request, db)
+    async with admission_controller.admit("analysis"):
+        return await ocr_processor.analyze_video_keywords(video_id, request, db)
 
 # 获取单个帧的OCR结果
 @app.get("/frames/{frame_id}/ocr-result", response_model=OCRResultResponse)
-async def get_frame_ocr_result(frame_id: int, db: Session = Depends(get_db)):
+async def get_frame_ocr_result(frame_id: int, db=Depends(get_async_db)):
     """获取指定帧的OCR结果"""
-    return ocr_processor.get_frame_ocr_result(frame_id, db)
+    return await db.run_sync(lambda session: ocr_processor.get_frame_ocr_result(frame_id, session))
 
 # 基于stage_configs的关键词分析API
 @app.post("/videos/{video_id}/analyze-stage-keywords")
 async def analyze_stage_keywords(video_id: int, db: Session = Depends(get_db)):
     """基于stage_configs分析关键词模式"""
-    return await ocr_processor.analyze_stage_keywords(video_id, db)
+    async with admission_controller.admit("analysis"):
+        return await ocr_processor.analyze_stage_keywords(video_id, db)
 
 # 删除OCR结果API
-@app.delete("/videos/{video_id}/ocr-results")
-async def delete_video_ocr_results(video_id: int, db: Session = Depends(get_db)):
-    """删除视频的所有OCR结果（数据库记录和JSON文件）"""
-    return ocr_processor.delete_video_ocr_results(video_id, db)
+@app.delete("/videos/{video_id}/ocr-results", status_code=202)
+async def delete_video_ocr_results(video_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """删除视频的所有OCR结果及依赖OCR结果的阶段分析结果（后台执行，立即返回任务信息）"""
+    return video_data_deleter.start_deletion_job(video_id, "ocr", background_tasks, db)
 
 # 获取OCR存储信息API
 @app.get("/videos/{video_id}/ocr-storage-info")
@@ -458,7 +662,7 @@ async def get_ocr_storage_info(video_id: int, db: Session = Depends(get_db)):
 @app.get("/videos/{video_id}/ocr-results/view")
 async def view_video_ocr_results(video_id: int, db: Session = Depends(get_db)):
     """查看视频的OCR结果（包含数据库和JSON文件信息）"""
-    return ocr_processor.view_video_ocr_results(video_id, db)
+    return FastJSONResponse(ocr_processor.view_video_ocr_results(video_id, db))
 
 # 获取视频OCR图片列表API
 @app.get("/videos/{video_id}/ocr-images")
@@ -522,43 +726,99 @@ async def get_raw_ocr_result(video_id: str, frame_id: str):
 @app.post("/videos/{video_id}/analyze-keyword-pattern")
 async def analyze_keyword_pattern(video_id: int, request: KeywordPatternRequest, db: Session = Depends(get_db)):
     """分析视频中关键词的模式，返回第一次出现和消失的时间戳"""
-    return keyword_pattern_analyzer.analyze_keyword_pattern(video_id, request, db)
+    async with admission_controller.admit("analysis"):
+        return await run_in_threadpool(keyword_pattern_analyzer.analyze_keyword_pattern, video_id, request, db)
 
 @app.post("/videos/{video_id}/analyze-stage-pattern")
 async def analyze_stage_pattern(video_id: int, request: StagePatternRequest, db: Session = Depends(get_db)):
-    """基于阶段配置分析关键词模式，返回每个阶段的时间戳信息"""
-    return keyword_pattern_analyzer.analyze_stage_pattern(video_id, request, db)
+    """基于阶段配置分析关键词模式，返回每个阶段的时间戳信息
+    
+    使用全部OCR结果（不设置置信度阈值）的分析结果会同步保存并更新项目耗时汇总
+    """
+    def analyze():
+        result = stage_stream_manager.analyze_stage_pattern(video_id, request, db)
+        if request.confidence_threshold <= 0:
+            stage_rollup_manager.record_video_results(video_id, result["stage_results"], db)
+        return result
+    
+    async with admission_controller.admit("analysis"):
+        return FastJSONResponse(await run_in_threadpool(analyze))
+
+@app.get("/videos/{video_id}/stage-pattern-live")
+async def get_stage_pattern_live(video_id: int):
+    """获取OCR处理过程中增量计算的阶段模式结果"""
+    return stage_stream_manager.get_live_result(video_id)
+
+@app.post("/projects/{project_id}/analyze-stage-pattern")
+async def analyze_project_stage_pattern(project_id: int, request: ProjectStagePatternRequest, db: Session = Depends(get_db)):
+    """批量分析项目下所有视频的阶段模式，返回每个视频的阶段耗时"""
+    def analyze():
+        result = keyword_pattern_analyzer.analyze_project_stage_pattern(project_id, request, db)
+        if request.confidence_threshold <= 0:
+            for video_result in result["video_results"]:
+                stage_rollup_manager.record_video_results(video_result["video_id"], video_result["stage_results"], db)
+        return result
+    
+    async with admission_controller.admit("analysis"):
+        return FastJSONResponse(await run_in_threadpool(analyze))
 
-@app.get("/videos/{video_id}/stage-pattern-summary")
-async def get_stage_pattern_summary(video_id: int, db: Session = Depends(get_db)):
-    """获取视频所有阶段的关键词模式摘要"""
-    request = StagePatternRequest(confidence_threshold=0.0, include_pattern_details=False)
-    result = keyword_pattern_analyzer.analyze_stage_pattern(video_id, request, db)
+@app.get("/projects/{project_id}/stage-rollups")
+async def get_project_stage_rollups(project_id: int, stage_name: Optional[str] = None, percentiles: Optional[str] = None, db: Session = Depends(get_db)):
+    """查询项目各阶段耗时汇总（样本数、均值、分位数、最小/最大值）
     
-    # 返回简化的摘要信息
-    summary = {
-        "video_id": video_id,
-        "total_stages": result["total_stages"],
-        "analysis_timestamp": result["analysis_timestamp"],
-        "stage_summaries": []
-    }
+    percentiles为逗号分隔的百分位，例如 50,95
+    """
+    percentile_values = None
+    if percentiles:
+        try:
+            percentile_values = [float(p) for p in percentiles.split(",") if p.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="percentiles格式错误，应为逗号分隔的数字")
+    return stage_rollup_manager.get_project_rollups(project_id, db, percentiles=percentile_values, stage_name=stage_name)
+
+@app.post("/projects/{project_id}/stage-rollups/rebuild")
+async def rebuild_project_stage_rollups(project_id: int, db: Session = Depends(get_db)):
+    """根据已保存的阶段分析结果重建项目耗时汇总"""
+    async with admission_controller.admit("analysis"):
+        return await run_in_threadpool(stage_rollup_manager.rebuild_project_rollups, project_id, db)
+
+@app.get("/videos/{video_id}/stage-pattern-summary")
+async def get_stage_pattern_summary(video_id: int, request: Request, db=Depends(get_async_db),
+                                    sync_db: Session = Depends(get_db)):
+    """获取视频所有阶段的关键词模式摘要（支持ETag条件请求，数据未变化时不重新分析）
     
-    for stage in result["stage_results"]:
-        stage_summary = {
-            "stage_id": stage["stage_id"],
-            "stage_name": stage["stage_name"],
-            "stage_order": stage["stage_order"],
-            "keywords": stage["keywords"],
-            "stage_start_timestamp_ms": stage["stage_start_timestamp_ms"],
-            "stage_end_timestamp_ms": stage["stage_end_timestamp_ms"],
-            "stage_duration_ms": stage["stage_duration_ms"],
-            "keywords_found": stage["pattern_summary"]["keywords_found"],
-            "total_occurrences": stage["pattern_summary"]["total_occurrences"]
+    版本号用异步会话查询，分析在线程池中使用同步会话执行
+    """
+    async def load_summary():
+        pattern_request = StagePatternRequest(confidence_threshold=0.0, include_pattern_details=False)
+        result = await run_in_threadpool(stage_stream_manager.analyze_stage_pattern, video_id, pattern_request, sync_db)
+        
+        # 返回简化的摘要信息
+        summary = {
+            "video_id": video_id,
+            "total_stages": result["total_stages"],
+            "analysis_timestamp": result["analysis_timestamp"],
+            "stage_summaries": []
         }
-        summary["stage_summaries"].append(stage_summary)
+        
+        for stage in result["stage_results"]:
+            stage_summary = {
+                "stage_id": stage["stage_id"],
+                "stage_name": stage["stage_name"],
+                "stage_order": stage["stage_order"],
+                "keywords": stage["keywords"],
+                "stage_start_timestamp_ms": stage["stage_start_timestamp_ms"],
+                "stage_end_timestamp_ms": stage["stage_end_timestamp_ms"],
+                "stage_duration_ms": stage["stage_duration_ms"],
+                "keywords_found": stage["pattern_summary"]["keywords_found"],
+                "total_occurrences": stage["pattern_summary"]["total_occurrences"]
+            }
+            summary["stage_summaries"].append(stage_summary)
+        
+        summary["overall_summary"] = result["overall_summary"]
+        return summary
     
-    summary["overall_summary"] = result["overall_summary"]
-    return summary
+    return await cached_video_response(request, db, video_id, load_summary)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+视频元数据探测模块
+上传完成后在后台探测视频的时长、帧率、分辨率、编码、总帧数和关键帧位置并保存到videos表，
+分帧等后续处理直接使用已保存的元数据规划工作，不需要再打开视频文件读取
+
+探测时OpenCV以原始数据包模式读取（不解码），统计帧数和关键帧只需顺序读取一遍文件
+"""
+
+from fastapi import HTTPException, BackgroundTasks
+from sqlalchemy.orm import Session
+from models_simple import Video
+from db_module import DatabaseWriter, db_writer
+from data_version_module import video_data_version_manager
+from job_module import job_registry
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import cv2
+import os
+
+
+# 保存在videos表中的元数据列
+METADATA_FIELDS = ["duration_ms", "fps", "resolution", "codec", "frame_count", "keyframes", "metadata_probed_at"]
+
+# 常见FourCC对应的编码名称
+FOURCC_CODECS = {
+    "avc1": "h264", "h264": "h264", "x264": "h264",
+    "hev1": "hevc", "hvc1": "hevc", "hevc": "hevc", "h265": "hevc",
+    "fmp4": "mpeg4", "mp4v": "mpeg4", "xvid": "mpeg4", "divx": "mpeg4",
+    "vp80": "vp8", "vp09": "vp9", "av01": "av1", "mjpg": "mjpeg"
+}
+
+
+def decode_fourcc(value: float) -> Optional[str]:
+    """将CAP_PROP_FOURCC的值转换为编码名称"""
+    code = int(value)
+    if code <= 0:
+        return None
+    fourcc = code.to_bytes(4, "little").decode("latin-1").strip("\x00 ").lower()
+    if not fourcc:
+        return None
+    return FOURCC_CODECS.get(fourcc, fourcc)
+
+
+def probe_video_file(video_path: str) -> Dict[str, Any]:
+    """读取视频文件的元数据
+    
+    总帧数按实际读取到的数据包计数（CAP_PROP_FRAME_COUNT只是容器中的估计值）；
+    OpenCV后端不支持原始数据包模式时逐帧解码计数，此时关键帧位置为None
+    """
+    if not os.path.exists(video_path):
+        raise ValueError(f"视频文件不存在: {video_path}")
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"无法打开视频文件: {video_path}")
+    
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        codec = decode_fourcc(cap.get(cv2.CAP_PROP_FOURCC))
+        
+        raw_mode = cap.set(cv2.CAP_PROP_FORMAT, -1)
+        frame_count = 0
+        last_timestamp_ms = 0
+        keyframes: Optional[List[List[int]]] = [] if raw_mode else None
+        while cap.grab():
+            last_timestamp_ms = int(round(cap.get(cv2.CAP_PROP_POS_MSEC)))
+            if raw_mode and cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append([frame_count, last_timestamp_ms])
+            frame_count += 1
+    finally:
+        cap.release()
+    
+    if fps > 0:
+        duration_ms = int((frame_count / fps) * 1000)
+    else:
+        duration_ms = last_timestamp_ms
+    
+    return {
+        "duration_ms": duration_ms,
+        # 保存完整精度的帧率：29.97002997按29.97计算帧时间戳时每分钟偏差数十毫秒
+        "fps": fps if fps > 0 else None,
+        "resolution": f"{width}x{height}" if width and height else None,
+        "codec": codec,
+        "frame_count": frame_count,
+        "keyframes": keyframes
+    }
+
+
+def metadata_info(video: Video) -> Dict[str, Any]:
+    """视频元数据（接口返回格式）"""
+    return {
+        "video_id": video.id,
+        "probed": video.metadata_probed_at is not None,
+        "duration_ms": video.duration_ms,
+        "fps": float(video.fps) if video.fps is not None else None,
+        "resolution": video.resolution,
+        "codec": video.codec,
+        "frame_count": video.frame_count,
+        "keyframes": video.keyframes,
+        "metadata_probed_at": video.metadata_probed_at
+    }
+
+
+class VideoMetadataProber:
+    """视频元数据探测和保存"""
+    
+    def __init__(self, writer: Optional[DatabaseWriter] = None):
+        self.writer = writer
+    
+    def apply_metadata(self, video: Video, metadata: Dict[str, Any], db: Session) -> None:
+        """将探测结果写入视频记录（由调用方提交）"""
+        for field, value in metadata.items():
+            setattr(video, field, value)
+        video.metadata_probed_at = datetime.utcnow()
+        video_data_version_manager.bump(video.id, db)
+    
+    def copy_metadata(self, source: Video, target: Video) -> None:
+        """内容相同的视频直接复用已探测的元数据"""
+        if source.metadata_probed_at is None:
+            return
+        for field in METADATA_FIELDS:
+            setattr(target, field, getattr(source, field))
+    
+    def _run_probe(self, video_id: int, file_path: str) -> Dict[str, Any]:
+        """后台任务：探测文件后通过写队列保存"""
+        metadata = probe_video_file(file_path)
+        
+        def save(session: Session) -> bool:
+            video = session.query(Video).filter(Video.id == video_id).first()
+            # 探测期间视频被删除时不再保存
+            if video is None or video.file_path != file_path:
+                return False
+            self.apply_metadata(video, metadata, session)
+            return True
+        
+        saved = (self.writer or db_writer).execute(save)
+        keyframes = metadata["keyframes"]
+        return {
+            "video_id": video_id,
+            "saved": saved,
+            **{field: value for field, value in metadata.items() if field != "keyframes"},
+            "keyframe_count": len(keyframes) if keyframes is not None else None
+        }
+    
+    def start_probe_job(self, video_id: int, background_tasks: BackgroundTasks, db: Session,
+                        force: bool = False) -> Optional[Dict[str, Any]]:
+        """创建后台探测任务并返回任务信息；已探测过且不强制重新探测时返回None"""
+        video = db.query(Video.id, Video.file_path, Video.metadata_probed_at).filter(Video.id == video_id).first()
+        if video is None:
+            raise HTTPException(status_code=404, detail="视频不存在")
+        if video.metadata_probed_at is not None and not force:
+            return None
+        
+        params = {"video_id": video_id}
+        job = job_registry.find_active("probe_video_metadata", params)
+        if job is None:
+            job = job_registry.create("probe_video_metadata", params)
+            background_tasks.add_task(job_registry.run, job["job_id"], lambda: self._run_probe(video_id, video.file_path))
+        return job
+    
+    def get_metadata(self, video_id: int, db: Session) -> Dict[str, Any]:
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if video is None:
+            raise HTTPException(status_code=404, detail="视频不存在")
+        return metadata_info(video)
+
+
+# 创建全局实例
+video_metadata_prober = VideoMetadataProber()
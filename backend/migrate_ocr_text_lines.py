@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移脚本 - 添加ocr_text_lines表并从ocr_results补全已有数据
+"""
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from models_simple import Video, OCRTextLine
+from ocr_text_line_module import backfill_text_lines
+import os
+
+def migrate_ocr_text_lines():
+    """创建文本行表并按视频逐个补全文本行"""
+    db_path = "./video_analysis.db"
+    
+    if not os.path.exists(db_path):
+        print(f"数据库文件不存在: {db_path}")
+        return
+    
+    engine = create_engine(f"sqlite:///{db_path}")
+    db = sessionmaker(bind=engine)()
+    try:
+        if not inspect(engine).has_table(OCRTextLine.__tablename__):
+            OCRTextLine.__table__.create(bind=engine)
+            print("✓ 成功添加ocr_text_lines表")
+        
+        total_lines = 0
+        for (video_id,) in db.query(Video.id).order_by(Video.id).all():
+            inserted = backfill_text_lines(db, video_id)
+            if inserted:
+                print(f"  视频 {video_id}: 写入 {inserted} 个文本行")
+            total_lines += inserted
+        print(f"✓ 文本行迁移完成，共写入 {total_lines} 个文本行")
+    except Exception as e:
+        db.rollback()
+        print(f"迁移ocr_text_lines失败: {str(e)}")
+    finally:
+        db.close()
+        engine.dispose()
+
+if __name__ == "__main__":
+    migrate_ocr_text_lines()
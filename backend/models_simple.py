@@ -4,7 +4,7 @@
 简化版数据库模型 - 使用SQLAlchemy
 """
 
-from sqlalchemy import Column, Integer, BigInteger, String, Text, DECIMAL, TIMESTAMP, Enum, JSON, ForeignKey, Index
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Float, DECIMAL, TIMESTAMP, Enum, JSON, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -63,11 +63,18 @@ class Video(Base):
     file_path = Column(String(500), nullable=False, comment="文件存储路径")
     file_size = Column(BigInteger, nullable=False, comment="文件大小(字节)")
     duration_ms = Column(BigInteger, comment="视频时长(毫秒)")
-    fps = Column(DECIMAL(10, 2), comment="帧率")
+    fps = Column(Float, comment="帧率（完整精度，帧时间戳按此计算）")
     resolution = Column(String(20), comment="分辨率 如1920x1080")
     format = Column(String(10), comment="视频格式")
     upload_time = Column(TIMESTAMP, default=datetime.utcnow)
     process_status = Column(Enum(ProcessStatus), default=ProcessStatus.pending)
+    content_hash = Column(String(64), comment="文件内容SHA-256，内容相同的视频共用同一个文件")
+    codec = Column(String(20), comment="视频编码 如h264")
+    frame_count = Column(BigInteger, comment="视频总帧数")
+    keyframes = Column(JSON, comment="关键帧位置 [[帧序号, 时间戳毫秒], ...]")
+    metadata_probed_at = Column(TIMESTAMP, comment="元数据探测时间，为空表示尚未探测")
+    frames_purged_at = Column(TIMESTAMP, comment="按保留策略清理帧图片的时间，分析结果保留")
+    archived_at = Column(TIMESTAMP, comment="按保留策略归档（删除OCR原始结果，可选删除视频文件）的时间，分析结果保留")
     
     # 关系
     project = relationship("Project", back_populates="videos")
@@ -79,6 +86,7 @@ class Video(Base):
     # 索引
     __table_args__ = (
         Index('idx_project_status', 'project_id', 'process_status'),
+        Index('idx_video_content_hash', 'content_hash'),
     )
 
 
@@ -150,6 +158,27 @@ class OCRResult(Base):
     )
 
 
+class OCRTextLine(Base):
+    """OCR文本行表（每帧每个识别文本行一条记录）"""
+    __tablename__ = "ocr_text_lines"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    frame_id = Column(Integer, ForeignKey("video_frames.id", ondelete="CASCADE"), nullable=False)
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"), nullable=False, comment="所属视频ID(冗余，便于按视频查询)")
+    line_idx = Column(Integer, nullable=False, comment="文本行序号")
+    text = Column(Text, nullable=False, comment="识别的文本")
+    text_norm = Column(String(500), nullable=False, comment="归一化文本(去除首尾空白并转小写)")
+    score = Column(DECIMAL(5, 4), comment="文本行置信度")
+    box = Column(JSON, comment="文本框坐标")
+    
+    # 索引
+    __table_args__ = (
+        Index('idx_line_frame', 'frame_id', 'line_idx', unique=True),
+        Index('idx_line_video_text', 'video_id', 'text_norm'),
+        Index('idx_line_video_score', 'video_id', 'score'),
+    )
+
+
 class StageAnalysisResult(Base):
     """阶段分析结果表"""
     __tablename__ = "stage_analysis_results"
@@ -181,6 +210,55 @@ class StageAnalysisResult(Base):
     )
 
 
+class StageDurationRollup(Base):
+    """项目级阶段耗时汇总表（按阶段名称增量维护）"""
+    __tablename__ = "stage_duration_rollups"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    stage_name = Column(String(100), nullable=False, comment="阶段名称")
+    sample_count = Column(Integer, nullable=False, default=0, comment="样本数")
+    duration_sum_ms = Column(BigInteger, nullable=False, default=0, comment="耗时总和(毫秒)")
+    min_duration_ms = Column(BigInteger, comment="最小耗时(毫秒)")
+    max_duration_ms = Column(BigInteger, comment="最大耗时(毫秒)")
+    sketch = Column(JSON, comment="耗时分位数草图(可合并)")
+    updated_at = Column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 索引
+    __table_args__ = (
+        Index('idx_rollup_project_stage', 'project_id', 'stage_name', unique=True),
+    )
+
+
+class VideoDataVersion(Base):
+    """视频数据版本表：视频的帧、OCR结果或阶段配置每次变化时版本号加一，用于ETag和响应缓存
+    
+    video_id不设外键：视频删除后保留版本号，视频ID被复用时版本号仍单调递增，旧的ETag不会误命中
+    """
+    __tablename__ = "video_data_versions"
+    
+    video_id = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(BigInteger, nullable=False, default=0, comment="数据版本号")
+    updated_at = Column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class VideoUpload(Base):
+    """分块上传会话表：记录已接收的字节数，连接中断后客户端从该位置继续上传"""
+    __tablename__ = "video_uploads"
+    
+    id = Column(String(32), primary_key=True, comment="上传ID")
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    original_filename = Column(String(255), nullable=False, comment="原始文件名")
+    total_size = Column(BigInteger, nullable=False, comment="文件总大小(字节)")
+    received_size = Column(BigInteger, nullable=False, default=0, comment="已接收字节数")
+    expected_hash = Column(String(64), comment="客户端提供的SHA-256，完成时校验")
+    temp_path = Column(String(500), nullable=False, comment="临时文件路径")
+    status = Column(String(20), nullable=False, default="uploading", comment="uploading/completed")
+    video_id = Column(Integer, comment="完成后创建的视频ID")
+    created_at = Column(TIMESTAMP, default=datetime.utcnow)
+    updated_at = Column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class VisualizationReport(Base):
     """可视化报告表"""
     __tablename__ = "visualization_reports"
@@ -201,6 +279,23 @@ class VisualizationReport(Base):
     )
 
 
+class StorageUsage(Base):
+    """存储用量表：按类别和视频统计的文件数和字节数，写入和删除文件时增量更新，定期与磁盘核对"""
+    __tablename__ = "storage_usage"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    category = Column(String(20), nullable=False, comment="存储类别 如frames、ocr_images")
+    video_id = Column(Integer, nullable=False, default=0, comment="视频ID，不按视频划分的类别为0")
+    file_count = Column(BigInteger, nullable=False, default=0, comment="文件数")
+    total_bytes = Column(BigInteger, nullable=False, default=0, comment="总字节数")
+    updated_at = Column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 索引
+    __table_args__ = (
+        Index('idx_storage_category_video', 'category', 'video_id', unique=True),
+    )
+
+
 # 辅助函数
 def json_to_dict(json_str: str) -> dict:
     """JSON字符串转字典"""
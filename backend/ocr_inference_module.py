@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR推理服务模块
+多worker部署时（api_workers > 1，或另有任务进程），每个进程各自加载PaddleOCR模型会成倍占用内存。
+推理服务作为独立进程只加载一套模型，API worker和任务进程通过Unix socket提交帧；
+服务把不同请求、不同进程同时提交的帧合并为一批（最多max_batch_size帧，凑批最多等待max_batch_delay_ms）进行识别。
+
+帧图片已保存在共享的数据目录中，请求只传递帧路径，识别结果图片和原始结果JSON由服务写入数据目录，
+因此服务需要在后端目录下启动（与API进程使用相同的./data）。
+
+启动: python ocr_inference_module.py --socket /tmp/byte_test_ocr.sock
+API进程设置环境变量 OCR_INFERENCE_SOCKET=/tmp/byte_test_ocr.sock 后不再加载模型，OCR请求转发到推理服务
+"""
+
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+from config import OCRConfig, settings as app_settings
+from serialization_module import dumps, loads
+import argparse
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+
+# 消息格式：4字节大端长度 + JSON
+_HEADER = struct.Struct(">I")
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]) -> None:
+    body = dumps(message)
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    """读取一条消息，连接关闭时返回None"""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"消息过大: {size}字节")
+    body = _recv_exact(sock, size)
+    if body is None:
+        return None
+    return loads(body)
+
+
+class _OCRJob:
+    """待识别的帧"""
+    
+    __slots__ = ("frame", "lang", "save_raw_result", "future")
+    
+    def __init__(self, frame: Dict[str, Any], lang: str, save_raw_result: bool):
+        self.frame = frame
+        self.lang = lang
+        self.save_raw_result = save_raw_result
+        self.future = Future()
+
+
+class OCRBatcher:
+    """动态批处理
+    
+    submit()提交的帧由专用推理线程执行：线程取出积压的帧（最多max_batch_size个，凑不满时最多再等待max_batch_delay_ms），
+    按(语言, 是否保存原始结果)分组后调用processor.process_frames_ocr批量识别。模型只在推理线程中使用
+    """
+    
+    def __init__(self, processor, max_batch_size: int = 8, max_batch_delay_ms: int = 10):
+        self.processor = processor
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay_ms / 1000
+        self._queue: "queue.Queue[Optional[_OCRJob]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {"frames": 0, "failed_frames": 0, "batches": 0, "max_batch_size": 0}
+    
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ocr-inference", daemon=True)
+                self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """识别完队列中的帧后停止推理线程"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+    
+    def submit(self, frame: Dict[str, Any], lang: str = "ch", save_raw_result: bool = True) -> Future:
+        """提交一帧，返回完成时包含识别结果的Future"""
+        job = _OCRJob(frame, lang, save_raw_result)
+        self.start()
+        self._queue.put(job)
+        return job.future
+    
+    def _collect_batch(self, first: _OCRJob) -> tuple:
+        """收集一批帧，返回(帧列表, 是否收到停止信号)"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_batch_delay
+        while len(batch) < self.max_batch_size:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+    
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stopping = self._collect_batch(first)
+            self._execute_batch(batch)
+            if stopping:
+                return
+    
+    def _execute_batch(self, batch: List[_OCRJob]) -> None:
+        groups: Dict[tuple, List[_OCRJob]] = {}
+        for job in batch:
+            groups.setdefault((job.lang, job.save_raw_result), []).append(job)
+        
+        for (lang, save_raw_result), jobs in groups.items():
+            try:
+                results = self.processor.process_frames_ocr([job.frame for job in jobs], lang, save_raw_result)
+            except Exception as e:
+                results = [e] * len(jobs)
+            
+            self.stats["batches"] += 1
+            self.stats["max_batch_size"] = max(self.stats["max_batch_size"], len(jobs))
+            for job, result in zip(jobs, results):
+                self.stats["frames"] += 1
+                if isinstance(result, Exception):
+                    self.stats["failed_frames"] += 1
+                    job.future.set_exception(result)
+                else:
+                    job.future.set_result(result)
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """处理一个连接：按顺序读取请求，每个请求识别完成后返回结果"""
+    
+    def setup(self):
+        with self.server.connections_lock:
+            self.server.connections.add(self.request)
+    
+    def finish(self):
+        with self.server.connections_lock:
+            self.server.connections.discard(self.request)
+    
+    def handle(self):
+        batcher: OCRBatcher = self.server.batcher
+        while True:
+            try:
+                message = recv_message(self.request)
+            except (OSError, ValueError) as e:
+                print(f"读取OCR请求失败: {e}")
+                return
+            if message is None:
+                return
+            
+            op = message.get("op")
+            if op == "ping":
+                response = {"ok": True, "stats": batcher.stats, "pid": os.getpid()}
+            elif op == "ocr":
+                frame = {"frame_path": message["frame_path"], "frame_id": message["frame_id"], "video_id": message.get("video_id")}
+                try:
+                    result = batcher.submit(frame, message.get("lang", "ch"), message.get("save_raw_result", True)).result()
+                    response = {"ok": True, "result": result}
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+            else:
+                response = {"ok": False, "error": f"未知的请求类型: {op}"}
+            
+            try:
+                send_message(self.request, response)
+            except OSError as e:
+                print(f"返回OCR结果失败: {e}")
+                return
+
+
+class OCRInferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """OCR推理服务：每个连接一个线程，识别由共享的OCRBatcher完成"""
+    
+    daemon_threads = True
+    # 多个进程的识别线程同时连接时，Unix socket的连接队列已满会使带超时的connect立即失败
+    request_queue_size = 128
+    
+    def __init__(self, socket_path: str, batcher: OCRBatcher):
+        # 清理上次异常退出遗留的socket文件
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.batcher = batcher
+        self.connections = set()
+        self.connections_lock = threading.Lock()
+        super().__init__(socket_path, _RequestHandler)
+    
+    def server_close(self):
+        # 关闭仍在等待请求的连接，客户端收到连接关闭后重连或报错
+        with self.connections_lock:
+            for connection in self.connections:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        super().server_close()
+        self.batcher.stop()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+class RemoteOCRClient:
+    """OCR推理服务客户端，process_frame_ocr与OCRProcessor.process_frame_ocr的接口和返回值一致
+    
+    每个线程复用一个连接（每个连接同一时间只有一个请求），并发识别多帧时在多个线程中调用即可
+    """
+    
+    def __init__(self, socket_path: str, timeout: Optional[float] = None, max_inflight_frames: Optional[int] = None):
+        settings = OCRConfig.INFERENCE_SERVER
+        self.socket_path = socket_path
+        self.timeout = timeout if timeout is not None else settings["request_timeout"]
+        # OCR任务同时提交的帧数，使推理服务能够合并成批
+        self.max_inflight_frames = max_inflight_frames or settings["max_inflight_frames"]
+        self._local = threading.local()
+    
+    def _connect(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+    
+    def _close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+    
+    def _request(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """发送请求并等待响应；连接已断开（如推理服务重启）时重连一次"""
+        for attempt in range(2):
+            try:
+                sock = self._connect()
+                send_message(sock, message)
+                response = recv_message(sock)
+                if response is None:
+                    raise ConnectionError("推理服务关闭了连接")
+                return response
+            except socket.timeout:
+                # 超时后连接上可能还会收到迟到的响应，不能复用
+                self._close()
+                raise ValueError(f"OCR推理服务响应超时（{self.timeout}秒）")
+            except OSError as e:
+                self._close()
+                if attempt == 1:
+                    raise ValueError(f"OCR推理服务不可用（{self.socket_path}）: {e}")
+    
+    def ping(self) -> Dict[str, Any]:
+        """检查推理服务状态，返回批处理统计"""
+        return self._request({"op": "ping"})
+    
+    def process_frame_ocr(self, frame_path: str, frame_id: int, video_id: int = None, use_gpu: bool = False, lang: str = 'ch', save_raw_result: bool = True) -> dict:
+        """通过推理服务识别单帧（GPU设置以推理服务启动参数为准）"""
+        response = self._request({
+            "op": "ocr",
+            "frame_path": os.path.abspath(frame_path),
+            "frame_id": frame_id,
+            "video_id": video_id,
+            "lang": lang,
+            "save_raw_result": save_raw_result
+        })
+        if not response.get("ok"):
+            raise ValueError(response.get("error", "OCR推理服务返回错误"))
+        result = response["result"]
+        # 推理服务使用绝对路径识别，返回调用方传入的路径
+        result["frame_path"] = frame_path
+        return result
+
+
+def main():
+    settings = OCRConfig.INFERENCE_SERVER
+    parser = argparse.ArgumentParser(description="OCR推理服务")
+    parser.add_argument("--socket", default=os.environ.get("OCR_INFERENCE_SOCKET", settings["socket_path"]))
+    parser.add_argument("--max-batch-size", type=int, default=settings["max_batch_size"])
+    parser.add_argument("--max-batch-delay-ms", type=int, default=settings["max_batch_delay_ms"])
+    parser.add_argument("--use-gpu", action="store_true")
+    parser.add_argument("--lang", default="ch")
+    args = parser.parse_args()
+    
+    # ocr_module的全局实例指向本服务，避免在服务进程中再加载一套模型；识别使用下面单独创建的实例
+    app_settings.ocr_inference_socket = args.socket
+    from ocr_module import OCRProcessor
+    processor = OCRProcessor(use_gpu=args.use_gpu, lang=args.lang)
+    
+    batcher = OCRBatcher(processor, args.max_batch_size, args.max_batch_delay_ms)
+    server = OCRInferenceServer(args.socket, batcher)
+    # 本进程写入的OCR图片和结果文件计入存储用量（与磁盘核对由API进程负责）
+    from storage_module import storage_accountant
+    storage_accountant.start(reconcile=False)
+    print(f"OCR推理服务已启动: {args.socket}，批大小: {args.max_batch_size}，凑批等待: {args.max_batch_delay_ms}ms")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        storage_accountant.stop(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,34 @@ OCR识别模块
 """
 
 from fastapi import HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from models_simple import Video, VideoFrame, OCRResult, StageConfig, ProcessStatus
 from pathlib import Path
+from functools import partial
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from datetime import datetime
 from paddleocr import PaddleOCR, TextRecognition
-from config import OCRConfig
+from config import OCRConfig, settings
+from keyword_pattern_module import _OCRRow
+from stage_stream_module import stage_stream_manager
+from progress_module import progress_manager
+from stage_rollup_module import stage_rollup_manager
+from ocr_text_line_module import build_text_line_rows, bulk_insert_text_lines, backfill_text_lines, text_line_rows_from_result
+from db_module import db_writer
+from storage_module import storage_accountant
+from frame_store_module import frame_store, parse_frame_ref
+from data_version_module import video_data_version_manager
+from pagination_module import fetch_timeline_page, parse_fields, DEFAULT_PAGE_LIMIT
+from serialization_module import loads
+from ocr_inference_module import RemoteOCRClient
+import asyncio
 import json
 import os
+import threading
 import time
-import cv2
 
 
 class OCRProcessRequest(BaseModel):
@@ -36,6 +52,20 @@ class OCRResultResponse(BaseModel):
         from_attributes = True
 
 
+# 分页接口可选的字段
+OCR_PAGE_FIELDS = {
+    "id": OCRResult.id,
+    "frame_id": OCRResult.frame_id,
+    "frame_number": VideoFrame.frame_number,
+    "timestamp_ms": VideoFrame.timestamp_ms,
+    "text_content": OCRResult.text_content,
+    "confidence": OCRResult.confidence,
+    "bbox": OCRResult.bbox,
+    "processed_at": OCRResult.processed_at
+}
+DEFAULT_OCR_PAGE_FIELDS = ["id", "frame_id", "timestamp_ms", "text_content", "confidence"]
+
+
 class EnhancedOCRResultResponse(BaseModel):
     """增强的OCR结果响应模型 - 支持PP-OCRv5"""
     frame_id: int
@@ -69,11 +99,21 @@ class KeywordAnalysisResponse(BaseModel):
     frame_occurrences: List[dict]
 
 
+def _save_frame_ocr(session: Session, video_id: int, ocr_row: Dict[str, Any], line_rows: List[Dict[str, Any]]) -> None:
+    """写线程中执行：保存单帧的OCR结果和文本行，并更新视频数据版本"""
+    session.execute(OCRResult.__table__.insert(), [ocr_row])
+    bulk_insert_text_lines(session, line_rows)
+    video_data_version_manager.bump(video_id, session)
+
+
 class OCRProcessor:
     """OCR处理器"""
     
-    def __init__(self):
+    def __init__(self, inference_socket: Optional[str] = None, use_gpu: bool = False, lang: str = "ch"):
         self.ocr_instance = None
+        self.inference_client = None
+        # PaddleOCR的预测器不是线程安全的：多个OCR任务在线程池中识别时，同一时间只允许一次本地推理
+        self._inference_lock = threading.Lock()
         self.ocr_results_path = "./data/ocr_results"
         self.ocr_images_path = "./data/ocr_images"  # 新增OCR图片存储路径
         
@@ -81,8 +121,13 @@ class OCRProcessor:
         Path(self.ocr_results_path).mkdir(parents=True, exist_ok=True)
         Path(self.ocr_images_path).mkdir(parents=True, exist_ok=True)  # 创建OCR图片目录
         
-        # 初始化OCR实例
-        self.initialize_ocr()
+        if inference_socket:
+            # 多worker部署：识别转发到共享的OCR推理服务，本进程不加载模型
+            self.inference_client = RemoteOCRClient(inference_socket)
+            print(f"✓ OCR识别使用推理服务: {inference_socket}")
+        else:
+            # 初始化OCR实例
+            self.initialize_ocr(use_gpu=use_gpu, lang=lang)
     
     def initialize_ocr(self, use_gpu: bool = False, lang: str = "ch") -> None:
         """初始化OCR实例 - 使用用户推荐的PaddleOCR配置"""
@@ -111,24 +156,35 @@ class OCRProcessor:
                 print(f"⚠ 基础配置也失败: {fallback_e}")
                 raise ValueError(f"OCR初始化完全失败: {fallback_e}")
     
+    def _read_frame_image(self, frame_path: str):
+        """读取帧图像（用于记录图像尺寸信息）"""
+        image = frame_store.read_image(frame_path)
+        if image is None:
+            print(f"⚠ 无法读取图像文件: {frame_path}")
+            raise ValueError(f"无法读取图像文件: {frame_path}")
+        
+        image_height, image_width = image.shape[:2]
+        image_channels = image.shape[2] if len(image.shape) > 2 else None
+        print(f"📷 图像信息: {image_width}x{image_height}, 通道数: {image_channels}")
+        return image
+    
+    def _predict_input(self, frame_path: str, image=None):
+        """OCR的输入：单独的图片文件直接传路径，归档中的帧传解码后的图像"""
+        if parse_frame_ref(frame_path) is None:
+            return frame_path
+        return image if image is not None else self._read_frame_image(frame_path)
+    
     def process_frame_ocr(self, frame_path: str, frame_id: int, video_id: int = None, use_gpu: bool = False, lang: str = 'ch', save_raw_result: bool = True) -> dict:
         """对单个帧进行OCR识别"""
         if not self.ocr_instance:
             raise ValueError("OCR实例未初始化")
         
-        if not os.path.exists(frame_path):
+        if not frame_store.exists(frame_path):
             raise ValueError(f"帧图片文件不存在: {frame_path}")
         
         try:
             # 获取图像信息
-            image = cv2.imread(frame_path)
-            if image is None:
-                print(f"⚠ 无法读取图像文件: {frame_path}")
-                raise ValueError(f"无法读取图像文件: {frame_path}")
-            
-            image_height, image_width = image.shape[:2]
-            image_channels = image.shape[2] if len(image.shape) > 2 else None
-            print(f"📷 图像信息: {image_width}x{image_height}, 通道数: {image_channels}")
+            image = self._read_frame_image(frame_path)
             
             # 记录处理开始时间
             start_time = time.time()
@@ -138,189 +194,250 @@ class OCRProcessor:
             
             # 尝试使用新版predict API
             try:
-                result = self.ocr_instance.predict(frame_path)
+                with self._inference_lock:
+                    result = self.ocr_instance.predict(self._predict_input(frame_path, image))
                 print(f"📝 OCR原始结果（新版API）: {result}")
-                
-                # 保存OCR处理后的图片
-                if video_id is not None:
-                    ocr_image_dir = Path(f"{self.ocr_images_path}/video_{video_id}")
-                    ocr_image_dir.mkdir(parents=True, exist_ok=True)
-                    
-                    # 保存OCR结果图片（使用指定格式）
-                    for res in result:
-                        # 直接保存为指定格式的文件名
-                        ocr_image_name = f"frame_{frame_id:06d}_333ms_ocr_res_img.jpg"
-                        ocr_image_path = ocr_image_dir / ocr_image_name
-                        res.save_to_img(save_path=str(ocr_image_path))
-                        print(f"✅ OCR图片已保存: {ocr_image_path}")
-                    
-                    # 保存原始OCR结果到JSON文件（如果需要）
-                    if save_raw_result:
-                        raw_result_dir = Path(f"{self.ocr_results_path}/video_{video_id}")
-                        raw_result_dir.mkdir(parents=True, exist_ok=True)
-                        raw_json_name = f"frame_{frame_id:06d}_333ms_ocr_res.json"
-                        raw_result_path = raw_result_dir / raw_json_name
-                        
-                        # 将原始结果转换为可序列化的格式
-                        raw_data = {
-                            "frame_id": frame_id,
-                            "frame_path": frame_path,
-                            "ocr_version": "PP-OCRv5",
-                            "processing_time": round(time.time() - start_time, 3),
-                            "raw_result": self._serialize_ocr_result(result)
-                        }
-                        
-                        with open(raw_result_path, 'w', encoding='utf-8') as f:
-                            json.dump(raw_data, f, ensure_ascii=False, indent=2, default=str)
-                        print(f"✅ 原始OCR结果已保存: {raw_result_path}")
-                else:
-                    print("⚠ 未提供video_id，跳过OCR图片保存")
-                
-                # 转换新版API结果为旧版格式以保持兼容性
-                result = self._convert_new_api_result_to_old_format(result)
+                result = self._handle_predict_result(result, frame_path, frame_id, video_id, save_raw_result, time.time() - start_time)
                 
             except Exception as new_api_error:
                 print(f"⚠ 新版API失败，尝试旧版API: {new_api_error}")
                 # 回退到旧版API
-                result = self.ocr_instance.ocr(frame_path)
+                with self._inference_lock:
+                    result = self.ocr_instance.ocr(self._predict_input(frame_path, image))
                 print(f"📝 OCR原始结果（旧版API）: {result}")
             
             # 计算处理时间
             processing_time = time.time() - start_time
             
-            # 处理OCR结果 - 增强的JSON结构
-            ocr_data = {
-                "frame_id": frame_id,
-                "frame_path": frame_path,
-                "ocr_version": "PP-OCRv5",
-                "processing_time": round(processing_time, 3),
-                "text_blocks": [],
-                "full_text": "",
-                "total_confidence": 0.0,
-                "text_count": 0,
-                "language": lang,
-                "image_info": {
-                    "width": image_width,
-                    "height": image_height,
-                    "channels": image_channels
-                },
-                "detection_results": [],
-                "recognition_results": []
-            }
-            
-            # 处理不同格式的OCR结果
-            if result:
-                text_blocks = []
-                confidences = []
-                full_text_parts = []
-                detection_results = []
-                recognition_results = []
-                
-                # 检查是否是新版TextRecognition API的结果格式
-                if isinstance(result, list) and len(result) > 0 and isinstance(result[0], dict):
-                    # 新版API格式处理
-                    result_dict = result[0]
-                    if 'rec_texts' in result_dict and 'rec_scores' in result_dict:
-                        rec_texts = result_dict['rec_texts']
-                        rec_scores = result_dict['rec_scores']
-                        
-                        for idx, (text, score) in enumerate(zip(rec_texts, rec_scores)):
-                            if text.strip():  # 只处理非空文本
-                                # 模拟边界框（新版API可能不提供详细坐标）
-                                bbox = [[0, idx*20], [100, idx*20], [100, (idx+1)*20], [0, (idx+1)*20]]
-                                
-                                text_block = {
-                                    "id": idx,
-                                    "text": text,
-                                    "confidence": float(score),
-                                    "bbox": bbox,
-                                    "bbox_normalized": {
-                                        "x1": 0,
-                                        "y1": idx*20,
-                                        "x2": 100,
-                                        "y2": (idx+1)*20
-                                    },
-                                    "text_length": len(text),
-                                    "word_count": len(text.split()) if text.strip() else 0
-                                }
-                                
-                                detection_result = {
-                                    "id": idx,
-                                    "bbox": bbox,
-                                    "confidence": float(score)
-                                }
-                                
-                                recognition_result = {
-                                    "id": idx,
-                                    "text": text,
-                                    "confidence": float(score)
-                                }
-                                
-                                text_blocks.append(text_block)
-                                detection_results.append(detection_result)
-                                recognition_results.append(recognition_result)
-                                confidences.append(float(score))
-                                full_text_parts.append(text)
-                elif isinstance(result, list) and len(result) > 0 and isinstance(result[0], list):
-                     # 旧版API格式处理
-                     for idx, line in enumerate(result[0]):
-                         if len(line) >= 2:
-                             bbox = line[0]  # 边界框坐标
-                             text_info = line[1]  # 文本和置信度
-                             
-                             if isinstance(text_info, (list, tuple)) and len(text_info) >= 2:
-                                 text = text_info[0]
-                                 confidence = float(text_info[1])
-                                 
-                                 # 详细的文本块信息
-                                 text_block = {
-                                     "id": idx,
-                                     "text": text,
-                                     "confidence": confidence,
-                                     "bbox": bbox,
-                                     "bbox_normalized": {
-                                         "x1": min([point[0] for point in bbox]),
-                                         "y1": min([point[1] for point in bbox]),
-                                         "x2": max([point[0] for point in bbox]),
-                                         "y2": max([point[1] for point in bbox])
-                                     },
-                                     "text_length": len(text),
-                                     "word_count": len(text.split()) if text.strip() else 0
-                                 }
-                                 
-                                 # 检测结果
-                                 detection_result = {
-                                     "id": idx,
-                                     "bbox": bbox,
-                                     "confidence": confidence
-                                 }
-                                 
-                                 # 识别结果
-                                 recognition_result = {
-                                     "id": idx,
-                                     "text": text,
-                                     "confidence": confidence,
-                                     "char_confidences": []  # 可以扩展为字符级置信度
-                                 }
-                                 
-                                 text_blocks.append(text_block)
-                                 detection_results.append(detection_result)
-                                 recognition_results.append(recognition_result)
-                                 confidences.append(confidence)
-                                 full_text_parts.append(text)
-                
-                ocr_data["text_blocks"] = text_blocks
-                ocr_data["detection_results"] = detection_results
-                ocr_data["recognition_results"] = recognition_results
-                ocr_data["full_text"] = " ".join(full_text_parts)
-                ocr_data["total_confidence"] = sum(confidences) / len(confidences) if confidences else 0.0
-                ocr_data["text_count"] = len(text_blocks)
-            
-            return ocr_data
+            return self._build_ocr_data(result, frame_path, frame_id, lang, image, processing_time)
             
         except Exception as e:
             raise ValueError(f"OCR处理失败: {str(e)}")
     
+    def process_frames_ocr(self, frames: List[Dict[str, Any]], lang: str = 'ch', save_raw_result: bool = True) -> list:
+        """批量OCR识别：多帧合并为一次predict调用（推理服务的动态批处理使用）
+        
+        frames的每项包含frame_path、frame_id、video_id。返回与frames顺序一致的结果，识别失败的帧对应ValueError。
+        批量predict不可用或失败时逐帧识别
+        """
+        if not self.ocr_instance:
+            raise ValueError("OCR实例未初始化")
+        
+        outputs = None
+        processing_time = 0.0
+        if len(frames) > 1:
+            start_time = time.time()
+            try:
+                inputs = [self._predict_input(frame["frame_path"]) for frame in frames]
+                with self._inference_lock:
+                    outputs = list(self.ocr_instance.predict(inputs))
+                if len(outputs) != len(frames):
+                    print(f"⚠ 批量识别结果数量不一致（{len(outputs)}/{len(frames)}），逐帧识别")
+                    outputs = None
+            except Exception as e:
+                print(f"⚠ 批量识别失败，逐帧识别: {e}")
+                outputs = None
+            # 批量耗时按帧数平均分摊
+            processing_time = (time.time() - start_time) / len(frames)
+        
+        results = []
+        for index, frame in enumerate(frames):
+            try:
+                if outputs is None:
+                    results.append(self.process_frame_ocr(
+                        frame["frame_path"], frame["frame_id"], frame.get("video_id"), lang=lang, save_raw_result=save_raw_result
+                    ))
+                    continue
+                image = self._read_frame_image(frame["frame_path"])
+                result = self._handle_predict_result(
+                    [outputs[index]], frame["frame_path"], frame["frame_id"], frame.get("video_id"), save_raw_result, processing_time
+                )
+                results.append(self._build_ocr_data(result, frame["frame_path"], frame["frame_id"], lang, image, processing_time))
+            except ValueError as e:
+                results.append(e)
+            except Exception as e:
+                results.append(ValueError(f"OCR处理失败: {str(e)}"))
+        return results
+    
+    def _handle_predict_result(self, result, frame_path: str, frame_id: int, video_id: Optional[int], save_raw_result: bool, processing_time: float):
+        """保存新版predict API的结果图片和原始结果，并转换为旧版格式"""
+        # 保存OCR处理后的图片
+        if video_id is not None:
+            ocr_image_dir = Path(f"{self.ocr_images_path}/video_{video_id}")
+            ocr_image_dir.mkdir(parents=True, exist_ok=True)
+            
+            # 保存OCR结果图片（使用指定格式）
+            for res in result:
+                # 直接保存为指定格式的文件名
+                ocr_image_name = f"frame_{frame_id:06d}_333ms_ocr_res_img.jpg"
+                ocr_image_path = ocr_image_dir / ocr_image_name
+                previous_size = os.path.getsize(ocr_image_path) if ocr_image_path.exists() else None
+                res.save_to_img(save_path=str(ocr_image_path))
+                storage_accountant.file_written(ocr_image_path, os.path.getsize(ocr_image_path), previous_size)
+                print(f"✅ OCR图片已保存: {ocr_image_path}")
+            
+            # 保存原始OCR结果到JSON文件（如果需要）
+            if save_raw_result:
+                raw_result_dir = Path(f"{self.ocr_results_path}/video_{video_id}")
+                raw_result_dir.mkdir(parents=True, exist_ok=True)
+                raw_json_name = f"frame_{frame_id:06d}_333ms_ocr_res.json"
+                raw_result_path = raw_result_dir / raw_json_name
+                
+                # 将原始结果转换为可序列化的格式
+                raw_data = {
+                    "frame_id": frame_id,
+                    "frame_path": frame_path,
+                    "ocr_version": "PP-OCRv5",
+                    "processing_time": round(processing_time, 3),
+                    "raw_result": self._serialize_ocr_result(result)
+                }
+                
+                previous_size = os.path.getsize(raw_result_path) if raw_result_path.exists() else None
+                with open(raw_result_path, 'w', encoding='utf-8') as f:
+                    json.dump(raw_data, f, ensure_ascii=False, indent=2, default=str)
+                storage_accountant.file_written(raw_result_path, os.path.getsize(raw_result_path), previous_size)
+                print(f"✅ 原始OCR结果已保存: {raw_result_path}")
+        else:
+            print("⚠ 未提供video_id，跳过OCR图片保存")
+        
+        # 转换新版API结果为旧版格式以保持兼容性
+        return self._convert_new_api_result_to_old_format(result)
+    
+    def _build_ocr_data(self, result, frame_path: str, frame_id: int, lang: str, image, processing_time: float) -> dict:
+        """由旧版格式的OCR结果构造增强的JSON结构"""
+        image_height, image_width = image.shape[:2]
+        image_channels = image.shape[2] if len(image.shape) > 2 else None
+        
+        # 处理OCR结果 - 增强的JSON结构
+        ocr_data = {
+            "frame_id": frame_id,
+            "frame_path": frame_path,
+            "ocr_version": "PP-OCRv5",
+            "processing_time": round(processing_time, 3),
+            "text_blocks": [],
+            "full_text": "",
+            "total_confidence": 0.0,
+            "text_count": 0,
+            "language": lang,
+            "image_info": {
+                "width": image_width,
+                "height": image_height,
+                "channels": image_channels
+            },
+            "detection_results": [],
+            "recognition_results": []
+        }
+        
+        # 处理不同格式的OCR结果
+        if result:
+            text_blocks = []
+            confidences = []
+            full_text_parts = []
+            detection_results = []
+            recognition_results = []
+            
+            # 检查是否是新版TextRecognition API的结果格式
+            if isinstance(result, list) and len(result) > 0 and isinstance(result[0], dict):
+                # 新版API格式处理
+                result_dict = result[0]
+                if 'rec_texts' in result_dict and 'rec_scores' in result_dict:
+                    rec_texts = result_dict['rec_texts']
+                    rec_scores = result_dict['rec_scores']
+                    
+                    for idx, (text, score) in enumerate(zip(rec_texts, rec_scores)):
+                        if text.strip():  # 只处理非空文本
+                            # 模拟边界框（新版API可能不提供详细坐标）
+                            bbox = [[0, idx*20], [100, idx*20], [100, (idx+1)*20], [0, (idx+1)*20]]
+                            
+                            text_block = {
+                                "id": idx,
+                                "text": text,
+                                "confidence": float(score),
+                                "bbox": bbox,
+                                "bbox_normalized": {
+                                    "x1": 0,
+                                    "y1": idx*20,
+                                    "x2": 100,
+                                    "y2": (idx+1)*20
+                                },
+                                "text_length": len(text),
+                                "word_count": len(text.split()) if text.strip() else 0
+                            }
+                            
+                            detection_result = {
+                                "id": idx,
+                                "bbox": bbox,
+                                "confidence": float(score)
+                            }
+                            
+                            recognition_result = {
+                                "id": idx,
+                                "text": text,
+                                "confidence": float(score)
+                            }
+                            
+                            text_blocks.append(text_block)
+                            detection_results.append(detection_result)
+                            recognition_results.append(recognition_result)
+                            confidences.append(float(score))
+                            full_text_parts.append(text)
+            elif isinstance(result, list) and len(result) > 0 and isinstance(result[0], list):
+                 # 旧版API格式处理
+                 for idx, line in enumerate(result[0]):
+                     if len(line) >= 2:
+                         bbox = line[0]  # 边界框坐标
+                         text_info = line[1]  # 文本和置信度
+                         
+                         if isinstance(text_info, (list, tuple)) and len(text_info) >= 2:
+                             text = text_info[0]
+                             confidence = float(text_info[1])
+                             
+                             # 详细的文本块信息
+                             text_block = {
+                                 "id": idx,
+                                 "text": text,
+                                 "confidence": confidence,
+                                 "bbox": bbox,
+                                 "bbox_normalized": {
+                                     "x1": min([point[0] for point in bbox]),
+                                     "y1": min([point[1] for point in bbox]),
+                                     "x2": max([point[0] for point in bbox]),
+                                     "y2": max([point[1] for point in bbox])
+                                 },
+                                 "text_length": len(text),
+                                 "word_count": len(text.split()) if text.strip() else 0
+                             }
+                             
+                             # 检测结果
+                             detection_result = {
+                                 "id": idx,
+                                 "bbox": bbox,
+                                 "confidence": confidence
+                             }
+                             
+                             # 识别结果
+                             recognition_result = {
+                                 "id": idx,
+                                 "text": text,
+                                 "confidence": confidence,
+                                 "char_confidences": []  # 可以扩展为字符级置信度
+                             }
+                             
+                             text_blocks.append(text_block)
+                             detection_results.append(detection_result)
+                             recognition_results.append(recognition_result)
+                             confidences.append(confidence)
+                             full_text_parts.append(text)
+            
+            ocr_data["text_blocks"] = text_blocks
+            ocr_data["detection_results"] = detection_results
+            ocr_data["recognition_results"] = recognition_results
+            ocr_data["full_text"] = " ".join(full_text_parts)
+            ocr_data["total_confidence"] = sum(confidences) / len(confidences) if confidences else 0.0
+            ocr_data["text_count"] = len(text_blocks)
+        
+        return ocr_data
+    
     def _convert_new_api_result_to_old_format(self, output):
         """转换新版predict API结果为旧版ocr格式"""
         try:
@@ -394,8 +511,10 @@ class OCRProcessor:
         ocr_output_dir.mkdir(parents=True, exist_ok=True)
         
         ocr_json_path = ocr_output_dir / f"frame_{frame_number}_ocr.json"
+        previous_size = os.path.getsize(ocr_json_path) if ocr_json_path.exists() else None
         with open(ocr_json_path, 'w', encoding='utf-8') as f:
             json.dump(ocr_data, f, ensure_ascii=False, indent=2)
+        storage_accountant.file_written(ocr_json_path, os.path.getsize(ocr_json_path), previous_size)
         
         return str(ocr_json_path)
     
@@ -406,11 +525,20 @@ class OCRProcessor:
         if not video:
             raise HTTPException(status_code=404, detail="视频不存在")
         
-        # 获取视频的所有帧
-        frames = db.query(VideoFrame).filter(VideoFrame.video_id == video_id).order_by(VideoFrame.frame_number).all()
+        # 获取视频的所有帧（按时间顺序，便于流式阶段分析）
+        frames = db.query(VideoFrame).filter(VideoFrame.video_id == video_id).order_by(VideoFrame.timestamp_ms).all()
         if not frames:
             raise HTTPException(status_code=404, detail="视频帧不存在，请先进行分帧处理")
         
+        # 启动流式阶段分析，OCR过程中即可查询阶段耗时
+        stage_stream = stage_stream_manager.start(video_id, db, total_frames=len(frames))
+        progress = progress_manager.start(video_id, "ocr", total=len(frames))
+        
+        # 使用推理服务时同时提交多帧，推理服务可将其合并成批；结果仍按时间顺序处理，阶段分析照常增量更新
+        engine = self.inference_client or self
+        max_inflight = self.inference_client.max_inflight_frames if self.inference_client else 1
+        ocr_tasks = {}
+        
         try:
             # 更新视频状态为处理中
             video.process_status = ProcessStatus.processing
@@ -419,20 +547,51 @@ class OCRProcessor:
             processed_frames = 0
             failed_frames = 0
             ocr_results = []
+            pending_writes = []
+            skipped_frames = 0
+            
+            # 已经处理过OCR的帧
+            existing_results = {
+                row.frame_id: row for row in db.query(OCRResult).join(VideoFrame, OCRResult.frame_id == VideoFrame.id).filter(
+                    VideoFrame.video_id == video_id
+                )
+            }
+            upcoming_frames = iter([frame for frame in frames if frame.id not in existing_results])
+            
+            def submit_frames():
+                """补足同时识别的帧，最多max_inflight帧（本地识别为1，推理服务为max_inflight_frames）
+                
+                每帧的识别作为后台任务提交，不在这里等待：本地识别在线程池中调用PaddleOCR，
+                使用推理服务时在线程池中通过Unix socket请求推理服务（由推理服务合并成批），都不阻塞事件循环
+                """
+                while len(ocr_tasks) < max_inflight:
+                    next_frame = next(upcoming_frames, None)
+                    if next_frame is None:
+                        return
+                    ocr_tasks[next_frame.id] = asyncio.ensure_future(run_in_threadpool(
+                        engine.process_frame_ocr, next_frame.frame_path, next_frame.id, video_id, request.use_gpu, request.lang,
+                        save_raw_result=True
+                    ))
             
             for frame in frames:
                 try:
                     print(f"🎬 处理帧: {frame.id}, 路径: {frame.frame_path}")
                     
                     # 检查是否已经处理过OCR
-                    existing_ocr = db.query(OCRResult).filter(OCRResult.frame_id == frame.id).first()
+                    existing_ocr = existing_results.get(frame.id)
                     if existing_ocr:
                         print(f"⏭ 跳过已处理的帧: {frame.id}")
+                        skipped_frames += 1
+                        if stage_stream:
+                            stage_stream.feed(frame, existing_ocr, text_line_rows_from_result(
+                                frame.id, video_id, existing_ocr.text_content, existing_ocr.bbox, existing_ocr.confidence
+                            ))
                         continue
                     
                     # 处理OCR
                     print(f"🔍 开始处理帧 {frame.id} 的OCR")
-                    ocr_data = self.process_frame_ocr(frame.frame_path, frame.id, video_id, request.use_gpu, request.lang, save_raw_result=True)
+                    submit_frames()
+                    ocr_data = await ocr_tasks.pop(frame.id)
                     print(f"✅ 帧 {frame.id} OCR处理完成，文本数量: {ocr_data.get('text_count', 0)}")
                     
                     # 从JSON文件中提取rec_texts数组
@@ -460,17 +619,23 @@ class OCRProcessor:
                     if not rec_texts:
                         rec_texts = [block.get('text', '') for block in ocr_data.get('text_blocks', [])]
                     
-                    # 保存OCR结果到数据库
-                    db_ocr = OCRResult(
-                        frame_id=frame.id,
-                        text_content=json.dumps(rec_texts, ensure_ascii=False),  # 存储rec_texts数组
-                        confidence=ocr_data["total_confidence"],
-                        bbox=json.dumps(ocr_data["text_blocks"], ensure_ascii=False)
-                    )
-                    
-                    db.add(db_ocr)
+                    # 保存OCR结果到数据库（通过写线程队列，与其他写任务合并提交）
+                    ocr_row = {
+                        "frame_id": frame.id,
+                        "text_content": json.dumps(rec_texts, ensure_ascii=False),  # 存储rec_texts数组
+                        "confidence": ocr_data["total_confidence"],
+                        "bbox": json.dumps(ocr_data["text_blocks"], ensure_ascii=False)
+                    }
+                    line_rows = build_text_line_rows(frame.id, video_id, ocr_data["text_blocks"])
+                    pending_writes.append((frame.id, db_writer.submit(
+                        partial(_save_frame_ocr, video_id=video_id, ocr_row=ocr_row, line_rows=line_rows)
+                    )))
                     processed_frames += 1
                     
+                    # 增量更新阶段分析（置信度按数据库列精度取整）
+                    if stage_stream:
+                        stage_stream.feed(frame, _OCRRow(ocr_row["text_content"], round(ocr_data["total_confidence"], 4)), line_rows)
+                    
                     # 注释掉普通格式JSON的保存，只保留raw格式
                     # self.save_ocr_result_to_file(video_id, frame.frame_number, ocr_data)
                     
@@ -486,14 +651,34 @@ class OCRProcessor:
                 except Exception as e:
                     failed_frames += 1
                     print(f"处理帧 {frame.id} OCR失败: {e}")
+                finally:
+                    progress.update(completed=processed_frames + skipped_frames, failed=failed_frames,
+                                    frames_ocr=processed_frames, frames_skipped=skipped_frames)
             
-            # 批量提交数据库更改
-            db.commit()
+            # 等待写队列提交本任务的OCR结果
+            for frame_id, pending_write in pending_writes:
+                try:
+                    await asyncio.wrap_future(pending_write)
+                except Exception as e:
+                    processed_frames -= 1
+                    failed_frames += 1
+                    print(f"保存帧 {frame_id} OCR结果失败: {e}")
+            
+            # 跳过的帧可能是文本行表建立之前处理的，补全其文本行
+            if skipped_frames:
+                backfill_text_lines(db, video_id)
             
             # 更新视频状态为完成
             video.process_status = ProcessStatus.completed
             db.commit()
             
+            if stage_stream:
+                stage_stream_manager.complete(stage_stream)
+                # 保存阶段结果并更新项目耗时汇总
+                stage_rollup_manager.record_video_results(video_id, stage_stream.build_response()["stage_results"], db)
+            progress.update(completed=processed_frames + skipped_frames, failed=failed_frames, frames_ocr=processed_frames)
+            progress.finish()
+            
             return {
                 "message": "OCR处理完成",
                 "video_id": video_id,
@@ -505,6 +690,10 @@ class OCRProcessor:
             
         except Exception as e:
             # 更新视频状态为失败
+            for task in ocr_tasks.values():
+                task.cancel()
+            stage_stream_manager.discard(video_id)
+            progress.finish(error=str(e))
             video.process_status = ProcessStatus.failed
             db.commit()
             raise HTTPException(status_code=500, detail=f"OCR处理失败: {str(e)}")
@@ -525,8 +714,32 @@ class OCRProcessor:
         
         return ocr_results
     
-    def get_enhanced_ocr_results(self, video_id: int) -> List[EnhancedOCRResultResponse]:
-        """获取增强的OCR结果（从JSON文件读取）"""
+    async def get_video_ocr_results_page(self, video_id: int, db, from_ms: Optional[int] = None, to_ms: Optional[int] = None,
+                                         cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_LIMIT,
+                                         fields: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+        """按帧时间顺序分页获取OCR结果，可限定时间窗口[from_ms, to_ms)并只返回指定字段（db为异步会话）"""
+        video = (await db.execute(select(Video.id).where(Video.id == video_id))).first()
+        if not video:
+            raise HTTPException(status_code=404, detail="视频不存在")
+        
+        page = await fetch_timeline_page(
+            db,
+            OCR_PAGE_FIELDS,
+            parse_fields(fields, OCR_PAGE_FIELDS, DEFAULT_OCR_PAGE_FIELDS),
+            filters=[VideoFrame.video_id == video_id],
+            order_columns=[VideoFrame.timestamp_ms, VideoFrame.id, OCRResult.id],
+            select_from=OCRResult,
+            joins=[(VideoFrame, OCRResult.frame_id == VideoFrame.id)],
+            from_ms=from_ms,
+            to_ms=to_ms,
+            cursor=cursor,
+            limit=limit,
+            include_total=include_total
+        )
+        return {"video_id": video_id, **page}
+    
+    def get_enhanced_ocr_result_rows(self, video_id: int) -> List[Dict[str, Any]]:
+        """获取增强的OCR结果（从JSON文件读取），直接返回与EnhancedOCRResultResponse字段相同的字典，不逐条构造模型"""
         try:
             enhanced_results = []
             video_ocr_dir = os.path.join("data", "ocr_results", f"video_{video_id}")
@@ -541,54 +754,52 @@ class OCRProcessor:
                 if filename.endswith("_ocr_res.json"):
                     file_path = os.path.join(video_ocr_dir, filename)
                     try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            ocr_data = json.load(f)
-                            
-                            # 手动构建EnhancedOCRResultResponse对象
-                            enhanced_result = EnhancedOCRResultResponse(
-                                frame_id=ocr_data.get('frame_id', 0),
-                                frame_path=ocr_data.get('frame_path', ''),
-                                ocr_version=ocr_data.get('ocr_version', 'PP-OCRv5'),
-                                processing_time=ocr_data.get('processing_time', 0.0),
-                                text_blocks=[],  # 简化处理
-                                full_text='',  # 从raw_result中提取
-                                total_confidence=0.0,  # 从raw_result中计算
-                                text_count=0,  # 从raw_result中计算
-                                language='zh',  # 默认中文
-                                image_info={},  # 简化处理
-                                detection_results=[],  # 简化处理
-                                recognition_results=[],  # 简化处理
-                                raw_result=ocr_data.get('raw_result', [])
-                            )
-                            
-                            # 从raw_result中提取rec_texts
-                            raw_result = ocr_data.get('raw_result', [])
-                            all_texts = []
-                            for result in raw_result:
-                                if isinstance(result, dict) and 'json' in result:
-                                    json_data = result['json']
-                                    if isinstance(json_data, dict) and 'res' in json_data:
-                                        res_data = json_data['res']
-                                        if isinstance(res_data, dict) and 'rec_texts' in res_data:
-                                            all_texts.extend(res_data['rec_texts'])
-                            
-                            enhanced_result.full_text = ' '.join(all_texts)
-                            enhanced_result.text_count = len(all_texts)
-                            
-                            enhanced_results.append(enhanced_result)
+                        with open(file_path, 'rb') as f:
+                            ocr_data = loads(f.read())
+                        
+                        # 从raw_result中提取rec_texts
+                        raw_result = ocr_data.get('raw_result', [])
+                        all_texts = []
+                        for result in raw_result:
+                            if isinstance(result, dict) and 'json' in result:
+                                json_data = result['json']
+                                if isinstance(json_data, dict) and 'res' in json_data:
+                                    res_data = json_data['res']
+                                    if isinstance(res_data, dict) and 'rec_texts' in res_data:
+                                        all_texts.extend(res_data['rec_texts'])
+                        
+                        enhanced_results.append({
+                            "frame_id": ocr_data.get('frame_id', 0),
+                            "frame_path": ocr_data.get('frame_path', ''),
+                            "ocr_version": ocr_data.get('ocr_version', 'PP-OCRv5'),
+                            "processing_time": ocr_data.get('processing_time', 0.0),
+                            "text_blocks": [],  # 简化处理
+                            "full_text": ' '.join(all_texts),
+                            "total_confidence": 0.0,  # 从raw_result中计算
+                            "text_count": len(all_texts),
+                            "language": 'zh',  # 默认中文
+                            "image_info": {},  # 简化处理
+                            "detection_results": [],  # 简化处理
+                            "recognition_results": [],  # 简化处理
+                            "raw_result": raw_result
+                        })
                             
                     except Exception as e:
                         print(f"读取OCR结果文件失败 {filename}: {e}")
                         continue
             
             # 按frame_id排序
-            enhanced_results.sort(key=lambda x: x.frame_id)
+            enhanced_results.sort(key=lambda x: x["frame_id"])
             return enhanced_results
             
         except Exception as e:
             print(f"获取增强OCR结果失败: {e}")
             raise HTTPException(status_code=500, detail="获取增强OCR结果失败")
     
+    def get_enhanced_ocr_results(self, video_id: int) -> List[EnhancedOCRResultResponse]:
+        """获取增强的OCR结果（从JSON文件读取）"""
+        return [EnhancedOCRResultResponse(**row) for row in self.get_enhanced_ocr_result_rows(video_id)]
+    
     def get_frame_ocr_result(self, frame_id: int, db: Session) -> OCRResult:
         """获取指定帧的OCR结果"""
         ocr_result = db.query(OCRResult).filter(OCRResult.frame_id == frame_id).first()
@@ -791,59 +1002,6 @@ class OCRProcessor:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"关键词分析失败: {str(e)}")
     
-    def delete_video_ocr_results(self, video_id: int, db: Session) -> dict:
-        """删除视频的所有OCR结果（数据库记录和JSON文件）"""
-        try:
-            # 检查视频是否存在
-            video = db.query(Video).filter(Video.id == video_id).first()
-            if not video:
-                raise HTTPException(status_code=404, detail="视频不存在")
-            
-            # 获取视频的所有帧
-            frames = db.query(VideoFrame).filter(VideoFrame.video_id == video_id).all()
-            
-            deleted_db_records = 0
-            deleted_json_files = 0
-            
-            # 删除数据库中的OCR记录
-            for frame in frames:
-                ocr_results = db.query(OCRResult).filter(OCRResult.frame_id == frame.id).all()
-                for ocr_result in ocr_results:
-                    db.delete(ocr_result)
-                    deleted_db_records += 1
-            
-            # 提交数据库更改
-            db.commit()
-            
-            # 删除JSON文件
-            ocr_output_dir = Path(f"{self.ocr_results_path}/video_{video_id}")
-            if ocr_output_dir.exists():
-                import shutil
-                for json_file in ocr_output_dir.glob("*.json"):
-                    try:
-                        json_file.unlink()
-                        deleted_json_files += 1
-                    except Exception as e:
-                        print(f"删除JSON文件失败: {json_file}, 错误: {e}")
-                
-                # 如果目录为空，删除目录
-                try:
-                    if not any(ocr_output_dir.iterdir()):
-                        ocr_output_dir.rmdir()
-                except Exception as e:
-                    print(f"删除目录失败: {ocr_output_dir}, 错误: {e}")
-            
-            return {
-                "message": "OCR结果删除成功",
-                "video_id": video_id,
-                "deleted_db_records": deleted_db_records,
-                "deleted_json_files": deleted_json_files
-            }
-            
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=500, detail=f"删除OCR结果失败: {str(e)}")
-    
     def get_ocr_storage_info(self, video_id: int, db: Session) -> dict:
         """获取OCR结果的存储信息"""
         try:
@@ -852,33 +1010,25 @@ class OCRProcessor:
             if not video:
                 raise HTTPException(status_code=404, detail="视频不存在")
             
-            # 统计数据库中的OCR记录
-            frames = db.query(VideoFrame).filter(VideoFrame.video_id == video_id).all()
-            total_frames = len(frames)
-            
-            db_ocr_count = 0
-            for frame in frames:
-                ocr_count = db.query(OCRResult).filter(OCRResult.frame_id == frame.id).count()
-                db_ocr_count += ocr_count
+            # 统计数据库中的帧数和OCR记录数
+            total_frames = db.query(func.count(VideoFrame.id)).filter(VideoFrame.video_id == video_id).scalar()
+            db_ocr_count = db.query(func.count(OCRResult.id)).join(
+                VideoFrame, OCRResult.frame_id == VideoFrame.id
+            ).filter(VideoFrame.video_id == video_id).scalar()
             
-            # 检查JSON文件存储
+            # OCR结果文件和图片的数量读取存储用量计数
             ocr_output_dir = Path(f"{self.ocr_results_path}/video_{video_id}")
-            json_files_count = 0
-            if ocr_output_dir.exists():
-                json_files_count = len(list(ocr_output_dir.glob("*.json")))
-            
-            # 检查OCR图片存储
             ocr_image_dir = Path(f"{self.ocr_images_path}/video_{video_id}")
-            image_files_count = 0
-            if ocr_image_dir.exists():
-                image_files_count = len(list(ocr_image_dir.glob("*.jpg")))
+            usage = storage_accountant.get_video_usage(video_id, db)["categories"]
             
             return {
                 "video_id": video_id,
                 "total_frames": total_frames,
                 "database_ocr_records": db_ocr_count,
-                "json_files_count": json_files_count,
-                "ocr_images_count": image_files_count,
+                "json_files_count": usage["ocr_results"]["file_count"],
+                "ocr_images_count": usage["ocr_images"]["file_count"],
+                "ocr_results_bytes": usage["ocr_results"]["total_bytes"],
+                "ocr_images_bytes": usage["ocr_images"]["total_bytes"],
                 "storage_paths": {
                     "ocr_results": str(ocr_output_dir),
                     "ocr_images": str(ocr_image_dir)
@@ -939,7 +1089,7 @@ class OCRProcessor:
             if ocr_image_dir.exists():
                 for image_file in ocr_image_dir.glob("*.jpg"):
                     try:
-                        image_file.unlink()
+                        storage_accountant.remove_file(image_file)
                         deleted_files += 1
                     except Exception as e:
                         print(f"删除OCR图片失败: {image_file}, 错误: {e}")
@@ -963,11 +1113,22 @@ class OCRProcessor:
     def view_video_ocr_results(self, video_id: int, db: Session) -> dict:
         """查看视频的OCR结果（包含数据库和JSON文件信息）"""
         try:
-            # 获取数据库中的OCR结果
-            db_results = self.get_video_ocr_results(video_id, db)
+            # 获取数据库中的OCR结果（只查询需要的列，不构造ORM对象）
+            if db.query(Video.id).filter(Video.id == video_id).first() is None:
+                raise HTTPException(status_code=404, detail="视频不存在")
+            db_results = db.execute(
+                select(
+                    OCRResult.id, OCRResult.frame_id, OCRResult.text_content, OCRResult.confidence,
+                    OCRResult.bbox, OCRResult.processed_at
+                ).join(
+                    VideoFrame, OCRResult.frame_id == VideoFrame.id
+                ).where(
+                    VideoFrame.video_id == video_id
+                ).order_by(VideoFrame.timestamp_ms)
+            ).all()
             
             # 获取JSON文件中的增强OCR结果
-            json_results = self.get_enhanced_ocr_results(video_id)
+            json_results = self.get_enhanced_ocr_result_rows(video_id)
             
             # 统计信息
             stats = {
@@ -989,15 +1150,17 @@ class OCRProcessor:
                     "processed_at": result.processed_at.isoformat() if result.processed_at else None
                 } for result in db_results],
                 "json_results": [{
-                    "frame_id": result.frame_id,
-                    "frame_path": result.frame_path,
-                    "ocr_version": result.ocr_version,
-                    "processing_time": result.processing_time,
-                    "text_blocks_count": len(result.text_blocks) if result.text_blocks else 0,
-                    "has_raw_result": result.raw_result is not None
+                    "frame_id": result["frame_id"],
+                    "frame_path": result["frame_path"],
+                    "ocr_version": result["ocr_version"],
+                    "processing_time": result["processing_time"],
+                    "text_blocks_count": len(result["text_blocks"]) if result["text_blocks"] else 0,
+                    "has_raw_result": result["raw_result"] is not None
                 } for result in json_results]
             }
             
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"查看OCR结果失败: {e}")
             raise HTTPException(status_code=500, detail=f"查看OCR结果失败: {str(e)}")
@@ -1006,12 +1169,12 @@ class OCRProcessor:
         """解析数据库中存储的text_content字段"""
         try:
             # 尝试解析为JSON数组（新格式）
-            parsed = json.loads(text_content)
+            parsed = loads(text_content)
             if isinstance(parsed, list):
                 return parsed  # 返回rec_texts数组
             else:
                 return text_content  # 返回原始字符串
-        except (json.JSONDecodeError, TypeError):
+        except (ValueError, TypeError):
             # 如果解析失败，返回原始字符串
             return text_content
     
@@ -1023,7 +1186,7 @@ class OCRProcessor:
             if not ocr_image_path.exists():
                 raise HTTPException(status_code=404, detail="OCR图片不存在")
             
-            ocr_image_path.unlink()
+            storage_accountant.remove_file(ocr_image_path)
             
             return {
                 "message": "OCR图片删除成功",
@@ -1037,4 +1200,4 @@ class OCRProcessor:
 
 
 # 创建全局OCR处理器实例
-ocr_processor = OCRProcessor()
\ No newline at end of file
+ocr_processor = OCRProcessor(inference_socket=settings.ocr_inference_socket)
\ No newline at end of file
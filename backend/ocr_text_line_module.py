@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+OCR文本行模块
+将每帧的OCR文本块拆分为ocr_text_lines表中的行记录（每行独立的置信度和文本框），
+关键词查询直接在文本行上以集合方式执行，置信度阈值作用于单行而不是整帧平均值
+"""
+
+from sqlalchemy import func, exists
+from sqlalchemy.orm import Session
+from models_simple import VideoFrame, OCRResult, OCRTextLine
+from typing import List, Dict, Any, Optional, Set
+import json
+
+
+# 归一化文本的最大长度（与text_norm列长度一致）
+TEXT_NORM_MAX_LENGTH = 500
+# 批量写入时每批的行数
+BULK_INSERT_BATCH_SIZE = 1000
+
+
+def normalize_text(text: str) -> str:
+    """文本归一化：去除首尾空白并转小写"""
+    return text.strip().lower()[:TEXT_NORM_MAX_LENGTH]
+
+
+def build_text_line_rows(frame_id: int, video_id: int, text_blocks: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """将OCR文本块转换为文本行记录（空文本跳过）"""
+    rows = []
+    for idx, block in enumerate(text_blocks or []):
+        text = block.get("text") or ""
+        if not text.strip():
+            continue
+        score = block.get("confidence")
+        rows.append({
+            "frame_id": frame_id,
+            "video_id": video_id,
+            "line_idx": block.get("id", idx),
+            "text": text,
+            "text_norm": normalize_text(text),
+            "score": round(float(score), 4) if score is not None else None,
+            "box": block.get("bbox")
+        })
+    return rows
+
+
+def bulk_insert_text_lines(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """批量写入文本行（executemany），不提交事务"""
+    for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+        db.execute(OCRTextLine.__table__.insert(), rows[start:start + BULK_INSERT_BATCH_SIZE])
+    return len(rows)
+
+
+def has_text_lines(db: Session, video_id: int) -> bool:
+    """判断视频是否已有文本行记录"""
+    return db.query(OCRTextLine.id).filter(OCRTextLine.video_id == video_id).first() is not None
+
+
+def videos_with_text_lines(db: Session, video_ids: List[int]) -> Set[int]:
+    """返回一组视频中已有文本行记录的视频ID"""
+    if not video_ids:
+        return set()
+    rows = db.query(OCRTextLine.video_id).filter(OCRTextLine.video_id.in_(video_ids)).distinct()
+    return {row.video_id for row in rows}
+
+
+def _legacy_text_blocks(text_content: Optional[str], bbox: Any, confidence: Optional[float]) -> List[Dict[str, Any]]:
+    """从旧的ocr_results记录中还原文本块"""
+    if isinstance(bbox, str):
+        try:
+            bbox = json.loads(bbox)
+        except json.JSONDecodeError:
+            bbox = None
+    if isinstance(bbox, list) and bbox and all(isinstance(block, dict) for block in bbox):
+        return bbox
+    
+    # 没有文本块信息时按text_content拆分，每行使用整帧置信度
+    texts = []
+    if text_content:
+        try:
+            parsed = json.loads(text_content)
+            texts = parsed if isinstance(parsed, list) else [str(parsed)]
+        except json.JSONDecodeError:
+            texts = [text_content]
+    return [
+        {"id": idx, "text": text, "confidence": float(confidence) if confidence is not None else None}
+        for idx, text in enumerate(texts) if isinstance(text, str)
+    ]
+
+
+def text_line_rows_from_result(frame_id: int, video_id: int, text_content: Optional[str], bbox: Any,
+                               confidence: Optional[float]) -> List[Dict[str, Any]]:
+    """由ocr_results记录还原文本行记录（与补全迁移写入的文本行相同）"""
+    return build_text_line_rows(frame_id, video_id, _legacy_text_blocks(text_content, bbox, confidence))
+
+
+def backfill_text_lines(db: Session, video_id: Optional[int] = None) -> int:
+    """根据ocr_results中已有的记录补全缺失的文本行（用于迁移旧数据），返回写入的行数"""
+    query = db.query(
+        OCRResult.frame_id,
+        VideoFrame.video_id,
+        OCRResult.text_content,
+        OCRResult.confidence,
+        OCRResult.bbox
+    ).join(
+        VideoFrame, OCRResult.frame_id == VideoFrame.id
+    ).filter(
+        ~exists().where(OCRTextLine.frame_id == OCRResult.frame_id)
+    )
+    if video_id is not None:
+        query = query.filter(VideoFrame.video_id == video_id)
+    
+    # 先读出全部待迁移记录，避免边读边写同一张表
+    pending = []
+    for row in query.all():
+        pending.extend(text_line_rows_from_result(row.frame_id, row.video_id, row.text_content, row.bbox, row.confidence))
+    
+    inserted = bulk_insert_text_lines(db, pending)
+    db.commit()
+    return inserted
+
+
+def query_keyword_line_matches(db: Session, video_id: int, keyword: str, case_sensitive: bool = False,
+                               exact_match: bool = False, min_score: float = 0.0) -> Dict[int, float]:
+    """查询视频中匹配关键词且置信度达标的文本行，返回 {frame_id: 匹配行的最高置信度}"""
+    keyword_norm = normalize_text(keyword) if exact_match else keyword.lower()
+    if exact_match:
+        text_filter = OCRTextLine.text_norm == keyword_norm
+    else:
+        text_filter = OCRTextLine.text_norm.contains(keyword_norm, autoescape=True)
+    
+    filters = [OCRTextLine.video_id == video_id, text_filter]
+    if min_score > 0:
+        filters.append(OCRTextLine.score >= min_score)
+    
+    if not case_sensitive:
+        rows = db.query(
+            OCRTextLine.frame_id, func.max(OCRTextLine.score)
+        ).filter(*filters).group_by(OCRTextLine.frame_id).all()
+        return {frame_id: float(score) if score is not None else 0.0 for frame_id, score in rows}
+    
+    # 区分大小写时先用归一化文本筛选候选行，再按原文精确判断
+    matches = {}
+    for frame_id, text, score in db.query(OCRTextLine.frame_id, OCRTextLine.text, OCRTextLine.score).filter(*filters):
+        matched = text.strip() == keyword if exact_match else keyword in text
+        if not matched:
+            continue
+        score = float(score) if score is not None else 0.0
+        if score > matches.get(frame_id, -1.0):
+            matches[frame_id] = score
+    return matches
+
+
+def match_text_lines(lines: List[Dict[str, Any]], keyword: str, case_sensitive: bool = False,
+                     exact_match: bool = False, min_score: float = 0.0) -> Optional[float]:
+    """在一帧的文本行记录中匹配关键词（规则与query_keyword_line_matches相同），返回匹配行的最高置信度，未匹配时返回None
+    
+    用于尚未写入数据库的文本行，如OCR过程中的流式阶段分析
+    """
+    keyword_norm = normalize_text(keyword) if exact_match else keyword.lower()
+    best = None
+    for line in lines:
+        if exact_match:
+            matched = line["text_norm"] == keyword_norm and (not case_sensitive or line["text"].strip() == keyword)
+        else:
+            matched = keyword_norm in line["text_norm"] and (not case_sensitive or keyword in line["text"])
+        score = line["score"]
+        if not matched or (min_score > 0 and (score is None or score < min_score)):
+            continue
+        score = float(score) if score is not None else 0.0
+        if best is None or score > best:
+            best = score
+    return best
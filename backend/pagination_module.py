@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+时间轴分页模块
+按(video_id, timestamp_ms)索引对帧、OCR结果等按时间排序的列表做键集分页：
+游标记录上一页最后一行的排序键，下一页从该位置之后继续读取，翻页开销与页码无关；
+支持按时间窗口[from_ms, to_ms)筛选，以及只返回指定字段
+"""
+
+from fastapi import HTTPException
+from sqlalchemy import select, func, tuple_
+from decimal import Decimal
+from typing import List, Dict, Any, Optional
+import base64
+import json
+
+
+DEFAULT_PAGE_LIMIT = 200
+MAX_PAGE_LIMIT = 1000
+
+
+def encode_cursor(position: List[Any]) -> str:
+    """将排序键编码为游标"""
+    raw = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str, length: int) -> List[int]:
+    """解码游标，无效时返回400"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        if not isinstance(position, list) or len(position) != length:
+            raise ValueError(cursor)
+        return [int(value) for value in position]
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def parse_fields(fields: Optional[str], allowed: Dict[str, Any], default: List[str]) -> List[str]:
+    """解析逗号分隔的字段列表，未指定时返回默认字段"""
+    if not fields:
+        return list(default)
+    selected = []
+    for field in fields.split(","):
+        field = field.strip()
+        if not field:
+            continue
+        if field not in allowed:
+            raise HTTPException(status_code=400, detail=f"不支持的字段: {field}，可选字段: {', '.join(allowed)}")
+        if field not in selected:
+            selected.append(field)
+    return selected or list(default)
+
+
+async def fetch_timeline_page(db, columns: Dict[str, Any], fields: List[str], filters: list, order_columns: list,
+                              select_from=None, joins: Optional[list] = None, from_ms: Optional[int] = None,
+                              to_ms: Optional[int] = None, cursor: Optional[str] = None,
+                              limit: int = DEFAULT_PAGE_LIMIT, include_total: bool = False) -> Dict[str, Any]:
+    """读取一页按时间排序的记录
+    
+    order_columns的第一列为时间戳列，其余列用于时间戳相同时确定唯一顺序；
+    db为async_db_module提供的异步会话
+    """
+    if limit < 1 or limit > MAX_PAGE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit取值范围为1-{MAX_PAGE_LIMIT}")
+    if from_ms is not None and to_ms is not None and from_ms > to_ms:
+        raise HTTPException(status_code=400, detail="from_ms不能大于to_ms")
+    
+    timestamp_column = order_columns[0]
+    window_filters = list(filters)
+    if from_ms is not None:
+        window_filters.append(timestamp_column >= from_ms)
+    if to_ms is not None:
+        window_filters.append(timestamp_column < to_ms)
+    
+    page_filters = list(window_filters)
+    if cursor:
+        position = decode_cursor(cursor, len(order_columns))
+        # 时间戳条件可直接走索引范围扫描，行值比较处理时间戳相同的记录
+        page_filters.append(timestamp_column >= position[0])
+        page_filters.append(tuple_(*order_columns) > tuple_(*position))
+    
+    def apply_from(statement):
+        if select_from is not None:
+            statement = statement.select_from(select_from)
+        for target, onclause in joins or []:
+            statement = statement.join(target, onclause)
+        return statement
+    
+    key_labels = [f"_key{i}" for i in range(len(order_columns))]
+    statement = select(
+        *[columns[field].label(field) for field in fields],
+        *[column.label(label) for column, label in zip(order_columns, key_labels)]
+    )
+    statement = apply_from(statement).where(*page_filters).order_by(*order_columns).limit(limit + 1)
+    rows = (await db.execute(statement)).all()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = []
+    for row in rows:
+        item = {}
+        for field in fields:
+            value = row._mapping[field]
+            item[field] = float(value) if isinstance(value, Decimal) else value
+        items.append(item)
+    
+    page = {
+        "items": items,
+        "fields": fields,
+        "limit": limit,
+        "has_more": has_more,
+        "next_cursor": encode_cursor([rows[-1]._mapping[label] for label in key_labels]) if has_more else None
+    }
+    if include_total:
+        count_statement = apply_from(select(func.count())).where(*window_filters)
+        page["total"] = (await db.execute(count_statement)).scalar()
+    return page
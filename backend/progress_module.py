@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+处理进度模块
+记录视频分帧、OCR等长时间处理的进度（已处理帧数、吞吐量、预计剩余时间），
+并通过SSE（Server-Sent Events）推送给前端，前端无需等待处理接口返回即可显示进度和阶段分析的中间结果。
+
+进度在处理线程中更新，推送时只发送最新状态：更新频繁时合并为每PUSH_INTERVAL秒最多一条事件。
+进度只保存在当前进程内存中，已结束的进度只保留最近若干个视频
+"""
+
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional
+from serialization_module import dumps
+from stage_stream_module import stage_stream_manager
+import asyncio
+import threading
+import time
+
+
+PROGRESS_RUNNING = "running"
+PROGRESS_COMPLETED = "completed"
+PROGRESS_FAILED = "failed"
+
+# 同一连接两条进度事件的最小间隔（秒）
+PUSH_INTERVAL = 0.5
+# 连接断开后浏览器自动重连的等待时间（毫秒）
+RECONNECT_DELAY_MS = 3000
+# 无进度变化时发送心跳注释的间隔（秒），防止代理断开空闲连接
+HEARTBEAT_INTERVAL = 15
+# 计算吞吐量的时间窗口（秒）
+THROUGHPUT_WINDOW = 10
+# 最多保留的已结束视频进度数
+MAX_FINISHED_VIDEOS = 200
+
+
+class PhaseProgress:
+    """一个处理阶段（如分帧、OCR）的进度
+    
+    completed为已处理的数量，total为预计总数（未知时为None）；counters保存阶段相关的其他计数
+    """
+    
+    def __init__(self, tracker: "VideoProgress", phase: str, total: Optional[int] = None):
+        self.tracker = tracker
+        self.phase = phase
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.counters: Dict[str, int] = {}
+        self.status = PROGRESS_RUNNING
+        self.error: Optional[str] = None
+        self.started_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self._start_time = time.monotonic()
+        self._finish_time: Optional[float] = None
+        self._samples: "deque[tuple]" = deque([(self._start_time, 0)])
+    
+    def update(self, completed: Optional[int] = None, failed: Optional[int] = None, total: Optional[int] = None,
+               **counters: int) -> None:
+        """更新计数（可在任意线程中调用）"""
+        with self.tracker.lock:
+            if completed is not None:
+                self.completed = completed
+            if failed is not None:
+                self.failed = failed
+            if total is not None:
+                self.total = total
+            self.counters.update(counters)
+            
+            now = time.monotonic()
+            if now - self._samples[-1][0] >= PUSH_INTERVAL / 2:
+                self._samples.append((now, self.completed))
+                while len(self._samples) > 2 and now - self._samples[0][0] > THROUGHPUT_WINDOW:
+                    self._samples.popleft()
+        self.tracker.notify()
+    
+    def finish(self, error: Optional[str] = None) -> None:
+        """标记阶段结束，error不为空表示失败"""
+        with self.tracker.lock:
+            self.status = PROGRESS_FAILED if error else PROGRESS_COMPLETED
+            self.error = error
+            self.finished_at = datetime.now()
+            self._finish_time = time.monotonic()
+        self.tracker.notify()
+    
+    def _throughput(self, now: float) -> Optional[float]:
+        """每秒处理的数量：进行中按最近的时间窗口计算，结束后按整个阶段平均"""
+        start_time, start_completed = self._samples[0]
+        if self._finish_time is not None:
+            start_time, start_completed = self._start_time, 0
+        elapsed = now - start_time
+        if elapsed <= 0 or self.completed <= start_completed:
+            return None
+        return (self.completed - start_completed) / elapsed
+    
+    def snapshot(self) -> Dict[str, Any]:
+        now = self._finish_time if self._finish_time is not None else time.monotonic()
+        throughput = self._throughput(now)
+        eta_seconds = None
+        if self.status == PROGRESS_RUNNING and throughput and self.total is not None:
+            eta_seconds = round(max(self.total - self.completed - self.failed, 0) / throughput, 1)
+        percent = None
+        if self.status == PROGRESS_COMPLETED:
+            percent = 100.0
+        elif self.total:
+            percent = round(min((self.completed + self.failed) / self.total, 1) * 100, 1)
+        return {
+            "phase": self.phase,
+            "status": self.status,
+            "completed": self.completed,
+            "failed": self.failed,
+            "total": self.total,
+            "percent": percent,
+            "throughput": round(throughput, 2) if throughput else None,
+            "eta_seconds": eta_seconds,
+            "elapsed_seconds": round(now - self._start_time, 1),
+            "counters": dict(self.counters),
+            "error": self.error,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class VideoProgress:
+    """单个视频各处理阶段的进度和订阅者"""
+    
+    def __init__(self, video_id: int):
+        self.video_id = video_id
+        self.phases: Dict[str, PhaseProgress] = {}
+        self.version = 0
+        self.lock = threading.Lock()
+        self._subscribers: Dict[asyncio.Event, asyncio.AbstractEventLoop] = {}
+    
+    def notify(self) -> None:
+        """进度变化，唤醒所有订阅者（订阅者在各自的事件循环中读取最新状态）"""
+        with self.lock:
+            self.version += 1
+            subscribers = list(self._subscribers.items())
+        for event, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+    
+    def subscribe(self) -> asyncio.Event:
+        event = asyncio.Event()
+        with self.lock:
+            self._subscribers[event] = asyncio.get_running_loop()
+        return event
+    
+    def unsubscribe(self, event: asyncio.Event) -> None:
+        with self.lock:
+            self._subscribers.pop(event, None)
+    
+    @property
+    def running(self) -> bool:
+        return any(phase.status == PROGRESS_RUNNING for phase in self.phases.values())
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            phases = {name: phase.snapshot() for name, phase in self.phases.items()}
+            version = self.version
+        return {"video_id": self.video_id, "version": version, "phases": phases}
+
+
+def partial_stage_results(video_id: int) -> Optional[list]:
+    """OCR过程中流式阶段分析的中间结果（只包含各阶段的起止时间和耗时）"""
+    stream = stage_stream_manager.get(video_id)
+    if stream is None:
+        return None
+    return [
+        {
+            "stage_id": result["stage_id"],
+            "stage_name": result["stage_name"],
+            "stage_start_timestamp_ms": result["stage_start_timestamp_ms"],
+            "stage_end_timestamp_ms": result["stage_end_timestamp_ms"],
+            "stage_duration_ms": result["stage_duration_ms"]
+        }
+        for result in stream.build_response()["stage_results"]
+    ]
+
+
+def format_sse(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> bytes:
+    """SSE消息格式"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}".encode())
+    lines.append(f"event: {event}".encode())
+    lines.append(b"data: " + dumps(data))
+    return b"\n".join(lines) + b"\n\n"
+
+
+class ProgressManager:
+    """处理进度管理类"""
+    
+    def __init__(self, max_finished_videos: int = MAX_FINISHED_VIDEOS):
+        self.max_finished_videos = max_finished_videos
+        self._videos: "OrderedDict[int, VideoProgress]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _tracker(self, video_id: int) -> VideoProgress:
+        with self._lock:
+            tracker = self._videos.get(video_id)
+            if tracker is None:
+                tracker = self._videos[video_id] = VideoProgress(video_id)
+            self._videos.move_to_end(video_id)
+            self._evict_finished()
+            return tracker
+    
+    def _evict_finished(self) -> None:
+        finished = [video_id for video_id, tracker in self._videos.items()
+                    if tracker.phases and not tracker.running and not tracker._subscribers]
+        for video_id in finished[:max(len(finished) - self.max_finished_videos, 0)]:
+            del self._videos[video_id]
+    
+    def start(self, video_id: int, phase: str, total: Optional[int] = None) -> PhaseProgress:
+        """开始一个处理阶段（替换该阶段之前的进度）"""
+        tracker = self._tracker(video_id)
+        progress = PhaseProgress(tracker, phase, total)
+        with tracker.lock:
+            tracker.phases[phase] = progress
+        tracker.notify()
+        return progress
+    
+    def get_progress(self, video_id: int) -> Dict[str, Any]:
+        """查询视频当前的处理进度，没有进度记录时phases为空"""
+        with self._lock:
+            tracker = self._videos.get(video_id)
+        if tracker is None:
+            return {"video_id": video_id, "version": 0, "phases": {}}
+        return tracker.snapshot()
+    
+    def _build_event(self, tracker: VideoProgress) -> Dict[str, Any]:
+        data = tracker.snapshot()
+        ocr = data["phases"].get("ocr")
+        if ocr is not None:
+            data["stage_results"] = partial_stage_results(tracker.video_id)
+        return data
+    
+    async def event_stream(self, video_id: int, push_interval: float = PUSH_INTERVAL,
+                           heartbeat_interval: float = HEARTBEAT_INTERVAL) -> AsyncIterator[bytes]:
+        """SSE事件流：连接后立即发送当前进度，之后每次进度变化发送最新进度，直到客户端断开"""
+        tracker = self._tracker(video_id)
+        event = tracker.subscribe()
+        try:
+            yield f"retry: {RECONNECT_DELAY_MS}\n\n".encode()
+            last_version = None
+            while True:
+                data = self._build_event(tracker)
+                if data["version"] != last_version:
+                    last_version = data["version"]
+                    yield format_sse("progress", data, data["version"])
+                    # 合并短时间内的多次更新
+                    await asyncio.sleep(push_interval)
+                    if tracker.version != last_version:
+                        continue
+                event.clear()
+                if tracker.version != last_version:
+                    continue
+                try:
+                    await asyncio.wait_for(event.wait(), heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+        finally:
+            tracker.unsubscribe(event)
+
+
+# 创建全局实例
+progress_manager = ProgressManager()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移脚本 - 视频帧率改为保存完整精度
+SQLite的fps列原样保存浮点数，无需修改列类型；已探测的视频帧率曾保留两位小数，
+清除其探测时间，下次分帧时在后台重新探测（也可以调用 POST /videos/{video_id}/metadata/probe 探测）
+"""
+
+from sqlalchemy import create_engine, text
+import os
+
+def reprobe_video_fps():
+    """标记已探测的视频需要重新探测帧率"""
+    db_path = "./video_analysis.db"
+    
+    if not os.path.exists(db_path):
+        print(f"数据库文件不存在: {db_path}")
+        return
+    
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        with engine.begin() as conn:
+            result = conn.execute(text(
+                "UPDATE videos SET metadata_probed_at = NULL WHERE metadata_probed_at IS NOT NULL AND fps IS NOT NULL"
+            ))
+            print(f"✓ {result.rowcount}个视频将重新探测帧率")
+    except Exception as e:
+        print(f"标记重新探测失败: {str(e)}")
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    reprobe_video_fps()
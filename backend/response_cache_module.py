@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+响应缓存模块
+视频相关的读接口按(接口路径及参数, 视频ID, 数据版本号)缓存序列化后的响应体，并返回对应的ETag：
+请求带有匹配的If-None-Match时直接返回304；版本号未变化时命中缓存，跳过数据库查询和计算。
+数据变化时版本号递增，旧版本的缓存项不会再被命中，按LRU淘汰
+"""
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Type
+from data_version_module import video_data_version_manager
+from serialization_module import dumps
+import hashlib
+import threading
+
+
+# 缓存的最大条目数和响应体总字节数
+MAX_CACHE_ENTRIES = 512
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def serialize_models(model: Type[BaseModel], objects: Iterable[Any]) -> List[Dict[str, Any]]:
+    """按响应模型的字段从ORM对象取值生成字典（不逐条构造模型，日期、Decimal等由序列化时转换）"""
+    names = list(model.__fields__)
+    return [{name: getattr(obj, name) for name in names} for obj in objects]
+
+
+def make_etag(video_id: int, version: int, key: Tuple) -> str:
+    """由视频ID、数据版本号和请求键生成弱ETag"""
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+    return f'W/"v{video_id}-{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断If-None-Match是否与ETag匹配（弱比较）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ResponseCache:
+    """按LRU淘汰的响应体缓存（线程安全）"""
+    
+    def __init__(self, max_entries: int = MAX_CACHE_ENTRIES, max_bytes: int = MAX_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+    
+    def get(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return body
+    
+    def put(self, key: Tuple, body: bytes) -> None:
+        # 单个响应超过总容量时不缓存
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+    
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.stats["not_modified"] += 1
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+    
+    def info(self) -> Dict[str, Any]:
+        """缓存状态"""
+        with self._lock:
+            return {"entries": len(self._entries), "size_bytes": self._size, **self.stats}
+
+
+async def cached_video_response(request: Request, db, video_id: int, compute: Callable[[], Awaitable[Any]]) -> Response:
+    """返回带ETag的视频数据响应：ETag匹配时返回304，缓存命中时直接返回缓存的响应体
+    
+    先读取版本号再查询数据：查询期间有写入提交时，缓存项的数据只会比版本号新，
+    之后的请求读到新版本号会重新计算，不会长期返回旧数据
+    """
+    version = await video_data_version_manager.get_version(video_id, db)
+    request_key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    etag = make_etag(video_id, version, request_key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    
+    cache_key = (request_key, video_id, version)
+    body = response_cache.get(cache_key)
+    if body is None:
+        data = await compute()
+        body = dumps(data)
+        response_cache.put(cache_key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# 创建全局实例
+response_cache = ResponseCache()
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+保留策略清理模块
+按Settings中的文件清理设置清理不再需要的文件（retention_auto_run开启时在后台定期执行，否则只通过接口手动执行），
+分析需要的数据（视频帧、OCR结果、OCR文本行和阶段分析结果等数据库记录，以及缩略图）全部保留：
+
+    frame_retention_days       OCR已完成的视频，分帧超过N天后删除帧图片和OCR结果图片
+    video_archive_days         OCR已完成的视频，上传超过N天后归档：删除OCR原始结果JSON，
+                               video_archive_delete_source开启时同时删除视频文件（之后无法重新分帧）
+    temp_file_retention_hours  删除超过N小时的临时文件、未完成的分块上传会话和无会话引用的上传临时文件
+
+设为0表示不执行该策略。文件分批删除，批之间按MAX_DELETES_PER_SECOND限速，避免清理占满磁盘IO；
+dry_run模式只统计将要删除的文件数和字节数，不删除任何文件
+"""
+
+from fastapi import BackgroundTasks
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import Session, aliased
+from models_simple import Video, VideoFrame, OCRResult, VideoUpload, ProcessStatus
+from db_module import DatabaseWriter, db_writer
+from job_module import job_registry
+from data_version_module import video_data_version_manager
+from storage_module import storage_accountant
+from frame_store_module import frame_store, frame_file_path
+from upload_module import UPLOAD_UPLOADING
+from config import RetentionConfig, settings
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import threading
+import time
+
+
+def _stat_files(paths) -> List[Tuple[str, int]]:
+    """(路径, 大小)列表，跳过不存在的文件"""
+    files = []
+    for path in paths:
+        try:
+            files.append((path, os.stat(path).st_size))
+        except FileNotFoundError:
+            continue
+    return files
+
+
+def _walk_files(directory: Path) -> List[str]:
+    if not directory.is_dir():
+        return []
+    return [os.path.join(root, filename) for root, _, filenames in os.walk(directory) for filename in filenames]
+
+
+def _remove_empty_dirs(directory: Path) -> None:
+    """自底向上删除空目录，目录中仍有文件时保留"""
+    if not directory.is_dir():
+        return
+    for root, _, _ in sorted(os.walk(directory), key=lambda item: len(item[0]), reverse=True):
+        try:
+            os.rmdir(root)
+        except OSError:
+            pass
+
+
+def _summary(files: List[Tuple[str, int]]) -> Dict[str, int]:
+    return {"file_count": len(files), "total_bytes": sum(size for _, size in files)}
+
+
+class RetentionCollector:
+    """保留策略清理管理类"""
+    
+    def __init__(self, writer: Optional[DatabaseWriter] = None, batch_size: int = RetentionConfig.BATCH_SIZE,
+                 max_deletes_per_second: float = RetentionConfig.MAX_DELETES_PER_SECOND,
+                 max_videos_per_run: int = RetentionConfig.MAX_VIDEOS_PER_RUN):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.max_deletes_per_second = max_deletes_per_second
+        self.max_videos_per_run = max_videos_per_run
+        self.frames_storage_path = "./data/frames"
+        self.ocr_results_path = "./data/ocr_results"
+        self.ocr_images_path = "./data/ocr_images"
+        self.temp_path = "./data/temp"
+        self.upload_temp_path = "./data/uploads"
+        self._run_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_report: Optional[Dict[str, Any]] = None
+    
+    def policies(self) -> Dict[str, Any]:
+        return {
+            "frame_retention_days": settings.frame_retention_days,
+            "video_archive_days": settings.video_archive_days,
+            "video_archive_delete_source": settings.video_archive_delete_source,
+            "temp_file_retention_hours": settings.temp_file_retention_hours
+        }
+    
+    def _ocr_completed(self):
+        """视频已分帧且每一帧都有OCR结果"""
+        frame = aliased(VideoFrame)
+        pending_frame = select(frame.id).where(
+            frame.video_id == Video.id,
+            ~exists().where(OCRResult.frame_id == frame.id)
+        ).exists()
+        has_frames = select(VideoFrame.id).where(VideoFrame.video_id == Video.id).exists()
+        return has_frames & ~pending_frame
+    
+    def _frame_candidates(self, db: Session, cutoff: datetime) -> List[int]:
+        """OCR已完成、最后一次分帧早于cutoff且帧图片尚未清理的视频"""
+        latest_extraction = select(func.max(VideoFrame.extracted_at)).where(
+            VideoFrame.video_id == Video.id
+        ).scalar_subquery()
+        rows = db.query(Video.id).filter(
+            Video.frames_purged_at.is_(None),
+            Video.process_status != ProcessStatus.processing,
+            latest_extraction < cutoff,
+            self._ocr_completed()
+        ).order_by(Video.id).limit(self.max_videos_per_run)
+        return [video_id for (video_id,) in rows]
+    
+    def _archive_candidates(self, db: Session, cutoff: datetime) -> List[Tuple[int, str]]:
+        """OCR已完成、上传早于cutoff且尚未归档的视频"""
+        rows = db.query(Video.id, Video.file_path).filter(
+            Video.archived_at.is_(None),
+            Video.process_status != ProcessStatus.processing,
+            Video.upload_time < cutoff,
+            self._ocr_completed()
+        ).order_by(Video.id).limit(self.max_videos_per_run)
+        return [(video_id, file_path) for video_id, file_path in rows]
+    
+    def _video_file_shared(self, db: Session, video_id: int, file_path: str) -> bool:
+        """内容相同的其他视频共用该文件且尚未归档"""
+        return db.query(Video.id).filter(
+            Video.file_path == file_path, Video.id != video_id, Video.archived_at.is_(None)
+        ).first() is not None
+    
+    def plan(self, db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """按当前策略列出需要删除的文件"""
+        now = now or datetime.utcnow()
+        policies = self.policies()
+        plan: Dict[str, Any] = {"frames": [], "archive": [], "temp": {"files": [], "uploads": []}}
+        
+        if policies["frame_retention_days"] > 0:
+            cutoff = now - timedelta(days=policies["frame_retention_days"])
+            for video_id in self._frame_candidates(db, cutoff):
+                paths = {
+                    frame_file_path(path)
+                    for (path,) in db.query(VideoFrame.frame_path).filter(VideoFrame.video_id == video_id)
+                }
+                dirs = [Path(f"{self.frames_storage_path}/video_{video_id}"), Path(f"{self.ocr_images_path}/video_{video_id}")]
+                for directory in dirs:
+                    paths.update(_walk_files(directory))
+                plan["frames"].append({"video_id": video_id, "files": _stat_files(sorted(paths)), "dirs": dirs})
+        
+        if policies["video_archive_days"] > 0:
+            cutoff = now - timedelta(days=policies["video_archive_days"])
+            for video_id, file_path in self._archive_candidates(db, cutoff):
+                directory = Path(f"{self.ocr_results_path}/video_{video_id}")
+                paths = _walk_files(directory)
+                if policies["video_archive_delete_source"] and not self._video_file_shared(db, video_id, file_path):
+                    paths.append(file_path)
+                plan["archive"].append({"video_id": video_id, "files": _stat_files(paths), "dirs": [directory]})
+        
+        if policies["temp_file_retention_hours"] > 0:
+            cutoff = now - timedelta(hours=policies["temp_file_retention_hours"])
+            # 文件修改时间为Unix时间戳，cutoff为UTC时间
+            cutoff_timestamp = (cutoff - datetime(1970, 1, 1)).total_seconds()
+            stale_uploads = db.query(VideoUpload.id, VideoUpload.temp_path).filter(
+                VideoUpload.status == UPLOAD_UPLOADING, VideoUpload.updated_at < cutoff
+            ).all()
+            active_paths = {
+                os.path.abspath(path) for (path,) in db.query(VideoUpload.temp_path).filter(VideoUpload.status == UPLOAD_UPLOADING)
+            }
+            plan["temp"]["uploads"] = [
+                {"upload_id": upload_id, "files": _stat_files([temp_path])} for upload_id, temp_path in stale_uploads
+            ]
+            # 临时目录中的过期文件，以及没有上传会话引用的过期上传临时文件（如表单上传中断后残留）
+            candidates = _walk_files(Path(self.temp_path))
+            candidates.extend(path for path in _walk_files(Path(self.upload_temp_path)) if os.path.abspath(path) not in active_paths)
+            for path in candidates:
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime < cutoff_timestamp:
+                    plan["temp"]["files"].append((path, stat.st_size))
+        return plan
+    
+    def _delete_files(self, files: List[Tuple[str, int]], stats: Dict[str, int]) -> bool:
+        """分批删除文件，批之间按速率限制等待，返回是否全部删除成功（收到停止信号时中止）"""
+        success = True
+        for start in range(0, len(files), self.batch_size):
+            if self._stop_event.is_set():
+                return False
+            batch = files[start:start + self.batch_size]
+            batch_started = time.monotonic()
+            for path, _ in batch:
+                try:
+                    stats["freed_bytes"] += storage_accountant.remove_file(path)
+                    frame_store.release(path)
+                    stats["deleted_files"] += 1
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    print(f"清理文件失败: {path}, 错误: {e}")
+                    stats["failed_files"] += 1
+                    success = False
+            if self.max_deletes_per_second and start + self.batch_size < len(files):
+                wait = len(batch) / self.max_deletes_per_second - (time.monotonic() - batch_started)
+                if wait > 0:
+                    self._stop_event.wait(wait)
+        return success
+    
+    def _mark_videos(self, video_ids: List[int], field: str) -> None:
+        """记录视频已清理帧图片或已归档"""
+        def mark(session: Session) -> None:
+            now = datetime.utcnow()
+            for video in session.query(Video).filter(Video.id.in_(video_ids)):
+                setattr(video, field, now)
+                video_data_version_manager.bump(video.id, session)
+        (self.writer or db_writer).execute(mark)
+    
+    def _delete_stale_uploads(self, upload_ids: List[str], cutoff: datetime) -> List[str]:
+        """删除仍未更新的过期上传会话，返回实际删除的会话ID（期间恢复上传的会话保留）"""
+        def delete(session: Session) -> List[str]:
+            query = session.query(VideoUpload).filter(
+                VideoUpload.id.in_(upload_ids), VideoUpload.status == UPLOAD_UPLOADING, VideoUpload.updated_at < cutoff
+            )
+            deleted = [upload.id for upload in query]
+            query.delete(synchronize_session=False)
+            return deleted
+        return (self.writer or db_writer).execute(delete)
+    
+    def run(self, dry_run: bool = False, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """执行一次清理，返回各策略处理的视频、文件数和字节数；dry_run为True时只统计不删除"""
+        with self._run_lock:
+            now = now or datetime.utcnow()
+            started = time.monotonic()
+            db = (self.writer or db_writer).session_factory()
+            try:
+                plan = self.plan(db, now)
+            finally:
+                db.close()
+            
+            report: Dict[str, Any] = {"dry_run": dry_run, "policies": self.policies()}
+            for policy in ("frames", "archive"):
+                videos = [{"video_id": item["video_id"], **_summary(item["files"])} for item in plan[policy]]
+                report[policy] = {
+                    "videos": videos,
+                    "file_count": sum(video["file_count"] for video in videos),
+                    "total_bytes": sum(video["total_bytes"] for video in videos)
+                }
+            upload_files = [file for upload in plan["temp"]["uploads"] for file in upload["files"]]
+            report["temp"] = {**_summary(plan["temp"]["files"] + upload_files), "stale_uploads": len(plan["temp"]["uploads"])}
+            
+            stats = {"deleted_files": 0, "failed_files": 0, "freed_bytes": 0}
+            if not dry_run:
+                for policy, field in (("frames", "frames_purged_at"), ("archive", "archived_at")):
+                    completed = []
+                    for item in plan[policy]:
+                        # 有文件未能删除时不标记，下一次清理时重试
+                        if self._delete_files(item["files"], stats):
+                            completed.append(item["video_id"])
+                        for directory in item["dirs"]:
+                            _remove_empty_dirs(directory)
+                    if completed:
+                        self._mark_videos(completed, field)
+                
+                self._delete_files(plan["temp"]["files"], stats)
+                if plan["temp"]["uploads"]:
+                    cutoff = now - timedelta(hours=settings.temp_file_retention_hours)
+                    deleted = set(self._delete_stale_uploads([upload["upload_id"] for upload in plan["temp"]["uploads"]], cutoff))
+                    for upload in plan["temp"]["uploads"]:
+                        if upload["upload_id"] in deleted:
+                            self._delete_files(upload["files"], stats)
+            
+            report.update(stats)
+            report["duration_seconds"] = round(time.monotonic() - started, 3)
+            report["finished_at"] = datetime.utcnow()
+            if not dry_run:
+                self.last_report = report
+            return report
+    
+    def start_gc_job(self, background_tasks: BackgroundTasks, dry_run: bool = False) -> Dict[str, Any]:
+        """创建后台清理任务并返回任务信息，相同模式的清理正在进行时返回已有任务"""
+        params = {"dry_run": dry_run}
+        job = job_registry.find_active("retention_gc", params)
+        if job is None:
+            job = job_registry.create("retention_gc", params)
+            background_tasks.add_task(job_registry.run, job["job_id"], lambda: self.run(dry_run))
+        return job
+    
+    def _run_periodically(self, interval: float) -> None:
+        while not self._stop_event.wait(interval):
+            try:
+                report = self.run()
+                if report["deleted_files"] or report["failed_files"]:
+                    print(f"保留策略清理完成: 删除{report['deleted_files']}个文件，释放{report['freed_bytes']}字节，"
+                          f"失败{report['failed_files']}个")
+            except Exception as e:
+                print(f"保留策略清理失败: {e}")
+    
+    def start(self, interval: float = RetentionConfig.GC_INTERVAL) -> None:
+        """启动后台线程，每interval秒清理一次"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_periodically, args=(interval,), name="retention-gc", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止后台线程，正在进行的清理在当前批结束后中止"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# 创建全局实例
+retention_collector = RetentionCollector()
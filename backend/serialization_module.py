@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+响应序列化与压缩模块
+大体量响应（OCR结果、阶段模式分析等）直接由字典和列表序列化：安装orjson时使用orjson，否则回退到标准库json；
+超过大小阈值的JSON/文本响应按客户端的Accept-Encoding进行Brotli（安装brotli时）或GZip压缩
+"""
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional
+import enum
+import gzip
+import json
+import zlib
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+
+# 小于该字节数的响应不压缩
+COMPRESSION_MINIMUM_SIZE = 1024
+# 超过该字节数的响应体在线程池中压缩，避免阻塞事件循环
+THREADPOOL_COMPRESSION_SIZE = 256 * 1024
+# 10k帧的OCR结果（约5-10MB）：GZip级别1压缩到约18%，耗时约为级别6的40%，级别6只再小约20%
+GZIP_LEVEL = 1
+BROTLI_QUALITY = 4
+# 压缩的响应类型（图片、视频等已压缩的格式以及事件流不压缩）
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "text/plain", "text/html", "text/csv", "application/javascript")
+
+
+def _default(obj: Any) -> Any:
+    """序列化JSON原生不支持的类型"""
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+
+def dumps(data: Any) -> bytes:
+    """将字典、列表等序列化为UTF-8编码的JSON"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """解析JSON字符串或字节"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """使用orjson序列化的JSON响应
+    
+    接口直接返回该响应时，FastAPI跳过响应模型校验和jsonable_encoder，适合大列表
+    """
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _parse_accept_encoding(value: str) -> List[str]:
+    """解析Accept-Encoding，返回可接受的编码（忽略q=0）"""
+    encodings = []
+    for item in value.split(","):
+        parts = [part.strip() for part in item.split(";")]
+        if not parts[0]:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            encodings.append(parts[0].lower())
+    return encodings
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """选择压缩编码：优先Brotli，其次GZip"""
+    if not accept_encoding:
+        return None
+    encodings = _parse_accept_encoding(accept_encoding)
+    if BROTLI_AVAILABLE and "br" in encodings:
+        return "br"
+    if "gzip" in encodings or "*" in encodings:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """流式压缩器"""
+    
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31输出GZip格式
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        self.encoding = encoding
+    
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+    
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.flush()
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+    
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """一次性压缩完整响应体"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """响应压缩中间件（ASGI）
+    
+    只压缩超过minimum_size字节的JSON/文本响应；已设置Content-Encoding的响应、304等无响应体的响应原样返回。
+    分块发送的响应按块流式压缩
+    """
+    
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = None
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressionResponder:
+    """处理单个请求的压缩：缓存响应头，根据第一个响应体消息决定是否压缩"""
+    
+    def __init__(self, app, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+    
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+    
+    def _compressible(self) -> bool:
+        headers = {name.lower(): value for name, value in self.start_message.get("headers", [])}
+        if b"content-encoding" in headers:
+            return False
+        content_type = headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip().lower()
+        return content_type in COMPRESSIBLE_CONTENT_TYPES
+    
+    def _headers(self, content_length: Optional[int]) -> list:
+        headers = [
+            (name, value) for name, value in self.start_message.get("headers", [])
+            if name.lower() not in (b"content-length", b"vary")
+        ]
+        vary = [value for name, value in self.start_message.get("headers", []) if name.lower() == b"vary"]
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"]) if vary else b"Accept-Encoding"))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        return headers
+    
+    async def send_compressed(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            return
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+        
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        
+        if self.start_message is not None:
+            start_message = self.start_message
+            if not self._compressible() or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                self.start_message = None
+                await self.send(start_message)
+                await self.send(message)
+                return
+            if not more_body:
+                # 完整响应体：一次性压缩并设置Content-Length
+                if len(body) >= THREADPOOL_COMPRESSION_SIZE:
+                    compressed = await run_in_threadpool(compress_body, body, self.encoding)
+                else:
+                    compressed = compress_body(body, self.encoding)
+                headers = self._headers(len(compressed))
+                self.start_message = None
+                await self.send({**start_message, "headers": headers})
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            # 分块响应：流式压缩，不设置Content-Length
+            self.compressor = _Compressor(self.encoding)
+            headers = self._headers(None)
+            self.start_message = None
+            await self.send({**start_message, "headers": headers})
+        
+        if self.passthrough or self.compressor is None:
+            await self.send(message)
+            return
+        if more_body:
+            chunk = self.compressor.compress(body) + self.compressor.flush()
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+        else:
+            chunk = self.compressor.compress(body) + self.compressor.finish()
+            await self.send({"type": "http.response.body", "body": chunk})
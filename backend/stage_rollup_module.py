@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+阶段耗时汇总模块
+按项目和阶段名称增量维护阶段耗时的样本数、均值、最小/最大值和分位数草图，
+视频的阶段分析结果变化时只对变化的耗时做加减，查询时无需重新分析视频
+"""
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models_simple import Project, Video, StageAnalysisResult, StageDurationRollup
+from typing import List, Dict, Any, Optional
+import math
+
+
+DEFAULT_PERCENTILES = [50, 90, 95, 99]
+
+
+class DurationSketch:
+    """对数分桶的可合并分位数草图（DDSketch）
+    
+    耗时按gamma=(1+α)/(1-α)的对数分桶计数，分位数估计的相对误差不超过α；
+    桶计数可直接相加合并，也可相减以移除样本，适合增量维护
+    """
+    
+    def __init__(self, relative_accuracy: float = 0.01, buckets: Optional[Dict[int, int]] = None, zero_count: int = 0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = dict(buckets or {})
+        self.zero_count = zero_count
+    
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.buckets.values())
+    
+    def _index(self, value: float) -> int:
+        return int(math.ceil(math.log(value) / self.log_gamma))
+    
+    def _bucket_value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+    
+    def add(self, value: float, count: int = 1) -> None:
+        """添加样本"""
+        if value <= 0:
+            self.zero_count += count
+            return
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+    
+    def remove(self, value: float, count: int = 1) -> None:
+        """移除之前添加过的样本"""
+        if value <= 0:
+            self.zero_count = max(0, self.zero_count - count)
+            return
+        index = self._index(value)
+        remaining = self.buckets.get(index, 0) - count
+        if remaining > 0:
+            self.buckets[index] = remaining
+        else:
+            self.buckets.pop(index, None)
+    
+    def merge(self, other: "DurationSketch") -> None:
+        """合并另一个相同精度的草图"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("只能合并相同精度的草图")
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """估计分位数（q取0-1）"""
+        total = self.count
+        if total == 0:
+            return None
+        
+        rank = q * (total - 1)
+        cumulative = self.zero_count
+        if cumulative > rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            cumulative += self.buckets[index]
+            if cumulative > rank:
+                return self._bucket_value(index)
+        return self._bucket_value(max(self.buckets))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "buckets": {str(index): count for index, count in self.buckets.items()}
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "DurationSketch":
+        if not data:
+            return cls()
+        return cls(
+            relative_accuracy=data.get("relative_accuracy", 0.01),
+            buckets={int(index): count for index, count in data.get("buckets", {}).items()},
+            zero_count=data.get("zero_count", 0)
+        )
+
+
+class StageRollupManager:
+    """阶段耗时汇总管理类"""
+    
+    def record_video_results(self, video_id: int, stage_results: List[Dict[str, Any]], db: Session) -> None:
+        """保存视频的阶段分析结果，并按耗时的变化增量更新项目汇总"""
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if not video or not stage_results:
+            return
+        
+        stage_ids = [result["stage_id"] for result in stage_results]
+        existing = {
+            row.stage_config_id: row
+            for row in db.query(StageAnalysisResult).filter(
+                StageAnalysisResult.video_id == video_id,
+                StageAnalysisResult.stage_config_id.in_(stage_ids)
+            ).all()
+        }
+        
+        added: Dict[str, List[int]] = {}
+        removed: Dict[str, List[int]] = {}
+        
+        for result in stage_results:
+            row = existing.get(result["stage_id"])
+            if row is None:
+                row = StageAnalysisResult(video_id=video_id, stage_config_id=result["stage_id"])
+                db.add(row)
+            
+            old_name, old_duration = row.stage_name, row.duration_ms
+            new_name, new_duration = result["stage_name"], result["stage_duration_ms"]
+            if (old_name, old_duration) != (new_name, new_duration):
+                if old_duration is not None:
+                    removed.setdefault(old_name, []).append(old_duration)
+                if new_duration is not None:
+                    added.setdefault(new_name, []).append(new_duration)
+            
+            matched_keywords = [
+                keyword_result["keyword"] for keyword_result in result.get("keyword_results", [])
+                if keyword_result["total_occurrences"] > 0
+            ]
+            row.stage_name = new_name
+            row.start_timestamp_ms = result["stage_start_timestamp_ms"]
+            row.end_timestamp_ms = result["stage_end_timestamp_ms"]
+            row.duration_ms = new_duration
+            row.matched_keywords = matched_keywords or None
+            row.confidence_score = round(result.get("pattern_summary", {}).get("average_confidence", 0.0), 4)
+        
+        self._apply_changes(video.project_id, added, removed, db)
+        db.commit()
+    
+    def remove_video_results(self, video_id: int, db: Session, stage_config_ids: Optional[List[int]] = None, commit: bool = True) -> int:
+        """删除视频（或指定阶段配置）的阶段分析结果，并从项目汇总中移除对应耗时，返回删除的结果数"""
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if not video:
+            return 0
+        
+        query = db.query(StageAnalysisResult).filter(StageAnalysisResult.video_id == video_id)
+        if stage_config_ids is not None:
+            query = query.filter(StageAnalysisResult.stage_config_id.in_(stage_config_ids))
+        rows = query.all()
+        if not rows:
+            return 0
+        
+        removed: Dict[str, List[int]] = {}
+        for row in rows:
+            if row.duration_ms is not None:
+                removed.setdefault(row.stage_name, []).append(row.duration_ms)
+            db.delete(row)
+        
+        self._apply_changes(video.project_id, {}, removed, db)
+        if commit:
+            db.commit()
+        return len(rows)
+    
+    def _apply_changes(self, project_id: int, added: Dict[str, List[int]], removed: Dict[str, List[int]], db: Session) -> None:
+        """将耗时的增减合并到汇总行"""
+        if not added and not removed:
+            return
+        
+        # 最值被移除时需要按明细重新计算，先刷新明细表的改动
+        db.flush()
+        
+        for stage_name in set(added) | set(removed):
+            self._ensure_rollup_row(project_id, stage_name, db)
+            rollup = db.query(StageDurationRollup).filter(
+                StageDurationRollup.project_id == project_id,
+                StageDurationRollup.stage_name == stage_name
+            ).with_for_update().one()
+            
+            sketch = DurationSketch.from_dict(rollup.sketch)
+            sample_count = rollup.sample_count or 0
+            duration_sum = rollup.duration_sum_ms or 0
+            min_duration = rollup.min_duration_ms
+            max_duration = rollup.max_duration_ms
+            extreme_removed = False
+            
+            for duration in removed.get(stage_name, []):
+                sketch.remove(duration)
+                sample_count -= 1
+                duration_sum -= duration
+                if duration == min_duration or duration == max_duration:
+                    extreme_removed = True
+            
+            for duration in added.get(stage_name, []):
+                sketch.add(duration)
+                sample_count += 1
+                duration_sum += duration
+                min_duration = duration if min_duration is None else min(min_duration, duration)
+                max_duration = duration if max_duration is None else max(max_duration, duration)
+            
+            if sample_count <= 0:
+                db.delete(rollup)
+                continue
+            
+            if extreme_removed:
+                min_duration, max_duration = db.query(
+                    func.min(StageAnalysisResult.duration_ms),
+                    func.max(StageAnalysisResult.duration_ms)
+                ).join(
+                    Video, StageAnalysisResult.video_id == Video.id
+                ).filter(
+                    Video.project_id == project_id,
+                    StageAnalysisResult.stage_name == stage_name,
+                    StageAnalysisResult.duration_ms.isnot(None)
+                ).one()
+            
+            rollup.sample_count = sample_count
+            rollup.duration_sum_ms = duration_sum
+            rollup.min_duration_ms = min_duration
+            rollup.max_duration_ms = max_duration
+            rollup.sketch = sketch.to_dict()
+    
+    def _ensure_rollup_row(self, project_id: int, stage_name: str, db: Session) -> None:
+        """汇总行不存在时插入空行（已存在则忽略），多个进程并发写入同一阶段时不会违反唯一索引"""
+        values = {"project_id": project_id, "stage_name": stage_name, "sample_count": 0, "duration_sum_ms": 0}
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            statement = postgresql.insert(StageDurationRollup.__table__).values(**values).on_conflict_do_nothing(
+                index_elements=["project_id", "stage_name"]
+            )
+        elif dialect == "sqlite":
+            statement = sqlite.insert(StageDurationRollup.__table__).values(**values).on_conflict_do_nothing(
+                index_elements=["project_id", "stage_name"]
+            )
+        elif dialect == "mysql":
+            statement = StageDurationRollup.__table__.insert().values(**values).prefix_with("IGNORE")
+        else:
+            if db.query(StageDurationRollup.id).filter(
+                StageDurationRollup.project_id == project_id,
+                StageDurationRollup.stage_name == stage_name
+            ).first() is None:
+                db.add(StageDurationRollup(**values))
+                db.flush()
+            return
+        db.execute(statement)
+    
+    def rebuild_project_rollups(self, project_id: int, db: Session) -> Dict[str, Any]:
+        """根据已保存的阶段分析结果重建项目汇总"""
+        project = db.query(Project).filter(Project.id == project_id).first()
+        if not project:
+            raise HTTPException(status_code=404, detail="项目不存在")
+        
+        db.query(StageDurationRollup).filter(StageDurationRollup.project_id == project_id).delete()
+        
+        rows = db.query(StageAnalysisResult.stage_name, StageAnalysisResult.duration_ms).join(
+            Video, StageAnalysisResult.video_id == Video.id
+        ).filter(
+            Video.project_id == project_id,
+            StageAnalysisResult.duration_ms.isnot(None)
+        ).all()
+        
+        added: Dict[str, List[int]] = {}
+        for row in rows:
+            added.setdefault(row.stage_name, []).append(row.duration_ms)
+        
+        self._apply_changes(project_id, added, {}, db)
+        db.commit()
+        
+        return {
+            "message": "阶段耗时汇总重建完成",
+            "project_id": project_id,
+            "total_stages": len(added),
+            "total_samples": len(rows)
+        }
+    
+    def get_project_rollups(self, project_id: int, db: Session, percentiles: Optional[List[float]] = None,
+                            stage_name: Optional[str] = None) -> Dict[str, Any]:
+        """查询项目的阶段耗时汇总"""
+        project = db.query(Project).filter(Project.id == project_id).first()
+        if not project:
+            raise HTTPException(status_code=404, detail="项目不存在")
+        
+        percentiles = percentiles or DEFAULT_PERCENTILES
+        if any(p < 0 or p > 100 for p in percentiles):
+            raise HTTPException(status_code=400, detail="分位数取值范围为0-100")
+        
+        query = db.query(StageDurationRollup).filter(StageDurationRollup.project_id == project_id)
+        if stage_name is not None:
+            query = query.filter(StageDurationRollup.stage_name == stage_name)
+        
+        stages = []
+        for rollup in query.order_by(StageDurationRollup.stage_name).all():
+            sketch = DurationSketch.from_dict(rollup.sketch)
+            percentile_values = {}
+            for p in percentiles:
+                value = sketch.quantile(p / 100)
+                if value is not None:
+                    # 估计值限制在真实的最值范围内
+                    value = min(max(value, rollup.min_duration_ms), rollup.max_duration_ms)
+                    value = round(value, 2)
+                percentile_values[f"p{p:g}"] = value
+            
+            stages.append({
+                "stage_name": rollup.stage_name,
+                "count": rollup.sample_count,
+                "mean_duration_ms": round(rollup.duration_sum_ms / rollup.sample_count, 2),
+                "min_duration_ms": rollup.min_duration_ms,
+                "max_duration_ms": rollup.max_duration_ms,
+                "percentiles": percentile_values,
+                "relative_accuracy": sketch.relative_accuracy,
+                "updated_at": rollup.updated_at.isoformat() if rollup.updated_at else None
+            })
+        
+        return {
+            "project_id": project_id,
+            "total_stages": len(stages),
+            "stages": stages
+        }
+
+
+# 创建全局实例
+stage_rollup_manager = StageRollupManager()
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+阶段起止规则模块
+将StageConfig中的start_rule / end_rule编译为增量状态机，
+所有阶段的规则在一次按时间顺序遍历帧序列的过程中同时求值
+
+规则语法（JSON）：
+    {"type": "keyword_appear", "keywords": ["A", "B"], "match": "any", "min_duration_ms": 0}
+        关键词出现（match=all时要求所有关键词同帧出现），可要求持续出现至少N毫秒
+        （持续时长计算到关键词消失的那一帧），触发时间为该次出现的开始时间
+    {"type": "keyword_disappear", "keywords": ["A"]}
+        关键词出现过之后第一次消失
+    {"type": "keyword_absent", "keywords": ["B"], "duration_ms": 500, "require_seen": false}
+        关键词连续缺失至少N毫秒（持续时长计算到关键词重新出现的那一帧），触发时间为缺失开始的时间；
+        require_seen为true时只统计出现过之后的缺失
+    {"type": "sequence", "steps": [rule, rule, ...]}
+        依次满足各个子规则（A之后B），触发时间为最后一个子规则的触发时间
+    {"type": "any", "rules": [rule, ...]} / {"type": "all", "rules": [rule, ...]}
+        任一 / 全部子规则满足
+
+关键词规则均支持case_sensitive、exact_match选项；省略keywords时使用阶段的关键词
+"""
+
+from typing import List, Optional, Dict, Any
+import json
+
+
+class StageRuleError(ValueError):
+    """阶段规则配置错误"""
+    pass
+
+
+class FrameView:
+    """规则求值时共享的单帧视图，同一帧的文本只做一次小写转换"""
+    
+    __slots__ = ("timestamp_ms", "frame_id", "text", "_text_lower")
+    
+    def __init__(self, timestamp_ms: int, frame_id: int, text: str):
+        self.timestamp_ms = timestamp_ms
+        self.frame_id = frame_id
+        self.text = text
+        self._text_lower = None
+    
+    @property
+    def text_lower(self) -> str:
+        if self._text_lower is None:
+            self._text_lower = self.text.lower()
+        return self._text_lower
+
+
+class KeywordMatcher:
+    """关键词匹配器，与关键词模式分析使用相同的匹配语义"""
+    
+    def __init__(self, keywords: List[str], match: str = "any", case_sensitive: bool = False, exact_match: bool = False):
+        self.match = match
+        self.case_sensitive = case_sensitive
+        self.exact_match = exact_match
+        self.keywords = keywords if case_sensitive else [keyword.lower() for keyword in keywords]
+    
+    def _contains(self, keyword: str, view: FrameView) -> bool:
+        text = view.text if self.case_sensitive else view.text_lower
+        if self.exact_match:
+            return keyword == text.strip()
+        return keyword in text
+    
+    def present(self, view: FrameView) -> bool:
+        """判断关键词是否出现在该帧中"""
+        if self.match == "all":
+            return all(self._contains(keyword, view) for keyword in self.keywords)
+        return any(self._contains(keyword, view) for keyword in self.keywords)
+
+
+class RuleAutomaton:
+    """规则状态机基类"""
+    
+    def __init__(self):
+        self.fired_at: Optional[int] = None
+        self.fired_frame_id: Optional[int] = None
+    
+    @property
+    def fired(self) -> bool:
+        return self.fired_at is not None
+    
+    def feed(self, view: FrameView) -> None:
+        """输入一帧，规则触发后不再改变状态"""
+        if not self.fired:
+            self._step(view)
+    
+    def _step(self, view: FrameView) -> None:
+        raise NotImplementedError
+    
+    def _fire(self, timestamp_ms: int, frame_id: Optional[int]) -> None:
+        self.fired_at = timestamp_ms
+        self.fired_frame_id = frame_id
+
+
+class KeywordAppearRule(RuleAutomaton):
+    """关键词出现（可要求持续时长）"""
+    
+    def __init__(self, matcher: KeywordMatcher, min_duration_ms: int = 0):
+        super().__init__()
+        self.matcher = matcher
+        self.min_duration_ms = min_duration_ms
+        self.run_start = None
+    
+    def _step(self, view: FrameView) -> None:
+        if not self.matcher.present(view):
+            # 出现持续到本帧之前，持续时长按本帧时间计算
+            if self.run_start is not None and view.timestamp_ms - self.run_start[0] >= self.min_duration_ms:
+                self._fire(*self.run_start)
+            self.run_start = None
+            return
+        
+        if self.run_start is None:
+            self.run_start = (view.timestamp_ms, view.frame_id)
+        if view.timestamp_ms - self.run_start[0] >= self.min_duration_ms:
+            self._fire(*self.run_start)
+
+
+class KeywordAbsentRule(RuleAutomaton):
+    """关键词缺失（可要求持续时长、可要求先出现过）"""
+    
+    def __init__(self, matcher: KeywordMatcher, duration_ms: int = 0, require_seen: bool = False):
+        super().__init__()
+        self.matcher = matcher
+        self.duration_ms = duration_ms
+        self.require_seen = require_seen
+        self.seen = False
+        self.window_start = None
+    
+    def _step(self, view: FrameView) -> None:
+        if self.matcher.present(view):
+            # 缺失持续到本帧之前，持续时长按本帧时间计算
+            if self.window_start is not None and view.timestamp_ms - self.window_start[0] >= self.duration_ms:
+                self._fire(*self.window_start)
+                return
+            self.seen = True
+            self.window_start = None
+            return
+        
+        if self.require_seen and not self.seen:
+            return
+        
+        if self.window_start is None:
+            self.window_start = (view.timestamp_ms, view.frame_id)
+        if view.timestamp_ms - self.window_start[0] >= self.duration_ms:
+            self._fire(*self.window_start)
+
+
+class SequenceRule(RuleAutomaton):
+    """按顺序满足的子规则序列，后一个子规则从前一个触发的帧开始求值"""
+    
+    def __init__(self, steps: List[RuleAutomaton]):
+        super().__init__()
+        self.steps = steps
+        self.current = 0
+    
+    def _step(self, view: FrameView) -> None:
+        while self.current < len(self.steps):
+            step = self.steps[self.current]
+            step.feed(view)
+            if not step.fired:
+                return
+            self.current += 1
+        
+        last = self.steps[-1]
+        self._fire(last.fired_at, last.fired_frame_id)
+
+
+class AnyRule(RuleAutomaton):
+    """任一子规则满足"""
+    
+    def __init__(self, rules: List[RuleAutomaton]):
+        super().__init__()
+        self.rules = rules
+    
+    def _step(self, view: FrameView) -> None:
+        for rule in self.rules:
+            rule.feed(view)
+        fired = [rule for rule in self.rules if rule.fired]
+        if fired:
+            earliest = min(fired, key=lambda rule: rule.fired_at)
+            self._fire(earliest.fired_at, earliest.fired_frame_id)
+
+
+class AllRule(RuleAutomaton):
+    """全部子规则满足"""
+    
+    def __init__(self, rules: List[RuleAutomaton]):
+        super().__init__()
+        self.rules = rules
+    
+    def _step(self, view: FrameView) -> None:
+        for rule in self.rules:
+            rule.feed(view)
+        if all(rule.fired for rule in self.rules):
+            latest = max(self.rules, key=lambda rule: rule.fired_at)
+            self._fire(latest.fired_at, latest.fired_frame_id)
+
+
+def _build_matcher(rule: Dict[str, Any], default_keywords: List[str]) -> KeywordMatcher:
+    keywords = rule.get("keywords") or default_keywords
+    if not isinstance(keywords, list) or not keywords or not all(isinstance(k, str) and k for k in keywords):
+        raise StageRuleError(f"规则 {rule.get('type')} 需要非空的关键词列表")
+    
+    match = rule.get("match", "any")
+    if match not in ("any", "all"):
+        raise StageRuleError(f"不支持的match取值: {match}")
+    
+    return KeywordMatcher(
+        keywords,
+        match=match,
+        case_sensitive=bool(rule.get("case_sensitive", False)),
+        exact_match=bool(rule.get("exact_match", False))
+    )
+
+
+def _get_duration(rule: Dict[str, Any], key: str) -> int:
+    value = rule.get(key, 0)
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+        raise StageRuleError(f"{key} 必须是非负数")
+    return int(value)
+
+
+def _get_subrules(rule: Dict[str, Any], key: str, default_keywords: List[str]) -> List[RuleAutomaton]:
+    subrules = rule.get(key)
+    if not isinstance(subrules, list) or not subrules:
+        raise StageRuleError(f"规则 {rule.get('type')} 需要非空的 {key} 列表")
+    return [compile_rule(subrule, default_keywords) for subrule in subrules]
+
+
+def compile_rule(rule: Dict[str, Any], default_keywords: Optional[List[str]] = None) -> RuleAutomaton:
+    """将规则配置编译为新的状态机实例"""
+    if isinstance(rule, str):
+        try:
+            rule = json.loads(rule)
+        except json.JSONDecodeError as e:
+            raise StageRuleError(f"规则不是有效的JSON: {e}")
+    
+    if not isinstance(rule, dict):
+        raise StageRuleError("规则必须是JSON对象")
+    
+    default_keywords = default_keywords or []
+    rule_type = rule.get("type")
+    
+    if rule_type == "keyword_appear":
+        return KeywordAppearRule(_build_matcher(rule, default_keywords), _get_duration(rule, "min_duration_ms"))
+    if rule_type == "keyword_disappear":
+        return KeywordAbsentRule(_build_matcher(rule, default_keywords), _get_duration(rule, "duration_ms"), require_seen=True)
+    if rule_type == "keyword_absent":
+        return KeywordAbsentRule(
+            _build_matcher(rule, default_keywords),
+            _get_duration(rule, "duration_ms"),
+            require_seen=bool(rule.get("require_seen", False))
+        )
+    if rule_type == "sequence":
+        return SequenceRule(_get_subrules(rule, "steps", default_keywords))
+    if rule_type == "any":
+        return AnyRule(_get_subrules(rule, "rules", default_keywords))
+    if rule_type == "all":
+        return AllRule(_get_subrules(rule, "rules", default_keywords))
+    
+    raise StageRuleError(f"不支持的规则类型: {rule_type}")
+
+
+def validate_rule(rule: Optional[Dict[str, Any]], default_keywords: Optional[List[str]] = None) -> None:
+    """校验规则配置，无效时抛出StageRuleError"""
+    if rule:
+        compile_rule(rule, default_keywords)
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+阶段模式流式分析模块
+在OCR处理过程中逐帧增量更新每个阶段、每个关键词的状态机，
+使阶段耗时在OCR任务运行期间即可查询，OCR结束后无需重新计算。
+关键词在每帧将要写入的文本行上匹配，与有文本行记录时的阶段分析接口结果一致。
+流式分析不收集关键词出现记录，OCR结束后只保留最终结果（最多MAX_COMPLETED_STREAMS个视频）
+"""
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from models_simple import StageConfig
+from keyword_pattern_module import keyword_pattern_analyzer, StagePatternTracker, StagePatternRequest
+from stage_rule_module import StageRuleError
+from ocr_text_line_module import match_text_lines
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import copy
+import threading
+
+
+# 保留最终结果的已完成视频数（超过时丢弃最早完成的）
+MAX_COMPLETED_STREAMS = 256
+
+
+class VideoStageStream:
+    """单个视频的流式阶段分析器"""
+    
+    def __init__(self, video_id: int, stage_specs: list, total_frames: int = 0):
+        self.video_id = video_id
+        self.stage_trackers = [StagePatternTracker(spec, collect_occurrences=False) for spec in stage_specs]
+        self.keywords = {keyword for spec in stage_specs for keyword in spec.keywords}
+        self.match_source = "ocr_results"
+        self.total_frames = total_frames
+        self.frames_processed = 0
+        self.last_timestamp_ms = None
+        self.completed = False
+        self._final_response: Optional[Dict[str, Any]] = None
+        self.started_at = datetime.now()
+        self.updated_at = self.started_at
+        self._lock = threading.Lock()
+    
+    def feed(self, frame, ocr_result, text_lines: Optional[List[Dict[str, Any]]] = None) -> None:
+        """输入一帧OCR结果（需按时间戳顺序），text_lines为该帧的文本行记录，提供时关键词在文本行上匹配"""
+        if text_lines is None:
+            # 与分析接口保持一致：按整帧匹配时置信度为空的记录不参与分析
+            if ocr_result.confidence is None:
+                return
+            keyword_matches = None
+        else:
+            keyword_matches = {keyword: match_text_lines(text_lines, keyword) for keyword in self.keywords}
+        
+        with self._lock:
+            if keyword_matches is not None:
+                self.match_source = "text_lines"
+            for tracker in self.stage_trackers:
+                tracker.feed(frame, ocr_result, keyword_matches)
+            self.frames_processed += 1
+            self.last_timestamp_ms = frame.timestamp_ms
+            self.updated_at = datetime.now()
+    
+    def complete(self) -> None:
+        """标记OCR任务完成，保存最终结果并释放各关键词的状态机"""
+        with self._lock:
+            self.completed = True
+            self.updated_at = datetime.now()
+        final_response = self.build_response()
+        with self._lock:
+            self._final_response = final_response
+            self.stage_trackers = []
+    
+    def build_response(self) -> Dict[str, Any]:
+        """生成与analyze_stage_pattern（include_pattern_details=False）相同结构的分析结果"""
+        with self._lock:
+            if self._final_response is not None:
+                return copy.deepcopy(self._final_response)
+            stage_results = [tracker.snapshot() for tracker in self.stage_trackers]
+            frames_processed = self.frames_processed
+            last_timestamp_ms = self.last_timestamp_ms
+            match_source = self.match_source
+            completed = self.completed
+            updated_at = self.updated_at
+        
+        return {
+            "message": "阶段模式分析完成" if completed else "阶段模式分析进行中",
+            "video_id": self.video_id,
+            "total_stages": len(stage_results),
+            "match_source": match_source,
+            "analysis_timestamp": updated_at.isoformat(),
+            "stage_results": [result.dict() for result in stage_results],
+            "overall_summary": keyword_pattern_analyzer._generate_overall_summary(stage_results),
+            "stream_status": {
+                "completed": completed,
+                "frames_processed": frames_processed,
+                "total_frames": self.total_frames,
+                "last_timestamp_ms": last_timestamp_ms,
+                "started_at": self.started_at.isoformat()
+            }
+        }
+
+
+class StageStreamManager:
+    """流式阶段分析器管理类"""
+    
+    def __init__(self):
+        self.streams: Dict[int, VideoStageStream] = {}
+        # 已完成的视频，按完成顺序排列
+        self._completed: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def start(self, video_id: int, db: Session, total_frames: int = 0) -> Optional[VideoStageStream]:
+        """为视频创建新的流式分析器，视频没有阶段配置时返回None"""
+        stage_configs = db.query(StageConfig).filter(
+            StageConfig.video_id == video_id
+        ).order_by(StageConfig.stage_order).all()
+        
+        if not stage_configs:
+            self.discard(video_id)
+            return None
+        
+        try:
+            stream = VideoStageStream(video_id, keyword_pattern_analyzer._build_stage_specs(stage_configs), total_frames)
+        except StageRuleError as e:
+            print(f"⚠ 阶段规则无效，跳过流式阶段分析: {e}")
+            self.discard(video_id)
+            return None
+        with self._lock:
+            self.streams[video_id] = stream
+            self._completed.pop(video_id, None)
+        return stream
+    
+    def complete(self, stream: VideoStageStream) -> None:
+        """OCR任务完成：流式分析器只保留最终结果，已完成的视频超过上限时丢弃最早完成的"""
+        stream.complete()
+        with self._lock:
+            if self.streams.get(stream.video_id) is not stream:
+                return
+            self._completed[stream.video_id] = None
+            self._completed.move_to_end(stream.video_id)
+            while len(self._completed) > MAX_COMPLETED_STREAMS:
+                video_id, _ = self._completed.popitem(last=False)
+                self.streams.pop(video_id, None)
+    
+    def get(self, video_id: int) -> Optional[VideoStageStream]:
+        """获取视频的流式分析器"""
+        with self._lock:
+            return self.streams.get(video_id)
+    
+    def get_completed(self, video_id: int) -> Optional[VideoStageStream]:
+        """获取已完成的流式分析器"""
+        stream = self.get(video_id)
+        if stream and stream.completed:
+            return stream
+        return None
+    
+    def discard(self, video_id: int) -> None:
+        """阶段配置或OCR结果变化后丢弃已有的流式结果"""
+        with self._lock:
+            self.streams.pop(video_id, None)
+            self._completed.pop(video_id, None)
+    
+    def analyze_stage_pattern(self, video_id: int, request: StagePatternRequest, db: Session) -> Dict[str, Any]:
+        """阶段模式分析：OCR期间已完成流式分析时直接返回结果，否则完整计算
+        
+        流式结果不含关键词出现记录，include_pattern_details为True时完整计算。
+        只读取分析结果，不保存阶段耗时
+        """
+        stream = self.get_completed(video_id)
+        if stream and request.stage_id is None and request.confidence_threshold <= 0 and not request.include_pattern_details:
+            return stream.build_response()
+        
+        return keyword_pattern_analyzer.analyze_stage_pattern(video_id, request, db)
+    
+    def get_live_result(self, video_id: int) -> Dict[str, Any]:
+        """查询视频当前的流式分析结果"""
+        stream = self.get(video_id)
+        if not stream:
+            raise HTTPException(status_code=404, detail="该视频没有进行中或已完成的流式阶段分析")
+        return stream.build_response()
+
+
+# 创建全局实例
+stage_stream_manager = StageStreamManager()
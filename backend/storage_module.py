@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+存储用量模块
+按类别（视频、帧图片、OCR结果等）和视频统计文件数和字节数，接口直接读取计数，不再遍历存储目录。
+
+写入和删除文件时调用file_written / file_removed记录增量，增量先累加在内存中，
+由后台线程每FLUSH_INTERVAL秒通过写队列合并写入storage_usage表；计数保存在数据库中，
+OCR推理服务等其他进程写入的文件也会计入。
+后台线程启动时及之后每RECONCILE_INTERVAL秒遍历一次目录，用磁盘上的实际用量替换计数，
+修正进程崩溃丢失的增量和外部程序直接增删的文件
+"""
+
+from fastapi import HTTPException, BackgroundTasks
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models_simple import Video, StorageUsage
+from db_module import DatabaseWriter, db_writer
+from job_module import job_registry
+from config import StorageConfig
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import os
+import threading
+import time
+
+
+def _iter_files(path: str) -> Iterator[os.DirEntry]:
+    """递归遍历目录下的文件（不跟随符号链接）"""
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+        except FileNotFoundError:
+            continue
+
+
+def _parse_video_dir(name: str) -> Optional[int]:
+    """video_{id}子目录对应的视频ID"""
+    if name.startswith("video_") and name[6:].isdigit():
+        return int(name[6:])
+    return None
+
+
+class StorageAccountant:
+    """存储用量计数管理类
+    
+    计数以(类别, 视频ID)为单位，不按视频划分的类别及按视频划分的类别中不属于任何视频子目录的文件，视频ID为0
+    """
+    
+    def __init__(self, categories: Optional[Dict[str, str]] = None, per_video_categories: Optional[List[str]] = None,
+                 writer: Optional[DatabaseWriter] = None, flush_interval: float = StorageConfig.FLUSH_INTERVAL,
+                 reconcile_interval: float = StorageConfig.RECONCILE_INTERVAL):
+        self.categories = dict(categories if categories is not None else StorageConfig.CATEGORIES)
+        self.per_video_categories = set(per_video_categories if per_video_categories is not None
+                                        else StorageConfig.PER_VIDEO_CATEGORIES)
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self.reconcile_interval = reconcile_interval
+        # 按路径长度倒序，嵌套目录优先匹配更深的类别
+        self._roots = sorted(
+            ((os.path.join(os.path.abspath(path), ""), category) for category, path in self.categories.items()),
+            key=lambda item: len(item[0]), reverse=True
+        )
+        self._pending: Dict[Tuple[str, int], List[int]] = {}
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._flush_failing = False
+        self.last_reconciled_at: Optional[datetime] = None
+    
+    def classify(self, path) -> Optional[Tuple[str, int]]:
+        """文件所属的(类别, 视频ID)，不在任何存储目录下时返回None"""
+        path = os.path.abspath(path)
+        for root, category in self._roots:
+            if path.startswith(root):
+                if category not in self.per_video_categories:
+                    return category, 0
+                return category, _parse_video_dir(path[len(root):].split(os.sep, 1)[0]) or 0
+        return None
+    
+    def record(self, category: str, video_id: int, files: int, size: int) -> None:
+        """记录增量（只累加在内存中，由flush写入数据库）"""
+        with self._lock:
+            delta = self._pending.setdefault((category, video_id), [0, 0])
+            delta[0] += files
+            delta[1] += size
+    
+    def file_written(self, path, size: int, previous_size: Optional[int] = None) -> None:
+        """记录写入的文件，previous_size为覆盖前原文件的大小（新文件为None）"""
+        key = self.classify(path)
+        if key is None:
+            return
+        if previous_size is None:
+            self.record(*key, 1, size)
+        else:
+            self.record(*key, 0, size - previous_size)
+    
+    def file_removed(self, path, size: int) -> None:
+        """记录删除的文件"""
+        key = self.classify(path)
+        if key is not None:
+            self.record(*key, -1, -size)
+    
+    def file_moved(self, source, destination, size: int) -> None:
+        self.file_removed(source, size)
+        self.file_written(destination, size)
+    
+    def remove_file(self, path) -> int:
+        """删除文件并记录，返回文件大小；文件不存在时抛出FileNotFoundError"""
+        size = os.stat(path).st_size
+        os.remove(path)
+        self.file_removed(path, size)
+        return size
+    
+    def _apply_deltas(self, pending: Dict[Tuple[str, int], List[int]], session: Session) -> None:
+        """在写事务中将增量累加到计数（记录不存在时插入）"""
+        now = datetime.utcnow()
+        for (category, video_id), (files, size) in pending.items():
+            updated = session.query(StorageUsage).filter(
+                StorageUsage.category == category, StorageUsage.video_id == video_id
+            ).update({
+                StorageUsage.file_count: StorageUsage.file_count + files,
+                StorageUsage.total_bytes: StorageUsage.total_bytes + size,
+                StorageUsage.updated_at: now
+            }, synchronize_session=False)
+            if not updated:
+                session.add(StorageUsage(category=category, video_id=video_id, file_count=files,
+                                         total_bytes=size, updated_at=now))
+                session.flush()
+        
+        # 视频的文件已全部删除时不再保留该视频的计数
+        video_ids = {video_id for _, video_id in pending if video_id}
+        if video_ids:
+            session.query(StorageUsage).filter(
+                StorageUsage.video_id.in_(video_ids), StorageUsage.file_count <= 0, StorageUsage.total_bytes <= 0
+            ).delete(synchronize_session=False)
+    
+    def flush(self) -> None:
+        """将内存中的增量写入数据库并等待提交，失败时保留增量下次重试"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        pending = {key: delta for key, delta in pending.items() if delta != [0, 0]}
+        if not pending:
+            return
+        
+        try:
+            (self.writer or db_writer).execute(lambda session: self._apply_deltas(pending, session))
+            self._flush_failing = False
+        except Exception as e:
+            with self._lock:
+                for key, (files, size) in pending.items():
+                    delta = self._pending.setdefault(key, [0, 0])
+                    delta[0] += files
+                    delta[1] += size
+            # 持续失败时只输出一次
+            if not self._flush_failing:
+                print(f"写入存储用量失败: {e}")
+            self._flush_failing = True
+    
+    def scan(self) -> Dict[Tuple[str, int], List[int]]:
+        """遍历存储目录，统计磁盘上实际的文件数和字节数"""
+        totals: Dict[Tuple[str, int], List[int]] = {}
+        
+        def add(key: Tuple[str, int], directory: str) -> None:
+            for entry in _iter_files(directory):
+                try:
+                    size = entry.stat(follow_symlinks=False).st_size
+                except FileNotFoundError:
+                    continue
+                total = totals.setdefault(key, [0, 0])
+                total[0] += 1
+                total[1] += size
+        
+        for category, path in self.categories.items():
+            if category not in self.per_video_categories:
+                add((category, 0), path)
+                continue
+            try:
+                entries = list(os.scandir(path))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                video_id = _parse_video_dir(entry.name) if entry.is_dir(follow_symlinks=False) else None
+                if video_id:
+                    add((category, video_id), entry.path)
+                elif entry.is_dir(follow_symlinks=False):
+                    add((category, 0), entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    total = totals.setdefault((category, 0), [0, 0])
+                    total[0] += 1
+                    total[1] += entry.stat(follow_symlinks=False).st_size
+        return totals
+    
+    def reconcile(self) -> Dict[str, Any]:
+        """用磁盘上的实际用量替换计数，返回各类别的用量和修正的差值
+        
+        遍历期间写入的文件可能被重复计入或遗漏，差值在下一次核对时修正
+        """
+        with self._reconcile_lock:
+            self.flush()
+            started = time.monotonic()
+            totals = self.scan()
+            
+            def replace(session: Session) -> Dict[str, List[int]]:
+                drift: Dict[str, List[int]] = {}
+                for row in session.query(StorageUsage):
+                    old = drift.setdefault(row.category, [0, 0])
+                    old[0] -= row.file_count
+                    old[1] -= row.total_bytes
+                session.query(StorageUsage).delete(synchronize_session=False)
+                now = datetime.utcnow()
+                for (category, video_id), (files, size) in totals.items():
+                    session.add(StorageUsage(category=category, video_id=video_id, file_count=files,
+                                             total_bytes=size, updated_at=now))
+                    new = drift.setdefault(category, [0, 0])
+                    new[0] += files
+                    new[1] += size
+                return drift
+            
+            drift = (self.writer or db_writer).execute(replace)
+            self.last_reconciled_at = datetime.utcnow()
+        
+        usage = {category: {"file_count": 0, "total_bytes": 0} for category in self.categories}
+        for (category, _), (files, size) in totals.items():
+            usage[category]["file_count"] += files
+            usage[category]["total_bytes"] += size
+        return {
+            "usage": usage,
+            "drift": {
+                category: {"file_count": files, "total_bytes": size}
+                for category, (files, size) in drift.items() if files or size
+            },
+            "scan_seconds": round(time.monotonic() - started, 3),
+            "reconciled_at": self.last_reconciled_at
+        }
+    
+    def _pending_snapshot(self) -> Dict[Tuple[str, int], List[int]]:
+        with self._lock:
+            return {key: list(delta) for key, delta in self._pending.items()}
+    
+    def get_usage(self, db: Session) -> Dict[str, Dict[str, int]]:
+        """各类别的文件数和字节数（数据库中的计数加上尚未写入的增量）"""
+        usage = {category: {"file_count": 0, "total_bytes": 0} for category in self.categories}
+        rows = db.query(
+            StorageUsage.category, func.sum(StorageUsage.file_count), func.sum(StorageUsage.total_bytes)
+        ).group_by(StorageUsage.category)
+        totals = [(category, files, size) for category, files, size in rows]
+        totals.extend((category, files, size) for (category, _), (files, size) in self._pending_snapshot().items())
+        for category, files, size in totals:
+            if category in usage:
+                usage[category]["file_count"] += int(files or 0)
+                usage[category]["total_bytes"] += int(size or 0)
+        for value in usage.values():
+            value["file_count"] = max(value["file_count"], 0)
+            value["total_bytes"] = max(value["total_bytes"], 0)
+        return usage
+    
+    def get_video_usage(self, video_id: int, db: Session) -> Dict[str, Any]:
+        """单个视频各类别产物的文件数和字节数"""
+        if db.query(Video.id).filter(Video.id == video_id).first() is None:
+            raise HTTPException(status_code=404, detail="视频不存在")
+        
+        usage = {category: [0, 0] for category in sorted(self.per_video_categories)}
+        rows = db.query(StorageUsage.category, StorageUsage.file_count, StorageUsage.total_bytes).filter(
+            StorageUsage.video_id == video_id
+        )
+        totals = [(category, files, size) for category, files, size in rows]
+        totals.extend(
+            (category, files, size) for (category, pending_video_id), (files, size) in self._pending_snapshot().items()
+            if pending_video_id == video_id
+        )
+        for category, files, size in totals:
+            if category in usage:
+                usage[category][0] += files
+                usage[category][1] += size
+        
+        categories = {
+            category: {"file_count": max(files, 0), "total_bytes": max(size, 0)}
+            for category, (files, size) in usage.items()
+        }
+        return {
+            "video_id": video_id,
+            "categories": categories,
+            "file_count": sum(value["file_count"] for value in categories.values()),
+            "total_bytes": sum(value["total_bytes"] for value in categories.values())
+        }
+    
+    def start_reconcile_job(self, background_tasks: BackgroundTasks) -> Dict[str, Any]:
+        """创建后台核对任务并返回任务信息，正在核对时返回已有任务"""
+        job = job_registry.find_active("reconcile_storage", {})
+        if job is None:
+            job = job_registry.create("reconcile_storage", {})
+            background_tasks.add_task(job_registry.run, job["job_id"], self.reconcile)
+        return job
+    
+    def _run(self, reconcile: bool) -> None:
+        next_reconcile = time.monotonic() if reconcile else None
+        while not self._stop_event.is_set():
+            try:
+                if next_reconcile is not None and time.monotonic() >= next_reconcile:
+                    next_reconcile = time.monotonic() + self.reconcile_interval
+                    result = self.reconcile()
+                    if result["drift"]:
+                        print(f"存储用量已与磁盘核对，修正: {result['drift']}")
+                else:
+                    self.flush()
+            except Exception as e:
+                print(f"存储用量统计失败: {e}")
+            self._stop_event.wait(self.flush_interval)
+    
+    def start(self, reconcile: bool = True) -> None:
+        """启动后台线程：定期写入增量，reconcile为True时启动后立即及之后定期与磁盘核对"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(reconcile,), name="storage-accountant", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止后台线程并写入剩余的增量"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+
+# 创建全局实例
+storage_accountant = StorageAccountant()
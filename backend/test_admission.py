@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+准入控制测试脚本
+验证并发限制与先进先出排队、队列已满返回429、排队超时返回503（均带Retry-After），以及客户端断开时名额不丢失
+"""
+
+import asyncio
+from fastapi import HTTPException
+
+from admission_module import AdmissionLimiter, AdmissionController
+
+
+def test_queue_and_rejections():
+    """测试并发数限制、排队顺序、429和503"""
+    print("=== 并发限制与拒绝测试 ===")
+    
+    async def run():
+        limiter = AdmissionLimiter("ocr", max_concurrent=2, max_queue=2, queue_timeout=0.2, retry_after=7, label="OCR处理")
+        release = asyncio.Event()
+        order = []
+        
+        async def request(name):
+            async with limiter.slot():
+                order.append(name)
+                await release.wait()
+        
+        tasks = [asyncio.create_task(request(i)) for i in range(4)]
+        await asyncio.sleep(0.01)
+        assert limiter.active == 2 and limiter.info()["queue_depth"] == 2
+        assert order == [0, 1]
+        
+        # 队列已满：立即返回429，尚无耗时统计时使用配置的Retry-After
+        try:
+            await limiter.acquire()
+            assert False, "队列已满应返回429"
+        except HTTPException as e:
+            assert e.status_code == 429 and e.headers["Retry-After"] == "7"
+            assert "OCR处理" in e.detail
+        
+        release.set()
+        await asyncio.gather(*tasks)
+        assert order == [0, 1, 2, 3]
+        assert limiter.active == 0
+        
+        # 占满名额后排队超时：返回503，Retry-After按平均耗时估算
+        blocker = asyncio.Event()
+        holders = [asyncio.create_task(_hold(limiter, blocker)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        try:
+            await limiter.acquire()
+            assert False, "排队超时应返回503"
+        except HTTPException as e:
+            assert e.status_code == 503 and int(e.headers["Retry-After"]) >= 1
+        blocker.set()
+        await asyncio.gather(*holders)
+        
+        info = limiter.info()
+        assert info["rejected_queue_full"] == 1 and info["rejected_timeout"] == 1
+        assert info["admitted"] == 6 and info["queued"] == 3 and info["max_queue_depth"] == 2
+        assert info["active"] == 0 and info["queue_depth"] == 0
+        return info
+    
+    info = asyncio.run(run())
+    print(f"✓ 并发限制与拒绝测试通过，状态: {info}")
+
+
+async def _hold(limiter, event):
+    async with limiter.slot():
+        await event.wait()
+
+
+def test_cancelled_waiter():
+    """测试排队中的请求被取消（客户端断开）后，名额移交给后面的请求"""
+    print("=== 取消排队请求测试 ===")
+    
+    async def run():
+        limiter = AdmissionLimiter("analysis", max_concurrent=1, max_queue=4, queue_timeout=5, retry_after=1)
+        blocker = asyncio.Event()
+        holder = asyncio.create_task(_hold(limiter, blocker))
+        await asyncio.sleep(0.01)
+        
+        cancelled = asyncio.create_task(_hold(limiter, asyncio.Event()))
+        waiting = asyncio.create_task(_hold(limiter, asyncio.Event()))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.sleep(0.01)
+        
+        blocker.set()
+        await holder
+        await asyncio.sleep(0.01)
+        # 被取消的请求没有占用名额，名额移交给了后面的请求
+        assert limiter.active == 1 and limiter.info()["queue_depth"] == 0
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert limiter.active == 0
+    
+    asyncio.run(run())
+    print("✓ 取消排队请求测试通过")
+
+
+def test_controller_info():
+    """测试按配置创建各接口类别"""
+    print("=== 接口类别配置测试 ===")
+    controller = AdmissionController()
+    info = controller.info()
+    assert {"frame_extraction", "ocr", "analysis"} <= set(info)
+    assert all(item["active"] == 0 and item["queue_depth"] == 0 for item in info.values())
+    print("✓ 接口类别配置测试通过")
+
+
+if __name__ == "__main__":
+    test_queue_and_rejections()
+    test_cancelled_waiter()
+    test_controller_info()
+    print("\n所有测试通过")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步数据库访问测试脚本
+验证异步会话（aiosqlite）与线程池替代会话的查询结果一致，且PRAGMA在异步连接上生效
+"""
+
+import asyncio
+import os
+import tempfile
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from db_module import create_db_engine
+from async_db_module import create_async_db_engine, ThreadPoolSession, ASYNC_DRIVER_AVAILABLE
+from models_simple import Base, Project, Video, VideoFrame
+from frame_extraction_module import frame_extractor
+
+
+def create_test_database(frame_count: int = 30) -> tuple:
+    """创建临时文件数据库并写入一个视频的帧记录"""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="async_db_"), "test.db")
+    database_url = f"sqlite:///{db_path}"
+    engine = create_db_engine(database_url)
+    Base.metadata.create_all(engine)
+    
+    SessionFactory = sessionmaker(bind=engine)
+    db = SessionFactory()
+    project = Project(name="异步测试项目")
+    db.add(project)
+    db.commit()
+    video = Video(project_id=project.id, original_filename="a.mp4", stored_filename="a.mp4", file_path="a.mp4", file_size=1)
+    db.add(video)
+    db.commit()
+    # 乱序写入，验证按帧序号排序
+    for frame_number in reversed(range(frame_count)):
+        db.add(VideoFrame(video_id=video.id, frame_number=frame_number, timestamp_ms=frame_number * 100, frame_path="x.jpg"))
+    db.commit()
+    video_id = video.id
+    db.close()
+    return database_url, engine, SessionFactory, video_id
+
+
+def test_async_and_threadpool_sessions():
+    """测试两种会话返回相同的帧列表"""
+    print("=== 异步会话查询测试 ===")
+    database_url, engine, SessionFactory, video_id = create_test_database()
+    
+    async def load_frames(session):
+        try:
+            frames = await frame_extractor.get_video_frames(video_id, session)
+            return [(frame.frame_number, frame.timestamp_ms) for frame in frames]
+        finally:
+            await session.close()
+    
+    expected = [(i, i * 100) for i in range(30)]
+    assert asyncio.run(load_frames(ThreadPoolSession(SessionFactory))) == expected
+    
+    if ASYNC_DRIVER_AVAILABLE:
+        from sqlalchemy.ext.asyncio import AsyncSession
+        
+        async def run_async():
+            async_engine = create_async_db_engine(database_url)
+            try:
+                session = AsyncSession(async_engine, expire_on_commit=False)
+                frames = await load_frames(session)
+                async with async_engine.connect() as conn:
+                    journal_mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+                return frames, journal_mode
+            finally:
+                await async_engine.dispose()
+        
+        frames, journal_mode = asyncio.run(run_async())
+        assert frames == expected
+        assert journal_mode == "wal"
+    else:
+        print("未安装aiosqlite，跳过异步驱动测试")
+    
+    engine.dispose()
+    print("✓ 异步会话查询测试通过")
+
+
+def test_missing_video():
+    """测试视频不存在时返回404"""
+    print("=== 视频不存在测试 ===")
+    database_url, engine, SessionFactory, video_id = create_test_database(frame_count=1)
+    
+    async def load_missing():
+        session = ThreadPoolSession(SessionFactory)
+        try:
+            await frame_extractor.get_video_frames(video_id + 1, session)
+        finally:
+            await session.close()
+    
+    try:
+        asyncio.run(load_missing())
+        raise AssertionError("应当抛出404")
+    except Exception as e:
+        assert getattr(e, "status_code", None) == 404
+    
+    engine.dispose()
+    print("✓ 视频不存在测试通过")
+
+
+if __name__ == "__main__":
+    test_async_and_threadpool_sessions()
+    test_missing_video()
+    print("\n所有测试通过")
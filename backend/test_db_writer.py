@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库写队列测试脚本
+验证SQLite生产配置的PRAGMA、写任务合并提交以及失败任务的隔离
+"""
+
+import os
+import tempfile
+import threading
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from db_module import create_db_engine, DatabaseWriter
+
+
+def create_writer():
+    """创建临时文件数据库和写队列"""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="db_writer_"), "test.db")
+    engine = create_db_engine(f"sqlite:///{db_path}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE items (value INTEGER UNIQUE)")
+    return engine, DatabaseWriter(sessionmaker(bind=engine))
+
+
+def test_sqlite_pragmas():
+    """测试生产配置的PRAGMA已生效"""
+    print("=== SQLite PRAGMA测试 ===")
+    engine, writer = create_writer()
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() > 0
+    engine.dispose()
+    print("✓ PRAGMA测试通过")
+
+
+def test_batched_writes_and_failure_isolation():
+    """测试并发写任务合并提交，且单个失败任务不影响同批其他任务"""
+    print("=== 写队列测试 ===")
+    engine, writer = create_writer()
+    
+    def insert(value):
+        return lambda session: session.execute(text("INSERT INTO items VALUES (:value)"), {"value": value})
+    
+    # 多个线程同时提交，其中重复值会违反唯一约束
+    futures = []
+    lock = threading.Lock()
+    
+    def submit_many(offset):
+        for i in range(50):
+            future = writer.submit(insert(offset * 50 + i if i != 49 else 0))
+            with lock:
+                futures.append(future)
+    
+    threads = [threading.Thread(target=submit_many, args=(t,)) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    failures = 0
+    for future in futures:
+        try:
+            future.result(timeout=10)
+        except Exception:
+            failures += 1
+    writer.stop()
+    
+    with engine.connect() as conn:
+        count = conn.exec_driver_sql("SELECT COUNT(*) FROM items").scalar()
+    print(f"  任务数: {writer.stats['jobs']}, 事务数: {writer.stats['transactions']}, 失败: {failures}")
+    # 每个线程的最后一个任务都写入0，与第一个线程的第一个任务重复，因此恰好4个任务失败
+    assert count == 200 - failures
+    assert failures == 4
+    engine.dispose()
+    print("✓ 写队列测试通过")
+
+
+if __name__ == "__main__":
+    test_sqlite_pragmas()
+    test_batched_writes_and_failure_isolation()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧记录批量写入测试脚本
+验证分帧过程中帧记录按批写入、每批提交后即可查询到并更新数据版本号，
+以及归档存储时已写入数据库的帧都能读取到图片
+"""
+
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+
+from db_module import create_db_engine, DatabaseWriter
+from models_simple import Base, Project, Video, VideoFrame, VideoDataVersion
+from frame_extraction_module import FrameExtractor, FrameRowWriter
+from frame_store_module import FrameStore
+
+
+def create_test_env():
+    """创建临时数据库和一个视频记录"""
+    base_dir = Path(tempfile.mkdtemp(prefix="frame_insert_"))
+    engine = create_db_engine(f"sqlite:///{base_dir / 'test.db'}")
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    db = SessionFactory()
+    try:
+        project = Project(name="帧写入测试项目")
+        db.add(project)
+        db.commit()
+        video = Video(project_id=project.id, original_filename="a.avi", stored_filename="a.avi",
+                      file_path=str(base_dir / "a.avi"), file_size=1000)
+        db.add(video)
+        db.commit()
+        video_id = video.id
+    finally:
+        db.close()
+    return SessionFactory, DatabaseWriter(SessionFactory), base_dir, video_id
+
+
+def count_frames(SessionFactory, video_id: int) -> int:
+    db = SessionFactory()
+    try:
+        return db.query(VideoFrame).filter(VideoFrame.video_id == video_id).count()
+    finally:
+        db.close()
+
+
+def test_row_writer_batches():
+    """测试按批写入和增量可见"""
+    print("=== 帧记录分批写入测试 ===")
+    SessionFactory, writer, _, video_id = create_test_env()
+    try:
+        row_writer = FrameRowWriter(video_id, writer, batch_size=4)
+        frames = [{"frame_number": i, "timestamp_ms": i * 100, "frame_path": f"frame_{i}.jpg", "file_size": 10 + i}
+                  for i in range(10)]
+        
+        row_writer.add(frames[:3])
+        assert count_frames(SessionFactory, video_id) == 0
+        row_writer.add(frames[3:9])
+        # 满两批的帧已提交，剩余的帧等待下一批
+        assert count_frames(SessionFactory, video_id) == 8 and row_writer.inserted == 8
+        row_writer.flush()
+        assert count_frames(SessionFactory, video_id) == 9
+        row_writer.add(frames[9:])
+        row_writer.flush()
+        
+        db = SessionFactory()
+        try:
+            rows = db.query(VideoFrame).filter(VideoFrame.video_id == video_id).order_by(VideoFrame.frame_number).all()
+            assert [(row.frame_number, row.timestamp_ms, row.file_size) for row in rows] == [
+                (i, i * 100, 10 + i) for i in range(10)
+            ]
+            assert all(row.extracted_at is not None for row in rows)
+            # 每批提交都更新数据版本号
+            assert db.query(VideoDataVersion.version).filter(VideoDataVersion.video_id == video_id).scalar() == 4
+        finally:
+            db.close()
+    finally:
+        writer.stop()
+    print("✓ 帧记录分批写入测试通过")
+
+
+def test_streaming_extraction():
+    """测试归档分帧时边分帧边写入帧记录"""
+    print("=== 边分帧边写入测试 ===")
+    SessionFactory, writer, base_dir, video_id = create_test_env()
+    video_path = str(base_dir / "a.avi")
+    video_writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(100):
+        video_writer.write(np.full((48, 64, 3), i * 2, dtype=np.uint8))
+    video_writer.release()
+    
+    extractor = FrameExtractor()
+    extractor.frames_storage_path = str(base_dir / "frames")
+    extractor.storage_backend = "archive"
+    store = FrameStore()
+    row_writer = FrameRowWriter(video_id, writer, batch_size=16)
+    visible_counts = []
+    
+    def on_frames(frames):
+        row_writer.add(frames)
+        visible_counts.append(count_frames(SessionFactory, video_id))
+    
+    try:
+        frames = extractor.extract_video_frames(video_path, video_id, fps=10.0, quality=85, on_frames=on_frames)
+        row_writer.flush()
+        assert len(frames) == 100 and count_frames(SessionFactory, video_id) == 100
+        # 分帧结束前已有帧记录可见
+        assert any(0 < count < 100 for count in visible_counts)
+        
+        db = SessionFactory()
+        try:
+            for frame in db.query(VideoFrame).filter(VideoFrame.video_id == video_id):
+                image = store.read_image(frame.frame_path)
+                assert image is not None and len(store.read_bytes(frame.frame_path)) == frame.file_size
+        finally:
+            db.close()
+    finally:
+        writer.stop()
+    print("✓ 边分帧边写入测试通过")
+
+
+if __name__ == "__main__":
+    test_row_writer_batches()
+    test_streaming_extraction()
+    print("\n所有测试通过")
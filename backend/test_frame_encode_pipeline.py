@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分帧编码流水线测试脚本
+验证多个编码线程并行写入后帧信息按帧号排列、文件大小与编码数据一致，
+WebP/PNG格式的文件扩展名和格式识别，以及编码线程出错时分帧失败
+"""
+
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from frame_extraction_module import FrameExtractor
+from frame_store_module import FrameStore, frame_image_format
+
+
+def create_test_video(base_dir: Path, frame_count: int = 30) -> str:
+    """生成灰度逐帧递增的测试视频（10fps）"""
+    video_path = str(base_dir / "test.avi")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(frame_count):
+        writer.write(np.full((48, 64, 3), i * 8, dtype=np.uint8))
+    writer.release()
+    return video_path
+
+
+def create_extractor(base_dir: Path, storage_backend: str = "files", workers: int = 3) -> FrameExtractor:
+    extractor = FrameExtractor()
+    extractor.frames_storage_path = str(base_dir / "frames")
+    extractor.storage_backend = storage_backend
+    extractor.encode_workers = workers
+    return extractor
+
+
+def test_parallel_encode():
+    """测试多线程编码写入的结果顺序和文件大小"""
+    print("=== 并行编码测试 ===")
+    base_dir = Path(tempfile.mkdtemp(prefix="frame_encode_"))
+    video_path = create_test_video(base_dir)
+    extractor = create_extractor(base_dir)
+    
+    frames = extractor.extract_video_frames(video_path, 1, fps=10.0, quality=90, image_format="webp")
+    assert [frame["frame_number"] for frame in frames] == list(range(30))
+    assert [frame["timestamp_ms"] for frame in frames] == [i * 100 for i in range(30)]
+    for frame in frames:
+        path = Path(frame["frame_path"])
+        assert path.name == f"frame_{frame['frame_number']:06d}_{frame['timestamp_ms']}ms.webp"
+        assert path.stat().st_size == frame["file_size"]
+        assert frame_image_format(frame["frame_path"]) == "webp"
+        image = cv2.imread(frame["frame_path"])
+        assert abs(int(image.mean()) - frame["frame_number"] * 8) <= 3
+    
+    # max_frames限制提交的帧数
+    frames = extractor.extract_video_frames(video_path, 2, fps=5.0, quality=90, max_frames=4)
+    assert [frame["frame_number"] for frame in frames] == [0, 1, 2, 3]
+    assert all(frame["frame_path"].endswith(".jpg") for frame in frames)
+    print("✓ 并行编码测试通过")
+
+
+def test_png_archive():
+    """测试PNG格式写入归档时按文件头识别格式"""
+    print("=== PNG归档测试 ===")
+    base_dir = Path(tempfile.mkdtemp(prefix="frame_encode_"))
+    video_path = create_test_video(base_dir, frame_count=10)
+    extractor = create_extractor(base_dir, storage_backend="archive")
+    store = FrameStore()
+    
+    frames = extractor.extract_video_frames(video_path, 1, fps=10.0, quality=90, image_format="png")
+    assert len(frames) == 10
+    for frame in frames:
+        data = store.read_bytes(frame["frame_path"])
+        assert len(data) == frame["file_size"]
+        assert frame_image_format(frame["frame_path"], data) == "png"
+        # 测试视频为有损MJPG，灰度值与写入时有少量误差
+        assert abs(int(store.read_image(frame["frame_path"]).mean()) - frame["frame_number"] * 8) <= 3
+    print("✓ PNG归档测试通过")
+
+
+def test_encoder_error():
+    """测试编码线程出错时分帧失败而不是挂起"""
+    print("=== 编码出错测试 ===")
+    base_dir = Path(tempfile.mkdtemp(prefix="frame_encode_"))
+    video_path = create_test_video(base_dir)
+    extractor = create_extractor(base_dir, workers=1)
+    extractor.create_frame_directory(1)
+    # 帧文件路径被目录占用，写入时出错
+    (base_dir / "frames" / "video_1" / "frame_000000_0ms.jpg").mkdir()
+    
+    try:
+        extractor.extract_video_frames(video_path, 1, fps=10.0, quality=90)
+    except OSError:
+        pass
+    else:
+        raise AssertionError("编码线程出错时应抛出异常")
+    
+    try:
+        extractor.extract_video_frames(video_path, 1, fps=10.0, quality=90, image_format="bmp")
+    except ValueError as e:
+        assert "不支持的帧图片格式" in str(e)
+    else:
+        raise AssertionError("不支持的格式应抛出ValueError")
+    print("✓ 编码出错测试通过")
+
+
+if __name__ == "__main__":
+    test_parallel_encode()
+    test_png_archive()
+    test_encoder_error()
+    print("\n所有测试通过")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量分帧测试脚本
+验证重复分帧不重复保存帧、不产生重复帧记录，中断后定位到已写入的帧之后继续解码，
+提高采样率时只补充缺少的帧并按时间戳重新编号（帧图片文件名随帧号更新），前后两次帧率来源不同（时间戳相差1ms）时不产生重复帧，
+以及帧图片被清理后重新生成图片时保留原帧记录
+"""
+
+import asyncio
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+
+from db_module import create_db_engine, DatabaseWriter
+from models_simple import Base, Project, Video, VideoFrame
+from frame_extraction_module import FrameExtractor, FrameExtractionRequest
+
+
+class CountingCapture:
+    """记录解码帧数的VideoCapture包装"""
+    grabbed = 0
+    original = cv2.VideoCapture
+    
+    def __init__(self, *args):
+        self.cap = CountingCapture.original(*args)
+    
+    def grab(self):
+        CountingCapture.grabbed += 1
+        return self.cap.grab()
+    
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+def test_resumable_extraction():
+    """测试重复分帧、中断后继续、提高采样率和清理后重新生成"""
+    print("=== 增量分帧测试 ===")
+    base_dir = Path(tempfile.mkdtemp(prefix="frame_resume_"))
+    engine = create_db_engine(f"sqlite:///{base_dir / 'test.db'}")
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    
+    video_path = str(base_dir / "a.avi")
+    video_writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(40):
+        video_writer.write(np.full((48, 64, 3), i * 5, dtype=np.uint8))
+    video_writer.release()
+    
+    extractor = FrameExtractor()
+    extractor.frames_storage_path = str(base_dir / "frames")
+    extractor.writer = DatabaseWriter(SessionFactory)
+    db = SessionFactory()
+    
+    def extract(fps: float) -> dict:
+        return asyncio.run(extractor.extract_frames_from_video(video_id, FrameExtractionRequest(fps=fps), db))
+    
+    def frame_rows():
+        db.expire_all()
+        return db.query(VideoFrame).filter(VideoFrame.video_id == video_id).order_by(VideoFrame.timestamp_ms).all()
+    
+    try:
+        project = Project(name="增量分帧测试项目")
+        db.add(project)
+        db.commit()
+        video = Video(project_id=project.id, original_filename="a.avi", stored_filename="a.avi",
+                      file_path=video_path, file_size=1000, fps=10)
+        db.add(video)
+        db.commit()
+        video_id = video.id
+        
+        result = extract(5.0)
+        assert result["total_frames"] == 20 and result["new_frames"] == 20 and result["existing_frames"] == 0
+        first_mtimes = {path.name: path.stat().st_mtime_ns for path in (base_dir / "frames" / f"video_{video_id}").iterdir()}
+        
+        # 重复分帧：不重复保存帧，也不新增帧记录
+        result = extract(5.0)
+        assert result["new_frames"] == 0 and result["total_frames"] == 20 and len(frame_rows()) == 20
+        assert {path.name: path.stat().st_mtime_ns
+                for path in (base_dir / "frames" / f"video_{video_id}").iterdir()} == first_mtimes
+        
+        # 模拟中断：最后8帧没有写入数据库
+        db.query(VideoFrame).filter(VideoFrame.video_id == video_id, VideoFrame.frame_number >= 12).delete()
+        db.commit()
+        cv2.VideoCapture = CountingCapture
+        try:
+            result = extract(5.0)
+        finally:
+            cv2.VideoCapture = CountingCapture.original
+        assert result["new_frames"] == 8 and result["existing_frames"] == 12
+        # 从第12个采样帧（源视频第24帧）开始解码，不再重新解码之前的帧
+        assert CountingCapture.grabbed == 40 - 24 + 1
+        rows = frame_rows()
+        assert [row.frame_number for row in rows] == list(range(20))
+        assert [row.timestamp_ms for row in rows] == [i * 200 for i in range(20)]
+        for row in rows[12:]:
+            assert abs(int(cv2.imread(row.frame_path).mean()) - row.frame_number * 10) <= 3
+        resumed_ids = {row.timestamp_ms: row.id for row in rows}
+        
+        # 提高采样率：只补充缺少的时间戳，已有帧的ID不变，帧号按时间戳重新排列
+        result = extract(10.0)
+        assert result["new_frames"] == 20 and result["total_frames"] == 40
+        rows = frame_rows()
+        assert [row.timestamp_ms for row in rows] == [i * 100 for i in range(40)]
+        assert [row.frame_number for row in rows] == list(range(40))
+        for row in rows:
+            assert Path(row.frame_path).name == f"frame_{row.frame_number:06d}_{row.timestamp_ms}ms.jpg"
+            assert abs(int(cv2.imread(row.frame_path).mean()) - row.frame_number * 5) <= 3
+        assert all(resumed_ids[row.timestamp_ms] == row.id for row in rows if row.timestamp_ms in resumed_ids)
+        
+        # 帧率来源不同：按探测后保存的帧率计算的时间戳与已有帧相差几毫秒，按源视频帧序号匹配，不新增帧记录
+        video.fps = 10.01
+        db.commit()
+        result = extract(10.0)
+        assert result["new_frames"] == 0 and result["existing_frames"] == 40
+        assert [row.timestamp_ms for row in frame_rows()] == [i * 100 for i in range(40)]
+        
+        # 帧图片被清理后重新分帧：重新生成图片，更新原帧记录（沿用原时间戳）
+        ids = [row.id for row in rows]
+        shutil.rmtree(base_dir / "frames" / f"video_{video_id}")
+        video.frames_purged_at = datetime.utcnow()
+        db.commit()
+        result = extract(10.0)
+        assert result["new_frames"] == 0 and result["total_frames"] == 40
+        rows = frame_rows()
+        assert [row.id for row in rows] == ids
+        assert [row.timestamp_ms for row in rows] == [i * 100 for i in range(40)]
+        for row in rows:
+            assert Path(row.frame_path).stat().st_size == row.file_size
+            assert abs(int(cv2.imread(row.frame_path).mean()) - row.frame_number * 5) <= 3
+        db.refresh(video)
+        assert video.frames_purged_at is None
+    finally:
+        db.close()
+        extractor.writer.stop()
+    print("✓ 增量分帧测试通过")
+
+
+if __name__ == "__main__":
+    test_resumable_extraction()
+    print("\n所有测试通过")
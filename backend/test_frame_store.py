@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧归档存储测试脚本
+验证帧追加到归档文件后按偏移读取、归档追加或删除重建后重新映射，
+以及archive存储方式下分帧只生成一个归档文件且帧图片可正常解码
+"""
+
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from frame_extraction_module import FrameExtractor
+from frame_store_module import FrameArchiveWriter, FrameStore, FRAME_ARCHIVE_NAME, parse_frame_ref, frame_file_path
+
+
+def test_archive_round_trip():
+    """测试追加、按偏移读取和重新映射"""
+    print("=== 帧归档读写测试 ===")
+    frames_dir = Path(tempfile.mkdtemp(prefix="frame_store_")) / "video_1"
+    store = FrameStore(max_mapped_archives=1)
+    
+    with FrameArchiveWriter(frames_dir) as writer:
+        first = writer.append(b"first-frame")
+        second = writer.append(b"second")
+        writer.flush()
+        archive_path = str(frames_dir / FRAME_ARCHIVE_NAME)
+        assert parse_frame_ref(first) == (archive_path, 0, 11)
+        assert parse_frame_ref(second) == (archive_path, 11, 6)
+        assert frame_file_path(second) == archive_path
+        assert parse_frame_ref(str(frames_dir / "frame_000001_0ms.jpg")) is None
+        
+        assert store.read_bytes(second) == b"second"
+        # 映射之后追加的帧需要重新映射
+        third = writer.append(b"third")
+        writer.flush()
+        assert store.read_bytes(third) == b"third"
+        assert store.read_bytes(first) == b"first-frame"
+    
+    # 再次打开时从文件末尾继续追加
+    with FrameArchiveWriter(frames_dir) as writer:
+        assert parse_frame_ref(writer.append(b"x"))[1] == 22
+    
+    # 删除后重建的归档不能读到旧映射中的数据
+    store.release(archive_path)
+    Path(archive_path).unlink()
+    assert not store.exists(first)
+    with FrameArchiveWriter(frames_dir) as writer:
+        rebuilt = writer.append(b"REBUILT-FRAME")
+    assert rebuilt == first.replace(":11", ":13")
+    assert store.read_bytes(rebuilt) == b"REBUILT-FRAME"
+    assert not store.exists(second.replace(":6", ":600"))
+    print("✓ 帧归档读写测试通过")
+
+
+def test_extract_to_archive():
+    """测试archive存储方式的分帧"""
+    print("=== 归档分帧测试 ===")
+    base_dir = Path(tempfile.mkdtemp(prefix="frame_store_"))
+    video_path = str(base_dir / "test.avi")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(20):
+        writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+    writer.release()
+    
+    extractor = FrameExtractor()
+    extractor.frames_storage_path = str(base_dir / "frames")
+    extractor.storage_backend = "archive"
+    store = FrameStore()
+    
+    frames = extractor.extract_video_frames(video_path, 1, fps=5.0, quality=90)
+    assert len(frames) == 10
+    assert [path.name for path in (base_dir / "frames" / "video_1").iterdir()] == [FRAME_ARCHIVE_NAME]
+    archive_size = (base_dir / "frames" / "video_1" / FRAME_ARCHIVE_NAME).stat().st_size
+    assert sum(frame["file_size"] for frame in frames) == archive_size
+    
+    for frame in frames:
+        image = store.read_image(frame["frame_path"])
+        assert image is not None and image.shape == (48, 64, 3)
+        # 第n帧的灰度约为n*20（每秒5帧，从10fps视频中隔帧取）
+        assert abs(int(image.mean()) - frame["frame_number"] * 20) <= 3
+    print("✓ 归档分帧测试通过")
+
+
+if __name__ == "__main__":
+    test_archive_round_trip()
+    test_extract_to_archive()
+    print("\n所有测试通过")
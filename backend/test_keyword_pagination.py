@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+关键词出现记录分页测试脚本
+验证occurrences模式按游标翻页直到游标为None，各关键词出现记录不重复、不遗漏，
+出现记录较少的关键词取完后在后续页返回空列表
+"""
+
+import json
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models_simple import Base, Project, Video, VideoFrame, OCRResult
+from keyword_pattern_module import keyword_pattern_analyzer, KeywordPatternRequest
+from ocr_text_line_module import backfill_text_lines
+
+
+def create_video_with_ocr():
+    """创建模拟视频：第0-2帧显示"加载中"，第3-12帧显示"首页" """
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    
+    project = Project(name="keyword-pagination")
+    db.add(project)
+    db.flush()
+    video = Video(project_id=project.id, original_filename="a.mp4", stored_filename="a.mp4", file_path="/tmp/a.mp4", file_size=0)
+    db.add(video)
+    db.flush()
+    
+    for i in range(13):
+        frame = VideoFrame(video_id=video.id, frame_number=i, timestamp_ms=i * 500, frame_path=f"/tmp/frame_{i}.jpg")
+        db.add(frame)
+        db.flush()
+        text = "加载中" if i < 3 else "首页"
+        db.add(OCRResult(
+            frame_id=frame.id,
+            text_content=json.dumps([text], ensure_ascii=False),
+            confidence=0.9,
+            bbox=json.dumps([{"id": 0, "text": text, "confidence": 0.9}], ensure_ascii=False)
+        ))
+    db.commit()
+    return db, video.id
+
+
+def collect_pages(video_id: int, db, keywords, limit: int):
+    """翻页直到游标为None，返回各关键词每页的出现时间戳"""
+    pages = []
+    cursor = None
+    while True:
+        request = KeywordPatternRequest(keywords=keywords, response_mode="occurrences", limit=limit, cursor=cursor)
+        result = keyword_pattern_analyzer.analyze_keyword_pattern(video_id, request, db)
+        pages.append({
+            item["keyword"]: [occurrence["timestamp_ms"] for occurrence in item["occurrences"]]
+            for item in result["keyword_results"]
+        })
+        cursor = result["next_cursor"]
+        if cursor is None:
+            return pages
+        assert len(pages) < 20, "游标未结束"
+
+
+def test_paginate_until_done():
+    """测试翻页到最后一页，出现记录不重复"""
+    print("=== 关键词出现记录分页测试 ===")
+    db, video_id = create_video_with_ocr()
+    keywords = ["加载中", "首页", "不存在"]
+    
+    for source in ("ocr_results", "text_lines"):
+        if source == "text_lines":
+            backfill_text_lines(db, video_id)
+        pages = collect_pages(video_id, db, keywords, limit=2)
+        assert len(pages) == 5, source
+        
+        # "加载中"在第2页取完，之后各页为空
+        assert [page["加载中"] for page in pages] == [[0, 500], [1000], [], [], []]
+        for keyword, expected in (("加载中", [0, 500, 1000]), ("首页", [i * 500 for i in range(3, 13)]), ("不存在", [])):
+            timestamps = [timestamp for page in pages for timestamp in page[keyword]]
+            assert timestamps == expected, (source, keyword, timestamps)
+    
+    # 所有关键词在第一页取完时不返回游标
+    request = KeywordPatternRequest(keywords=["加载中"], response_mode="occurrences", limit=3)
+    assert keyword_pattern_analyzer.analyze_keyword_pattern(video_id, request, db)["next_cursor"] is None
+    db.close()
+    print("✓ 关键词出现记录分页测试通过")
+
+
+if __name__ == "__main__":
+    test_paginate_until_done()
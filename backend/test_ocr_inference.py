@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR推理服务测试脚本
+使用模拟识别器验证：多个客户端并发提交的帧被合并成批、识别失败返回给对应的请求、推理服务重启后客户端自动重连
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ocr_inference_module import OCRBatcher, OCRInferenceServer, RemoteOCRClient
+
+
+class FakeProcessor:
+    """模拟OCRProcessor.process_frames_ocr，记录每批的帧数"""
+    
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.batch_sizes = []
+    
+    def process_frames_ocr(self, frames, lang="ch", save_raw_result=True):
+        self.batch_sizes.append(len(frames))
+        time.sleep(self.delay)
+        results = []
+        for frame in frames:
+            if frame["frame_path"].endswith("missing.jpg"):
+                results.append(ValueError(f"帧图片文件不存在: {frame['frame_path']}"))
+            else:
+                results.append({"frame_id": frame["frame_id"], "frame_path": frame["frame_path"], "full_text": f"帧{frame['frame_id']}", "language": lang})
+        return results
+
+
+def start_server(socket_path: str, processor: FakeProcessor, max_batch_size: int = 8):
+    server = OCRInferenceServer(socket_path, OCRBatcher(processor, max_batch_size=max_batch_size, max_batch_delay_ms=20))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+def stop_server(server, thread):
+    server.shutdown()
+    server.server_close()
+    thread.join(5)
+
+
+def test_dynamic_batching():
+    """测试并发请求合并成批，结果按请求返回"""
+    print("=== 动态批处理测试 ===")
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="ocr_inference_"), "ocr.sock")
+    processor = FakeProcessor()
+    server, thread = start_server(socket_path, processor)
+    client = RemoteOCRClient(socket_path, timeout=10)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda i: client.process_frame_ocr(f"frame_{i}.jpg", i, video_id=1), range(32)))
+        
+        assert [result["frame_id"] for result in results] == list(range(32))
+        assert all(result["frame_path"] == f"frame_{i}.jpg" for i, result in enumerate(results))
+        assert sum(processor.batch_sizes) == 32
+        assert max(processor.batch_sizes) > 1 and max(processor.batch_sizes) <= 8
+        
+        stats = client.ping()["stats"]
+        assert stats["frames"] == 32 and stats["batches"] == len(processor.batch_sizes)
+        print(f"✓ 动态批处理测试通过，32帧分为{len(processor.batch_sizes)}批: {processor.batch_sizes}")
+    finally:
+        stop_server(server, thread)
+
+
+def test_errors_and_reconnect():
+    """测试单帧识别失败只影响该请求，推理服务重启后客户端重连"""
+    print("=== 错误与重连测试 ===")
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="ocr_inference_"), "ocr.sock")
+    processor = FakeProcessor(delay=0)
+    server, thread = start_server(socket_path, processor)
+    client = RemoteOCRClient(socket_path, timeout=10)
+    try:
+        try:
+            client.process_frame_ocr("missing.jpg", 1)
+            assert False, "识别失败应抛出ValueError"
+        except ValueError as e:
+            assert "帧图片文件不存在" in str(e)
+        assert client.process_frame_ocr("frame_2.jpg", 2)["full_text"] == "帧2"
+        
+        # 重启推理服务后，旧连接失效，客户端自动重连
+        stop_server(server, thread)
+        server, thread = start_server(socket_path, processor)
+        assert client.process_frame_ocr("frame_3.jpg", 3)["full_text"] == "帧3"
+    finally:
+        stop_server(server, thread)
+    
+    try:
+        client.process_frame_ocr("frame_4.jpg", 4)
+        assert False, "推理服务停止后应抛出ValueError"
+    except ValueError as e:
+        assert "不可用" in str(e)
+    print("✓ 错误与重连测试通过")
+
+
+if __name__ == "__main__":
+    test_dynamic_batching()
+    test_errors_and_reconnect()
+    print("\n所有测试通过")
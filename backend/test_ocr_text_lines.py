@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR文本行测试脚本
+验证文本行迁移、基于文本行的关键词分析与整帧分析结果一致，以及单行置信度过滤；
+阶段分析、项目批量分析和OCR过程中的流式阶段分析同样在文本行上匹配关键词，结果与整帧分析一致
+"""
+
+import json
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models_simple import Base, Project, Video, VideoFrame, OCRResult, OCRTextLine, StageConfig
+from keyword_pattern_module import (
+    keyword_pattern_analyzer, KeywordPatternRequest, StagePatternRequest, ProjectStagePatternRequest
+)
+from ocr_text_line_module import (
+    backfill_text_lines, query_keyword_line_matches, match_text_lines, text_line_rows_from_result
+)
+from stage_stream_module import VideoStageStream
+
+
+def create_video_with_ocr():
+    """创建带OCR结果的模拟视频：第3-7帧显示"加载中"（第5帧置信度很低），第8帧起显示"首页" """
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    
+    project = Project(name="text-lines")
+    db.add(project)
+    db.flush()
+    video = Video(project_id=project.id, original_filename="a.mp4", stored_filename="a.mp4", file_path="/tmp/a.mp4", file_size=0)
+    db.add(video)
+    db.flush()
+    
+    for i in range(15):
+        frame = VideoFrame(video_id=video.id, frame_number=i, timestamp_ms=i * 333, frame_path=f"/tmp/frame_{i}.jpg")
+        db.add(frame)
+        db.flush()
+        
+        blocks = [{"id": 0, "text": "Logo", "confidence": 0.99}]
+        if 3 <= i < 8:
+            blocks.append({"id": 1, "text": "加载中...", "confidence": 0.2 if i == 5 else 0.95})
+        if i >= 8:
+            blocks.append({"id": 1, "text": "首页", "confidence": 0.9})
+        
+        db.add(OCRResult(
+            frame_id=frame.id,
+            text_content=json.dumps([block["text"] for block in blocks], ensure_ascii=False),
+            confidence=sum(block["confidence"] for block in blocks) / len(blocks),
+            bbox=json.dumps(blocks, ensure_ascii=False)
+        ))
+    db.add_all([
+        StageConfig(video_id=video.id, stage_name="加载阶段", stage_order=1, keywords='["加载中"]'),
+        StageConfig(video_id=video.id, stage_name="首页阶段", stage_order=2, keywords='["首页", "logo"]'),
+    ])
+    db.commit()
+    return db, video.id
+
+
+def stage_timeline(result):
+    """阶段分析结果中与匹配来源无关的部分（出现记录的置信度在文本行上为单行置信度）"""
+    return [
+        (stage["stage_name"], stage["stage_start_timestamp_ms"], stage["stage_end_timestamp_ms"],
+         [(keyword["keyword"], keyword["total_occurrences"], keyword["pattern_analysis"]["continuous_periods"],
+           [occurrence["frame_id"] for occurrence in keyword["occurrences"]])
+          for keyword in stage.get("keyword_results", [])])
+        for stage in result["stage_results"]
+    ]
+
+
+def test_backfill_and_equivalence():
+    """测试旧数据迁移后，文本行分析与整帧分析结果一致"""
+    print("=== 文本行迁移与一致性测试 ===")
+    db, video_id = create_video_with_ocr()
+    request = KeywordPatternRequest(keywords=["加载中", "首页", "logo", "不存在"])
+    
+    legacy = keyword_pattern_analyzer.analyze_keyword_pattern(video_id, request, db)
+    assert legacy["match_source"] == "ocr_results"
+    
+    inserted = backfill_text_lines(db, video_id)
+    assert inserted == db.query(OCRTextLine).count() == 15 + 5 + 7
+    assert backfill_text_lines(db, video_id) == 0  # 重复迁移不会写入重复行
+    
+    lines = keyword_pattern_analyzer.analyze_keyword_pattern(video_id, request, db)
+    assert lines["match_source"] == "text_lines"
+    for legacy_result, line_result in zip(legacy["keyword_results"], lines["keyword_results"]):
+        for key in ("first_appearance_timestamp_ms", "first_disappearance_timestamp_ms", "last_appearance_timestamp_ms", "total_occurrences"):
+            assert legacy_result[key] == line_result[key], (line_result["keyword"], key)
+        assert legacy_result["pattern_analysis"]["continuous_periods"] == line_result["pattern_analysis"]["continuous_periods"]
+        assert [o["frame_id"] for o in legacy_result["occurrences"]] == [o["frame_id"] for o in line_result["occurrences"]]
+    print("✓ 文本行分析与整帧分析一致")
+
+
+def test_line_confidence_threshold():
+    """测试置信度阈值作用于单个文本行"""
+    print("=== 单行置信度过滤测试 ===")
+    db, video_id = create_video_with_ocr()
+    backfill_text_lines(db, video_id)
+    
+    # 第5帧"加载中"所在行置信度为0.2，而整帧平均置信度约为0.6
+    matches = query_keyword_line_matches(db, video_id, "加载中", min_score=0.5)
+    assert sorted(matches) == [4, 5, 7, 8]
+    
+    request = KeywordPatternRequest(keywords=["加载中"], confidence_threshold=0.5)
+    result = keyword_pattern_analyzer.analyze_keyword_pattern(video_id, request, db)["keyword_results"][0]
+    periods = result["pattern_analysis"]["continuous_periods"]
+    assert [(p["start_timestamp_ms"], p["end_timestamp_ms"]) for p in periods] == [(999, 1665), (1998, 2664)]
+    assert result["first_disappearance_timestamp_ms"] == 1665
+    
+    # 区分大小写与精确匹配
+    assert query_keyword_line_matches(db, video_id, "logo", case_sensitive=True) == {}
+    assert len(query_keyword_line_matches(db, video_id, "Logo", case_sensitive=True, exact_match=True)) == 15
+    assert query_keyword_line_matches(db, video_id, "加载", exact_match=True) == {}
+    print("✓ 单行置信度过滤测试通过")
+
+
+def test_stage_analysis_on_text_lines():
+    """测试阶段分析、项目批量分析和流式阶段分析在文本行上匹配关键词"""
+    print("=== 阶段分析文本行匹配测试 ===")
+    db, video_id = create_video_with_ocr()
+    project_id = db.query(Video.project_id).filter(Video.id == video_id).scalar()
+    
+    legacy = keyword_pattern_analyzer.analyze_stage_pattern(video_id, StagePatternRequest(), db)
+    legacy_project = keyword_pattern_analyzer.analyze_project_stage_pattern(
+        project_id, ProjectStagePatternRequest(max_workers=1, include_pattern_details=True), db
+    )
+    assert legacy["match_source"] == legacy_project["video_results"][0]["match_source"] == "ocr_results"
+    
+    backfill_text_lines(db, video_id)
+    lines = keyword_pattern_analyzer.analyze_stage_pattern(video_id, StagePatternRequest(), db)
+    lines_project = keyword_pattern_analyzer.analyze_project_stage_pattern(
+        project_id, ProjectStagePatternRequest(max_workers=1, include_pattern_details=True), db
+    )
+    assert lines["match_source"] == lines_project["video_results"][0]["match_source"] == "text_lines"
+    assert stage_timeline(lines) == stage_timeline(legacy)
+    assert stage_timeline(lines_project["video_results"][0]) == stage_timeline(legacy_project["video_results"][0])
+    assert stage_timeline(lines) == stage_timeline(lines_project["video_results"][0])
+    
+    # 流式分析在OCR过程中按将要写入的文本行匹配，与文本行上的完整分析一致
+    rows = db.query(VideoFrame, OCRResult).join(OCRResult, VideoFrame.id == OCRResult.frame_id).filter(
+        VideoFrame.video_id == video_id
+    ).order_by(VideoFrame.timestamp_ms).all()
+    stream = VideoStageStream(video_id, keyword_pattern_analyzer._build_stage_specs(
+        db.query(StageConfig).filter(StageConfig.video_id == video_id).order_by(StageConfig.stage_order).all()
+    ), total_frames=len(rows))
+    for frame, ocr_result in rows:
+        stream.feed(frame, ocr_result, text_line_rows_from_result(
+            frame.id, video_id, ocr_result.text_content, ocr_result.bbox, ocr_result.confidence
+        ))
+    streamed = stream.build_response()
+    expected = keyword_pattern_analyzer.analyze_stage_pattern(video_id, StagePatternRequest(include_pattern_details=False), db)
+    assert streamed["match_source"] == "text_lines"
+    assert streamed["stage_results"] == expected["stage_results"]
+    
+    # 置信度阈值作用于单行：第5帧"加载中"所在行置信度低，加载阶段在该帧结束
+    filtered = keyword_pattern_analyzer.analyze_stage_pattern(video_id, StagePatternRequest(confidence_threshold=0.5), db)
+    filtered_project = keyword_pattern_analyzer.analyze_project_stage_pattern(
+        project_id, ProjectStagePatternRequest(max_workers=1, confidence_threshold=0.5), db
+    )
+    assert filtered["stage_results"][0]["stage_end_timestamp_ms"] == 1665
+    assert filtered_project["video_results"][0]["stage_results"][0]["stage_end_timestamp_ms"] == 1665
+    
+    # 内存中的文本行匹配与SQL查询规则相同
+    lines_by_frame = {}
+    for frame, ocr_result in rows:
+        lines_by_frame[frame.id] = text_line_rows_from_result(
+            frame.id, video_id, ocr_result.text_content, ocr_result.bbox, ocr_result.confidence
+        )
+    for keyword in ("加载中", "加载", "logo", "Logo", "LOGO", "首页", "不存在"):
+        for case_sensitive in (False, True):
+            for exact_match in (False, True):
+                for min_score in (0.0, 0.5):
+                    expected_matches = query_keyword_line_matches(db, video_id, keyword, case_sensitive, exact_match, min_score)
+                    in_memory = {
+                        frame_id: match_text_lines(frame_lines, keyword, case_sensitive, exact_match, min_score)
+                        for frame_id, frame_lines in lines_by_frame.items()
+                    }
+                    assert {frame_id: score for frame_id, score in in_memory.items() if score is not None} == expected_matches, \
+                        (keyword, case_sensitive, exact_match, min_score)
+    db.close()
+    print("✓ 阶段分析文本行匹配测试通过")
+
+
+if __name__ == "__main__":
+    test_backfill_and_equivalence()
+    test_line_confidence_threshold()
+    test_stage_analysis_on_text_lines()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+处理进度测试脚本
+验证进度计数、吞吐量和预计剩余时间，SSE事件流推送其他线程中更新的进度（合并频繁更新、发送心跳），
+以及分帧过程中记录已解码和已保存的帧数
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import cv2
+import numpy as np
+
+from progress_module import ProgressManager, PROGRESS_COMPLETED, PROGRESS_FAILED
+from frame_extraction_module import FrameExtractor
+
+
+def parse_events(chunks):
+    """解析SSE消息，返回(事件名, 数据)列表"""
+    events = []
+    for chunk in chunks:
+        text = chunk.decode()
+        if not text.startswith(("id:", "event:")):
+            continue
+        fields = dict(line.split(": ", 1) for line in text.strip().split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_phase_progress():
+    """测试计数、百分比、吞吐量和预计剩余时间"""
+    print("=== 进度计数测试 ===")
+    manager = ProgressManager()
+    progress = manager.start(1, "ocr", total=100)
+    time.sleep(0.3)
+    progress.update(completed=30, failed=2, frames_ocr=30)
+    snapshot = manager.get_progress(1)["phases"]["ocr"]
+    assert snapshot["status"] == "running" and snapshot["percent"] == 32.0
+    assert snapshot["throughput"] > 0 and snapshot["eta_seconds"] > 0
+    assert snapshot["counters"] == {"frames_ocr": 30}
+    
+    progress.update(completed=98)
+    progress.finish()
+    snapshot = manager.get_progress(1)["phases"]["ocr"]
+    assert snapshot["status"] == PROGRESS_COMPLETED and snapshot["percent"] == 100.0
+    assert snapshot["eta_seconds"] is None and snapshot["finished_at"] is not None
+    
+    failed = manager.start(1, "extraction")
+    failed.finish(error="无法打开视频文件")
+    snapshot = manager.get_progress(1)["phases"]["extraction"]
+    assert snapshot["status"] == PROGRESS_FAILED and snapshot["error"] == "无法打开视频文件"
+    assert manager.get_progress(2) == {"video_id": 2, "version": 0, "phases": {}}
+    print("✓ 进度计数测试通过")
+
+
+def test_event_stream():
+    """测试SSE事件流：工作线程更新进度，订阅者收到合并后的最新进度"""
+    print("=== SSE事件流测试 ===")
+    manager = ProgressManager()
+    
+    async def run():
+        stream = manager.event_stream(5, push_interval=0.05, heartbeat_interval=0.2)
+        chunks = [await stream.__anext__()]
+        assert chunks[0].startswith(b"retry:")
+        # 连接时还没有进度：立即发送空进度
+        chunks.append(await stream.__anext__())
+        
+        def worker():
+            progress = manager.start(5, "extraction", total=500)
+            for i in range(1, 501):
+                progress.update(completed=i)
+                if i % 100 == 0:
+                    time.sleep(0.02)
+            progress.finish()
+        
+        thread = threading.Thread(target=worker)
+        thread.start()
+        while True:
+            chunk = await asyncio.wait_for(stream.__anext__(), 5)
+            chunks.append(chunk)
+            events = parse_events([chunk])
+            if events and events[0][1]["phases"].get("extraction", {}).get("status") == PROGRESS_COMPLETED:
+                break
+        thread.join()
+        
+        # 没有进度变化时发送心跳
+        assert await asyncio.wait_for(stream.__anext__(), 5) == b": keep-alive\n\n"
+        tracker = manager._videos[5]
+        assert len(tracker._subscribers) == 1
+        await stream.aclose()
+        assert len(tracker._subscribers) == 0
+        return chunks
+    
+    chunks = asyncio.run(run())
+    events = parse_events(chunks)
+    assert events[0][1]["phases"] == {}
+    completed = [data["phases"]["extraction"]["completed"] for _, data in events[1:]]
+    assert completed == sorted(completed) and completed[-1] == 500
+    # 500次更新合并为少量事件
+    assert len(events) < 50
+    print(f"✓ SSE事件流测试通过，500次更新推送了{len(events)}条事件")
+
+
+def test_extraction_progress():
+    """测试分帧时记录已解码帧数、已保存帧数和预计保存的帧数"""
+    print("=== 分帧进度测试 ===")
+    base_dir = tempfile.mkdtemp(prefix="progress_")
+    video_path = os.path.join(base_dir, "video.mp4")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (160, 120))
+    for i in range(90):
+        writer.write(np.full((120, 160, 3), i, np.uint8))
+    writer.release()
+    
+    extractor = FrameExtractor()
+    extractor.frames_storage_path = os.path.join(base_dir, "frames")
+    manager = ProgressManager()
+    progress = manager.start(9, "extraction")
+    frames = extractor.extract_video_frames(video_path, 9, fps=3, quality=80, progress=progress)
+    progress.finish()
+    
+    snapshot = manager.get_progress(9)["phases"]["extraction"]
+    assert len(frames) == 9
+    assert snapshot["completed"] == 90 and snapshot["total"] == 90
+    assert snapshot["counters"] == {"frames_saved": 9, "frames_expected": 9}
+    print("✓ 分帧进度测试通过")
+
+
+if __name__ == "__main__":
+    test_phase_progress()
+    test_event_stream()
+    test_extraction_progress()
+    print("\n所有测试通过")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+项目阶段模式批量分析测试脚本
+验证多进程分析与单进程分析结果一致、max_workers不超过CPU核数且进程池在请求间复用，
+include_pattern_details为True时返回关键词出现记录，以及无效的阶段规则在提交到工作进程前返回400
+"""
+
+import os
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import keyword_pattern_module
+from models_simple import Base, Project, Video, VideoFrame, OCRResult, StageConfig
+from keyword_pattern_module import keyword_pattern_analyzer, ProjectStagePatternRequest, shutdown_analysis_pool
+
+
+def create_project(video_count: int = 3):
+    """创建内存数据库，项目下每个视频有两个阶段和10帧OCR结果"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    project = Project(name="批量分析测试项目")
+    db.add(project)
+    db.flush()
+    for i in range(video_count):
+        video = Video(project_id=project.id, original_filename=f"v{i}.mp4", stored_filename=f"v{i}.mp4",
+                      file_path=f"/tmp/v{i}.mp4", file_size=0)
+        db.add(video)
+        db.flush()
+        db.add_all([
+            StageConfig(video_id=video.id, stage_name="加载阶段", stage_order=1, keywords='["加载中"]'),
+            StageConfig(video_id=video.id, stage_name="首页阶段", stage_order=2, keywords='["首页"]'),
+        ])
+        # 第i个视频的加载阶段持续(3 + i)帧
+        for frame_number in range(10):
+            frame = VideoFrame(video_id=video.id, frame_number=frame_number, timestamp_ms=frame_number * 1000,
+                               frame_path=f"/tmp/frame_{video.id}_{frame_number}.jpg")
+            db.add(frame)
+            db.flush()
+            text = "加载中" if frame_number < 3 + i else "首页"
+            db.add(OCRResult(frame_id=frame.id, text_content=text, confidence=0.9))
+    db.commit()
+    return db, project.id
+
+
+def stage_durations(result):
+    return {
+        video["video_id"]: [stage["stage_duration_ms"] for stage in video["stage_results"]]
+        for video in result["video_results"]
+    }
+
+
+def test_parallel_matches_serial():
+    """测试多进程与单进程结果一致，进程池复用且进程数受CPU核数限制"""
+    print("=== 批量分析并行测试 ===")
+    db, project_id = create_project()
+    try:
+        serial = keyword_pattern_analyzer.analyze_project_stage_pattern(
+            project_id, ProjectStagePatternRequest(max_workers=1), db
+        )
+        assert serial["analyzed_videos"] == 3
+        assert all("keyword_results" not in stage for video in serial["video_results"] for stage in video["stage_results"])
+        
+        parallel = keyword_pattern_analyzer.analyze_project_stage_pattern(
+            project_id, ProjectStagePatternRequest(max_workers=1000), db
+        )
+        assert stage_durations(parallel) == stage_durations(serial)
+        pool = keyword_pattern_module._analysis_pool
+        if (os.cpu_count() or 1) > 1:
+            # 请求的进程数被限制为CPU核数，进程池在请求间复用
+            assert pool is not None and pool._max_workers == os.cpu_count()
+            keyword_pattern_analyzer.analyze_project_stage_pattern(project_id, ProjectStagePatternRequest(max_workers=2), db)
+            assert keyword_pattern_module._analysis_pool is pool
+    finally:
+        shutdown_analysis_pool()
+        db.close()
+    assert keyword_pattern_module._analysis_pool is None
+    print("✓ 批量分析并行测试通过")
+
+
+def test_pattern_details():
+    """测试include_pattern_details返回关键词出现记录"""
+    print("=== 批量分析详情测试 ===")
+    db, project_id = create_project(video_count=1)
+    try:
+        result = keyword_pattern_analyzer.analyze_project_stage_pattern(
+            project_id, ProjectStagePatternRequest(include_pattern_details=True, max_workers=1), db
+        )
+        loading = result["video_results"][0]["stage_results"][0]
+        occurrences = loading["keyword_results"][0]["occurrences"]
+        assert [occurrence["timestamp_ms"] for occurrence in occurrences] == [0, 1000, 2000]
+        assert loading["stage_duration_ms"] == 3000
+    finally:
+        db.close()
+    print("✓ 批量分析详情测试通过")
+
+
+def test_invalid_rule_rejected_before_dispatch():
+    """测试无效规则在父进程中校验，不创建进程池"""
+    print("=== 批量分析无效规则测试 ===")
+    db, project_id = create_project()
+    shutdown_analysis_pool()
+    try:
+        config = db.query(StageConfig).filter(StageConfig.stage_name == "首页阶段").order_by(StageConfig.id.desc()).first()
+        config.start_rule = '{"type": "unknown"}'
+        db.commit()
+        try:
+            keyword_pattern_analyzer.analyze_project_stage_pattern(project_id, ProjectStagePatternRequest(max_workers=1000), db)
+        except HTTPException as e:
+            assert e.status_code == 400 and "首页阶段" in e.detail
+        else:
+            raise AssertionError("无效规则应返回400")
+        assert keyword_pattern_module._analysis_pool is None
+    finally:
+        shutdown_analysis_pool()
+        db.close()
+    print("✓ 批量分析无效规则测试通过")
+
+
+if __name__ == "__main__":
+    test_parallel_matches_serial()
+    test_pattern_details()
+    test_invalid_rule_rejected_before_dispatch()
+    print("\n所有测试通过")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应缓存测试脚本
+验证视频数据版本号随写操作递增、ETag条件请求返回304，以及缓存命中时跳过计算
+"""
+
+import asyncio
+import os
+import tempfile
+from starlette.requests import Request
+from sqlalchemy.orm import sessionmaker
+
+from db_module import create_db_engine
+from async_db_module import ThreadPoolSession
+from models_simple import Base, Project, Video, VideoFrame
+from frame_extraction_module import frame_extractor, VideoFrameResponse
+from deletion_module import VideoDataDeleter
+from data_version_module import video_data_version_manager
+from response_cache_module import cached_video_response, serialize_models, etag_matches, ResponseCache, response_cache
+
+
+def create_test_database(frame_count: int = 10):
+    """创建临时数据库并写入一个视频的帧记录"""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="response_cache_"), "test.db")
+    engine = create_db_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    
+    db = SessionFactory()
+    project = Project(name="缓存测试项目")
+    db.add(project)
+    db.commit()
+    video = Video(project_id=project.id, original_filename="a.mp4", stored_filename="a.mp4", file_path="a.mp4", file_size=1)
+    db.add(video)
+    db.commit()
+    for i in range(frame_count):
+        db.add(VideoFrame(video_id=video.id, frame_number=i, timestamp_ms=i * 100, frame_path=f"{i}.jpg"))
+    db.commit()
+    video_id = video.id
+    db.close()
+    return SessionFactory, video_id
+
+
+def make_request(path: str, query: str = "", if_none_match: str = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query.encode(), "headers": headers})
+
+
+def test_conditional_requests():
+    """测试ETag、304和缓存命中，写入后版本号变化使旧ETag失效"""
+    print("=== ETag条件请求测试 ===")
+    SessionFactory, video_id = create_test_database()
+    path = f"/videos/{video_id}/frames"
+    computed = []
+    
+    async def run():
+        session = ThreadPoolSession(SessionFactory)
+        try:
+            async def load_frames():
+                computed.append(1)
+                return serialize_models(VideoFrameResponse, await frame_extractor.get_video_frames(video_id, session))
+            
+            response = await cached_video_response(make_request(path), session, video_id, load_frames)
+            etag = response.headers["etag"]
+            assert response.status_code == 200 and etag.startswith('W/"v')
+            assert b'"frame_number":9' in response.body
+            
+            # 版本号未变化：命中缓存，不再计算
+            response = await cached_video_response(make_request(path), session, video_id, load_frames)
+            assert response.status_code == 200 and response.headers["etag"] == etag
+            assert len(computed) == 1
+            
+            response = await cached_video_response(make_request(path, if_none_match=etag), session, video_id, load_frames)
+            assert response.status_code == 304 and response.headers["etag"] == etag
+            
+            # 不同的查询参数对应不同的ETag
+            response = await cached_video_response(make_request(path, "limit=5"), session, video_id, load_frames)
+            assert response.headers["etag"] != etag
+            
+            # 写入新帧并递增版本号后，旧ETag不再匹配
+            db = SessionFactory()
+            db.add(VideoFrame(video_id=video_id, frame_number=10, timestamp_ms=1000, frame_path="10.jpg"))
+            video_data_version_manager.bump(video_id, db)
+            db.commit()
+            db.close()
+            assert await video_data_version_manager.get_version(video_id, session) == 1
+            
+            response = await cached_video_response(make_request(path, if_none_match=etag), session, video_id, load_frames)
+            assert response.status_code == 200 and response.headers["etag"] != etag
+            assert b'"frame_number":10' in response.body
+            assert len(computed) == 3
+        finally:
+            await session.close()
+    
+    asyncio.run(run())
+    print(f"✓ ETag条件请求测试通过，缓存状态: {response_cache.info()}")
+
+
+def test_deletion_bumps_version():
+    """测试删除视频数据时版本号递增"""
+    print("=== 删除数据更新版本号测试 ===")
+    SessionFactory, video_id = create_test_database()
+    # 产物目录指向临时目录，避免删除真实数据
+    deleter = VideoDataDeleter()
+    base_dir = tempfile.mkdtemp(prefix="response_cache_files_")
+    deleter.frames_storage_path = os.path.join(base_dir, "frames")
+    deleter.ocr_results_path = os.path.join(base_dir, "ocr_results")
+    deleter.ocr_images_path = os.path.join(base_dir, "ocr_images")
+    deleter.thumbnails_path = os.path.join(base_dir, "thumbnails")
+    
+    db = SessionFactory()
+    deleter.delete_video_data(video_id, "ocr", db)
+    deleter.delete_video_data(video_id, "frames", db)
+    db.close()
+    
+    async def get_version():
+        session = ThreadPoolSession(SessionFactory)
+        try:
+            return await video_data_version_manager.get_version(video_id, session)
+        finally:
+            await session.close()
+    
+    assert asyncio.run(get_version()) == 2
+    print("✓ 删除数据更新版本号测试通过")
+
+
+def test_cache_eviction_and_etag_matching():
+    """测试按条目数和字节数淘汰，以及If-None-Match的弱比较"""
+    print("=== 缓存淘汰与ETag匹配测试 ===")
+    cache = ResponseCache(max_entries=3, max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+    cache.put("c", b"1234")  # 超过10字节，淘汰最久未使用的b
+    assert cache.get("b") is None and cache.get("a") == b"1234"
+    cache.put("d", b"x" * 11)  # 超过总容量的响应不缓存
+    assert cache.get("d") is None
+    
+    etag = 'W/"v1-2-abc"'
+    assert etag_matches('"v1-2-abc"', etag)
+    assert etag_matches('W/"v1-1-abc", W/"v1-2-abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('W/"v1-1-abc"', etag)
+    assert not etag_matches(None, etag)
+    print("✓ 缓存淘汰与ETag匹配测试通过")
+
+
+if __name__ == "__main__":
+    test_conditional_requests()
+    test_deletion_bumps_version()
+    test_cache_eviction_and_etag_matching()
+    print("\n所有测试通过")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+保留策略清理测试脚本
+验证OCR完成且超过保留期限的视频删除帧图片和OCR图片（数据库记录保留）、超过归档期限的视频默认保留视频文件、
+开启video_archive_delete_source时删除视频文件（其他视频仍共用的文件保留）、过期临时文件和上传会话的清理，
+以及dry_run只统计不删除
+"""
+
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from sqlalchemy.orm import sessionmaker
+
+from db_module import create_db_engine, DatabaseWriter
+from models_simple import Base, Project, Video, VideoFrame, OCRResult, VideoUpload
+from retention_module import RetentionCollector
+from config import settings
+
+
+def write_file(path: Path, size: int = 100, age_hours: float = 0) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    if age_hours:
+        timestamp = time.time() - age_hours * 3600
+        os.utime(path, (timestamp, timestamp))
+    return str(path)
+
+
+def test_retention_gc():
+    """测试各保留策略的清理结果"""
+    print("=== 保留策略清理测试 ===")
+    base_dir = Path(tempfile.mkdtemp(prefix="retention_"))
+    engine = create_db_engine(f"sqlite:///{base_dir / 'test.db'}")
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    collector = RetentionCollector(writer=DatabaseWriter(SessionFactory), batch_size=2, max_deletes_per_second=1000)
+    for name in ("frames_storage_path", "ocr_results_path", "ocr_images_path", "temp_path", "upload_temp_path"):
+        setattr(collector, name, str(base_dir / name))
+    now = datetime.utcnow()
+    
+    db = SessionFactory()
+    try:
+        project = Project(name="保留策略测试项目")
+        db.add(project)
+        db.commit()
+        
+        def add_video(name: str, uploaded_days: int, extracted_days: int = None, ocr_frames: int = 2,
+                      file_path: str = None) -> int:
+            file_path = file_path or write_file(base_dir / "videos" / name, 1000)
+            video = Video(project_id=project.id, original_filename=name, stored_filename=name, file_path=file_path,
+                          file_size=1000, upload_time=now - timedelta(days=uploaded_days))
+            db.add(video)
+            db.flush()
+            if extracted_days is not None:
+                for i in range(2):
+                    frame_path = write_file(base_dir / "frames_storage_path" / f"video_{video.id}" / f"frame_{i}.jpg")
+                    frame = VideoFrame(video_id=video.id, frame_number=i, timestamp_ms=i * 1000, frame_path=frame_path,
+                                       file_size=100, extracted_at=now - timedelta(days=extracted_days))
+                    db.add(frame)
+                    db.flush()
+                    if i < ocr_frames:
+                        db.add(OCRResult(frame_id=frame.id, text_content="加载中"))
+                        write_file(base_dir / "ocr_images_path" / f"video_{video.id}" / f"frame_{i}_ocr.jpg", 50)
+                        write_file(base_dir / "ocr_results_path" / f"video_{video.id}" / f"frame_{i}_ocr.json", 20)
+            db.commit()
+            return video.id
+        
+        purged = add_video("purged.mp4", uploaded_days=40, extracted_days=40)
+        pending_ocr = add_video("pending.mp4", uploaded_days=40, extracted_days=40, ocr_frames=1)
+        recent = add_video("recent.mp4", uploaded_days=5, extracted_days=5)
+        archived = add_video("archived.mp4", uploaded_days=100, extracted_days=100)
+        shared = add_video("shared.mp4", uploaded_days=100, extracted_days=100)
+        # 内容相同、尚未归档的视频共用shared.mp4
+        add_video("shared_copy.mp4", uploaded_days=1, file_path=str(base_dir / "videos" / "shared.mp4"))
+        
+        old_temp = write_file(base_dir / "temp_path" / "old.tmp", age_hours=48)
+        new_temp = write_file(base_dir / "temp_path" / "new.tmp")
+        orphan_upload = write_file(base_dir / "upload_temp_path" / "orphan.part", age_hours=48)
+        stale_upload_path = write_file(base_dir / "upload_temp_path" / "stale.part", age_hours=48)
+        active_upload_path = write_file(base_dir / "upload_temp_path" / "active.part", age_hours=48)
+        for upload_id, path, updated_hours in (("stale", stale_upload_path, 48), ("active", active_upload_path, 1)):
+            db.add(VideoUpload(id=upload_id, project_id=project.id, original_filename="a.mp4", total_size=1000,
+                               received_size=100, temp_path=path, status="uploading",
+                               updated_at=now - timedelta(hours=updated_hours)))
+        db.commit()
+    finally:
+        db.close()
+    
+    try:
+        # 默认归档时保留视频文件，只删除OCR原始结果
+        report = collector.run(dry_run=True, now=now)
+        assert [video["file_count"] for video in report["archive"]["videos"]] == [2, 2]
+        
+        settings.video_archive_delete_source = True
+        # dry_run只统计不删除
+        report = collector.run(dry_run=True, now=now)
+        assert [video["video_id"] for video in report["frames"]["videos"]] == [purged, archived, shared]
+        assert report["frames"]["file_count"] == 12 and report["frames"]["total_bytes"] == 3 * (200 + 100)
+        assert [video["video_id"] for video in report["archive"]["videos"]] == [archived, shared]
+        # shared.mp4仍被其他视频使用，只删除OCR原始结果
+        assert [video["file_count"] for video in report["archive"]["videos"]] == [3, 2]
+        assert report["temp"] == {"file_count": 3, "total_bytes": 300, "stale_uploads": 1}
+        assert report["deleted_files"] == 0 and os.path.exists(old_temp)
+        
+        report = collector.run(now=now)
+        assert report["deleted_files"] == 12 + 5 + 3 and report["failed_files"] == 0
+        assert report["freed_bytes"] == 3 * 300 + 1000 + 4 * 20 + 300
+        
+        db = SessionFactory()
+        try:
+            videos = {video.id: video for video in db.query(Video)}
+            assert videos[purged].frames_purged_at is not None and videos[purged].archived_at is None
+            assert videos[pending_ocr].frames_purged_at is None and videos[recent].frames_purged_at is None
+            assert videos[archived].archived_at is not None and videos[shared].archived_at is not None
+            assert not os.path.exists(videos[archived].file_path) and os.path.exists(videos[shared].file_path)
+            # 分析需要的数据库记录保留
+            assert db.query(VideoFrame).count() == 10 and db.query(OCRResult).count() == 9
+            assert not (base_dir / "frames_storage_path" / f"video_{purged}").exists()
+            assert (base_dir / "frames_storage_path" / f"video_{pending_ocr}").exists()
+            assert (base_dir / "ocr_results_path" / f"video_{purged}").exists()
+            assert not (base_dir / "ocr_results_path" / f"video_{archived}").exists()
+            assert [upload.id for upload in db.query(VideoUpload)] == ["active"]
+        finally:
+            db.close()
+        assert not os.path.exists(old_temp) and os.path.exists(new_temp)
+        assert not os.path.exists(orphan_upload) and not os.path.exists(stale_upload_path)
+        assert os.path.exists(active_upload_path)
+        
+        # 已清理的视频不再重复处理
+        report = collector.run(dry_run=True, now=now)
+        assert report["frames"]["videos"] == [] and report["archive"]["videos"] == []
+        assert report["temp"]["file_count"] == 0
+    finally:
+        settings.video_archive_delete_source = False
+        collector.writer.stop()
+    print("✓ 保留策略清理测试通过")
+
+
+if __name__ == "__main__":
+    test_retention_gc()
+    print("\n所有测试通过")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应序列化与压缩测试脚本
+验证orjson序列化结果与标准JSON一致，以及压缩中间件按阈值、响应类型和Accept-Encoding处理响应
+"""
+
+import asyncio
+import gzip
+import json
+from datetime import datetime
+from decimal import Decimal
+from starlette.responses import Response, StreamingResponse
+
+from models_simple import ProcessStatus
+from frame_extraction_module import VideoFrameResponse
+from serialization_module import dumps, loads, FastJSONResponse, CompressionMiddleware, choose_encoding
+
+
+def call_app(app, accept_encoding: str = None) -> tuple:
+    """以ASGI方式调用应用，返回(状态码, 响应头字典, 响应体)"""
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []
+    scope = {"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": headers}
+    messages = []
+    received = []
+    
+    async def receive():
+        # 请求体只返回一次，之后一直等待（流式响应会监听客户端断开）
+        if received:
+            await asyncio.Event().wait()
+        received.append(True)
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        messages.append(message)
+    
+    asyncio.run(CompressionMiddleware(app)(scope, receive, send))
+    start = messages[0]
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], {name.decode(): value.decode() for name, value in start["headers"]}, body
+
+
+def test_dumps():
+    """测试日期、Decimal、枚举和Pydantic模型的序列化"""
+    print("=== 序列化测试 ===")
+    now = datetime(2024, 1, 2, 3, 4, 5, 678)
+    frame = VideoFrameResponse(id=1, video_id=2, frame_number=3, timestamp_ms=100, frame_path="a.jpg", file_size=10, extracted_at=now)
+    data = {"time": now, "confidence": Decimal("0.9512"), "status": ProcessStatus.completed, "frame": frame, "text": "加载中"}
+    
+    assert loads(dumps(data)) == {
+        "time": "2024-01-02T03:04:05.000678",
+        "confidence": 0.9512,
+        "status": "completed",
+        "frame": json.loads(frame.json()),
+        "text": "加载中"
+    }
+    assert "加载中".encode("utf-8") in FastJSONResponse(data).body
+    print("✓ 序列化测试通过")
+
+
+def test_compression():
+    """测试压缩阈值、响应类型、编码协商和流式压缩"""
+    print("=== 压缩中间件测试 ===")
+    large = dumps([{"frame_id": i, "text": "加载中"} for i in range(2000)])
+    
+    status, headers, body = call_app(Response(large, media_type="application/json"), "gzip, deflate")
+    assert status == 200 and headers["content-encoding"] == "gzip" and headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(body) < len(large)
+    assert gzip.decompress(body) == large
+    
+    # 小响应、图片、客户端不接受压缩时原样返回
+    for app, accept in ((Response(b"{}", media_type="application/json"), "gzip"),
+                        (Response(large, media_type="image/jpeg"), "gzip"),
+                        (Response(large, media_type="application/json"), None),
+                        (Response(large, media_type="application/json"), "gzip;q=0")):
+        status, headers, body = call_app(app, accept)
+        assert "content-encoding" not in headers and body in (b"{}", large)
+    
+    status, headers, body = call_app(Response(status_code=304, headers={"ETag": 'W/"v1"'}), "gzip")
+    assert status == 304 and body == b"" and "content-encoding" not in headers
+    
+    # 分块响应按块流式压缩
+    chunks = [large[i:i + 4096] for i in range(0, len(large), 4096)]
+    
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+    
+    status, headers, body = call_app(StreamingResponse(stream(), media_type="application/json"), "gzip")
+    assert headers["content-encoding"] == "gzip" and "content-length" not in headers
+    assert gzip.decompress(body) == large
+    
+    assert choose_encoding("br;q=1.0, gzip;q=0.8") in ("br", "gzip")
+    assert choose_encoding("identity") is None
+    print("✓ 压缩中间件测试通过")
+
+
+if __name__ == "__main__":
+    test_dumps()
+    test_compression()
+    print("\n所有测试通过")
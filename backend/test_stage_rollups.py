@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阶段耗时汇总测试脚本
+验证分位数草图的精度，以及增量维护的汇总与按明细重建的结果一致
+"""
+
+import random
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models_simple import Base, Project, Video, StageConfig, StageDurationRollup
+from stage_rollup_module import DurationSketch, stage_rollup_manager
+
+
+def create_session():
+    """创建内存数据库会话"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def stage_result(config, duration):
+    """构造单个阶段的分析结果"""
+    return {
+        "stage_id": config.id,
+        "stage_name": config.stage_name,
+        "stage_start_timestamp_ms": 0 if duration is not None else None,
+        "stage_end_timestamp_ms": duration,
+        "stage_duration_ms": duration,
+        "pattern_summary": {"average_confidence": 0.9}
+    }
+
+
+def snapshot(db, project_id):
+    """汇总行的可比较快照"""
+    rollups = db.query(StageDurationRollup).filter(StageDurationRollup.project_id == project_id).all()
+    return {
+        r.stage_name: (r.sample_count, r.duration_sum_ms, r.min_duration_ms, r.max_duration_ms, r.sketch)
+        for r in rollups
+    }
+
+
+def test_sketch_accuracy():
+    """测试分位数估计的相对误差"""
+    print("=== 分位数草图精度测试 ===")
+    rng = random.Random(7)
+    values = [rng.randint(200, 20000) for _ in range(5000)]
+    sketch = DurationSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    
+    # 移除一半样本后应与只添加另一半的草图完全相同
+    other = DurationSketch(relative_accuracy=0.01)
+    for value in values[2500:]:
+        other.add(value)
+    for value in values[:2500]:
+        sketch.remove(value)
+    assert sketch.to_dict() == other.to_dict()
+    
+    ordered = sorted(values[2500:])
+    for q in (0.5, 0.9, 0.95, 0.99):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        estimate = sketch.quantile(q)
+        assert abs(estimate - exact) / exact <= 0.01 + 1e-9, (q, exact, estimate)
+    print("✓ 分位数草图精度测试通过")
+
+
+def test_incremental_matches_rebuild():
+    """测试增量更新的汇总与重建结果一致"""
+    print("=== 增量汇总一致性测试 ===")
+    db = create_session()
+    project = Project(name="build-1")
+    db.add(project)
+    db.flush()
+    
+    configs = {}
+    for i in range(6):
+        video = Video(project_id=project.id, original_filename=f"v{i}.mp4", stored_filename=f"v{i}.mp4", file_path=f"/tmp/v{i}.mp4", file_size=0)
+        db.add(video)
+        db.flush()
+        configs[video.id] = [
+            StageConfig(video_id=video.id, stage_name="加载阶段", stage_order=1, keywords='["加载中"]'),
+            StageConfig(video_id=video.id, stage_name="首页阶段", stage_order=2, keywords='["首页"]'),
+        ]
+        db.add_all(configs[video.id])
+    db.commit()
+    
+    rng = random.Random(11)
+    for _ in range(60):
+        video_id = rng.choice(list(configs))
+        if rng.random() < 0.15:
+            stage_rollup_manager.remove_video_results(video_id, db)
+            continue
+        results = [stage_result(config, rng.choice([None, 0, rng.randint(100, 5000)])) for config in configs[video_id]]
+        stage_rollup_manager.record_video_results(video_id, results, db)
+    
+    incremental = snapshot(db, project.id)
+    stage_rollup_manager.rebuild_project_rollups(project.id, db)
+    assert snapshot(db, project.id) == incremental
+    
+    # 删除单个阶段配置的结果
+    video_id = next(iter(configs))
+    stage_rollup_manager.record_video_results(video_id, [stage_result(configs[video_id][0], 1234)], db)
+    stage_rollup_manager.remove_video_results(video_id, db, stage_config_ids=[configs[video_id][0].id])
+    incremental = snapshot(db, project.id)
+    stage_rollup_manager.rebuild_project_rollups(project.id, db)
+    assert snapshot(db, project.id) == incremental
+    
+    summary = stage_rollup_manager.get_project_rollups(project.id, db, percentiles=[50, 95])
+    for stage in summary["stages"]:
+        print(f"  {stage['stage_name']}: n={stage['count']}, mean={stage['mean_duration_ms']}, {stage['percentiles']}")
+        assert stage["min_duration_ms"] <= stage["percentiles"]["p50"] <= stage["max_duration_ms"]
+    print("✓ 增量汇总与重建结果一致")
+
+
+if __name__ == "__main__":
+    test_sketch_accuracy()
+    test_incremental_matches_rebuild()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阶段起止规则测试脚本
+验证start_rule / end_rule编译后的状态机在单次遍历中的求值结果
+"""
+
+import json
+from types import SimpleNamespace
+
+from keyword_pattern_module import keyword_pattern_analyzer, _StageSpec
+from stage_rule_module import compile_rule, validate_rule, FrameView, StageRuleError
+
+
+def build_frames():
+    """构造模拟帧：0-7帧显示"加载中"，6-9帧显示"请稍候"，10帧起显示"首页"（第12帧闪烁消失）"""
+    frames_with_ocr = []
+    for i in range(20):
+        texts = []
+        if i < 8:
+            texts.append("加载中")
+        if 6 <= i < 10:
+            texts.append("请稍候")
+        if i >= 10 and i != 12:
+            texts.append("首页")
+        frame = SimpleNamespace(id=i + 1, frame_number=i, timestamp_ms=i * 100)
+        ocr_result = SimpleNamespace(text_content=json.dumps(texts, ensure_ascii=False), confidence=0.9)
+        frames_with_ocr.append((frame, ocr_result))
+    return frames_with_ocr
+
+
+def run_rule(rule, default_keywords=None):
+    """对模拟帧序列求值单个规则"""
+    automaton = compile_rule(rule, default_keywords)
+    for frame, ocr_result in build_frames():
+        automaton.feed(FrameView(frame.timestamp_ms, frame.id, ocr_result.text_content))
+    return automaton.fired_at
+
+
+def test_keyword_rules():
+    """测试关键词出现、消失、缺失规则"""
+    print("=== 关键词规则测试 ===")
+    assert run_rule({"type": "keyword_appear", "keywords": ["首页"]}) == 1000
+    assert run_rule({"type": "keyword_appear", "keywords": ["加载中", "请稍候"], "match": "all"}) == 600
+    assert run_rule({"type": "keyword_disappear", "keywords": ["加载中"]}) == 800
+    # 第12帧的短暂消失不满足持续缺失300ms的要求
+    assert run_rule({"type": "keyword_absent", "keywords": ["首页"], "duration_ms": 300, "require_seen": True}) is None
+    assert run_rule({"type": "keyword_absent", "keywords": ["首页"], "duration_ms": 50, "require_seen": True}) == 1200
+    # 第10帧起持续出现300ms
+    assert run_rule({"type": "keyword_appear", "keywords": ["首页"], "min_duration_ms": 300}) == 1300
+    # 省略keywords时使用阶段关键词
+    assert run_rule({"type": "keyword_disappear"}, ["请稍候"]) == 1000
+    print("✓ 关键词规则测试通过")
+
+
+def test_combinators():
+    """测试顺序、任一、全部组合规则"""
+    print("=== 组合规则测试 ===")
+    sequence = {
+        "type": "sequence",
+        "steps": [
+            {"type": "keyword_appear", "keywords": ["请稍候"]},
+            {"type": "keyword_appear", "keywords": ["首页"]}
+        ]
+    }
+    assert run_rule(sequence) == 1000
+    assert run_rule({"type": "any", "rules": [
+        {"type": "keyword_appear", "keywords": ["首页"]},
+        {"type": "keyword_appear", "keywords": ["请稍候"]}
+    ]}) == 600
+    assert run_rule({"type": "all", "rules": [
+        {"type": "keyword_disappear", "keywords": ["加载中"]},
+        {"type": "keyword_disappear", "keywords": ["请稍候"]}
+    ]}) == 1000
+    print("✓ 组合规则测试通过")
+
+
+def test_invalid_rules():
+    """测试无效规则校验"""
+    print("=== 无效规则测试 ===")
+    for rule in [
+        {"type": "unknown"},
+        {"type": "keyword_appear", "keywords": []},
+        {"type": "keyword_absent", "keywords": ["A"], "duration_ms": -1},
+        {"type": "sequence", "steps": []},
+        {"type": "keyword_appear", "keywords": ["A"], "match": "some"},
+    ]:
+        try:
+            validate_rule(rule)
+        except StageRuleError:
+            continue
+        raise AssertionError(f"规则应当无效: {rule}")
+    print("✓ 无效规则测试通过")
+
+
+def test_stage_boundaries():
+    """测试阶段分析中规则覆盖默认的起止计算"""
+    print("=== 阶段起止规则测试 ===")
+    specs = [
+        _StageSpec(1, "默认规则", 1, ["加载中", "请稍候"]),
+        _StageSpec(
+            2, "自定义规则", 2, ["加载中", "请稍候"],
+            start_rule={"type": "keyword_appear", "keywords": ["请稍候"]},
+            end_rule={"type": "keyword_appear", "keywords": ["首页"], "min_duration_ms": 100}
+        ),
+    ]
+    default_stage, rule_stage = keyword_pattern_analyzer._analyze_stages(specs, build_frames())
+    
+    assert (default_stage.stage_start_timestamp_ms, default_stage.stage_end_timestamp_ms) == (0, 1000)
+    assert default_stage.start_source == "keywords"
+    
+    assert (rule_stage.stage_start_timestamp_ms, rule_stage.stage_end_timestamp_ms) == (600, 1000)
+    assert rule_stage.stage_duration_ms == 400
+    assert (rule_stage.start_source, rule_stage.end_source) == ("rule", "rule")
+    print("✓ 阶段起止规则测试通过")
+
+
+if __name__ == "__main__":
+    test_keyword_rules()
+    test_combinators()
+    test_invalid_rules()
+    test_stage_boundaries()
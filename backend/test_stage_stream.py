@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式阶段分析测试脚本
+验证逐帧增量计算的结果与一次性完整分析（不收集关键词出现记录）的结果一致，
+以及OCR完成后流式分析器只保留最终结果、已完成的视频数不超过上限
+"""
+
+import json
+from types import SimpleNamespace
+
+from keyword_pattern_module import keyword_pattern_analyzer, _StageSpec
+import stage_stream_module
+from stage_stream_module import VideoStageStream, StageStreamManager
+
+
+def build_frames():
+    """构造模拟的帧和OCR结果序列"""
+    frames_with_ocr = []
+    for i in range(20):
+        texts = []
+        if 2 <= i < 8:
+            texts.append("加载中...")
+        if 5 <= i < 7 or i == 12:
+            texts.append("请稍候")
+        if i >= 10:
+            texts.append("首页")
+        frame = SimpleNamespace(id=i + 1, frame_number=i, timestamp_ms=i * 333)
+        ocr_result = SimpleNamespace(text_content=json.dumps(texts, ensure_ascii=False), confidence=0.9)
+        frames_with_ocr.append((frame, ocr_result))
+    return frames_with_ocr
+
+
+def test_stream_matches_batch():
+    """测试流式结果与完整分析结果一致"""
+    print("=== 流式阶段分析一致性测试 ===")
+    
+    specs = [
+        _StageSpec(1, "加载阶段", 1, ["加载中", "请稍候"]),
+        _StageSpec(2, "首页阶段", 2, ["首页"]),
+    ]
+    frames_with_ocr = build_frames()
+    
+    stream = VideoStageStream(1, specs, total_frames=len(frames_with_ocr))
+    for index, (frame, ocr_result) in enumerate(frames_with_ocr):
+        stream.feed(frame, ocr_result)
+        
+        # 每一帧之后的流式结果都应等于对已处理前缀的完整分析
+        partial = stream.build_response()["stage_results"]
+        expected = [r.dict() for r in keyword_pattern_analyzer._analyze_stages(
+            specs, frames_with_ocr[:index + 1], collect_occurrences=False
+        )]
+        assert partial == expected, f"第{index}帧后流式结果不一致"
+    
+    stream.complete()
+    result = stream.build_response()
+    # 完成后释放状态机，只保留最终结果
+    assert stream.stage_trackers == []
+    assert result["stage_results"] == [
+        r.dict() for r in keyword_pattern_analyzer._analyze_stages(specs, frames_with_ocr, collect_occurrences=False)
+    ]
+    assert all(not keyword["occurrences"] for stage in result["stage_results"] for keyword in stage["keyword_results"])
+    assert result["stream_status"]["completed"]
+    assert result["stream_status"]["frames_processed"] == len(frames_with_ocr)
+    
+    loading = result["stage_results"][0]
+    print(f"  加载阶段: {loading['stage_start_timestamp_ms']}ms -> {loading['stage_end_timestamp_ms']}ms")
+    assert loading["stage_start_timestamp_ms"] == 2 * 333
+    assert loading["stage_end_timestamp_ms"] == 8 * 333
+    print("✓ 流式结果与完整分析一致")
+
+
+def test_completed_streams_bounded():
+    """测试已完成的流式结果数量不超过上限"""
+    print("=== 已完成流式结果上限测试 ===")
+    specs = [_StageSpec(1, "加载阶段", 1, ["加载中"])]
+    manager = StageStreamManager()
+    original_limit = stage_stream_module.MAX_COMPLETED_STREAMS
+    stage_stream_module.MAX_COMPLETED_STREAMS = 2
+    try:
+        for video_id in range(1, 4):
+            stream = VideoStageStream(video_id, specs, total_frames=0)
+            manager.streams[video_id] = stream
+            manager.complete(stream)
+        # 最早完成的视频被丢弃
+        assert sorted(manager.streams) == [2, 3]
+        assert manager.get_completed(3) is not None
+    finally:
+        stage_stream_module.MAX_COMPLETED_STREAMS = original_limit
+    print("✓ 已完成流式结果上限测试通过")
+
+
+if __name__ == "__main__":
+    test_stream_matches_batch()
+    test_completed_streams_bounded()
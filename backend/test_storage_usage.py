@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存储用量统计测试脚本
+验证写入、覆盖和删除文件时增量更新按类别和视频的计数，增量合并写入数据库，
+与磁盘核对时修正丢失的增量，以及删除视频数据后该视频的计数清零
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from sqlalchemy.orm import sessionmaker
+
+from db_module import create_db_engine, DatabaseWriter
+from models_simple import Base, Project, Video, StorageUsage
+from storage_module import StorageAccountant
+
+
+def create_test_env():
+    """创建临时数据库和存储目录"""
+    base_dir = Path(tempfile.mkdtemp(prefix="storage_"))
+    engine = create_db_engine(f"sqlite:///{base_dir / 'test.db'}")
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    categories = {name: str(base_dir / "data" / name) for name in ("videos", "frames", "ocr_images")}
+    accountant = StorageAccountant(categories, ["frames", "ocr_images"], writer=DatabaseWriter(SessionFactory))
+    return SessionFactory, accountant, base_dir
+
+
+def write_file(accountant: StorageAccountant, path: Path, size: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    previous_size = path.stat().st_size if path.exists() else None
+    path.write_bytes(b"x" * size)
+    accountant.file_written(path, size, previous_size)
+
+
+def test_incremental_counters():
+    """测试分类、增量计数、合并写入数据库和删除文件"""
+    print("=== 增量计数测试 ===")
+    SessionFactory, accountant, base_dir = create_test_env()
+    data_dir = base_dir / "data"
+    
+    assert accountant.classify(data_dir / "frames" / "video_7" / "frame_000001.jpg") == ("frames", 7)
+    assert accountant.classify(data_dir / "frames" / "misc.jpg") == ("frames", 0)
+    assert accountant.classify(data_dir / "videos" / "video_3" / "a.mp4") == ("videos", 0)
+    assert accountant.classify(base_dir / "elsewhere" / "a.jpg") is None
+    
+    db = SessionFactory()
+    try:
+        project = Project(name="存储测试项目")
+        db.add(project)
+        db.commit()
+        video = Video(project_id=project.id, original_filename="a.mp4", stored_filename="a.mp4",
+                      file_path=str(data_dir / "videos" / "a.mp4"), file_size=1000)
+        db.add(video)
+        db.commit()
+        video_id = video.id
+        
+        write_file(accountant, data_dir / "videos" / "a.mp4", 1000)
+        for i in range(3):
+            write_file(accountant, data_dir / "frames" / f"video_{video_id}" / f"frame_{i}.jpg", 100)
+        write_file(accountant, data_dir / "ocr_images" / f"video_{video_id}" / "frame_0_ocr.jpg", 50)
+        # 覆盖同名文件只改变字节数
+        write_file(accountant, data_dir / "frames" / f"video_{video_id}" / "frame_0.jpg", 150)
+        # 不在存储目录下的文件不计入
+        write_file(accountant, base_dir / "elsewhere" / "a.jpg", 10)
+        
+        # 尚未写入数据库时读取结果已包含增量
+        usage = accountant.get_usage(db)
+        assert usage["frames"] == {"file_count": 3, "total_bytes": 350}
+        assert db.query(StorageUsage).count() == 0
+        
+        accountant.flush()
+        assert db.query(StorageUsage).count() == 3
+        assert accountant.get_usage(db) == usage
+        assert usage["videos"] == {"file_count": 1, "total_bytes": 1000}
+        
+        video_usage = accountant.get_video_usage(video_id, db)
+        assert video_usage["categories"]["frames"] == {"file_count": 3, "total_bytes": 350}
+        assert video_usage["categories"]["ocr_images"] == {"file_count": 1, "total_bytes": 50}
+        assert video_usage["file_count"] == 4 and video_usage["total_bytes"] == 400
+        
+        accountant.remove_file(data_dir / "frames" / f"video_{video_id}" / "frame_1.jpg")
+        accountant.flush()
+        assert accountant.get_usage(db)["frames"] == {"file_count": 2, "total_bytes": 250}
+        
+        # 视频的文件全部删除后不再保留该视频的计数
+        for path in list((data_dir / "frames" / f"video_{video_id}").iterdir()):
+            accountant.remove_file(path)
+        accountant.remove_file(data_dir / "ocr_images" / f"video_{video_id}" / "frame_0_ocr.jpg")
+        accountant.flush()
+        assert db.query(StorageUsage).filter(StorageUsage.video_id == video_id).count() == 0
+        assert accountant.get_video_usage(video_id, db)["file_count"] == 0
+    finally:
+        db.close()
+        accountant.writer.stop()
+    print("✓ 增量计数测试通过")
+
+
+def test_reconcile():
+    """测试与磁盘核对：修正丢失的增量和直接增删的文件"""
+    print("=== 磁盘核对测试 ===")
+    SessionFactory, accountant, base_dir = create_test_env()
+    data_dir = base_dir / "data"
+    
+    db = SessionFactory()
+    try:
+        write_file(accountant, data_dir / "frames" / "video_1" / "frame_0.jpg", 100)
+        write_file(accountant, data_dir / "frames" / "video_2" / "frame_0.jpg", 200)
+        accountant.flush()
+        
+        # 绕过计数直接增删文件（模拟外部程序或进程崩溃丢失的增量）
+        os.remove(data_dir / "frames" / "video_2" / "frame_0.jpg")
+        (data_dir / "ocr_images" / "video_1").mkdir(parents=True)
+        (data_dir / "ocr_images" / "video_1" / "frame_0_ocr.jpg").write_bytes(b"x" * 30)
+        (data_dir / "videos").mkdir(parents=True)
+        (data_dir / "videos" / "b.mp4").write_bytes(b"x" * 500)
+        assert accountant.get_usage(db)["frames"]["file_count"] == 2
+        
+        result = accountant.reconcile()
+        assert result["drift"]["frames"] == {"file_count": -1, "total_bytes": -200}
+        assert result["drift"]["ocr_images"] == {"file_count": 1, "total_bytes": 30}
+        assert result["drift"]["videos"] == {"file_count": 1, "total_bytes": 500}
+        assert accountant.last_reconciled_at is not None
+        
+        usage = accountant.get_usage(db)
+        assert usage == result["usage"]
+        assert usage["frames"] == {"file_count": 1, "total_bytes": 100}
+        rows = {(row.category, row.video_id): row.file_count for row in db.query(StorageUsage)}
+        assert rows == {("frames", 1): 1, ("ocr_images", 1): 1, ("videos", 0): 1}
+        
+        # 再次核对没有差值
+        assert accountant.reconcile()["drift"] == {}
+    finally:
+        db.close()
+        accountant.writer.stop()
+    print("✓ 磁盘核对测试通过")
+
+
+if __name__ == "__main__":
+    test_incremental_counters()
+    test_reconcile()
+    print("\n所有测试通过")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缩略图测试脚本
+验证多尺寸缩略图的生成、带内容哈希的URL及缓存头、雪碧图的拼接和清单，以及后台预生成
+"""
+
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+import cv2
+import numpy as np
+from fastapi import HTTPException
+from starlette.requests import Request
+from sqlalchemy.orm import sessionmaker
+
+from db_module import create_db_engine
+from async_db_module import ThreadPoolSession
+from models_simple import Base, Project, Video, VideoFrame
+from thumbnail_module import ThumbnailManager, THUMBNAIL_SIZES, IMMUTABLE_CACHE_CONTROL
+
+
+def create_test_data(frame_count: int = 12):
+    """创建临时数据库和帧图片（1280x720）"""
+    base_dir = Path(tempfile.mkdtemp(prefix="thumbnails_"))
+    engine = create_db_engine(f"sqlite:///{base_dir / 'test.db'}")
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    
+    db = SessionFactory()
+    project = Project(name="缩略图测试项目")
+    db.add(project)
+    db.commit()
+    video = Video(project_id=project.id, original_filename="a.mp4", stored_filename="a.mp4", file_path="a.mp4", file_size=1)
+    db.add(video)
+    db.commit()
+    for i in range(frame_count):
+        frame_path = str(base_dir / "frames" / f"frame_{i:06d}.jpg")
+        os.makedirs(os.path.dirname(frame_path), exist_ok=True)
+        image = np.full((720, 1280, 3), i * 20, dtype=np.uint8)
+        cv2.imwrite(frame_path, image)
+        db.add(VideoFrame(video_id=video.id, frame_number=i, timestamp_ms=i * 1000, frame_path=frame_path,
+                          file_size=os.path.getsize(frame_path)))
+    db.commit()
+    video_id = video.id
+    db.close()
+    
+    manager = ThumbnailManager()
+    manager.thumbnails_path = str(base_dir / "thumbnails")
+    return SessionFactory, video_id, manager
+
+
+def make_request(if_none_match: str = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": headers})
+
+
+def test_thumbnail_urls():
+    """测试重定向到带哈希的URL、按需生成、不可变缓存头和304"""
+    print("=== 缩略图URL测试 ===")
+    SessionFactory, video_id, manager = create_test_data()
+    db = SessionFactory()
+    frame = db.query(VideoFrame).first()
+    
+    redirect = manager.get_thumbnail_redirect(frame.id, "sm", db)
+    location = redirect.headers["location"]
+    assert redirect.status_code == 307 and location.startswith(f"/thumbnails/frames/{frame.id}/sm/")
+    key = location.rsplit("/", 1)[1][:-len(".jpg")]
+    
+    response = asyncio.run(manager.serve_thumbnail(frame.id, "sm", key, make_request(), db))
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    thumbnail = cv2.imread(response.path)
+    assert thumbnail.shape[:2] == (135, THUMBNAIL_SIZES["sm"])
+    
+    response = asyncio.run(manager.serve_thumbnail(frame.id, "sm", key, make_request(response.headers["etag"]), db))
+    assert response.status_code == 304
+    
+    # 帧被重新提取后哈希变化，旧URL返回404
+    frame.extracted_at = frame.extracted_at.replace(year=2000)
+    db.commit()
+    try:
+        asyncio.run(manager.serve_thumbnail(frame.id, "sm", key, make_request(), db))
+        assert False, "过期的哈希应返回404"
+    except HTTPException as e:
+        assert e.status_code == 404
+    assert manager.get_thumbnail_redirect(frame.id, "sm", db).headers["location"] != location
+    
+    try:
+        manager.get_thumbnail_redirect(frame.id, "xl", db)
+        assert False, "不支持的尺寸应返回400"
+    except HTTPException as e:
+        assert e.status_code == 400
+    db.close()
+    print("✓ 缩略图URL测试通过")
+
+
+def test_sprite():
+    """测试雪碧图的帧选取、拼接位置以及重复请求复用已生成的雪碧图"""
+    print("=== 雪碧图测试 ===")
+    SessionFactory, video_id, manager = create_test_data()
+    db = ThreadPoolSession(SessionFactory)
+    
+    def get_sprite(**kwargs):
+        return asyncio.run(manager.get_sprite(video_id, db, **kwargs))
+    
+    manifest = get_sprite(size="xs", count=6, columns=4, from_ms=0, to_ms=12000)
+    tiles = manifest["tiles"]
+    assert len(tiles) == 6 and manifest["columns"] == 4 and manifest["rows"] == 2
+    assert [tile["timestamp_ms"] for tile in tiles] == [0, 2000, 4000, 6000, 8000, 10000]
+    assert manifest["tile_width"] == 96 and manifest["tile_height"] == 54
+    assert (tiles[5]["x"], tiles[5]["y"]) == (96, 54)
+    
+    _, _, _, video_dir, size, filename = manifest["sprite_url"].split("/")
+    key = filename[:-len(".jpg")]
+    response = manager.serve_sprite(video_id, size, key, make_request())
+    sprite = cv2.imread(response.path)
+    assert sprite.shape[:2] == (108, 384)
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    # 第6帧（时间10000ms，灰度200）位于第二行第二列
+    assert abs(int(sprite[54 + 27, 96 + 48, 0]) - 200) < 5
+    
+    # 再次请求时复用已生成的雪碧图
+    mtime = os.path.getmtime(response.path)
+    assert get_sprite(size="xs", count=6, columns=4, from_ms=0, to_ms=12000) == manifest
+    assert os.path.getmtime(response.path) == mtime
+    
+    empty = get_sprite(from_ms=50000)
+    assert empty["sprite_url"] is None and empty["tiles"] == []
+    try:
+        get_sprite(count=0)
+        assert False, "count超出范围应返回400"
+    except HTTPException as e:
+        assert e.status_code == 400
+    asyncio.run(db.close())
+    print("✓ 雪碧图测试通过")
+
+
+def test_pregenerate():
+    """测试后台预生成常用尺寸的缩略图，已存在的缩略图不重复生成"""
+    print("=== 缩略图预生成测试 ===")
+    SessionFactory, video_id, manager = create_test_data(frame_count=3)
+    db = SessionFactory()
+    frames = [{
+        "id": frame.id, "frame_path": frame.frame_path, "file_size": frame.file_size, "extracted_at": frame.extracted_at
+    } for frame in db.query(VideoFrame).all()]
+    db.close()
+    
+    result = manager.pregenerate(video_id, frames)
+    assert result["generated"] == 6 and result["failed"] == 0
+    assert len(list(Path(manager.thumbnails_path).rglob("*.jpg"))) == 6
+    assert manager.pregenerate(video_id, frames)["generated"] == 0
+    print("✓ 缩略图预生成测试通过")
+
+
+if __name__ == "__main__":
+    test_thumbnail_urls()
+    test_sprite()
+    test_pregenerate()
+    print("\n所有测试通过")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间轴分页测试脚本
+验证帧和OCR结果的键集分页、时间窗口筛选、字段选择以及游标校验
+"""
+
+import asyncio
+import os
+import tempfile
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+
+from db_module import create_db_engine
+from async_db_module import ThreadPoolSession
+from models_simple import Base, Project, Video, VideoFrame, OCRResult
+from frame_extraction_module import frame_extractor
+
+
+def create_test_database(frame_count: int = 50):
+    """创建临时数据库，帧时间戳每两帧重复一次，用于验证相同时间戳的分页顺序"""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="timeline_"), "test.db")
+    engine = create_db_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    
+    db = SessionFactory()
+    project = Project(name="分页测试项目")
+    db.add(project)
+    db.commit()
+    video = Video(project_id=project.id, original_filename="a.mp4", stored_filename="a.mp4", file_path="a.mp4", file_size=1)
+    db.add(video)
+    db.commit()
+    for i in range(frame_count):
+        frame = VideoFrame(video_id=video.id, frame_number=i, timestamp_ms=(i // 2) * 100, frame_path=f"{i}.jpg")
+        db.add(frame)
+        db.flush()
+        db.add(OCRResult(frame_id=frame.id, text_content=f'["第{i}帧"]', confidence=0.9))
+    db.commit()
+    video_id = video.id
+    db.close()
+    return SessionFactory, video_id
+
+
+async def collect_pages(load_page, limit: int, **kwargs):
+    """依次读取所有页，返回(全部记录, 页数)"""
+    items, cursor, pages = [], None, 0
+    while True:
+        page = await load_page(cursor=cursor, limit=limit, **kwargs)
+        items.extend(page["items"])
+        pages += 1
+        if not page["has_more"]:
+            assert page["next_cursor"] is None
+            return items, pages
+        cursor = page["next_cursor"]
+
+
+def test_frame_pages():
+    """测试帧分页结果与完整列表一致，时间窗口和字段选择生效"""
+    print("=== 帧分页测试 ===")
+    SessionFactory, video_id = create_test_database()
+    
+    async def run():
+        session = ThreadPoolSession(SessionFactory)
+        try:
+            async def load_page(**kwargs):
+                return await frame_extractor.get_video_frames_page(video_id, session, **kwargs)
+            
+            items, pages = await collect_pages(load_page, limit=7)
+            assert pages == 8
+            assert [item["frame_number"] for item in items] == list(range(50))
+            
+            # 时间窗口[500, 1000)内为第10-19帧
+            items, _ = await collect_pages(load_page, limit=3, from_ms=500, to_ms=1000, fields="frame_number")
+            assert items == [{"frame_number": i} for i in range(10, 20)]
+            
+            page = await load_page(limit=5, include_total=True, from_ms=2000)
+            assert page["total"] == 10 and len(page["items"]) == 5
+            
+            for kwargs in ({"cursor": "not-a-cursor"}, {"fields": "frame_number,unknown"}, {"limit": 0},
+                           {"from_ms": 10, "to_ms": 5}):
+                try:
+                    await load_page(**kwargs)
+                    raise AssertionError(f"应当返回400: {kwargs}")
+                except HTTPException as e:
+                    assert e.status_code == 400
+        finally:
+            await session.close()
+    
+    asyncio.run(run())
+    print("✓ 帧分页测试通过")
+
+
+def test_ocr_pages():
+    """测试OCR结果按帧时间分页"""
+    print("=== OCR结果分页测试 ===")
+    # OCR模块依赖PaddleOCR，未安装时跳过
+    try:
+        from ocr_module import ocr_processor
+    except ImportError as e:
+        print(f"无法导入OCR模块，跳过: {e}")
+        return
+    SessionFactory, video_id = create_test_database()
+    
+    async def run():
+        session = ThreadPoolSession(SessionFactory)
+        try:
+            async def load_page(**kwargs):
+                return await ocr_processor.get_video_ocr_results_page(video_id, session, **kwargs)
+            
+            items, _ = await collect_pages(load_page, limit=4, fields="timestamp_ms,text_content,confidence")
+            assert [item["text_content"] for item in items] == [f'["第{i}帧"]' for i in range(50)]
+            assert all(item["confidence"] == 0.9 for item in items)
+        finally:
+            await session.close()
+    
+    asyncio.run(run())
+    print("✓ OCR结果分页测试通过")
+
+
+if __name__ == "__main__":
+    test_frame_pages()
+    test_ocr_pages()
+    print("\n所有测试通过")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频数据删除测试脚本
+验证按范围以集合方式删除数据库记录、并行删除产物文件，以及后台删除任务的状态登记
+"""
+
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from fastapi import BackgroundTasks
+from sqlalchemy.orm import sessionmaker
+
+from db_module import create_db_engine, DatabaseWriter
+from models_simple import (
+    Base, Project, Video, VideoFrame, OCRResult, OCRTextLine, StageConfig,
+    StageAnalysisResult, StageDurationRollup
+)
+from deletion_module import VideoDataDeleter
+from job_module import job_registry, JOB_COMPLETED
+from stage_rollup_module import stage_rollup_manager
+
+
+def create_test_data(frame_count: int = 20):
+    """创建临时数据库和产物目录，写入一个带帧、OCR结果和阶段结果的视频"""
+    base_dir = Path(tempfile.mkdtemp(prefix="deletion_"))
+    engine = create_db_engine(f"sqlite:///{base_dir / 'test.db'}")
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    
+    deleter = VideoDataDeleter(writer=DatabaseWriter(SessionFactory))
+    deleter.frames_storage_path = str(base_dir / "frames")
+    deleter.ocr_results_path = str(base_dir / "ocr_results")
+    deleter.ocr_images_path = str(base_dir / "ocr_images")
+    deleter.thumbnails_path = str(base_dir / "thumbnails")
+    
+    db = SessionFactory()
+    project = Project(name="删除测试项目")
+    db.add(project)
+    db.commit()
+    video_path = base_dir / "video.mp4"
+    video_path.write_bytes(b"video")
+    video = Video(project_id=project.id, original_filename="video.mp4", stored_filename="video.mp4",
+                  file_path=str(video_path), file_size=5)
+    db.add(video)
+    db.commit()
+    
+    frames_dir = Path(deleter.frames_storage_path) / f"video_{video.id}"
+    ocr_dir = Path(deleter.ocr_results_path) / f"video_{video.id}"
+    images_dir = Path(deleter.ocr_images_path) / f"video_{video.id}"
+    for directory in (frames_dir, ocr_dir, images_dir):
+        directory.mkdir(parents=True)
+    
+    for i in range(frame_count):
+        frame_path = frames_dir / f"frame_{i:06d}.jpg"
+        frame_path.write_bytes(b"jpg")
+        frame = VideoFrame(video_id=video.id, frame_number=i, timestamp_ms=i * 100, frame_path=str(frame_path))
+        db.add(frame)
+        db.flush()
+        db.add(OCRResult(frame_id=frame.id, text_content='["加载中"]', confidence=0.9))
+        db.add(OCRTextLine(frame_id=frame.id, video_id=video.id, line_idx=0, text="加载中", text_norm="加载中", score=0.9))
+        (ocr_dir / f"frame_{i:06d}_ocr_res.json").write_text("{}")
+        (images_dir / f"frame_{frame.id}_ocr.jpg").write_bytes(b"jpg")
+    
+    config = StageConfig(video_id=video.id, stage_name="加载阶段", stage_order=1, keywords=["加载中"])
+    db.add(config)
+    db.commit()
+    stage_rollup_manager.record_video_results(video.id, [{
+        "stage_id": config.id,
+        "stage_name": "加载阶段",
+        "stage_start_timestamp_ms": 0,
+        "stage_end_timestamp_ms": 1000,
+        "stage_duration_ms": 1000,
+        "keyword_results": []
+    }], db)
+    video_id = video.id
+    db.close()
+    return SessionFactory, deleter, video_id, base_dir
+
+
+def count_rows(SessionFactory, video_id: int) -> dict:
+    db = SessionFactory()
+    try:
+        return {
+            "frames": db.query(VideoFrame).filter(VideoFrame.video_id == video_id).count(),
+            "ocr_results": db.query(OCRResult).count(),
+            "text_lines": db.query(OCRTextLine).count(),
+            "stage_results": db.query(StageAnalysisResult).count(),
+            "rollups": db.query(StageDurationRollup).count(),
+            "stage_configs": db.query(StageConfig).count(),
+            "videos": db.query(Video).count()
+        }
+    finally:
+        db.close()
+
+
+def test_delete_ocr_scope():
+    """测试只删除OCR结果时保留帧和帧图片"""
+    print("=== OCR范围删除测试 ===")
+    SessionFactory, deleter, video_id, base_dir = create_test_data()
+    
+    db = SessionFactory()
+    result = deleter.delete_video_data(video_id, "ocr", db)
+    db.close()
+    
+    assert result["deleted_rows"]["ocr_results"] == 20
+    assert result["deleted_rows"]["ocr_text_lines"] == 20
+    assert result["deleted_rows"]["stage_analysis_results"] == 1
+    assert result["deleted_files"] == 20
+    counts = count_rows(SessionFactory, video_id)
+    assert counts["frames"] == 20 and counts["ocr_results"] == 0 and counts["text_lines"] == 0
+    assert counts["stage_results"] == 0 and counts["rollups"] == 0
+    assert not (base_dir / "ocr_results" / f"video_{video_id}").exists()
+    assert len(list((base_dir / "frames" / f"video_{video_id}").iterdir())) == 20
+    print("✓ OCR范围删除测试通过")
+
+
+def test_background_frames_job():
+    """测试后台删除帧任务：接口立即返回任务，任务执行后帧、OCR和产物目录全部删除"""
+    print("=== 后台删除帧任务测试 ===")
+    SessionFactory, deleter, video_id, base_dir = create_test_data()
+    
+    background_tasks = BackgroundTasks()
+    db = SessionFactory()
+    job = deleter.start_deletion_job(video_id, "frames", background_tasks, db)
+    # 任务执行前重复提交返回同一个任务
+    assert deleter.start_deletion_job(video_id, "frames", background_tasks, db)["job_id"] == job["job_id"]
+    db.close()
+    assert job["status"] == "pending"
+    assert len(background_tasks.tasks) == 1
+    
+    asyncio.run(background_tasks())
+    job = job_registry.get(job["job_id"])
+    assert job["status"] == JOB_COMPLETED, job
+    assert job["result"]["deleted_rows"]["video_frames"] == 20
+    assert job["result"]["deleted_files"] == 60
+    assert job["result"]["failed_files"] == 0
+    
+    counts = count_rows(SessionFactory, video_id)
+    assert counts["frames"] == 0 and counts["ocr_results"] == 0 and counts["stage_results"] == 0
+    assert counts["stage_configs"] == 1 and counts["videos"] == 1
+    for name in ("frames", "ocr_results", "ocr_images"):
+        assert not (base_dir / name / f"video_{video_id}").exists()
+    deleter.writer.stop()
+    print("✓ 后台删除帧任务测试通过")
+
+
+def test_delete_video_scope():
+    """测试删除整个视频"""
+    print("=== 视频范围删除测试 ===")
+    SessionFactory, deleter, video_id, base_dir = create_test_data(frame_count=5)
+    
+    db = SessionFactory()
+    result = deleter.delete_video_data(video_id, "video", db)
+    db.close()
+    
+    assert result["deleted_rows"]["videos"] == 1
+    assert result["deleted_rows"]["stage_configs"] == 1
+    counts = count_rows(SessionFactory, video_id)
+    assert all(value == 0 for value in counts.values()), counts
+    assert not os.path.exists(base_dir / "video.mp4")
+    print("✓ 视频范围删除测试通过")
+
+
+if __name__ == "__main__":
+    test_delete_ocr_scope()
+    test_background_frames_job()
+    test_delete_video_scope()
+    print("\n所有测试通过")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频元数据探测测试脚本
+验证不解码读取时长、帧率、分辨率、编码、总帧数和关键帧位置，后台任务保存到视频记录，
+以及已探测的视频不重复探测
+"""
+
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+import cv2
+import numpy as np
+from fastapi import BackgroundTasks
+from sqlalchemy.orm import sessionmaker
+
+from db_module import create_db_engine, DatabaseWriter
+from models_simple import Base, Project, Video
+from metadata_module import VideoMetadataProber, probe_video_file
+from job_module import job_registry, JOB_COMPLETED
+
+
+def create_test_video(path: str, frame_count: int = 90, fps: int = 30, size=(320, 240)) -> str:
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for i in range(frame_count):
+        frame = np.full((size[1], size[0], 3), i % 255, np.uint8)
+        cv2.putText(frame, str(i), (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def test_probe_video_file():
+    """测试探测结果"""
+    print("=== 视频元数据探测测试 ===")
+    video_path = create_test_video(os.path.join(tempfile.mkdtemp(prefix="metadata_"), "probe.mp4"))
+    
+    metadata = probe_video_file(video_path)
+    assert metadata["frame_count"] == 90
+    assert metadata["fps"] == 30.0 and metadata["duration_ms"] == 3000
+    assert metadata["resolution"] == "320x240"
+    assert metadata["codec"] == "mpeg4"
+    keyframes = metadata["keyframes"]
+    assert keyframes and keyframes[0] == [0, 0]
+    assert all(0 <= frame < 90 for frame, _ in keyframes)
+    assert [timestamp for _, timestamp in keyframes] == sorted(timestamp for _, timestamp in keyframes)
+    
+    # 帧率保存完整精度，不保留两位小数
+    fractional_path = os.path.join(tempfile.mkdtemp(prefix="metadata_"), "fractional.avi")
+    writer = cv2.VideoWriter(fractional_path, cv2.VideoWriter_fourcc(*"MJPG"), 10.125, (64, 48))
+    for i in range(3):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+    assert probe_video_file(fractional_path)["fps"] == 10.125
+    
+    try:
+        probe_video_file(video_path + ".missing")
+        assert False, "文件不存在应抛出ValueError"
+    except ValueError:
+        pass
+    print(f"✓ 视频元数据探测测试通过，关键帧: {keyframes}")
+
+
+def test_probe_job():
+    """测试后台探测任务保存元数据，已探测的视频不再创建任务，内容相同的视频复用元数据"""
+    print("=== 后台探测任务测试 ===")
+    base_dir = Path(tempfile.mkdtemp(prefix="metadata_"))
+    engine = create_db_engine(f"sqlite:///{base_dir / 'test.db'}")
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    prober = VideoMetadataProber(writer=DatabaseWriter(SessionFactory))
+    video_path = create_test_video(str(base_dir / "video.mp4"), frame_count=60)
+    
+    db = SessionFactory()
+    try:
+        project = Project(name="元数据测试项目")
+        db.add(project)
+        db.commit()
+        video = Video(project_id=project.id, original_filename="video.mp4", stored_filename="video.mp4",
+                      file_path=video_path, file_size=os.path.getsize(video_path))
+        db.add(video)
+        db.commit()
+        assert prober.get_metadata(video.id, db)["probed"] is False
+        
+        background_tasks = BackgroundTasks()
+        job = prober.start_probe_job(video.id, background_tasks, db)
+        assert prober.start_probe_job(video.id, background_tasks, db)["job_id"] == job["job_id"]
+        asyncio.run(background_tasks())
+        job = job_registry.get(job["job_id"])
+        assert job["status"] == JOB_COMPLETED, job
+        assert job["result"]["saved"] is True and job["result"]["frame_count"] == 60
+        
+        db.expire_all()
+        info = prober.get_metadata(video.id, db)
+        assert info["probed"] is True
+        assert info["frame_count"] == 60 and info["duration_ms"] == 2000 and info["fps"] == 30.0
+        assert info["resolution"] == "320x240" and info["keyframes"][0] == [0, 0]
+        
+        # 数据库中的帧率为完整精度
+        db.query(Video).filter(Video.id == video.id).update({"fps": 30000 / 1001})
+        db.commit()
+        db.expire_all()
+        assert prober.get_metadata(video.id, db)["fps"] == 30000 / 1001
+        
+        # 已探测过：不再创建任务，强制时重新探测
+        assert prober.start_probe_job(video.id, BackgroundTasks(), db) is None
+        assert prober.start_probe_job(video.id, BackgroundTasks(), db, force=True) is not None
+        
+        # 内容相同的视频复用元数据
+        copy = Video(project_id=project.id, original_filename="copy.mp4", stored_filename="video.mp4",
+                     file_path=video_path, file_size=video.file_size)
+        prober.copy_metadata(db.query(Video).get(video.id), copy)
+        assert copy.frame_count == 60 and copy.keyframes == info["keyframes"] and copy.metadata_probed_at is not None
+    finally:
+        db.close()
+        prober.writer.stop()
+    print("✓ 后台探测任务测试通过")
+
+
+if __name__ == "__main__":
+    test_probe_video_file()
+    test_probe_job()
+    print("\n所有测试通过")
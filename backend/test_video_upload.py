@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分块上传测试脚本
+验证分块流式写入、连接中断后按服务端记录的位置续传（含进程重启）、位置不一致返回409、
+SHA-256校验，以及内容相同的视频共用同一个文件
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from fastapi import HTTPException
+from starlette.requests import Request
+from sqlalchemy.orm import sessionmaker
+
+from db_module import create_db_engine
+from models_simple import Base, Project, Video, VideoUpload
+from video_module import video_manager
+from upload_module import VideoUploadManager, UploadCreateRequest
+from deletion_module import VideoDataDeleter
+
+
+def create_test_env():
+    """创建临时数据库和存储目录，视频管理器的目录指向临时目录"""
+    base_dir = Path(tempfile.mkdtemp(prefix="upload_"))
+    engine = create_db_engine(f"sqlite:///{base_dir / 'test.db'}")
+    Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine)
+    
+    for name in ("videos", "uploads"):
+        (base_dir / name).mkdir()
+    video_manager.video_storage_path = str(base_dir / "videos")
+    video_manager.upload_temp_path = str(base_dir / "uploads")
+    
+    db = SessionFactory()
+    project = Project(name="上传测试项目")
+    db.add(project)
+    db.commit()
+    project_id = project.id
+    db.close()
+    return SessionFactory, project_id, base_dir
+
+
+def make_chunk_request(chunks, disconnect: bool = False) -> Request:
+    """构造以流的形式发送chunks的PUT请求，disconnect为True时发送完后模拟连接断开"""
+    messages = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks]
+    messages.append({"type": "http.disconnect"} if disconnect else {"type": "http.request", "body": b"", "more_body": False})
+    
+    async def receive():
+        return messages.pop(0)
+    
+    return Request({"type": "http", "method": "PUT", "path": "/uploads", "query_string": b"", "headers": []}, receive)
+
+
+def test_resumable_upload():
+    """测试分块上传、断线续传、进程重启后续传和位置不一致"""
+    print("=== 断点续传测试 ===")
+    SessionFactory, project_id, base_dir = create_test_env()
+    data = os.urandom(300 * 1024)
+    manager = VideoUploadManager()
+    
+    async def run():
+        db = SessionFactory()
+        try:
+            session = manager.create_upload(
+                project_id, UploadCreateRequest(filename="demo.mp4", size=len(data), sha256=hashlib.sha256(data).hexdigest()), db
+            )
+            upload_id = session["upload_id"]
+            assert session["offset"] == 0 and session["status"] == "uploading"
+            
+            # 第一块正常写入
+            result = await manager.append_chunk(upload_id, 0, make_chunk_request([data[:64 * 1024], data[64 * 1024:100 * 1024]]), db)
+            assert result["offset"] == 100 * 1024
+            
+            # 第二块发送一部分后连接断开，已收到的部分保留
+            result = await manager.append_chunk(upload_id, 100 * 1024, make_chunk_request([data[100 * 1024:150 * 1024]], disconnect=True), db)
+            assert result["offset"] == 150 * 1024
+            assert manager.get_upload(upload_id, db)["offset"] == 150 * 1024
+            
+            # 客户端按旧位置重发返回409，并带有服务端的位置
+            try:
+                await manager.append_chunk(upload_id, 100 * 1024, make_chunk_request([data[100 * 1024:200 * 1024]]), db)
+                assert False, "位置不一致应返回409"
+            except HTTPException as e:
+                assert e.status_code == 409 and e.headers["Upload-Offset"] == str(150 * 1024)
+            
+            # 未上传完整时不能完成
+            try:
+                await manager.complete_upload(upload_id, db)
+                assert False, "未上传完整应返回400"
+            except HTTPException as e:
+                assert e.status_code == 400
+            
+            # 模拟进程重启：内存中的哈希状态丢失，临时文件末尾有未记录的残留数据
+            restarted = VideoUploadManager()
+            with open(db.query(VideoUpload).get(upload_id).temp_path, "ab") as f:
+                f.write(b"garbage")
+            result = await restarted.append_chunk(upload_id, 150 * 1024, make_chunk_request([data[150 * 1024:]]), db)
+            assert result["offset"] == len(data)
+            
+            completed = await restarted.complete_upload(upload_id, db)
+            assert completed["deduplicated"] is False
+            assert completed["content_hash"] == hashlib.sha256(data).hexdigest()
+            # 重复完成返回同一个视频
+            assert (await restarted.complete_upload(upload_id, db))["video_id"] == completed["video_id"]
+            
+            video = db.query(Video).get(completed["video_id"])
+            assert Path(video.file_path).read_bytes() == data
+            assert video.file_size == len(data) and video.content_hash == completed["content_hash"]
+            assert os.listdir(base_dir / "uploads") == []
+        finally:
+            db.close()
+    
+    asyncio.run(run())
+    print("✓ 断点续传测试通过")
+
+
+def test_deduplication_and_hash_mismatch():
+    """测试内容相同的视频共用文件、删除其中一个时保留文件，以及哈希不一致时拒绝"""
+    print("=== 去重与校验测试 ===")
+    SessionFactory, project_id, base_dir = create_test_env()
+    data = os.urandom(64 * 1024)
+    manager = VideoUploadManager()
+    
+    async def upload(db, sha256=None):
+        session = manager.create_upload(project_id, UploadCreateRequest(filename="same.mp4", size=len(data), sha256=sha256), db)
+        await manager.append_chunk(session["upload_id"], 0, make_chunk_request([data]), db)
+        return await manager.complete_upload(session["upload_id"], db)
+    
+    async def run():
+        db = SessionFactory()
+        try:
+            first = await upload(db)
+            second = await upload(db)
+            assert first["deduplicated"] is False and second["deduplicated"] is True
+            first_video = db.query(Video).get(first["video_id"])
+            second_video = db.query(Video).get(second["video_id"])
+            assert first_video.file_path == second_video.file_path
+            shared_path = first_video.file_path
+            assert len(os.listdir(base_dir / "videos")) == 1
+            
+            # 客户端提供的哈希与内容不一致：拒绝并删除会话
+            try:
+                await upload(db, sha256="0" * 64)
+                assert False, "哈希不一致应返回400"
+            except HTTPException as e:
+                assert e.status_code == 400
+            assert db.query(VideoUpload).filter(VideoUpload.status == "uploading").count() == 0
+            assert os.listdir(base_dir / "uploads") == []
+            
+            # 删除其中一个视频时，另一个视频仍引用的文件保留
+            deleter = VideoDataDeleter()
+            for name in ("frames_storage_path", "ocr_results_path", "ocr_images_path", "thumbnails_path"):
+                setattr(deleter, name, str(base_dir / name))
+            deleter.delete_video_data(first["video_id"], "video", db)
+            assert os.path.exists(shared_path)
+            deleter.delete_video_data(second["video_id"], "video", db)
+            assert not os.path.exists(shared_path)
+        finally:
+            db.close()
+    
+    asyncio.run(run())
+    print("✓ 去重与校验测试通过")
+
+
+if __name__ == "__main__":
+    test_resumable_upload()
+    test_deduplication_and_hash_mismatch()
+    print("\n所有测试通过")
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图模块
+为视频帧生成多尺寸缩略图（首次请求时生成，分帧完成后也可在后台预生成），以及把多帧缩略图拼成一张雪碧图，
+时间轴上的上百张缩略图只需一次请求。
+
+缩略图和雪碧图的URL包含由帧记录（ID、路径、大小、提取时间）计算的哈希：帧重新提取后哈希随之变化，
+同一URL的内容永远不变，因此以immutable长期缓存
+"""
+
+from fastapi import HTTPException, BackgroundTasks, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from email.utils import formatdate
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from models_simple import Video, VideoFrame
+from job_module import job_registry
+from storage_module import storage_accountant
+from frame_store_module import frame_store
+import cv2
+import hashlib
+import numpy as np
+import os
+import uuid
+
+
+# 缩略图尺寸（宽度，高度按帧的宽高比缩放）
+THUMBNAIL_SIZES = {"xs": 96, "sm": 240, "md": 480}
+# 分帧完成后在后台预生成的尺寸
+PREGENERATE_SIZES = ("xs", "sm")
+THUMBNAIL_QUALITY = 80
+# 生成算法变化时修改版本号，使旧的缓存URL失效
+THUMBNAIL_VERSION = 1
+# 雪碧图最多包含的帧数
+MAX_SPRITE_FRAMES = 400
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def frame_content_key(frame_id: int, frame_path: str, file_size: Optional[int], extracted_at) -> str:
+    """帧内容的哈希：帧ID可能在删除后被复用，因此同时包含路径、大小和提取时间"""
+    extracted = extracted_at.isoformat() if extracted_at is not None else ""
+    raw = f"{THUMBNAIL_VERSION}:{frame_id}:{frame_path}:{file_size}:{extracted}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def check_size(size: str) -> int:
+    """校验缩略图尺寸名称，返回宽度"""
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"不支持的缩略图尺寸: {size}，可选: {', '.join(THUMBNAIL_SIZES)}")
+    return THUMBNAIL_SIZES[size]
+
+
+def _resize(image, width: int):
+    height, original_width = image.shape[:2]
+    if original_width <= width:
+        return image
+    new_height = max(1, round(height * width / original_width))
+    return cv2.resize(image, (width, new_height), interpolation=cv2.INTER_AREA)
+
+
+def _write_jpeg(path: Path, image) -> None:
+    """编码JPEG并原子写入（先写临时文件再重命名），并发生成同一文件时不会读到半个文件"""
+    success, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_QUALITY])
+    if not success:
+        raise ValueError(f"缩略图编码失败: {path}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    temp_path.write_bytes(encoded.tobytes())
+    previous_size = os.path.getsize(path) if path.exists() else None
+    os.replace(temp_path, path)
+    storage_accountant.file_written(path, encoded.size, previous_size)
+
+
+def _not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    """请求的If-None-Match或If-Modified-Since与当前版本一致"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    last_modified = headers.get("Last-Modified")
+    return last_modified is not None and request.headers.get("if-modified-since") == last_modified
+
+
+def cached_file_response(path: str, request: Request, media_type: str, cache_control: str, filename: Optional[str] = None) -> Response:
+    """返回文件响应，If-None-Match或If-Modified-Since匹配时返回304"""
+    stat = os.stat(path)
+    etag = '"' + hashlib.md5(f"{stat.st_mtime}-{stat.st_size}".encode()).hexdigest() + '"'
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    headers = {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": cache_control}
+    if _not_modified(request, headers):
+        return Response(status_code=304, headers=headers)
+    
+    return FileResponse(path=path, media_type=media_type, filename=filename, headers=headers, stat_result=stat)
+
+
+def cached_bytes_response(data: bytes, request: Request, media_type: str, cache_control: str, filename: Optional[str] = None) -> Response:
+    """返回内存中的数据（如归档中的帧），ETag按内容计算，If-None-Match匹配时返回304"""
+    headers = {"ETag": '"' + hashlib.md5(data).hexdigest() + '"', "Cache-Control": cache_control}
+    if _not_modified(request, headers):
+        return Response(status_code=304, headers=headers)
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
+class ThumbnailManager:
+    """缩略图管理类"""
+    
+    def __init__(self):
+        self.thumbnails_path = "./data/thumbnails"
+    
+    def thumbnail_path(self, video_id: int, frame_id: int, size: str, key: str) -> Path:
+        return Path(f"{self.thumbnails_path}/video_{video_id}/{size}/frame_{frame_id}_{key}.jpg")
+    
+    def sprite_path(self, video_id: int, size: str, key: str) -> Path:
+        return Path(f"{self.thumbnails_path}/video_{video_id}/sprites/{size}_{key}.jpg")
+    
+    def thumbnail_url(self, frame_id: int, size: str, key: str) -> str:
+        return f"/thumbnails/frames/{frame_id}/{size}/{key}.jpg"
+    
+    def ensure_thumbnail(self, video_id: int, frame_id: int, frame_path: str, size: str, key: str) -> Path:
+        """缩略图不存在时从原始帧生成，返回缩略图路径"""
+        width = check_size(size)
+        path = self.thumbnail_path(video_id, frame_id, size, key)
+        if path.exists():
+            return path
+        if not frame_store.exists(frame_path):
+            raise HTTPException(status_code=404, detail="帧图片文件不存在")
+        image = frame_store.read_image(frame_path)
+        if image is None:
+            raise HTTPException(status_code=500, detail="帧图片读取失败")
+        _write_jpeg(path, _resize(image, width))
+        return path
+    
+    def _load_frame(self, frame_id: int, db: Session) -> VideoFrame:
+        frame = db.query(VideoFrame).filter(VideoFrame.id == frame_id).first()
+        if not frame:
+            raise HTTPException(status_code=404, detail="帧不存在")
+        return frame
+    
+    def get_thumbnail_redirect(self, frame_id: int, size: str, db: Session) -> Response:
+        """重定向到帧当前的带哈希缩略图URL（重定向本身不缓存）"""
+        check_size(size)
+        frame = self._load_frame(frame_id, db)
+        key = frame_content_key(frame.id, frame.frame_path, frame.file_size, frame.extracted_at)
+        return Response(
+            status_code=307,
+            headers={"Location": self.thumbnail_url(frame.id, size, key), "Cache-Control": "no-cache"}
+        )
+    
+    async def serve_thumbnail(self, frame_id: int, size: str, key: str, request: Request, db: Session) -> Response:
+        """返回带哈希URL的缩略图（不可变，长期缓存），哈希与帧当前内容不一致时返回404"""
+        check_size(size)
+        frame = self._load_frame(frame_id, db)
+        if key != frame_content_key(frame.id, frame.frame_path, frame.file_size, frame.extracted_at):
+            raise HTTPException(status_code=404, detail="缩略图已过期")
+        path = await run_in_threadpool(self.ensure_thumbnail, frame.video_id, frame.id, frame.frame_path, size, key)
+        return cached_file_response(str(path), request, "image/jpeg", IMMUTABLE_CACHE_CONTROL)
+    
+    async def _sample_frames(self, video_id: int, db, count: int, from_ms: Optional[int], to_ms: Optional[int]) -> list:
+        """在时间窗口[from_ms, to_ms)内按时间均匀选取count帧（db为异步会话）"""
+        query = select(
+            VideoFrame.id, VideoFrame.timestamp_ms, VideoFrame.frame_path, VideoFrame.file_size, VideoFrame.extracted_at
+        ).where(VideoFrame.video_id == video_id)
+        if from_ms is not None:
+            query = query.where(VideoFrame.timestamp_ms >= from_ms)
+        if to_ms is not None:
+            query = query.where(VideoFrame.timestamp_ms < to_ms)
+        rows = (await db.execute(query.order_by(VideoFrame.timestamp_ms, VideoFrame.id))).all()
+        if len(rows) <= count:
+            return rows
+        step = len(rows) / count
+        return [rows[int(i * step)] for i in range(count)]
+    
+    async def get_sprite(self, video_id: int, db, size: str = "xs", count: int = 100, columns: int = 10,
+                         from_ms: Optional[int] = None, to_ms: Optional[int] = None) -> Dict[str, Any]:
+        """异步查询选取的帧，再在线程池中生成（或复用）雪碧图并返回清单（db为异步会话）"""
+        check_size(size)
+        if count < 1 or count > MAX_SPRITE_FRAMES:
+            raise HTTPException(status_code=400, detail=f"count取值范围为1-{MAX_SPRITE_FRAMES}")
+        if columns < 1:
+            raise HTTPException(status_code=400, detail="columns必须大于0")
+        if from_ms is not None and to_ms is not None and from_ms > to_ms:
+            raise HTTPException(status_code=400, detail="from_ms不能大于to_ms")
+        if (await db.execute(select(Video.id).where(Video.id == video_id))).first() is None:
+            raise HTTPException(status_code=404, detail="视频不存在")
+        
+        frames = await self._sample_frames(video_id, db, count, from_ms, to_ms)
+        return await run_in_threadpool(self.build_sprite, video_id, frames, size, columns)
+    
+    def build_sprite(self, video_id: int, frames: list, size: str, columns: int) -> Dict[str, Any]:
+        """用选取的帧生成（或复用）雪碧图并返回清单：雪碧图URL、单格尺寸以及每帧所在的位置"""
+        width = check_size(size)
+        manifest = {
+            "video_id": video_id,
+            "size": size,
+            "sprite_url": None,
+            "tile_width": width,
+            "tile_height": 0,
+            "columns": columns,
+            "rows": 0,
+            "tiles": []
+        }
+        if not frames:
+            return manifest
+        
+        frame_keys = [frame_content_key(f.id, f.frame_path, f.file_size, f.extracted_at) for f in frames]
+        sprite_key = hashlib.sha1(f"{size}:{columns}:{','.join(frame_keys)}".encode("utf-8")).hexdigest()[:16]
+        path = self.sprite_path(video_id, size, sprite_key)
+        
+        columns = min(columns, len(frames))
+        rows = (len(frames) + columns - 1) // columns
+        thumbnails = None
+        if not path.exists():
+            thumbnails = []
+            for frame, key in zip(frames, frame_keys):
+                try:
+                    thumbnails.append(cv2.imread(str(self.ensure_thumbnail(video_id, frame.id, frame.frame_path, size, key))))
+                except HTTPException as e:
+                    print(f"帧 {frame.id} 缩略图生成失败: {e.detail}")
+                    thumbnails.append(None)
+            valid = [image for image in thumbnails if image is not None]
+            if not valid:
+                raise HTTPException(status_code=404, detail="帧图片文件不存在")
+            tile_height = valid[0].shape[0]
+        else:
+            sprite = cv2.imread(str(path))
+            tile_height = sprite.shape[0] // rows
+        
+        if thumbnails is not None:
+            sprite = np.zeros((tile_height * rows, width * columns, 3), dtype=np.uint8)
+            for index, image in enumerate(thumbnails):
+                if image is None:
+                    continue
+                # 宽高比不同的帧缩放到统一的格子大小
+                if image.shape[0] != tile_height or image.shape[1] != width:
+                    image = cv2.resize(image, (width, tile_height), interpolation=cv2.INTER_AREA)
+                row, column = divmod(index, columns)
+                sprite[row * tile_height:(row + 1) * tile_height, column * width:(column + 1) * width] = image
+            _write_jpeg(path, sprite)
+        
+        manifest.update({
+            "sprite_url": f"/thumbnails/sprites/{video_id}/{size}/{sprite_key}.jpg",
+            "tile_height": tile_height,
+            "columns": columns,
+            "rows": rows,
+            "tiles": [{
+                "frame_id": frame.id,
+                "timestamp_ms": frame.timestamp_ms,
+                "x": (index % columns) * width,
+                "y": (index // columns) * tile_height
+            } for index, frame in enumerate(frames)]
+        })
+        return manifest
+    
+    def serve_sprite(self, video_id: int, size: str, key: str, request: Request) -> Response:
+        """返回雪碧图（不可变，长期缓存），需先通过清单接口生成"""
+        check_size(size)
+        if not all(c in "0123456789abcdef" for c in key):
+            raise HTTPException(status_code=404, detail="雪碧图不存在")
+        path = self.sprite_path(video_id, size, key)
+        if not path.exists():
+            raise HTTPException(status_code=404, detail="雪碧图不存在")
+        return cached_file_response(str(path), request, "image/jpeg", IMMUTABLE_CACHE_CONTROL)
+    
+    def pregenerate(self, video_id: int, frames: List[Dict[str, Any]], sizes=PREGENERATE_SIZES) -> Dict[str, Any]:
+        """后台任务：为视频的所有帧生成常用尺寸的缩略图"""
+        generated, failed = 0, 0
+        for frame in frames:
+            key = frame_content_key(frame["id"], frame["frame_path"], frame["file_size"], frame["extracted_at"])
+            image = None
+            for size in sizes:
+                path = self.thumbnail_path(video_id, frame["id"], size, key)
+                if path.exists():
+                    continue
+                try:
+                    if image is None:
+                        image = frame_store.read_image(frame["frame_path"])
+                        if image is None:
+                            raise ValueError(f"帧图片读取失败: {frame['frame_path']}")
+                    _write_jpeg(path, _resize(image, THUMBNAIL_SIZES[size]))
+                    generated += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"生成缩略图失败: 帧 {frame['id']}, 尺寸 {size}, 错误: {e}")
+                    break
+        return {"video_id": video_id, "frames": len(frames), "generated": generated, "failed": failed}
+    
+    def start_pregenerate_job(self, video_id: int, background_tasks: BackgroundTasks, db: Session) -> Dict[str, Any]:
+        """创建后台预生成缩略图任务，返回任务信息"""
+        frames = [dict(row._mapping) for row in db.execute(
+            select(VideoFrame.id, VideoFrame.frame_path, VideoFrame.file_size, VideoFrame.extracted_at).where(
+                VideoFrame.video_id == video_id
+            ).order_by(VideoFrame.timestamp_ms)
+        )]
+        job = job_registry.create("generate_thumbnails", {"video_id": video_id})
+        background_tasks.add_task(job_registry.run, job["job_id"], lambda: self.pregenerate(video_id, frames))
+        return job
+
+
+# 创建全局实例
+thumbnail_manager = ThumbnailManager()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+分块上传模块
+大视频分块上传，连接中断后从服务端记录的位置继续：
+1. POST /projects/{project_id}/uploads 创建上传会话，返回上传ID和建议的分块大小
+2. PUT /uploads/{upload_id}?offset=N 以请求体流式发送从offset开始的一块数据，边写入边计算SHA-256
+3. 中断后 GET /uploads/{upload_id} 查询已接收的字节数，从该位置继续
+4. POST /uploads/{upload_id}/complete 校验大小（及客户端提供的哈希）后登记视频，内容与已有视频相同时不重复保存
+"""
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from sqlalchemy.orm import Session
+from models_simple import VideoUpload
+from video_module import video_manager, write_and_hash
+from utils import update_hash_from_file
+from storage_module import storage_accountant
+from typing import Dict, Optional, Tuple
+from pydantic import BaseModel
+import asyncio
+import hashlib
+import os
+import uuid
+
+
+# 建议客户端使用的分块大小
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+UPLOAD_UPLOADING = "uploading"
+UPLOAD_COMPLETED = "completed"
+
+
+class UploadCreateRequest(BaseModel):
+    filename: str
+    size: int
+    sha256: Optional[str] = None  # 可选，完成时校验文件完整性
+
+
+class VideoUploadManager:
+    """分块上传会话管理类
+    
+    会话的已接收字节数保存在数据库中；流式哈希的状态保存在进程内存中，进程重启后续传时从临时文件重新计算。
+    同一上传会话的分块在进程内按顺序写入
+    """
+    
+    def __init__(self):
+        self._hashers: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+    
+    def _lock(self, upload_id: str) -> asyncio.Lock:
+        lock = self._locks.get(upload_id)
+        if lock is None:
+            lock = self._locks[upload_id] = asyncio.Lock()
+        return lock
+    
+    def _forget(self, upload_id: str) -> None:
+        self._hashers.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+    
+    def _session_info(self, upload: VideoUpload) -> dict:
+        return {
+            "upload_id": upload.id,
+            "project_id": upload.project_id,
+            "filename": upload.original_filename,
+            "total_size": upload.total_size,
+            "offset": upload.received_size,
+            "status": upload.status,
+            "video_id": upload.video_id,
+            "chunk_size": UPLOAD_CHUNK_SIZE
+        }
+    
+    def _load(self, upload_id: str, db: Session) -> VideoUpload:
+        upload = db.query(VideoUpload).filter(VideoUpload.id == upload_id).first()
+        if not upload:
+            raise HTTPException(status_code=404, detail="上传会话不存在")
+        return upload
+    
+    def create_upload(self, project_id: int, request: UploadCreateRequest, db: Session) -> dict:
+        """创建上传会话"""
+        video_manager.check_upload(project_id, request.filename, db)
+        if request.size <= 0:
+            raise HTTPException(status_code=400, detail="文件大小必须大于0")
+        video_manager.check_file_size(request.size)
+        
+        upload = VideoUpload(
+            id=uuid.uuid4().hex,
+            project_id=project_id,
+            original_filename=request.filename,
+            total_size=request.size,
+            received_size=0,
+            expected_hash=request.sha256.lower() if request.sha256 else None,
+            temp_path=video_manager.new_temp_path(),
+            status=UPLOAD_UPLOADING
+        )
+        open(upload.temp_path, "wb").close()
+        storage_accountant.file_written(upload.temp_path, 0)
+        db.add(upload)
+        db.commit()
+        return self._session_info(upload)
+    
+    def get_upload(self, upload_id: str, db: Session) -> dict:
+        """查询上传会话，续传时从返回的offset继续"""
+        return self._session_info(self._load(upload_id, db))
+    
+    def _restore_hasher(self, upload_id: str, temp_path: str, received_size: int):
+        """恢复流式哈希：丢弃临时文件中超出已确认字节数的部分（写入后未及记录即中断），再重新计算哈希"""
+        cached = self._hashers.get(upload_id)
+        if cached is not None and cached[0] == received_size:
+            return cached[1]
+        with open(temp_path, "ab") as f:
+            f.truncate(received_size)
+        hash_func = hashlib.sha256()
+        update_hash_from_file(hash_func, temp_path)
+        return hash_func
+    
+    async def append_chunk(self, upload_id: str, offset: int, request: Request, db: Session) -> dict:
+        """流式写入从offset开始的一块数据；客户端中途断开时保留已写入的部分"""
+        async with self._lock(upload_id):
+            upload = self._load(upload_id, db)
+            if upload.status != UPLOAD_UPLOADING:
+                raise HTTPException(status_code=409, detail="上传已完成")
+            if offset != upload.received_size:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"上传位置不一致，服务端已接收{upload.received_size}字节",
+                    headers={"Upload-Offset": str(upload.received_size)}
+                )
+            
+            hash_func = await run_in_threadpool(self._restore_hasher, upload_id, upload.temp_path, upload.received_size)
+            received = upload.received_size
+            try:
+                with open(upload.temp_path, "ab") as buffer:
+                    async for chunk in request.stream():
+                        if not chunk:
+                            continue
+                        if received + len(chunk) > upload.total_size:
+                            raise HTTPException(status_code=400, detail="上传的数据超出文件大小")
+                        await run_in_threadpool(write_and_hash, buffer, hash_func, chunk)
+                        received += len(chunk)
+            except ClientDisconnect:
+                print(f"上传 {upload_id} 连接中断，已接收 {received}/{upload.total_size} 字节")
+            finally:
+                self._hashers[upload_id] = (received, hash_func)
+                storage_accountant.file_written(upload.temp_path, received, previous_size=upload.received_size)
+                upload.received_size = received
+                db.commit()
+            
+            return self._session_info(upload)
+    
+    async def complete_upload(self, upload_id: str, db: Session) -> dict:
+        """校验并登记视频（重复调用返回同一个视频）"""
+        async with self._lock(upload_id):
+            upload = self._load(upload_id, db)
+            if upload.status == UPLOAD_COMPLETED:
+                return {"message": "视频上传成功", "upload_id": upload_id, "video_id": upload.video_id,
+                        "filename": upload.original_filename, "size": upload.total_size}
+            if upload.received_size != upload.total_size:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"文件尚未上传完整（{upload.received_size}/{upload.total_size}字节）",
+                    headers={"Upload-Offset": str(upload.received_size)}
+                )
+            
+            hash_func = await run_in_threadpool(self._restore_hasher, upload_id, upload.temp_path, upload.received_size)
+            content_hash = hash_func.hexdigest()
+            if upload.expected_hash and upload.expected_hash != content_hash:
+                # 数据已损坏，无法从中间续传，删除会话后需重新上传
+                await run_in_threadpool(self._discard, upload, db)
+                raise HTTPException(status_code=400, detail="文件校验失败（SHA-256不一致），请重新上传")
+            
+            result = await run_in_threadpool(
+                video_manager.register_uploaded_file,
+                upload.project_id, upload.original_filename, upload.temp_path, upload.total_size, content_hash, db
+            )
+            upload.status = UPLOAD_COMPLETED
+            upload.video_id = result["video_id"]
+            db.commit()
+            self._forget(upload_id)
+            return {**result, "upload_id": upload_id}
+    
+    def _discard(self, upload: VideoUpload, db: Session) -> None:
+        if os.path.exists(upload.temp_path):
+            storage_accountant.remove_file(upload.temp_path)
+        db.delete(upload)
+        db.commit()
+        self._hashers.pop(upload.id, None)
+    
+    async def abort_upload(self, upload_id: str, db: Session) -> dict:
+        """取消上传，删除临时文件"""
+        async with self._lock(upload_id):
+            upload = self._load(upload_id, db)
+            if upload.status == UPLOAD_COMPLETED:
+                raise HTTPException(status_code=409, detail="上传已完成，请删除视频")
+            await run_in_threadpool(self._discard, upload, db)
+        self._forget(upload_id)
+        return {"message": "上传已取消", "upload_id": upload_id}
+
+
+# 创建全局实例
+video_upload_manager = VideoUploadManager()
@@ -81,12 +81,27 @@ def calculate_file_hash(file_path: str, algorithm: str = "md5") -> str:
         文件哈希值
     """
     hash_func = getattr(hashlib, algorithm)()
+    update_hash_from_file(hash_func, file_path)
+    return hash_func.hexdigest()
+
+
+def update_hash_from_file(hash_func, file_path: str, chunk_size: int = 1024 * 1024) -> int:
+    """将文件内容分块读入哈希对象（分块上传续传时用于恢复流式哈希的状态）
+    
+    Args:
+        hash_func: hashlib哈希对象
+        file_path: 文件路径
+        chunk_size: 每次读取的字节数
     
+    Returns:
+        读取的字节数
+    """
+    total = 0
     with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b""):
+        for chunk in iter(lambda: f.read(chunk_size), b""):
             hash_func.update(chunk)
-    
-    return hash_func.hexdigest()
+            total += len(chunk)
+    return total
 
 
 def get_file_size(file_path: str) -> int:
@@ -5,14 +5,30 @@
 """
 
 from fastapi import HTTPException, UploadFile, File, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from models_simple import Video, Project, ProcessStatus
+from deletion_module import video_data_deleter
+from metadata_module import video_metadata_prober
+from storage_module import storage_accountant
+from config import settings
 from pathlib import Path
 from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel
-import shutil
+import hashlib
 import os
+import uuid
+
+
+# 表单上传时每次读取的字节数
+UPLOAD_READ_CHUNK_SIZE = 1024 * 1024
+
+
+def write_and_hash(buffer, hash_func, chunk: bytes) -> None:
+    """写入一块数据并更新哈希（在线程池中执行，hashlib计算大块数据时释放GIL）"""
+    buffer.write(chunk)
+    hash_func.update(chunk)
 
 
 class VideoResponse(BaseModel):
@@ -28,6 +44,8 @@ class VideoResponse(BaseModel):
     format: Optional[str]
     upload_time: datetime
     process_status: str
+    frames_purged_at: Optional[datetime] = None
+    archived_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
@@ -39,9 +57,11 @@ class VideoManager:
     def __init__(self):
         self.allowed_extensions = [".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv", ".webm"]
         self.video_storage_path = "./data/videos"
+        self.upload_temp_path = "./data/uploads"
         
         # 确保视频存储目录存在
         Path(self.video_storage_path).mkdir(parents=True, exist_ok=True)
+        Path(self.upload_temp_path).mkdir(parents=True, exist_ok=True)
     
     def validate_video_file(self, filename: str) -> bool:
         """验证视频文件格式"""
@@ -49,64 +69,139 @@ class VideoManager:
         return file_extension in self.allowed_extensions
     
     def generate_stored_filename(self, project_id: int, original_filename: str) -> str:
-        """生成存储文件名"""
+        """生成存储文件名（带随机后缀，同一秒内上传的视频不会互相覆盖）"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         file_extension = Path(original_filename).suffix.lower()
-        return f"video_{project_id}_{timestamp}{file_extension}"
+        return f"video_{project_id}_{timestamp}_{uuid.uuid4().hex[:8]}{file_extension}"
     
     def get_file_path(self, stored_filename: str) -> str:
         """获取文件完整路径"""
         return f"{self.video_storage_path}/{stored_filename}"
     
-    async def upload_video(self, project_id: int, file: UploadFile, db: Session) -> dict:
-        """上传视频文件"""
-        # 检查项目是否存在
+    def check_upload(self, project_id: int, filename: str, db: Session) -> None:
+        """检查项目是否存在以及文件类型"""
         project = db.query(Project).filter(Project.id == project_id).first()
         if not project:
             raise HTTPException(status_code=404, detail="项目不存在")
         
-        # 检查文件类型
-        if not self.validate_video_file(file.filename):
-            file_extension = Path(file.filename).suffix.lower()
+        if not self.validate_video_file(filename):
+            file_extension = Path(filename).suffix.lower()
             raise HTTPException(status_code=400, detail=f"不支持的文件格式: {file_extension}")
+    
+    def check_file_size(self, size: int) -> None:
+        if size > settings.max_video_size:
+            raise HTTPException(
+                status_code=413,
+                detail=f"文件过大，最大支持{settings.max_video_size // (1024 * 1024)}MB"
+            )
+    
+    def new_temp_path(self) -> str:
+        """上传过程中使用的临时文件路径"""
+        return f"{self.upload_temp_path}/{uuid.uuid4().hex}.part"
+    
+    def register_uploaded_file(self, project_id: int, original_filename: str, temp_path: str, file_size: int,
+                               content_hash: str, db: Session) -> dict:
+        """登记上传完成的文件
         
-        # 生成存储文件名和路径
-        stored_filename = self.generate_stored_filename(project_id, file.filename)
-        file_path = self.get_file_path(stored_filename)
+        已有内容相同（SHA-256和大小一致）且文件仍存在的视频时，新视频复用该文件并删除临时文件；
+        否则将临时文件移动到视频存储目录
+        """
+        file_path = None
+        source_video = None
+        candidates = db.query(Video).filter(
+            Video.content_hash == content_hash, Video.file_size == file_size
+        ).order_by(Video.metadata_probed_at.is_(None))
+        for candidate in candidates:
+            if os.path.exists(candidate.file_path):
+                source_video = candidate
+                file_path, stored_filename = candidate.file_path, candidate.stored_filename
+                break
+        
+        deduplicated = file_path is not None
+        if deduplicated:
+            storage_accountant.remove_file(temp_path)
+        else:
+            stored_filename = self.generate_stored_filename(project_id, original_filename)
+            file_path = self.get_file_path(stored_filename)
+            os.replace(temp_path, file_path)
+            storage_accountant.file_moved(temp_path, file_path, file_size)
         
-        # 保存文件
         try:
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            file_size = os.path.getsize(file_path)
-            
             # 创建视频记录
             db_video = Video(
                 project_id=project_id,
-                original_filename=file.filename,
+                original_filename=original_filename,
                 stored_filename=stored_filename,
                 file_path=file_path,
                 file_size=file_size,
-                format=Path(file.filename).suffix[1:],  # 去掉点号
-                process_status=ProcessStatus.pending
+                format=Path(original_filename).suffix[1:],  # 去掉点号
+                process_status=ProcessStatus.pending,
+                content_hash=content_hash
             )
+            if source_video is not None:
+                video_metadata_prober.copy_metadata(source_video, db_video)
             
             db.add(db_video)
             db.commit()
             db.refresh(db_video)
+        except Exception:
+            db.rollback()
+            # 新移动的文件没有视频记录引用，删除；复用的文件属于已有视频，保留
+            if not deduplicated and os.path.exists(file_path):
+                storage_accountant.remove_file(file_path)
+            raise
+        
+        return {
+            "message": "视频上传成功",
+            "video_id": db_video.id,
+            "filename": original_filename,
+            "size": file_size,
+            "content_hash": content_hash,
+            "deduplicated": deduplicated
+        }
+    
+    async def upload_video(self, project_id: int, file: UploadFile, db: Session) -> dict:
+        """上传视频文件（边接收边计算SHA-256，与已有视频内容相同时不重复保存）"""
+        self.check_upload(project_id, file.filename, db)
+        
+        # 先写入临时文件，完成后再登记
+        temp_path = self.new_temp_path()
+        hash_func = hashlib.sha256()
+        file_size = 0
+        recorded = False
+        
+        def discard_temp():
+            if not os.path.exists(temp_path):
+                return
+            # 接收完成后临时文件已计入存储用量
+            if recorded:
+                storage_accountant.remove_file(temp_path)
+            else:
+                os.remove(temp_path)
+        
+        # 保存文件
+        try:
+            with open(temp_path, "wb") as buffer:
+                while True:
+                    chunk = await file.read(UPLOAD_READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    file_size += len(chunk)
+                    self.check_file_size(file_size)
+                    await run_in_threadpool(write_and_hash, buffer, hash_func, chunk)
+            storage_accountant.file_written(temp_path, file_size)
+            recorded = True
             
-            return {
-                "message": "视频上传成功",
-                "video_id": db_video.id,
-                "filename": file.filename,
-                "size": file_size
-            }
+            return await run_in_threadpool(
+                self.register_uploaded_file, project_id, file.filename, temp_path, file_size, hash_func.hexdigest(), db
+            )
             
+        except HTTPException:
+            discard_temp()
+            raise
         except Exception as e:
             # 如果保存失败，删除已上传的文件
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            discard_temp()
             raise HTTPException(status_code=500, detail=f"文件保存失败: {str(e)}")
     
     async def get_video(self, video_id: int, db: Session) -> Video:
@@ -129,26 +224,20 @@ class VideoManager:
             db.commit()
     
     def delete_video(self, video_id: int, db: Session) -> dict:
-        """删除视频及其文件"""
+        """删除视频及其文件（包括帧、OCR结果、阶段配置和分析结果）"""
         video = db.query(Video).filter(Video.id == video_id).first()
         if not video:
             raise HTTPException(status_code=404, detail="视频不存在")
+        filename = video.original_filename
         
-        # 删除视频文件
-        if os.path.exists(video.file_path):
-            try:
-                os.remove(video.file_path)
-            except Exception as e:
-                print(f"删除视频文件失败: {video.file_path}, 错误: {e}")
-        
-        # 删除数据库记录
-        db.delete(video)
-        db.commit()
+        result = video_data_deleter.delete_video_data(video_id, "video", db)
         
         return {
             "message": "视频删除成功",
             "video_id": video_id,
-            "filename": video.original_filename
+            "filename": filename,
+            "deleted_rows": result["deleted_rows"],
+            "deleted_files": result["deleted_files"]
         }
     
     def get_video_info(self, video_id: int, db: Session) -> dict:
@@ -76,17 +76,37 @@ export const videoApi = {
     return api.get(`/videos/${videoId}`)
   },
   
+  // 获取视频元数据（时长、帧率、分辨率、编码、总帧数、关键帧位置）
+  getVideoMetadata(videoId) {
+    return api.get(`/videos/${videoId}/metadata`)
+  },
+  
+  // 获取视频各类产物占用的文件数和字节数
+  getVideoStorage(videoId) {
+    return api.get(`/videos/${videoId}/storage`)
+  },
+  
   // 获取视频帧列表
   getVideoFrames(videoId) {
     return api.get(`/videos/${videoId}/frames`)
   },
   
+  // 分页获取视频帧（params: from_ms, to_ms, cursor, limit, fields, include_total）
+  getVideoFramesPage(videoId, params) {
+    return api.get(`/videos/${videoId}/frames/page`, { params })
+  },
+  
   // 提取视频帧
   extractVideoFrames(videoId, params) {
     return api.post(`/videos/${videoId}/extract-frames`, params)
   },
   
-  // 删除视频所有帧
+  // 删除视频及其所有数据（后台任务，返回任务信息）
+  deleteVideo(videoId) {
+    return api.delete(`/videos/${videoId}`)
+  },
+  
+  // 删除视频所有帧（后台任务，返回任务信息）
   deleteVideoFrames(videoId) {
     return api.delete(`/videos/${videoId}/frames`)
   },
@@ -99,6 +119,16 @@ export const videoApi = {
   // 获取帧图片URL
   getFrameImageUrl(frameId) {
     return `${api.defaults.baseURL}/frames/${frameId}/image`
+  },
+  
+  // 获取帧缩略图URL（size: xs/sm/md）
+  getFrameThumbnailUrl(frameId, size = 'sm') {
+    return `${api.defaults.baseURL}/frames/${frameId}/thumbnail?size=${size}`
+  },
+  
+  // 获取时间轴缩略图雪碧图（params: size, count, columns, from_ms, to_ms），返回雪碧图URL和每帧位置
+  getThumbnailSprite(videoId, params) {
+    return api.get(`/videos/${videoId}/thumbnail-sprite`, { params })
   }
 }
 
@@ -117,9 +147,9 @@ export const stageConfigApi = {
 
 // OCR处理API
 export const ocrApi = {
-  // 处理视频OCR
+  // 处理视频OCR（处理完成后才返回，进度通过progressApi.subscribe获取）
   processVideoOCR(videoId, params) {
-    return api.post(`/videos/${videoId}/process-ocr`, params)
+    return api.post(`/videos/${videoId}/process-ocr`, params, { timeout: 0 })
   },
   
   // 获取视频OCR结果
@@ -127,6 +157,11 @@ export const ocrApi = {
     return api.get(`/videos/${videoId}/ocr-results`)
   },
   
+  // 分页获取视频OCR结果（params: from_ms, to_ms, cursor, limit, fields, include_total）
+  getVideoOCRResultsPage(videoId, params) {
+    return api.get(`/videos/${videoId}/ocr-results/page`, { params })
+  },
+  
   // 获取增强OCR结果
   getEnhancedOCRResults(videoId) {
     return api.get(`/videos/${videoId}/enhanced-ocr-results`)
@@ -168,6 +203,133 @@ export const ocrApi = {
   }
 }
 
+// 后台任务API
+export const jobApi = {
+  // 获取后台任务状态
+  getJob(jobId) {
+    return api.get(`/jobs/${jobId}`)
+  },
+  
+  // 轮询后台任务直到结束，返回最终的任务信息
+  async waitForJob(jobId, interval = 1000) {
+    while (true) {
+      const job = await api.get(`/jobs/${jobId}`)
+      if (job.status === 'completed' || job.status === 'failed') {
+        return job
+      }
+      await new Promise(resolve => setTimeout(resolve, interval))
+    }
+  }
+}
+
+// 分块上传API（断点续传）
+export const uploadApi = {
+  // 创建上传会话
+  createUpload(projectId, file) {
+    return api.post(`/projects/${projectId}/uploads`, { filename: file.name, size: file.size })
+  },
+  
+  // 查询上传会话（已接收的字节数）
+  getUpload(uploadId) {
+    return api.get(`/uploads/${uploadId}`)
+  },
+  
+  // 上传从offset开始的一块数据
+  uploadChunk(uploadId, offset, blob) {
+    return api.put(`/uploads/${uploadId}`, blob, {
+      params: { offset },
+      headers: {
+        'Content-Type': 'application/octet-stream'
+      },
+      timeout: 300000
+    })
+  },
+  
+  // 完成上传，登记视频
+  completeUpload(uploadId) {
+    return api.post(`/uploads/${uploadId}/complete`, null, { timeout: 300000 })
+  },
+  
+  // 取消上传
+  abortUpload(uploadId) {
+    return api.delete(`/uploads/${uploadId}`)
+  },
+  
+  // 分块上传文件，中断后重试时从服务端已接收的位置继续；刷新页面后再次上传同一文件也会续传
+  async uploadFile(projectId, file, { onProgress, maxRetries = 5 } = {}) {
+    const storageKey = `upload:${projectId}:${file.name}:${file.size}:${file.lastModified}`
+    let session = null
+    const savedId = localStorage.getItem(storageKey)
+    if (savedId) {
+      session = await this.getUpload(savedId).catch(() => null)
+      if (session && session.status !== 'uploading') {
+        session = null
+      }
+    }
+    if (!session) {
+      session = await this.createUpload(projectId, file)
+      localStorage.setItem(storageKey, session.upload_id)
+    }
+    
+    let offset = session.offset
+    let retries = 0
+    while (offset < file.size) {
+      onProgress && onProgress(Math.floor(offset / file.size * 100))
+      try {
+        const blob = file.slice(offset, offset + session.chunk_size)
+        const result = await this.uploadChunk(session.upload_id, offset, blob)
+        offset = result.offset
+        retries = 0
+      } catch (error) {
+        if (error.response && error.response.status < 500 && error.response.status !== 409) {
+          throw error
+        }
+        if (++retries > maxRetries) {
+          throw error
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** (retries - 1)))
+        // 以服务端记录的位置为准继续上传
+        offset = (await this.getUpload(session.upload_id)).offset
+      }
+    }
+    
+    onProgress && onProgress(99)
+    try {
+      const result = await this.completeUpload(session.upload_id)
+      localStorage.removeItem(storageKey)
+      onProgress && onProgress(100)
+      return result
+    } catch (error) {
+      if (error.response && error.response.status === 400) {
+        // 校验失败的会话已被删除，下次重新上传
+        localStorage.removeItem(storageKey)
+      }
+      throw error
+    }
+  }
+}
+
+// 处理进度API
+export const progressApi = {
+  // 获取视频分帧、OCR的当前进度
+  getProgress(videoId) {
+    return api.get(`/videos/${videoId}/progress`)
+  },
+  
+  // 订阅视频处理进度（SSE），onProgress收到 { phases: { extraction, ocr }, stage_results }，返回取消订阅的函数
+  subscribe(videoId, onProgress) {
+    const source = new EventSource(`${api.defaults.baseURL}/videos/${videoId}/progress/stream`)
+    source.addEventListener('progress', event => {
+      onProgress(JSON.parse(event.data))
+    })
+    source.onerror = error => {
+      // 浏览器会自动重连
+      console.error('进度连接中断:', error)
+    }
+    return () => source.close()
+  }
+}
+
 // 系统信息API
 export const systemApi = {
   // 获取系统信息
@@ -175,6 +337,21 @@ export const systemApi = {
     return api.get('/system/info')
   },
   
+  // 立即与磁盘核对存储用量（后台任务）
+  reconcileStorage() {
+    return api.post('/system/storage/reconcile')
+  },
+  
+  // 预览按保留策略将要清理的文件
+  getRetentionReport() {
+    return api.get('/system/retention')
+  },
+  
+  // 立即按保留策略清理（后台任务），dryRun为true时只统计不删除
+  runRetentionGC(dryRun = false) {
+    return api.post('/system/retention/gc', null, { params: { dry_run: dryRun } })
+  },
+  
   // 获取根路径信息
   getRoot() {
     return api.get('/')